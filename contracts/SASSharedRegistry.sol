@@ -81,6 +81,15 @@ contract SASSharedRegistry {
         uint256 requestedHighFrequency;
         uint256 grantExpireTime;
     }
+    struct RelinquishmentRequest {
+        string fccId;
+        string cbsdSerialNumber;
+        string grantId;
+    }
+    struct DeregistrationRequest {
+        string fccId;
+        string cbsdSerialNumber;
+    }
 
     mapping(bytes32 => CBSD) public cbsds;
     mapping(bytes32 => Grant[]) public grants;
@@ -89,9 +98,19 @@ contract SASSharedRegistry {
 
     event SASAuthorized(address indexed sas);
     event SASRevoked(address indexed sas);
-    event CBSDRegistered(string indexed fccId, string indexed serialNumber, address indexed sasOrigin);
-    event GrantCreated(string indexed fccId, string indexed serialNumber, string grantId, address indexed sasOrigin);
-    event GrantTerminated(string indexed fccId, string indexed serialNumber, string grantId, address indexed sasOrigin);
+    // cbsdKey (= _generateCBSDKey) indexado permite filtrar o histórico de um CBSD
+    // no nó; fccId e serialNumber vão em texto no data
+    // latitude/longitude (graus x 1e7) no evento: o gateway indexa os CBSDs por localização
+    event CBSDRegistered(bytes32 indexed cbsdKey, string fccId, string serialNumber, address indexed sasOrigin,
+                         int256 latitude, int256 longitude);
+    event CBSDDeregistered(bytes32 indexed cbsdKey, string fccId, string serialNumber, address indexed sasOrigin);
+    // Faixa do grant (Hz) e EIRP máxima no evento: o gateway indexa os grants ativos por
+    // frequência e verifica conflitos co-canal entre SAS
+    event GrantCreated(bytes32 indexed cbsdKey, string fccId, string serialNumber, string grantId, address indexed sasOrigin,
+                       uint256 lowFrequency, uint256 highFrequency, uint256 maxEirp);
+    event GrantTerminated(bytes32 indexed cbsdKey, string fccId, string serialNumber, string grantId, address indexed sasOrigin);
+    // Item de lote que falhou (os demais itens seguem; sucesso = evento da operação)
+    event BatchItemFailed(uint256 indexed index, string operation, string reason);
 
     modifier onlyOwner() {
         // require(msg.sender == owner, "Not authorized");
@@ -123,9 +142,16 @@ contract SASSharedRegistry {
         return keccak256(abi.encodePacked(fccId, serialNumber));
     }
 
-    function registration(RegistrationRequest calldata req) external onlyAuthorizedSAS {
+    function _requireOk(string memory err) private pure {
+        require(bytes(err).length == 0, err);
+    }
+
+    // Operações internas: retornam a mensagem de erro ("" em caso de sucesso)
+    // para que os lotes registrem falhas por item sem reverter a transação.
+
+    function _registration(RegistrationRequest calldata req) private returns (string memory) {
         bytes32 cbsdKey = _generateCBSDKey(req.fccId, req.cbsdSerialNumber);
-        require(bytes(cbsds[cbsdKey].fccId).length == 0, "CBSD already exists");
+        if (bytes(cbsds[cbsdKey].fccId).length != 0) return "CBSD already exists";
         CBSD storage newCbsd = cbsds[cbsdKey];
         newCbsd.fccId = req.fccId;
         newCbsd.userId = req.userId;
@@ -148,12 +174,13 @@ contract SASSharedRegistry {
         newCbsd.sasOrigin = msg.sender;
         newCbsd.registrationTimestamp = block.timestamp;
         totalCbsds++;
-        emit CBSDRegistered(req.fccId, req.cbsdSerialNumber, msg.sender);
+        emit CBSDRegistered(cbsdKey, req.fccId, req.cbsdSerialNumber, msg.sender, req.latitude, req.longitude);
+        return "";
     }
 
-    function grant(GrantRequest calldata req) external onlyAuthorizedSAS {
+    function _grant(GrantRequest calldata req) private returns (string memory) {
         bytes32 cbsdKey = _generateCBSDKey(req.fccId, req.cbsdSerialNumber);
-        require(bytes(cbsds[cbsdKey].fccId).length != 0, "CBSD not registered");
+        if (bytes(cbsds[cbsdKey].fccId).length == 0) return "CBSD not registered";
         string memory grantId = string(abi.encodePacked("grant_", req.fccId, req.cbsdSerialNumber, grants[cbsdKey].length));
         grants[cbsdKey].push();
         Grant storage newGrant = grants[cbsdKey][grants[cbsdKey].length - 1];
@@ -170,27 +197,81 @@ contract SASSharedRegistry {
         newGrant.sasOrigin = msg.sender;
         newGrant.grantTimestamp = block.timestamp;
         totalGrants++;
-        emit GrantCreated(req.fccId, req.cbsdSerialNumber, grantId, msg.sender);
+        emit GrantCreated(cbsdKey, req.fccId, req.cbsdSerialNumber, grantId, msg.sender, req.lowFrequency,
+                           req.highFrequency, req.maxEirp);
+        return "";
     }
 
-    function relinquishment(string memory fccId, string memory cbsdSerialNumber, string memory grantId) external onlyAuthorizedSAS {
+    function _relinquishment(string memory fccId, string memory cbsdSerialNumber, string memory grantId) private returns (string memory, bool) {
         bytes32 cbsdKey = _generateCBSDKey(fccId, cbsdSerialNumber);
-        require(bytes(cbsds[cbsdKey].fccId).length != 0, "CBSD not registered");
+        if (bytes(cbsds[cbsdKey].fccId).length == 0) return ("CBSD not registered", false);
         Grant[] storage grantArray = grants[cbsdKey];
         for (uint i = 0; i < grantArray.length; i++) {
             if (keccak256(bytes(grantArray[i].grantId)) == keccak256(bytes(grantId))) {
                 grantArray[i].terminated = true;
-                emit GrantTerminated(fccId, cbsdSerialNumber, grantId, msg.sender);
-                break;
+                emit GrantTerminated(cbsdKey, fccId, cbsdSerialNumber, grantId, msg.sender);
+                return ("", true);
             }
         }
+        return ("", false);
     }
 
-    function deregistration(string memory fccId, string memory cbsdSerialNumber) external onlyAuthorizedSAS {
+    function _deregistration(string memory fccId, string memory cbsdSerialNumber) private returns (string memory) {
         bytes32 cbsdKey = _generateCBSDKey(fccId, cbsdSerialNumber);
-        require(bytes(cbsds[cbsdKey].fccId).length != 0, "CBSD not registered");
+        if (bytes(cbsds[cbsdKey].fccId).length == 0) return "CBSD not registered";
         delete cbsds[cbsdKey];
         delete grants[cbsdKey];
         totalCbsds--;
+        emit CBSDDeregistered(cbsdKey, fccId, cbsdSerialNumber, msg.sender);
+        return "";
+    }
+
+    function registration(RegistrationRequest calldata req) external onlyAuthorizedSAS {
+        _requireOk(_registration(req));
+    }
+
+    function grant(GrantRequest calldata req) external onlyAuthorizedSAS {
+        _requireOk(_grant(req));
+    }
+
+    function relinquishment(string memory fccId, string memory cbsdSerialNumber, string memory grantId) external onlyAuthorizedSAS {
+        (string memory err, ) = _relinquishment(fccId, cbsdSerialNumber, grantId);
+        _requireOk(err);
+    }
+
+    function deregistration(string memory fccId, string memory cbsdSerialNumber) external onlyAuthorizedSAS {
+        _requireOk(_deregistration(fccId, cbsdSerialNumber));
+    }
+
+    // Lotes: uma transação para vários CBSDs. Itens inválidos emitem
+    // BatchItemFailed(index, operação, motivo) e não revertem o lote.
+
+    function registrationBatch(RegistrationRequest[] calldata reqs) external onlyAuthorizedSAS {
+        for (uint256 i = 0; i < reqs.length; i++) {
+            string memory err = _registration(reqs[i]);
+            if (bytes(err).length != 0) emit BatchItemFailed(i, "registration", err);
+        }
+    }
+
+    function grantBatch(GrantRequest[] calldata reqs) external onlyAuthorizedSAS {
+        for (uint256 i = 0; i < reqs.length; i++) {
+            string memory err = _grant(reqs[i]);
+            if (bytes(err).length != 0) emit BatchItemFailed(i, "grant", err);
+        }
+    }
+
+    function relinquishmentBatch(RelinquishmentRequest[] calldata reqs) external onlyAuthorizedSAS {
+        for (uint256 i = 0; i < reqs.length; i++) {
+            (string memory err, bool found) = _relinquishment(reqs[i].fccId, reqs[i].cbsdSerialNumber, reqs[i].grantId);
+            if (bytes(err).length != 0) emit BatchItemFailed(i, "relinquishment", err);
+            else if (!found) emit BatchItemFailed(i, "relinquishment", "Grant not found");
+        }
+    }
+
+    function deregistrationBatch(DeregistrationRequest[] calldata reqs) external onlyAuthorizedSAS {
+        for (uint256 i = 0; i < reqs.length; i++) {
+            string memory err = _deregistration(reqs[i].fccId, reqs[i].cbsdSerialNumber);
+            if (bytes(err).length != 0) emit BatchItemFailed(i, "deregistration", err);
+        }
     }
-} 
\ No newline at end of file
+}
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark: geração do /v1.2/fullActivityDump com N CBSDs indexados
+
+Popula o índice (em memória e SQLite) com N CBSDs, um grant a cada
+``--grant-every``, e mede a geração do dump em partes (``dump_chunks``):
+tempo, vazão e tamanho (com e sem gzip). Em seguida compara o pico de memória alocada (tracemalloc) do dump
+em partes com o de montar o dump inteiro antes de responder.
+
+Uso:
+    python benchmarks/bench_activity_dump.py --cbsds 1000000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from repository.activity_dump import dump_chunks
+from repository.repository import CBSDRepository, cbsd_key
+from repository.sqlite_repository import SQLiteCBSDRepository
+
+SAS = "0xf39Fd6e51aad88F6F4ce6aB8827279cffFb92266"
+TX_HASH = "0x" + "01" * 32
+
+
+def populate(repo, count, grant_every):
+    with repo.transaction():
+        for i in range(count):
+            cbsd_id = cbsd_key("BENCH-FCC", f"BENCH-SN-{i}")
+            repo.add_cbsd(cbsd_id, {"fcc_id": None, "serial_number": None, "sas_origin": SAS,
+                                    "status": "registered", "block_number": i // 100, "transaction_hash": TX_HASH})
+            if grant_every and i % grant_every == 0:
+                repo.add_grant(cbsd_id, {"grant_id": f"GRANT-{i}", "sas_origin": SAS, "created_at": i // 100,
+                                         "transaction_hash": TX_HASH, "terminated": False})
+        repo.set_sas(SAS, True)
+        repo.set_checkpoint(count // 100)
+
+
+def measure(label, repo, count, gzip):
+    start = time.perf_counter()
+    size = chunks = 0
+    for chunk in dump_chunks(repo.snapshot(), gzip=gzip):
+        size += len(chunk)
+        chunks += 1
+    elapsed = time.perf_counter() - start
+    print(f"{label:24s} {elapsed:7.2f}s  {count / elapsed:10,.0f} CBSDs/s  {size / 2**20:8.1f} MiB em {chunks} partes")
+
+
+def peak_memory(generate):
+    """Pico de memória alocada (tracemalloc) ao consumir ``generate()``"""
+    tracemalloc.start()
+    for _ in generate():
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cbsds", type=int, default=1_000_000)
+    parser.add_argument("--grant-every", type=int, default=4, help="um grant a cada N CBSDs (0 = nenhum)")
+    parser.add_argument("--no-trace", action="store_true", help="sem a medição de pico de memória (tracemalloc)")
+    args = parser.parse_args()
+
+    memory = CBSDRepository()
+    populate(memory, args.cbsds, args.grant_every)
+    path = os.path.join(tempfile.mkdtemp(), "index.db")
+    store = SQLiteCBSDRepository(path)
+    populate(store, args.cbsds, args.grant_every)
+    print(f"{args.cbsds} CBSDs, um grant a cada {args.grant_every}\n")
+
+    measure("Memória, NDJSON:", memory, args.cbsds, False)
+    measure("Memória, NDJSON+gzip:", memory, args.cbsds, True)
+    measure("SQLite, NDJSON:", store, args.cbsds, False)
+    measure("SQLite, NDJSON+gzip:", store, args.cbsds, True)
+
+    if not args.no_trace:
+        streamed = peak_memory(lambda: dump_chunks(memory.snapshot()))
+        whole = peak_memory(lambda: [b"".join(dump_chunks(memory.snapshot()))])
+        print(f"\nPico de memória do dump em partes: {streamed:8.1f} MiB")
+        print(f"Pico de memória do dump inteiro:   {whole:8.1f} MiB")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
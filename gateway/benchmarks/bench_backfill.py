@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark: backfill de um histórico longo, sequencial vs paralelo adaptativo
+
+Injeta no nó stand-in N logs (SASAuthorized) em B blocos, metade deles
+concentrada num trecho denso de 1% dos blocos, com latência simulada por
+``eth_getLogs`` e limite de logs por resposta (como um nó real). Mede:
+
+- sequencial: ``eth_getLogs`` em faixas fixas de ``--chunk`` blocos, um por
+  vez (o indexador antes do Backfill). Falha se uma faixa passar do limite
+- Backfill: faixas adaptativas buscadas por ``--workers`` chamadas
+  concorrentes, aplicadas em ordem pelo EventIndexer
+
+Uso:
+    python benchmarks/bench_backfill.py --logs 200000 --blocks 100000 --workers 8
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from web3 import AsyncWeb3
+from web3._utils.method_formatters import log_entry_formatter
+from blockchain.blockchain import load_contract_abi
+from blockchain.event_indexer import EventIndexer
+from config.settings import settings
+from rpc_standin import ChainStandIn, RPCStandInServer, encode_event_log
+
+
+def populate(chain, contract, logs, blocks):
+    abi = next(e for e in contract.abi if e["type"] == "event" and e["name"] == "SASAuthorized")
+    template = encode_event_log(contract.address, abi, {"sas": "0xf39Fd6e51aad88F6F4ce6aB8827279cffFb92266"})
+    dense_start, dense_blocks = blocks // 2, max(1, blocks // 100)
+    numbers = []
+    for i in range(logs):
+        if i % 2:
+            numbers.append(dense_start + (i // 2) * dense_blocks // (logs // 2 + 1))
+        else:
+            numbers.append(1 + (i // 2) * (blocks - 1) // (logs // 2 + 1))
+    numbers.sort()
+    chain.add_logs([dict(template, blockNumber=hex(number)) for number in numbers])
+    while chain.block_number < blocks:
+        chain.mine()
+
+
+async def sequential(web3, contract, topics, head, chunk):
+    applied = 0
+    start = 1
+    while start <= head:
+        end = min(head, start + chunk - 1)
+        logs = await web3.eth.get_logs({"address": contract.address, "fromBlock": start, "toBlock": end,
+                                        "topics": topics})
+        applied += len(logs)
+        start = end + 1
+    return applied
+
+
+async def run(args):
+    chain = ChainStandIn(max_logs=args.max_logs or None, logs_latency=args.latency / 1000)
+    with RPCStandInServer(chain) as server:
+        web3 = AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(server.url, request_kwargs={"timeout": 600}))
+        contract = web3.eth.contract(address=settings.CONTRACT_ADDRESS, abi=load_contract_abi())
+        populate(chain, contract, args.logs, args.blocks)
+        head = chain.block_number
+        print(f"{args.logs} logs em {head} blocos (metade em {args.blocks // 100} blocos), "
+              f"{args.latency:.0f} ms por eth_getLogs, limite de {args.max_logs} logs por resposta\n")
+
+        applied = []
+        handlers = {"SASAuthorized": lambda event: applied.append(event["blockNumber"])}
+        indexer = EventIndexer(web3, contract, handlers, start_block=1, chunk_size=args.chunk,
+                               workers=args.workers)
+
+        start = time.perf_counter()
+        try:
+            count = await sequential(web3, contract, indexer._topics, head, args.chunk)
+            elapsed = time.perf_counter() - start
+            print(f"Sequencial ({args.chunk} blocos):  {elapsed:7.2f}s  {head / elapsed:10,.0f} blocos/s  "
+                  f"{count / elapsed:8,.0f} logs/s")
+        except Exception as e:
+            print(f"Sequencial ({args.chunk} blocos):  falhou após {time.perf_counter() - start:.2f}s: {e}")
+
+        start = time.perf_counter()
+        await indexer.sync()
+        elapsed = time.perf_counter() - start
+        stats = indexer.backfill.get_stats()
+        assert applied == sorted(applied) and len(applied) == args.logs
+        print(f"Backfill ({args.workers} workers):      {elapsed:7.2f}s  {head / elapsed:10,.0f} blocos/s  "
+              f"{args.logs / elapsed:8,.0f} logs/s  ({stats['requests']} eth_getLogs, {stats['splits']} divisões, "
+              f"faixa final {stats['chunk_size']} blocos)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logs", type=int, default=200_000)
+    parser.add_argument("--blocks", type=int, default=100_000)
+    parser.add_argument("--chunk", type=int, default=2000, help="faixa inicial (e fixa no sequencial)")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=20, help="ms por eth_getLogs no stand-in")
+    parser.add_argument("--max-logs", type=int, default=10_000, help="limite de logs por resposta do nó (0 = sem limite)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
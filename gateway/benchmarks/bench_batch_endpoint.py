@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark: N requisições individuais vs um lote WInnForum
+
+Registra N CBSDs da mesma conta via ``/v1.3/registration`` de duas formas:
+
+- N POSTs com um item cada (concorrentes)
+- um POST com ``{"registrationRequest": [...]}``
+
+Mostra tempo total, requisições HTTP recebidas pelo nó stand-in e chamadas
+``eth_sendRawTransaction``.
+
+Uso:
+    python benchmarks/bench_batch_endpoint.py --items 200 --block-time 1
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import httpx
+from eth_account import Account
+from web3 import AsyncWeb3
+from blockchain.async_blockchain import AsyncBlockchain
+from blockchain.signer_pool import SignerPool
+from blockchain.receipt_watcher import ReceiptWatcher
+from blockchain.gas_policy import GasPolicy
+import api.api as api_module
+from rpc_standin import ChainStandIn, RPCStandInServer
+
+PAYLOAD = {
+    "fccId": "BATCH-FCC", "userId": "BATCH-USER", "cbsdSerialNumber": "BATCH-SN",
+    "callSign": "BATCH", "cbsdCategory": "A", "airInterface": "E_UTRA",
+    "measCapability": ["EUTRA_CARRIER_RSSI"], "eirpCapability": 47,
+    "latitude": 375000000, "longitude": 1224000000, "height": 30, "heightType": "AGL",
+    "indoorDeployment": False, "antennaGain": 15, "antennaBeamwidth": 360,
+    "antennaAzimuth": 0, "groupingParam": "",
+    "cbsdAddress": "0xf39Fd6e51aad88F6F4ce6aB8827279cffFb92266"
+}
+
+
+async def run(server, items, batch):
+    web3 = AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(server.url))
+    watcher = ReceiptWatcher(web3, api_module.receipt_cache)
+    api_module.signer_pool = SignerPool(web3=web3, signer_class=AsyncBlockchain, receipt_watcher=watcher,
+                                        gas_policy=GasPolicy(web3, watcher))
+    api_module.receipt_watcher = watcher
+    key = Account.create().key.hex()
+    # Busca o nonce inicial fora da medição
+    await api_module.signer_pool.get(key).nonce_manager.get_nonces(0)
+
+    server.chain.call_counts.clear()
+    http_before = server.http_requests
+    transport = httpx.ASGITransport(app=api_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://gateway", timeout=300) as client:
+        start = time.perf_counter()
+        if batch:
+            resp = await client.post("/v1.3/registration", json={"registrationRequest": items, "private_key": key})
+            ok = sum(r["success"] for r in resp.json()["registrationResponse"])
+        else:
+            responses = await asyncio.gather(*[
+                client.post("/v1.3/registration", json=dict(item, private_key=key)) for item in items
+            ])
+            ok = sum(r.status_code == 200 for r in responses)
+        elapsed = time.perf_counter() - start
+    await watcher.stop()
+    return ok, elapsed, server.http_requests - http_before, server.chain.call_counts.get("eth_sendRawTransaction", 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--block-time", type=float, default=1.0)
+    args = parser.parse_args()
+
+    items = [dict(PAYLOAD, cbsdSerialNumber=f"BATCH-{i}") for i in range(args.items)]
+    with RPCStandInServer(ChainStandIn(block_time=args.block_time)) as server:
+        print(f"{args.items} registrations da mesma conta, bloco a cada {args.block_time}s\n")
+        for label, batch in (("Requisições individuais", False), ("Lote WInnForum", True)):
+            ok, elapsed, http, raw = asyncio.run(run(server, items, batch))
+            print(f"{label:<24} ok={ok:4d}  total={elapsed:6.2f}s  POSTs ao nó={http:5d}  "
+                  f"eth_sendRawTransaction={raw}")
+
+
+if __name__ == "__main__":
+    main()
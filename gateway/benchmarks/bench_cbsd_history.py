@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark: histórico de um CBSD com filtro de tópico cbsdKey vs varredura
+
+Injeta no nó stand-in N logs de CBSDRegistered/GrantCreated/GrantTerminated
+distribuídos entre ``--cbsds`` CBSDs e mede, para consultas de histórico de
+CBSDs sorteados:
+
+- ``cbsdKey``: um ``eth_getLogs`` com o tópico ``cbsdKey`` (o nó devolve só
+  os logs do CBSD), decodificados com o EventDecoder
+- ``varredura``: ``eth_getLogs`` de todos os eventos do intervalo,
+  decodificação de todos e filtro no gateway (o que era necessário com
+  ``string indexed fccId/serialNumber``)
+
+O stand-in filtra os tópicos percorrendo os logs (um nó real usa os blooms
+dos blocos), então a diferença medida vem da transferência e decodificação.
+
+Uso:
+    python benchmarks/bench_cbsd_history.py --logs 200000 --cbsds 10000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from web3 import Web3
+from blockchain.blockchain import load_contract_abi, logs_filter
+from blockchain.event_decoder import EventDecoder
+from config.settings import settings
+from repository.repository import cbsd_key
+from rpc_standin import ChainStandIn, RPCStandInServer, encode_event_log
+
+EVENTS = ('CBSDRegistered', 'GrantCreated', 'GrantTerminated')
+SAS = "0xf39Fd6e51aad88F6F4ce6aB8827279cffFb92266"
+
+
+def populate(chain, contract, logs, cbsds, per_block):
+    abi = {e["name"]: e for e in contract.abi if e["type"] == "event"}
+    batch = []
+    for i in range(logs):
+        serial = f"BENCH-SN-{i % cbsds}"
+        args = {"cbsdKey": bytes.fromhex(cbsd_key("BENCH-FCC", serial)), "fccId": "BENCH-FCC",
+                "serialNumber": serial, "grantId": f"GRANT-{i}", "sasOrigin": SAS,
+                "lowFrequency": 3550000000, "highFrequency": 3560000000, "maxEirp": 47, "latitude": 375000000,
+                "longitude": -1224000000}
+        name = "CBSDRegistered" if i < cbsds else EVENTS[1 + i % 2]
+        batch.append(dict(encode_event_log(contract.address, abi[name], args), blockNumber=hex(1 + i // per_block)))
+    chain.add_logs(batch)
+
+
+def history_by_topic(web3, contract, decoder, serial):
+    key = "0x" + cbsd_key("BENCH-FCC", serial)
+    return decoder.decode_all(web3.eth.get_logs(logs_filter(contract, EVENTS, 0, 'latest', topics=[key])))
+
+
+def history_by_scan(web3, contract, decoder, serial):
+    key = bytes.fromhex(cbsd_key("BENCH-FCC", serial))
+    records = decoder.decode_all(web3.eth.get_logs(logs_filter(contract, EVENTS, 0, 'latest')))
+    return [record for record in records if record.cbsd_key == key]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logs", type=int, default=200_000)
+    parser.add_argument("--cbsds", type=int, default=10_000)
+    parser.add_argument("--per-block", type=int, default=100, help="logs por bloco")
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--scan-queries", type=int, default=3, help="consultas por varredura (lentas)")
+    args = parser.parse_args()
+
+    with RPCStandInServer(ChainStandIn()) as server:
+        web3 = Web3(Web3.HTTPProvider(server.url, request_kwargs={"timeout": 600}))
+        contract = web3.eth.contract(address=settings.CONTRACT_ADDRESS, abi=load_contract_abi())
+        populate(server.chain, contract, args.logs, args.cbsds, args.per_block)
+        decoder = EventDecoder()
+        serials = [f"BENCH-SN-{random.randrange(args.cbsds)}" for _ in range(args.queries)]
+        print(f"{args.logs} logs de {args.cbsds} CBSDs em {server.chain.block_number} blocos\n")
+
+        start = time.perf_counter()
+        found = [len(history_by_topic(web3, contract, decoder, serial)) for serial in serials]
+        by_topic = (time.perf_counter() - start) / len(serials)
+        print(f"Filtro cbsdKey: {by_topic * 1000:10.1f} ms por consulta ({sum(found) / len(found):.1f} eventos)")
+
+        start = time.perf_counter()
+        scanned = [len(history_by_scan(web3, contract, decoder, serial)) for serial in serials[:args.scan_queries]]
+        by_scan = (time.perf_counter() - start) / len(scanned)
+        assert scanned == found[:len(scanned)]
+        print(f"Varredura:      {by_scan * 1000:10.1f} ms por consulta  ({by_scan / by_topic:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark: decodificação de logs com process_log vs EventDecoder
+
+Gera N logs sintéticos (mistura de CBSDRegistered, GrantCreated,
+GrantTerminated, SASAuthorized e SASRevoked, já no formato devolvido pelo
+web3 em ``eth_getLogs``) e mede a vazão de:
+
+- ``contract.events[name].process_log`` (escolhendo o evento pelo tópico 0)
+- ``EventDecoder.decode_all`` (registro por tópico 0 com ``eth_abi`` direto)
+
+process_log roda sobre uma amostra (``--baseline-sample``) por ser lento;
+a vazão (logs/s) é comparável.
+
+Uso:
+    python benchmarks/bench_event_decoder.py --logs 1000000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from web3 import Web3
+from web3._utils.method_formatters import log_entry_formatter
+from blockchain.blockchain import load_contract_abi, event_topics
+from blockchain.event_decoder import EventDecoder
+from config.settings import settings
+from rpc_standin import encode_event_log
+
+SAS = ["0x" + f"{i:040x}" for i in range(1, 9)]
+KEY = Web3.keccak(text="BENCH-FCC" + "BENCH-SN")
+
+
+def synthetic_logs(contract, count):
+    abi = {e["name"]: e for e in contract.abi if e["type"] == "event"}
+    # Um modelo codificado por evento/SAS; variações só nos metadados do log
+    templates = []
+    for sas in SAS:
+        templates += [
+            encode_event_log(contract.address, abi["CBSDRegistered"],
+                             {"cbsdKey": KEY, "fccId": "BENCH-FCC", "serialNumber": "BENCH-SN", "sasOrigin": sas,
+                              "latitude": 375000000, "longitude": -1224000000}),
+            encode_event_log(contract.address, abi["GrantCreated"],
+                             {"cbsdKey": KEY, "fccId": "BENCH-FCC", "serialNumber": "BENCH-SN", "grantId": "GRANT-0001",
+                              "sasOrigin": sas, "lowFrequency": 3550000000, "highFrequency": 3560000000,
+                              "maxEirp": 47}),
+            encode_event_log(contract.address, abi["GrantTerminated"],
+                             {"cbsdKey": KEY, "fccId": "BENCH-FCC", "serialNumber": "BENCH-SN", "grantId": "GRANT-0001",
+                              "sasOrigin": sas}),
+            encode_event_log(contract.address, abi["SASAuthorized"], {"sas": sas}),
+        ]
+    templates.append(encode_event_log(contract.address, abi["SASRevoked"], {"sas": SAS[0]}))
+    templates = [log_entry_formatter(dict(t, blockNumber="0x0", logIndex="0x0", transactionIndex="0x0",
+                                          removed=False, transactionHash="0x" + "00" * 32,
+                                          blockHash="0x" + "00" * 32)) for t in templates]
+    return [dict(templates[i % len(templates)], blockNumber=i // 100, logIndex=i % 100) for i in range(count)]
+
+
+def run_process_log(contract, logs):
+    names = {bytes(topic): name for name, topic in event_topics().items()}
+    events = {name: contract.events[name] for name in names.values()}
+    return [events[names[bytes(log["topics"][0])]].process_log(log) for log in logs]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logs", type=int, default=1_000_000)
+    parser.add_argument("--baseline-sample", type=int, default=50_000)
+    args = parser.parse_args()
+
+    contract = Web3().eth.contract(address=settings.CONTRACT_ADDRESS, abi=load_contract_abi())
+    logs = synthetic_logs(contract, args.logs)
+    sample = logs[:min(args.baseline_sample, args.logs)]
+    print(f"{args.logs} logs sintéticos (process_log sobre {len(sample)})\n")
+
+    start = time.perf_counter()
+    run_process_log(contract, sample)
+    baseline = len(sample) / (time.perf_counter() - start)
+    print(f"process_log:   {baseline:12,.0f} logs/s  ({args.logs / baseline:7.2f}s estimados para {args.logs})")
+
+    decoder = EventDecoder()
+    start = time.perf_counter()
+    records = decoder.decode_all(logs)
+    elapsed = time.perf_counter() - start
+    assert len(records) == args.logs
+    print(f"EventDecoder:  {args.logs / elapsed:12,.0f} logs/s  ({elapsed:7.2f}s)  "
+          f"{args.logs / elapsed / baseline:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
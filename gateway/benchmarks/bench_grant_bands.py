@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Benchmark: grants ativos que sobrepõem uma faixa, IntervalIndex vs varredura
+
+Popula o repositório com N grants (``--grants-per-cbsd`` por CBSD, 10%
+encerrados) em 3550-3700 MHz, com larguras de 5 a 40 MHz. Com ``--raster``
+5000000 (padrão) as faixas seguem a grade de 5 MHz dos canais; com
+``--raster 1`` cada grant tem uma faixa distinta (pior caso do índice). Mede,
+para consultas sorteadas de larguras diferentes:
+
+- ``chaves``: só ``IntervalIndex.overlapping`` (O(log R + k)), sem montar os grants
+- ``página``/``todos``: ``find_grants('active', low, high)``, primeira página
+  de ``--page`` itens e todos os k resultados
+- ``varredura``: todos os grants de todos os CBSDs comparando a faixa (O(n))
+
+Com ``--sqlite`` repete com o ``SQLiteCBSDRepository`` (R*Tree).
+
+Uso:
+    python benchmarks/bench_grant_bands.py --grants 1000000
+    python benchmarks/bench_grant_bands.py --grants 1000000 --raster 1
+    python benchmarks/bench_grant_bands.py --grants 200000 --sqlite
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from itertools import islice
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from repository.repository import CBSDRepository, cbsd_key
+from repository.sqlite_repository import SQLiteCBSDRepository
+
+SAS = "0xf39Fd6e51aad88F6F4ce6aB8827279cffFb92266"
+BAND_LOW, BAND_HIGH = 3_550_000_000, 3_700_000_000
+WIDTHS = (5_000_000, 10_000_000, 20_000_000, 40_000_000)
+# Larguras das consultas: um ponto (1 Hz), um canal, 20 MHz e a banda toda
+QUERY_WIDTHS = (1, 10_000_000, 20_000_000, BAND_HIGH - BAND_LOW)
+
+
+def populate(repo, grants, per_cbsd, raster, rng):
+    with repo.transaction():
+        for i in range(grants):
+            serial = f"BENCH-SN-{i // per_cbsd}"
+            key = cbsd_key("BENCH-FCC", serial)
+            if i % per_cbsd == 0:
+                repo.add_cbsd(key, {"fcc_id": "BENCH-FCC", "serial_number": serial, "sas_origin": SAS,
+                                    "status": "registered", "block_number": i // 100,
+                                    "transaction_hash": f"0x{i:064x}"})
+            width = rng.choice(WIDTHS)
+            low = BAND_LOW + rng.randrange(0, BAND_HIGH - BAND_LOW - width + 1, raster)
+            repo.add_grant(key, {"grant_id": f"G-{i}", "sas_origin": SAS, "created_at": i // 100,
+                                 "transaction_hash": f"0x{i:064x}", "terminated": False,
+                                 "low_frequency": low, "high_frequency": low + width})
+            if i % 10 == 3:
+                repo.terminate_grant(key, f"G-{i}", i // 100 + 1, SAS)
+
+
+def scan(repo, low, high):
+    for cbsd_id, cbsd in repo.cbsds.items():
+        for grant in repo._grants(cbsd):
+            if not grant.terminated and grant.low_frequency < high and grant.high_frequency > low:
+                yield cbsd_id, dict(grant.as_dict(), fcc_id=cbsd.fcc_id, serial_number=cbsd.serial_number)
+
+
+def scan_sqlite(repo, low, high):
+    return iter(repo.conn.execute(
+        "SELECT * FROM grants NOT INDEXED WHERE terminated = 0 AND low_frequency < ? AND high_frequency > ?",
+        (high, low)).fetchall())
+
+
+def timed(query, queries, page=None):
+    """Tempo médio (s) por consulta e número médio de resultados"""
+    start = time.perf_counter()
+    found = 0
+    for low, high in queries:
+        results = query(low, high)
+        found += sum(1 for _ in (islice(results, page) if page else results))
+    return (time.perf_counter() - start) / len(queries), found / len(queries)
+
+
+def label(width):
+    return f"{width} Hz" if width < 1_000_000 else f"{width // 1_000_000} MHz"
+
+
+def compare(name, repo, args, rng, keys=None, scanner=scan):
+    print(f"\n{name}: {'largura':>8} {'k':>8} {'chaves':>10} {'por chave':>10} {'página':>10} {'todos':>11} "
+          f"{'varredura':>10}")
+    for width in QUERY_WIDTHS:
+        queries = [(low, low + width) for low in
+                   (BAND_LOW + rng.randrange(0, BAND_HIGH - BAND_LOW - width + 1) for _ in range(args.queries))]
+        find = lambda low, high: repo.find_grants("active", low=low, high=high)
+        page_time, _ = timed(find, queries, args.page)
+        all_time, found = timed(find, queries)
+        scan_time, scan_found = timed(lambda low, high: scanner(repo, low, high), queries[:args.scan_queries])
+        assert scan_found == found or args.scan_queries < args.queries
+        if keys is not None:
+            key_time, _ = timed(keys, queries)
+            keys_columns = f"{key_time * 1000:7.2f} ms {key_time / max(found, 1) * 1e6:7.2f} µs"
+        else:
+            keys_columns = f"{'-':>10} {'-':>10}"
+        print(f"{' ' * len(name)}  {label(width):>8} {found:8.0f} {keys_columns} {page_time * 1000:7.2f} ms "
+              f"{all_time * 1000:8.1f} ms {scan_time * 1000:7.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--grants", type=int, default=1_000_000)
+    parser.add_argument("--grants-per-cbsd", type=int, default=4)
+    parser.add_argument("--raster", type=int, default=5_000_000, help="grade (Hz) do início das faixas")
+    parser.add_argument("--page", type=int, default=100, help="itens da primeira página")
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--scan-queries", type=int, default=2, help="consultas por varredura (lentas)")
+    parser.add_argument("--sqlite", action="store_true", help="também com o repositório SQLite")
+    args = parser.parse_args()
+    rng = random.Random(1)
+
+    repo = CBSDRepository()
+    start = time.perf_counter()
+    populate(repo, args.grants, args.grants_per_cbsd, args.raster, rng)
+    load = time.perf_counter() - start
+    bands = repo.active_bands
+    print(f"{args.grants} grants em memória carregados em {load:.1f} s; {len(bands)} ativos em "
+          f"{len(bands._keys)} faixas distintas, {len(bands._nodes)} nós")
+    compare("memória", repo, args, rng, keys=lambda low, high: bands.overlapping(low, high))
+
+    if args.sqlite:
+        with tempfile.TemporaryDirectory() as directory:
+            repo = SQLiteCBSDRepository(os.path.join(directory, "index.db"))
+            start = time.perf_counter()
+            populate(repo, args.grants, args.grants_per_cbsd, args.raster, random.Random(1))
+            print(f"\n{args.grants} grants em SQLite carregados em {time.perf_counter() - start:.1f} s")
+            compare("sqlite", repo, args, rng, scanner=scan_sqlite)
+            repo.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Benchmark: verificações de conflito co-canal por segundo com N grants ativos
+
+Popula o repositório em memória com N grants ativos (``--grants-per-cbsd``
+por CBSD) de ``--sas`` SAS diferentes. Os CBSDs ficam nos EUA continentais
+(70% em torno de ``--cities`` centros, como em bench_spatial_index.py). As
+faixas de 10 ou 20 MHz seguem a grade de 5 MHz em 3550-3700 MHz. Cada
+verificação é a de um grant novo, num CBSD sorteado, com faixa e SAS
+sorteados:
+
+- ``índice``: ``ConflictIndex.conflicting`` (células que cobrem o raio + uma
+  passada vetorizada de faixa, SAS e distância sobre os candidatos)
+- ``colunas``: uma passada vetorizada sobre as colunas de todos os N grants
+- ``python``: comparação par a par em Python com todos os N grants (O(n))
+- ``monitor``: ``ConflictMonitor`` ponta a ponta, com o grant gravado no
+  repositório e um ``GrantConflicts`` montado por grant com conflito
+
+Uso:
+    python benchmarks/bench_grant_conflicts.py --grants 1000000
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from blockchain.event_decoder import GrantCreated
+from handlers.conflicts import ConflictMonitor
+from repository.repository import CBSDRepository, cbsd_key
+from repository.spatial import COORDINATE_SCALE, EARTH_RADIUS_KM, haversine_km
+
+BAND_LOW, BAND_HIGH = 3_550_000_000, 3_700_000_000
+RASTER = 5_000_000
+WIDTHS = (10_000_000, 20_000_000)
+RADII_KM = (10, 40, 100)
+TX_HASH = b"\x01" * 32
+
+
+def location(rng, centers):
+    if rng.random() < 0.7:
+        latitude, longitude = rng.choice(centers)
+        latitude, longitude = latitude + rng.gauss(0, 0.3), longitude + rng.gauss(0, 0.3)
+    else:
+        latitude, longitude = rng.uniform(25, 49), rng.uniform(-125, -67)
+    return round(latitude * COORDINATE_SCALE), round(longitude * COORDINATE_SCALE)
+
+
+def band(rng):
+    width = rng.choice(WIDTHS)
+    low = BAND_LOW + rng.randrange(0, BAND_HIGH - BAND_LOW - width + 1, RASTER)
+    return low, low + width
+
+
+def populate(repo, args, sas, rng):
+    centers = [(rng.uniform(26, 48), rng.uniform(-124, -68)) for _ in range(args.cities)]
+    cbsds = []
+    with repo.transaction():
+        for i in range(args.grants // args.grants_per_cbsd):
+            serial = f"BENCH-SN-{i}"
+            key = cbsd_key("BENCH-FCC", serial)
+            latitude, longitude = location(rng, centers)
+            origin = rng.choice(sas)
+            repo.add_cbsd(key, {"fcc_id": "BENCH-FCC", "serial_number": serial, "sas_origin": origin,
+                                "status": "registered", "block_number": i // 100,
+                                "transaction_hash": f"0x{i:064x}", "latitude": latitude, "longitude": longitude})
+            for g in range(args.grants_per_cbsd):
+                low, high = band(rng)
+                repo.add_grant(key, {"grant_id": f"G-{i}-{g}", "sas_origin": origin, "created_at": i // 100,
+                                     "transaction_hash": f"0x{i:064x}", "terminated": False, "low_frequency": low,
+                                     "high_frequency": high, "max_eirp": rng.randrange(20, 48)})
+            cbsds.append((key, serial, origin, latitude / COORDINATE_SCALE, longitude / COORDINATE_SCALE))
+    return cbsds
+
+
+def scan_columns(index, latitude, longitude, low, high, sas_origin, radius_km):
+    """Uma passada sobre as colunas de todos os grants (faixa e SAS, depois a distância dos que sobram)"""
+    n = len(index._keys)
+    sas_id = index._sas_ids.get(sas_origin.lower(), -1)
+    rows = np.flatnonzero((index._low[:n] < high) & (index._high[:n] > low) & (index._sas[:n] != sas_id))
+    distances = haversine_km(latitude, longitude, index._lat[rows], index._lon[rows])
+    return rows[distances <= radius_km]
+
+
+def scan_python(grants, latitude, longitude, low, high, sas_origin, radius_km):
+    """Cada par (grant novo, grant ativo) comparado em Python"""
+    lat1, lon1 = math.radians(latitude), math.radians(longitude)
+    cos1 = math.cos(lat1)
+    sas_origin = sas_origin.lower()
+    found = 0
+    for lat2, lon2, band_low, band_high, origin in grants:
+        if band_low >= high or band_high <= low or origin == sas_origin:
+            continue
+        a = math.sin((lat2 - lat1) / 2) ** 2 + cos1 * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+        if 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0))) <= radius_km:
+            found += 1
+    return found
+
+
+def timed(check, queries):
+    """Tempo médio (s) por verificação e número médio de conflitos"""
+    start = time.perf_counter()
+    found = sum(check(*query) for query in queries)
+    return (time.perf_counter() - start) / len(queries), found / len(queries)
+
+
+def rate(seconds):
+    return f"{seconds * 1000:8.3f} ms {1 / seconds:9,.0f}/s"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--grants", type=int, default=1_000_000)
+    parser.add_argument("--grants-per-cbsd", type=int, default=4)
+    parser.add_argument("--sas", type=int, default=5, help="SAS de origem distintos")
+    parser.add_argument("--cities", type=int, default=200, help="centros onde se concentram 70%% dos CBSDs")
+    parser.add_argument("--checks", type=int, default=2000)
+    parser.add_argument("--scan-checks", type=int, default=20, help="verificações por passada nas colunas")
+    parser.add_argument("--python-checks", type=int, default=2, help="verificações par a par em Python (lentas)")
+    args = parser.parse_args()
+    rng = random.Random(1)
+    sas = [f"0x{i:040x}" for i in range(1, args.sas + 1)]
+
+    repo = CBSDRepository()
+    start = time.perf_counter()
+    cbsds = populate(repo, args, sas, rng)
+    index = repo.active_grants
+    print(f"{len(index)} grants ativos em {len(cbsds)} CBSDs carregados em {time.perf_counter() - start:.1f} s "
+          f"(com todos os índices); {len(index._cells)} células de {index.cell_size}°")
+
+    n = len(index._keys)
+    grants = list(zip(np.radians(index._lat[:n]).tolist(), np.radians(index._lon[:n]).tolist(),
+                      index._low[:n].tolist(), index._high[:n].tolist(),
+                      [(index._sas_names[i] or '').lower() for i in index._sas[:n].tolist()]))
+
+    print(f"\n{'raio':>6} {'k':>7} {'índice':>24} {'colunas':>24} {'python':>24}")
+    for radius in RADII_KM:
+        queries = []
+        for _ in range(args.checks):
+            _, _, _, latitude, longitude = rng.choice(cbsds)
+            queries.append((latitude, longitude, *band(rng), rng.choice(sas), radius))
+        index_time, found = timed(lambda *query: len(index.conflicting(*query)), queries)
+        scan_time, scan_found = timed(lambda *query: len(scan_columns(index, *query)), queries[:args.scan_checks])
+        python_time, python_found = timed(lambda *query: scan_python(grants, *query), queries[:args.python_checks])
+        # Mesmos conflitos nas três formas
+        assert timed(lambda *query: len(index.conflicting(*query)), queries[:args.scan_checks])[1] == scan_found
+        assert timed(lambda *query: len(index.conflicting(*query)), queries[:args.python_checks])[1] == python_found
+        print(f"{radius:>3} km {found:7.0f} {rate(index_time)} {rate(scan_time)} {rate(python_time)}")
+
+    # Ponta a ponta: grant gravado no repositório (como o handler) e verificado pelo monitor
+    monitor = ConflictMonitor(repo, radius_km=40, max_lag=0)
+    records = []
+    for i in range(args.checks):
+        key, serial, origin, _, _ = rng.choice(cbsds)
+        low, high = band(rng)
+        repo.add_grant(key, {"grant_id": f"NEW-{i}", "sas_origin": origin, "created_at": 10**6,
+                             "transaction_hash": "0x01", "terminated": False, "low_frequency": low,
+                             "high_frequency": high, "max_eirp": 30})
+        records.append(GrantCreated(10**6, i, TX_HASH, bytes.fromhex(key), "BENCH-FCC", serial, f"NEW-{i}", origin,
+                                    low, high, 30))
+    start = time.perf_counter()
+    monitor(records, 10**6)
+    elapsed = time.perf_counter() - start
+    stats = monitor.get_stats()
+    print(f"\nmonitor (40 km): {stats['checks']} GrantCreated em {elapsed:.2f} s = {stats['checks'] / elapsed:,.0f} "
+          f"verificações/s; {stats['conflicting_grants']} com conflito")
+
+
+if __name__ == "__main__":
+    main()
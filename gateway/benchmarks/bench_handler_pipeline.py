@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Benchmark: replay de N eventos pelos handlers do indexador
+
+Gera N registros sintéticos (EventDecoder) na ordem dos blocos: a cada bloco,
+registros de um grupo de CBSDs, 3 grants para o grupo anterior e o
+encerramento de um grant do grupo antes dele. Mede, em memória e em SQLite
+(uma transação por faixa de ``--range`` eventos):
+
+- por evento: cada registro convertido para o formato do web3
+  (``as_event``) e aplicado por um handler por evento com uma linha INFO por
+  evento (o caminho anterior ao HandlerPipeline)
+- pipeline: ``HandlerPipeline`` com os ``EVENT_HANDLERS`` em lotes,
+  particionado por CBSD, log resumido
+
+Reporta eventos/s e, para o pipeline em memória, o pico de memória alocada
+(tracemalloc) e o tamanho final do repositório.
+
+Uso:
+    python benchmarks/bench_handler_pipeline.py --events 1000000
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from web3 import Web3
+import handlers.handlers as handlers_module
+from blockchain.event_decoder import CBSDRegistered, EventDecoder, GrantCreated, GrantTerminated
+from handlers.handlers import EVENT_HANDLERS
+from handlers.pipeline import HandlerPipeline
+from repository.repository import CBSDRepository, cbsd_key
+from repository.sqlite_repository import SQLiteCBSDRepository
+
+SAS = "0xf39Fd6e51aad88F6F4ce6aB8827279cffFb92266"
+TX_HASH = b"\x01" * 32
+GROUP = 20
+
+logger = logging.getLogger("bench_handler_pipeline")
+
+
+def generate(count):
+    """Registros na ordem dos blocos (5 eventos por CBSD: registro, 3 grants, 1 encerramento)"""
+    records = []
+    keys = []
+    block = 0
+    while len(records) < count:
+        block += 1
+        group = len(keys) // GROUP
+        for i in range(GROUP):
+            serial = f"BENCH-SN-{len(keys)}"
+            keys.append((bytes.fromhex(cbsd_key("BENCH-FCC", serial)), serial))
+            records.append(CBSDRegistered(block, 0, TX_HASH, keys[-1][0], "BENCH-FCC", serial, SAS,
+                                          375000000, -1224000000))
+        for key, serial in keys[(group - 1) * GROUP:group * GROUP] if group >= 1 else []:
+            for g in range(3):
+                records.append(GrantCreated(block, 0, TX_HASH, key, "BENCH-FCC", serial, f"{serial}-G{g}", SAS,
+                                            3550000000, 3560000000, 47))
+        for key, serial in keys[(group - 2) * GROUP:(group - 1) * GROUP] if group >= 2 else []:
+            records.append(GrantTerminated(block, 0, TX_HASH, key, "BENCH-FCC", serial, f"{serial}-G0", SAS))
+    return records[:count]
+
+
+def per_event_handlers(repo):
+    """Handlers por evento como eram antes do pipeline (formato do web3, INFO por evento)"""
+    def cbsd_registered(event):
+        args = event['args']
+        logger.info(f"Novo CBSD registrado - CBSD: {args['fccId']}/{args['serialNumber']}, "
+                    f"SAS Origin: {args['sasOrigin']}")
+        repo.add_cbsd(bytes(args['cbsdKey']).hex(), {
+            'fcc_id': args['fccId'], 'serial_number': args['serialNumber'], 'sas_origin': args['sasOrigin'],
+            'status': 'registered', 'block_number': event['blockNumber'],
+            'transaction_hash': Web3.to_hex(event['transactionHash'])})
+
+    def grant_created(event):
+        args = event['args']
+        logger.info(f"Novo grant criado - CBSD: {args['fccId']}/{args['serialNumber']}, "
+                    f"Grant ID: {args['grantId']}, SAS: {args['sasOrigin']}")
+        repo.add_grant(bytes(args['cbsdKey']).hex(), {
+            'grant_id': args['grantId'], 'sas_origin': args['sasOrigin'], 'created_at': event['blockNumber'],
+            'transaction_hash': Web3.to_hex(event['transactionHash']), 'terminated': False})
+
+    def grant_terminated(event):
+        args = event['args']
+        logger.info(f"Grant terminado - CBSD: {args['fccId']}/{args['serialNumber']}, "
+                    f"Grant ID: {args['grantId']}, SAS: {args['sasOrigin']}")
+        repo.terminate_grant(bytes(args['cbsdKey']).hex(), args['grantId'], event['blockNumber'],
+                             args['sasOrigin'])
+
+    return {'CBSDRegistered': cbsd_registered, 'GrantCreated': grant_created, 'GrantTerminated': grant_terminated}
+
+
+def ranges(records, size):
+    for start in range(0, len(records), size):
+        yield records[start:start + size]
+
+
+def replay_per_event(repo, records, size):
+    decoder = EventDecoder()
+    handlers = per_event_handlers(repo)
+    for chunk in ranges(records, size):
+        with repo.transaction():
+            for record in chunk:
+                handlers[type(record).__name__](decoder.as_event(record))
+
+
+def replay_pipeline(repo, records, size, partitions, batch_size):
+    handlers_module.repo = repo
+    pipeline = HandlerPipeline(EVENT_HANDLERS, repository=repo, partitions=partitions, batch_size=batch_size)
+
+    async def run():
+        for chunk in ranges(records, size):
+            with repo.transaction():
+                await pipeline.process(chunk)
+
+    asyncio.run(run())
+    assert pipeline.errors == 0
+
+
+def measure(label, replay, repo, records):
+    start = time.perf_counter()
+    replay(repo, records)
+    elapsed = time.perf_counter() - start
+    print(f"{label:26s} {elapsed:7.2f}s  {len(records) / elapsed:10,.0f} eventos/s")
+    return repo
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--range", type=int, default=10_000, help="eventos por faixa (uma transação)")
+    parser.add_argument("--partitions", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--no-sqlite", action="store_true")
+    parser.add_argument("--no-trace", action="store_true", help="sem a medição de memória (tracemalloc)")
+    args = parser.parse_args()
+
+    # Logs como em produção (formatados e escritos), mas sem poluir o terminal
+    root = logging.getLogger()
+    root.handlers = [logging.StreamHandler(open(os.devnull, "w"))]
+    root.setLevel(logging.INFO)
+
+    records = generate(args.events)
+    print(f"{len(records)} eventos de {len(records) // 5} CBSDs em {records[-1].block_number} blocos\n")
+
+    per_event = lambda repo, records: replay_per_event(repo, records, args.range)
+    pipeline = lambda repo, records: replay_pipeline(repo, records, args.range, args.partitions, args.batch_size)
+    expected = measure("Memória, por evento:", per_event, CBSDRepository(), records)
+    result = measure("Memória, pipeline:", pipeline, CBSDRepository(), records)
+    assert result.cbsds == expected.cbsds
+    if not args.no_sqlite:
+        directory = tempfile.mkdtemp()
+        measure("SQLite, por evento:", per_event, SQLiteCBSDRepository(os.path.join(directory, "a.db")), records)
+        measure("SQLite, pipeline:", pipeline, SQLiteCBSDRepository(os.path.join(directory, "b.db")), records)
+
+    if not args.no_trace:
+        tracemalloc.start()
+        repo = CBSDRepository()
+        replay_pipeline(repo, records, args.range, args.partitions, args.batch_size)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"\nPipeline em memória: repositório {current / 2**20:.1f} MiB, pico {peak / 2**20:.1f} MiB "
+              f"(além dos {len(records)} registros de entrada)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark: inicialização com o índice persistente vs replay em memória
+
+Com N CBSDs indexados (CBSDRegistered + GrantCreated para uma fração):
+
+- SQLite: tempo para reabrir o índice, ler o checkpoint e responder a
+  primeira consulta (o que o gateway faz no startup)
+- Memória: tempo para reconstruir o CBSDRepository aplicando os N eventos
+  aos handlers. É um limite inferior: não inclui ``eth_getLogs`` nem a
+  decodificação dos logs, que dominam o replay real desde o gênese
+
+Uso:
+    python benchmarks/bench_index_startup.py --cbsds 1000000
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from eth_utils import keccak
+import handlers.handlers as handlers_module
+from blockchain.event_decoder import CBSDRegistered, GrantCreated
+from repository.repository import CBSDRepository, cbsd_key
+from repository.sqlite_repository import SQLiteCBSDRepository
+
+SAS = "0xf39Fd6e51aad88F6F4ce6aB8827279cffFb92266"
+TX_HASH = b"\x01" * 32
+FCC_ID = "BENCH-FCC"
+
+
+def synthetic_events(count, grant_every):
+    """Registros já decodificados, como o indexador entrega aos handlers"""
+    for i in range(count):
+        serial = f"BENCH-SN-{i}"
+        key = keccak(text=FCC_ID + serial)
+        registered = CBSDRegistered(i // 100, 0, TX_HASH, key, FCC_ID, serial, SAS, 375000000, -1224000000)
+        yield handlers_module.handle_cbsd_registered, [registered]
+        if grant_every and i % grant_every == 0:
+            yield handlers_module.handle_grant_created, [GrantCreated(i // 100, 1, TX_HASH, key, FCC_ID, serial,
+                                                                      f"GRANT-{i}", SAS, 3550000000, 3560000000, 47)]
+
+
+def apply_all(repo, count, grant_every):
+    handlers_module.repo = repo
+    with repo.transaction():
+        for handler, records in synthetic_events(count, grant_every):
+            handler(records)
+        repo.set_checkpoint(count // 100)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cbsds", type=int, default=1_000_000)
+    parser.add_argument("--grant-every", type=int, default=4, help="um grant a cada N CBSDs (0 = nenhum)")
+    parser.add_argument("--db", default=None, help="arquivo do índice (padrão: temporário)")
+    args = parser.parse_args()
+    # Handlers registram cada evento em INFO
+    logging.getLogger(handlers_module.__name__).setLevel(logging.WARNING)
+
+    path = args.db or os.path.join(tempfile.mkdtemp(), "index.db")
+    probe = cbsd_key("BENCH-FCC", f"BENCH-SN-{args.cbsds // 2}")
+    print(f"{args.cbsds} CBSDs, um grant a cada {args.grant_every}, índice em {path}\n")
+
+    start = time.perf_counter()
+    store = SQLiteCBSDRepository(path)
+    apply_all(store, args.cbsds, args.grant_every)
+    store.close()
+    elapsed = time.perf_counter() - start
+    print(f"Indexação em SQLite:       {elapsed:8.2f}s  ({args.cbsds / elapsed:,.0f} CBSDs/s, "
+          f"{os.path.getsize(path) / 2**20:.0f} MiB)")
+
+    start = time.perf_counter()
+    store = SQLiteCBSDRepository(path)
+    checkpoint = store.get_checkpoint()
+    cbsd = store.get(probe)
+    elapsed = time.perf_counter() - start
+    assert cbsd is not None
+    print(f"Startup SQLite:            {elapsed * 1000:8.2f}ms (checkpoint no bloco {checkpoint})")
+
+    start = time.perf_counter()
+    for _ in range(10000):
+        store.get(probe)
+    print(f"Consulta SQLite:           {(time.perf_counter() - start) / 10000 * 1e6:8.1f}µs por CBSD")
+    store.close()
+
+    start = time.perf_counter()
+    memory = CBSDRepository()
+    apply_all(memory, args.cbsds, args.grant_every)
+    elapsed = time.perf_counter() - start
+    assert memory.get(probe) is not None
+    print(f"Startup em memória:        {elapsed:8.2f}s  (replay dos handlers, sem RPC nem decodificação)")
+
+
+if __name__ == "__main__":
+    main()
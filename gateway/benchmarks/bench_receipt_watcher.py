@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark: polling de recibo por requisição vs ReceiptWatcher único
+
+Envia N transações (uma conta cada) ao nó stand-in, que minera um bloco a
+cada ``--block-time`` segundos, e compara a espera pelos recibos:
+
+- ``wait_for_transaction_receipt`` por requisição (poll a cada ``--poll-interval``)
+- ``ReceiptWatcher`` (um ``eth_blockNumber`` por intervalo + um batch por bloco)
+
+Mostra chamadas ``eth_getTransactionReceipt``, POSTs HTTP e a latência entre a
+mineração e a resolução do recibo.
+
+Uso:
+    python benchmarks/bench_receipt_watcher.py --requests 200 --block-time 1
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from eth_account import Account
+from web3 import AsyncWeb3
+from blockchain.async_blockchain import AsyncBlockchain
+from blockchain.receipt_watcher import ReceiptWatcher
+from rpc_standin import ChainStandIn, RPCStandInServer
+
+PAYLOAD = {"fccId": "BENCH-FCC", "cbsdSerialNumber": "BENCH-SN", "grantId": "grant_0"}
+
+
+async def run(server, keys, use_watcher, poll_interval):
+    web3 = AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(server.url))
+    watcher = ReceiptWatcher(web3, poll_interval=poll_interval) if use_watcher else None
+    signers = [AsyncBlockchain(key, web3=web3, receipt_watcher=watcher) for key in keys]
+    chain = server.chain
+
+    # Envio fora da medição: só a espera pelo recibo é comparada
+    hashes = await asyncio.gather(*[s.relinquishment(PAYLOAD, wait=False) for s in signers])
+    chain.call_counts.clear()
+    http_before = server.http_requests
+
+    async def one(tx_hash):
+        if watcher:
+            await watcher.wait(tx_hash)
+        else:
+            await web3.eth.wait_for_transaction_receipt(tx_hash, poll_latency=poll_interval)
+        # Transações mineradas durante o envio contam a partir do início da espera
+        return time.time() - max(chain.mined_at[tx_hash.to_0x_hex()], wait_start)
+
+    wait_start = time.time()
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*[one(h) for h in hashes])
+    elapsed = time.perf_counter() - start
+    if watcher:
+        await watcher.stop()
+    await web3.provider.disconnect()
+    return {
+        "receipt_calls": chain.call_counts.get("eth_getTransactionReceipt", 0),
+        "http": server.http_requests - http_before,
+        "latency_ms": statistics.mean(latencies) * 1000,
+        "latency_max_ms": max(latencies) * 1000,
+        "elapsed": elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--block-time", type=float, default=1.0)
+    parser.add_argument("--poll-interval", type=float, default=0.1)
+    args = parser.parse_args()
+
+    keys = [Account.create().key.hex() for _ in range(args.requests)]
+    with RPCStandInServer(ChainStandIn(block_time=args.block_time)) as server:
+        print(f"{args.requests} transações concorrentes, bloco a cada {args.block_time}s\n")
+        for label, use_watcher in (("Polling por requisição", False), ("ReceiptWatcher único", True)):
+            r = asyncio.run(run(server, keys, use_watcher, args.poll_interval))
+            print(f"{label:<24} eth_getTransactionReceipt={r['receipt_calls']:6d}  POSTs={r['http']:6d}  "
+                  f"latência pós-mineração média={r['latency_ms']:6.1f}ms máx={r['latency_max_ms']:6.1f}ms  "
+                  f"total={r['elapsed']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
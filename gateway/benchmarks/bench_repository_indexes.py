@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Benchmark: consultas por índice secundário vs varredura com N CBSDs
+
+Popula o repositório com N CBSDs distribuídos entre ``--sas`` SAS e
+``--fcc-ids`` FCC IDs (1% com status ``deregistered``), um grant por CBSD
+(10% encerrados), e mede para valores sorteados:
+
+- ``índice``: ``find_cbsds``/``find_grants`` (O(k) para k resultados), tanto a
+  primeira página de ``--page`` itens quanto todos os k resultados
+- ``varredura``: percorrer todos os CBSDs comparando o campo (O(n)), como
+  era necessário com só ``get``/``all``
+
+Com ``--sqlite`` repete com o ``SQLiteCBSDRepository`` (varredura com
+``NOT INDEXED``).
+
+Uso:
+    python benchmarks/bench_repository_indexes.py --cbsds 1000000
+    python benchmarks/bench_repository_indexes.py --cbsds 200000 --sqlite
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from itertools import islice
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from repository.repository import CBSDRepository, cbsd_key
+from repository.sqlite_repository import CBSD_FIELDS, SQLiteCBSDRepository
+
+
+def sas_address(i):
+    return f"0x{i + 1:040x}"
+
+
+def populate(repo, cbsds, sas, fcc_ids):
+    with repo.transaction():
+        for i in range(cbsds):
+            fcc_id, serial = f"FCC-{i % fcc_ids}", f"BENCH-SN-{i}"
+            key = cbsd_key(fcc_id, serial)
+            repo.add_cbsd(key, {"fcc_id": fcc_id, "serial_number": serial, "sas_origin": sas_address(i % sas),
+                                "status": "deregistered" if i % 100 == 99 else "registered",
+                                "block_number": i // 100, "transaction_hash": f"0x{i:064x}"})
+            repo.add_grant(key, {"grant_id": f"G-{i}", "sas_origin": sas_address(i % sas), "created_at": i // 100,
+                                 "transaction_hash": f"0x{i:064x}", "terminated": False})
+            if i % 10 == 3:
+                repo.terminate_grant(key, f"G-{i}", i // 100 + 1, sas_address(i % sas))
+
+
+def scan_memory(repo, field, value):
+    for cbsd_id, cbsd in repo.cbsds.items():
+        if getattr(cbsd, field) == value:
+            yield cbsd_id, repo._as_dict(cbsd)
+
+
+def scan_memory_grants(repo, state):
+    terminated = state == "terminated"
+    for cbsd_id, cbsd in repo.cbsds.items():
+        for grant in repo._grants(cbsd):
+            if grant.terminated == terminated:
+                yield cbsd_id, dict(grant.as_dict(), fcc_id=cbsd.fcc_id, serial_number=cbsd.serial_number)
+
+
+def scan_sqlite(repo, field, value):
+    for row in repo.conn.execute(f"SELECT * FROM cbsds NOT INDEXED WHERE {field} = ?", (value,)):
+        yield row['cbsd_id'], dict({f: row[f] for f in CBSD_FIELDS}, grants=repo.get_grants(row['cbsd_id']))
+
+
+def scan_sqlite_grants(repo, state):
+    for row in repo.conn.execute("SELECT g.*, c.fcc_id AS cbsd_fcc_id FROM grants g NOT INDEXED "
+                                 "JOIN cbsds c ON c.cbsd_id = g.cbsd_id WHERE g.terminated = ?",
+                                 (int(state == "terminated"),)):
+        yield row['cbsd_id'], dict(row)
+
+
+def timed(query, queries, page=None):
+    """Tempo médio (s) por consulta e número médio de resultados"""
+    start = time.perf_counter()
+    found = 0
+    for args in queries:
+        results = query(*args)
+        found += sum(1 for _ in (islice(results, page) if page else results))
+    return (time.perf_counter() - start) / len(queries), found / len(queries)
+
+
+def compare(name, repo, args, scan, scan_grants):
+    rng = random.Random(1)
+    cases = [
+        ("sas_origin", lambda value: repo.find_cbsds(sas_origin=value), lambda value: scan(repo, "sas_origin", value),
+         [(sas_address(rng.randrange(args.sas)),) for _ in range(args.queries)]),
+        ("fcc_id", lambda value: repo.find_cbsds(fcc_id=value), lambda value: scan(repo, "fcc_id", value),
+         [(f"FCC-{rng.randrange(args.fcc_ids)}",) for _ in range(args.queries)]),
+        ("status", lambda value: repo.find_cbsds(status=value), lambda value: scan(repo, "status", value),
+         [("deregistered",)]),
+        ("grants", repo.find_grants, lambda state: scan_grants(repo, state), [("terminated",)]),
+    ]
+    print(f"\n{name}: {'consulta':<12} {'k':>9} {'página índice':>15} {'todos índice':>14} "
+          f"{'varredura':>12} {'ganho':>8}")
+    for label, indexed, scanned, queries in cases:
+        first_page, _ = timed(indexed, queries, args.page)
+        everything, found = timed(indexed, queries)
+        scan_time, scan_found = timed(scanned, queries[:args.scan_queries])
+        assert scan_found == found or len(queries) > args.scan_queries
+        print(f"{' ' * len(name)}  {label:<12} {found:9.0f} {first_page * 1000:12.2f} ms {everything * 1000:11.1f} ms "
+              f"{scan_time * 1000:9.0f} ms {scan_time / everything:7.0f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cbsds", type=int, default=1_000_000)
+    parser.add_argument("--sas", type=int, default=100, help="SAS distintos")
+    parser.add_argument("--fcc-ids", type=int, default=1000, help="FCC IDs distintos")
+    parser.add_argument("--page", type=int, default=100, help="itens da primeira página")
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--scan-queries", type=int, default=2, help="consultas por varredura (lentas)")
+    parser.add_argument("--sqlite", action="store_true", help="também com o repositório SQLite")
+    args = parser.parse_args()
+
+    repo = CBSDRepository()
+    start = time.perf_counter()
+    populate(repo, args.cbsds, args.sas, args.fcc_ids)
+    load = time.perf_counter() - start
+    print(f"{args.cbsds} CBSDs em memória carregados em {load:.1f} s ({args.cbsds / load:,.0f} CBSDs/s, "
+          f"com índices)")
+    compare("memória", repo, args, scan_memory, scan_memory_grants)
+
+    if args.sqlite:
+        with tempfile.TemporaryDirectory() as directory:
+            repo = SQLiteCBSDRepository(os.path.join(directory, "index.db"))
+            start = time.perf_counter()
+            populate(repo, args.cbsds, args.sas, args.fcc_ids)
+            print(f"\n{args.cbsds} CBSDs em SQLite carregados em {time.perf_counter() - start:.1f} s")
+            compare("sqlite", repo, args, scan_sqlite, scan_sqlite_grants)
+            repo.close()
+
+
+if __name__ == "__main__":
+    main()
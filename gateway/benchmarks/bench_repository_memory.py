@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Benchmark: memória do repositório em memória com N CBSDs
+
+Popula o repositório com N CBSDs e ``--grants`` grants por CBSD (metade
+encerrada), com strings novas a cada evento, como chegam da decodificação
+dos logs. Compara três layouts:
+
+- dicionários: um dict por CBSD e por grant, hashes em hex (o layout anterior)
+- registros: ``CBSDRecord``/``GrantRecord`` com ``__slots__``, strings
+  repetidas internadas, hashes em bytes
+- registros + grants em colunas: ``CBSDRepository(columnar_grants=True)``
+
+Para cada um mede a memória alocada ao final (tracemalloc), o tempo de
+carga (sem tracemalloc) e o tempo de ``get`` de CBSDs sorteados.
+
+Uso:
+    python benchmarks/bench_repository_memory.py --cbsds 100000
+    python benchmarks/bench_repository_memory.py --cbsds 1000000
+"""
+
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from repository.repository import CBSDRepository, cbsd_key
+
+SAS = ["0xf39Fd6e51aad88F6F4ce6aB8827279cffFb92266", "0x70997970C51812dc3A010C7d01b50e0d17dc79C8"]
+
+
+def fresh(value: str) -> str:
+    """Cópia da string (a decodificação de cada log cria objetos novos)"""
+    return "".join([value[:1], value[1:]])
+
+
+class DictRepository:
+    """Layout anterior: dicionários aninhados, strings e hashes como recebidos"""
+
+    def __init__(self):
+        self.cbsds = {}
+
+    def add_cbsd(self, cbsd_id, data):
+        self.cbsds[cbsd_id] = dict(data, grants=[])
+
+    def add_grant(self, cbsd_id, grant):
+        self.cbsds[cbsd_id]['grants'].append(grant)
+
+    def terminate_grant(self, cbsd_id, grant_id, block_number, terminated_by):
+        for grant in self.cbsds[cbsd_id]['grants']:
+            if grant['grant_id'] == grant_id:
+                grant.update(terminated=True, terminated_at=block_number, terminated_by=terminated_by)
+
+    def get(self, cbsd_id):
+        return self.cbsds.get(cbsd_id)
+
+
+def populate(repo, keys, grants):
+    for i, key in enumerate(keys):
+        serial = f"BENCH-SN-{i}"
+        sas = fresh(SAS[i % 2])
+        repo.add_cbsd(key, {"fcc_id": fresh("BENCH-FCC"), "serial_number": serial, "sas_origin": sas,
+                            "status": fresh("registered"), "block_number": i // 100,
+                            "transaction_hash": f"0x{i:064x}"})
+        for g in range(grants):
+            repo.add_grant(key, {"grant_id": f"{serial}-G{g}", "sas_origin": fresh(sas), "created_at": i // 100 + 1,
+                                 "transaction_hash": f"0x{i * 8 + g + 1:064x}", "terminated": False})
+            if g % 2:
+                repo.terminate_grant(key, f"{serial}-G{g}", i // 100 + 2, fresh(sas))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cbsds", type=int, default=1_000_000)
+    parser.add_argument("--grants", type=int, default=3, help="grants por CBSD")
+    parser.add_argument("--reads", type=int, default=100_000)
+    args = parser.parse_args()
+
+    keys = [cbsd_key("BENCH-FCC", f"BENCH-SN-{i}") for i in range(args.cbsds)]
+    probes = random.sample(keys, min(args.reads, len(keys)))
+    print(f"{args.cbsds} CBSDs, {args.grants} grants por CBSD\n")
+
+    layouts = [
+        ("Dicionários (anterior):", DictRepository),
+        ("Registros (slots):", lambda: CBSDRepository(columnar_grants=False)),
+        ("Registros + colunas:", lambda: CBSDRepository(columnar_grants=True)),
+    ]
+    baseline = None
+    for label, factory in layouts:
+        repo = factory()
+        start = time.perf_counter()
+        populate(repo, keys, args.grants)
+        load = time.perf_counter() - start
+        start = time.perf_counter()
+        for key in probes:
+            repo.get(key)
+        read = (time.perf_counter() - start) / len(probes)
+        del repo
+        gc.collect()
+
+        tracemalloc.start()
+        repo = factory()
+        populate(repo, keys, args.grants)
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del repo
+        gc.collect()
+
+        baseline = baseline or size
+        print(f"{label:26s} {size / 2**20:9.1f} MiB  {size / args.cbsds:7.0f} B/CBSD  ({baseline / size:4.1f}x)  "
+              f"carga {load:6.2f}s  get {read * 1e6:5.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
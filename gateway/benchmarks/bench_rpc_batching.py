@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark: AsyncHTTPProvider vs BatchingHTTPProvider
+
+Dois cenários contra o nó stand-in, com cada provider:
+
+- ``raw``: N transações já assinadas enviadas em paralelo com
+  ``eth.send_raw_transaction`` (sem esperar recibo)
+- ``registration``: N registrations concorrentes de N contas diferentes
+  (nonce, gas price, estimativa, envio e recibo por transação)
+
+Mostra requisições HTTP recebidas pelo nó por transação concluída.
+
+Uso:
+    python benchmarks/bench_rpc_batching.py --txs 500 --block-time 1
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from eth_account import Account
+from web3 import AsyncWeb3
+from blockchain.async_blockchain import AsyncBlockchain
+from blockchain.batching_provider import BatchingHTTPProvider
+from blockchain.signer_pool import SignerPool
+from blockchain.receipt_watcher import ReceiptWatcher
+from blockchain.receipt_cache import ReceiptCache
+from blockchain.gas_policy import GasPolicy
+from rpc_standin import ChainStandIn, RPCStandInServer
+from bench_batch_endpoint import PAYLOAD
+
+
+def create_web3(url, batching):
+    provider = BatchingHTTPProvider(url, window_ms=0) if batching else AsyncWeb3.AsyncHTTPProvider(url)
+    return AsyncWeb3(provider)
+
+
+def sign_transfers(count, chain_id):
+    account = Account.create()
+    return [
+        account.sign_transaction({
+            "to": account.address, "value": 0, "gas": 21000, "gasPrice": 1,
+            "nonce": nonce, "chainId": chain_id
+        }).raw_transaction
+        for nonce in range(count)
+    ]
+
+
+async def run_raw(server, raw_txs, batching):
+    web3 = create_web3(server.url, batching)
+    http_before = server.http_requests
+    start = time.perf_counter()
+    hashes = await asyncio.gather(*[web3.eth.send_raw_transaction(raw) for raw in raw_txs])
+    return len(hashes), time.perf_counter() - start, server.http_requests - http_before
+
+
+async def run_registrations(server, count, batching):
+    web3 = create_web3(server.url, batching)
+    watcher = ReceiptWatcher(web3, ReceiptCache())
+    pool = SignerPool(web3=web3, signer_class=AsyncBlockchain, receipt_watcher=watcher,
+                      gas_policy=GasPolicy(web3, watcher))
+    keys = [Account.create().key.hex() for _ in range(count)]
+    http_before = server.http_requests
+    start = time.perf_counter()
+    receipts = await asyncio.gather(*[
+        pool.get(key).registration(dict(PAYLOAD, cbsdSerialNumber=f"RPC-{i}")) for i, key in enumerate(keys)
+    ])
+    elapsed = time.perf_counter() - start
+    await watcher.stop()
+    ok = sum(r["status"] == 1 for r in receipts)
+    return ok, elapsed, server.http_requests - http_before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--txs", type=int, default=500, help="transações assinadas no cenário raw")
+    parser.add_argument("--registrations", type=int, default=100, help="registrations concorrentes")
+    parser.add_argument("--block-time", type=float, default=1.0)
+    args = parser.parse_args()
+
+    with RPCStandInServer(ChainStandIn(block_time=args.block_time)) as server:
+        print(f"Bloco a cada {args.block_time}s\n")
+        for label, batching in (("AsyncHTTPProvider", False), ("BatchingHTTPProvider", True)):
+            raw_txs = sign_transfers(args.txs, server.chain.chain_id)
+            ok, elapsed, http = asyncio.run(run_raw(server, raw_txs, batching))
+            print(f"{label:<21} raw          txs={ok:5d}  total={elapsed:6.2f}s  POSTs ao nó={http:5d}  "
+                  f"POSTs/tx={http / ok:.3f}")
+            ok, elapsed, http = asyncio.run(run_registrations(server, args.registrations, batching))
+            print(f"{label:<21} registration txs={ok:5d}  total={elapsed:6.2f}s  POSTs ao nó={http:5d}  "
+                  f"POSTs/tx={http / max(ok, 1):.3f}")
+
+
+if __name__ == "__main__":
+    main()
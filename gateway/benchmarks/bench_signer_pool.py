@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Benchmark: overhead por requisição de ``Blockchain(private_key)`` vs ``SignerPool.get``
+
+Usa o nó JSON-RPC local (rpc_standin) para que a checagem ``is_connected()``
+tenha um round trip HTTP real, como no Besu.
+
+Uso:
+    python benchmarks/bench_signer_pool.py --requests 2000 --keys 50 --pool-size 256
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from eth_account import Account
+from config.settings import settings
+from blockchain.blockchain import Blockchain
+from blockchain.signer_pool import SignerPool
+from rpc_standin import RPCStandInServer
+
+
+def measure(label, func, keys, requests):
+    samples = []
+    for i in range(requests):
+        key = keys[i % len(keys)]
+        start = time.perf_counter()
+        func(key)
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    print(f"{label:<32} média={statistics.mean(samples):9.1f}µs  "
+          f"p50={samples[len(samples) // 2]:9.1f}µs  p99={samples[int(len(samples) * 0.99)]:9.1f}µs")
+    return statistics.mean(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--keys", type=int, default=50, help="contas distintas (como no plano de stress)")
+    parser.add_argument("--pool-size", type=int, default=256)
+    args = parser.parse_args()
+
+    keys = ["0x" + Account.create().key.hex().removeprefix("0x") for _ in range(args.keys)]
+
+    with RPCStandInServer() as server:
+        settings.RPC_URL = server.url
+        print(f"Nó stand-in em {server.url} | {args.requests} requisições, {args.keys} contas\n")
+
+        before = measure("Blockchain(private_key)", lambda key: Blockchain(key), keys, args.requests)
+
+        pool = SignerPool(max_size=args.pool_size)
+        after = measure(f"SignerPool.get (máx. {args.pool_size})", pool.get, keys, args.requests)
+
+        small = SignerPool(max_size=max(1, args.keys // 2))
+        measure(f"SignerPool.get (máx. {small.max_size}, com evicção)", small.get, keys, args.requests)
+
+        print(f"\nGanho por requisição: {before / after:.0f}x  | pool: {pool.get_stats()}")
+        print(f"Requisições HTTP ao nó: {server.http_requests}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Benchmark: CBSDs num raio / retângulo, GridIndex vs varredura com N CBSDs
+
+Popula o repositório com N CBSDs nos EUA continentais (lat 25-49, lon
+-125 a -67): 70% em torno de ``--cities`` centros (desvio de ~0,3°) e 30%
+uniformes. Mede, para centros sorteados entre as cidades e raios de 1 a
+100 km (e retângulos equivalentes):
+
+- ``índice``: ``GridIndex.within_radius``/``within_box`` (células que cobrem
+  a consulta + distâncias dos candidatos numa operação NumPy), só as chaves
+- ``página``: ``find_near``/``find_in_box``, primeira página de ``--page`` CBSDs
+- ``numpy``: haversine vetorizado sobre as N coordenadas (varredura O(n) em C)
+- ``python``: varredura de todos os CBSDs com ``math`` por CBSD (O(n))
+
+Com ``--sqlite`` repete com o ``SQLiteCBSDRepository`` (R*Tree ``cbsd_locations``).
+
+Uso:
+    python benchmarks/bench_spatial_index.py --cbsds 1000000
+    python benchmarks/bench_spatial_index.py --cbsds 200000 --sqlite
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from itertools import islice
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from repository.repository import CBSDRepository, cbsd_key
+from repository.spatial import COORDINATE_SCALE, EARTH_RADIUS_KM, haversine_km, in_box
+from repository.sqlite_repository import SQLiteCBSDRepository
+
+SAS = "0xf39Fd6e51aad88F6F4ce6aB8827279cffFb92266"
+RADII_KM = (1, 10, 50, 100)
+
+
+def locations(count, cities, rng):
+    centers = [(rng.uniform(26, 48), rng.uniform(-124, -68)) for _ in range(cities)]
+    points = []
+    for i in range(count):
+        if i % 10 < 7:
+            latitude, longitude = rng.choice(centers)
+            latitude, longitude = latitude + rng.gauss(0, 0.3), longitude + rng.gauss(0, 0.3)
+        else:
+            latitude, longitude = rng.uniform(25, 49), rng.uniform(-125, -67)
+        points.append((round(latitude * COORDINATE_SCALE), round(longitude * COORDINATE_SCALE)))
+    return centers, points
+
+
+def populate(repo, points):
+    with repo.transaction():
+        for i, (latitude, longitude) in enumerate(points):
+            serial = f"BENCH-SN-{i}"
+            repo.add_cbsd(cbsd_key("BENCH-FCC", serial), {
+                "fcc_id": "BENCH-FCC", "serial_number": serial, "sas_origin": SAS, "status": "registered",
+                "block_number": i // 100, "transaction_hash": f"0x{i:064x}", "latitude": latitude,
+                "longitude": longitude})
+
+
+def scan_python(repo, latitude, longitude, radius_km):
+    """Distância de cada CBSD calculada em Python"""
+    lat1, lon1 = math.radians(latitude), math.radians(longitude)
+    cos1 = math.cos(lat1)
+    found = []
+    for cbsd_id, cbsd in repo.cbsds.items():
+        lat2, lon2 = math.radians(cbsd.latitude / COORDINATE_SCALE), math.radians(cbsd.longitude / COORDINATE_SCALE)
+        a = math.sin((lat2 - lat1) / 2) ** 2 + cos1 * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+        if 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0))) <= radius_km:
+            found.append(cbsd_id)
+    return found
+
+
+def timed(query, queries, page=None):
+    """Tempo médio (s) por consulta e número médio de resultados"""
+    start = time.perf_counter()
+    found = 0
+    for args in queries:
+        results = query(*args)
+        found += sum(1 for _ in (islice(results, page) if page else results))
+    return (time.perf_counter() - start) / len(queries), found / len(queries)
+
+
+def box_of(latitude, longitude, radius_km):
+    """Retângulo de lado 2 * raio centrado no ponto"""
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    dlon = dlat / math.cos(math.radians(latitude))
+    return latitude - dlat, longitude - dlon, latitude + dlat, longitude + dlon
+
+
+def compare(name, repo, args, centers, latitudes, longitudes, rng):
+    print(f"\n{name}: {'consulta':<12} {'k':>8} {'índice':>10} {'página':>10} {'numpy':>10} {'python':>10}")
+    memory = isinstance(repo, CBSDRepository)
+    for radius in RADII_KM:
+        queries = [(lat + rng.gauss(0, 0.2), lon + rng.gauss(0, 0.2), radius)
+                   for lat, lon in (rng.choice(centers) for _ in range(args.queries))]
+        boxes = [box_of(*query) for query in queries]
+        scans = queries[:args.scan_queries]
+        scan_numpy = lambda lat, lon, r: np.flatnonzero(haversine_km(lat, lon, latitudes, longitudes) <= r)
+        numpy_time, found = timed(scan_numpy, queries)
+        box_numpy, box_found = timed(lambda *box: np.flatnonzero(in_box(latitudes, longitudes, *box)), boxes)
+        page_time, _ = timed(repo.find_near, queries, args.page)
+        box_page, _ = timed(repo.find_in_box, boxes, args.page)
+        # Mesmos resultados que a varredura vetorizada
+        assert timed(repo.find_near, scans)[1] == timed(scan_numpy, scans)[1]
+        if memory:
+            index_time, index_found = timed(lambda *query: repo.locations.within_radius(*query)[0], queries)
+            box_index, box_index_found = timed(repo.locations.within_box, boxes)
+            assert (index_found, box_index_found) == (found, box_found)
+            python_time, _ = timed(lambda *query: scan_python(repo, *query), scans)
+            index_columns = (f"{index_time * 1000:7.2f} ms", f"{box_index * 1000:7.2f} ms")
+            python_column = f"{python_time * 1000:7.0f} ms"
+        else:
+            index_columns, python_column = (f"{'-':>10}", f"{'-':>10}"), f"{'-':>10}"
+        print(f"{' ' * len(name)}  {f'raio {radius} km':<12} {found:8.0f} {index_columns[0]} "
+              f"{page_time * 1000:7.2f} ms {numpy_time * 1000:7.1f} ms {python_column}")
+        print(f"{' ' * len(name)}  {f'caixa {2 * radius} km':<12} {box_found:8.0f} {index_columns[1]} "
+              f"{box_page * 1000:7.2f} ms {box_numpy * 1000:7.1f} ms {'-':>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cbsds", type=int, default=1_000_000)
+    parser.add_argument("--cities", type=int, default=200, help="centros onde se concentram 70%% dos CBSDs")
+    parser.add_argument("--page", type=int, default=100, help="CBSDs da primeira página")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--scan-queries", type=int, default=3, help="consultas por varredura (lentas)")
+    parser.add_argument("--sqlite", action="store_true", help="também com o repositório SQLite")
+    args = parser.parse_args()
+    rng = random.Random(1)
+    centers, points = locations(args.cbsds, args.cities, rng)
+    latitudes = np.array([p[0] for p in points], dtype=np.float64) / COORDINATE_SCALE
+    longitudes = np.array([p[1] for p in points], dtype=np.float64) / COORDINATE_SCALE
+
+    repo = CBSDRepository()
+    start = time.perf_counter()
+    populate(repo, points)
+    load = time.perf_counter() - start
+    print(f"{args.cbsds} CBSDs em memória carregados em {load:.1f} s ({args.cbsds / load:,.0f} CBSDs/s, com "
+          f"índices); {len(repo.locations._cells)} células de {repo.locations.cell_size}°")
+    compare("memória", repo, args, centers, latitudes, longitudes, random.Random(2))
+
+    if args.sqlite:
+        with tempfile.TemporaryDirectory() as directory:
+            repo = SQLiteCBSDRepository(os.path.join(directory, "index.db"))
+            start = time.perf_counter()
+            populate(repo, points)
+            print(f"\n{args.cbsds} CBSDs em SQLite carregados em {time.perf_counter() - start:.1f} s")
+            compare("sqlite", repo, args, centers, latitudes, longitudes, random.Random(2))
+            repo.close()
+
+
+if __name__ == "__main__":
+    main()
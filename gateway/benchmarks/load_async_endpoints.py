@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Teste de carga: requisições concorrentes num único worker (um event loop)
+
+Compara o caminho antigo (``Blockchain`` síncrono chamado dentro de um
+endpoint ``async def``, que bloqueia o loop em ``wait_for_transaction_receipt``)
+com os endpoints atuais sobre ``AsyncBlockchain``. O nó stand-in minera um
+bloco a cada ``--block-time`` segundos, como o Besu.
+
+Uso:
+    python benchmarks/load_async_endpoints.py --requests 50 --block-time 1
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import httpx
+from eth_account import Account
+from web3 import AsyncWeb3
+from config.settings import settings
+from blockchain.blockchain import Blockchain
+from blockchain.async_blockchain import AsyncBlockchain
+from blockchain.signer_pool import SignerPool
+import api.api as api_module
+from rpc_standin import ChainStandIn, RPCStandInServer
+
+PAYLOAD = {
+    "fccId": "LOAD-FCC", "userId": "LOAD-USER", "cbsdSerialNumber": "LOAD-SN",
+    "callSign": "LOAD", "cbsdCategory": "A", "airInterface": "E_UTRA",
+    "measCapability": ["EUTRA_CARRIER_RSSI"], "eirpCapability": 47,
+    "latitude": 375000000, "longitude": 1224000000, "height": 30, "heightType": "AGL",
+    "indoorDeployment": False, "antennaGain": 15, "antennaBeamwidth": 360,
+    "antennaAzimuth": 0, "groupingParam": "",
+    "cbsdAddress": "0xf39Fd6e51aad88F6F4ce6aB8827279cffFb92266"
+}
+
+
+def max_overlap(intervals):
+    points = sorted([(s, 1) for s, _ in intervals] + [(e, -1) for _, e in intervals])
+    current = peak = 0
+    for _, delta in points:
+        current += delta
+        peak = max(peak, current)
+    return peak
+
+
+def report(label, intervals, elapsed):
+    print(f"{label:<34} total={elapsed:6.2f}s  {len(intervals) / elapsed:7.1f} req/s  "
+          f"sobreposição máx.={max_overlap(intervals)}")
+
+
+async def run_blocking(keys):
+    """Caminho antigo: chamada síncrona dentro de uma corrotina"""
+    signers = [Blockchain(key) for key in keys]
+
+    async def one(i):
+        start = time.perf_counter()
+        signers[i].registration(dict(PAYLOAD, cbsdSerialNumber=f"SYNC-{i}"))
+        return start, time.perf_counter()
+
+    start = time.perf_counter()
+    intervals = await asyncio.gather(*[one(i) for i in range(len(keys))])
+    return intervals, time.perf_counter() - start
+
+
+async def run_async_endpoints(url, keys):
+    """Endpoints atuais (AsyncBlockchain) via ASGI, num único event loop"""
+    pool = SignerPool(web3=AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(url)), signer_class=AsyncBlockchain)
+    api_module.signer_pool, api_module.blockchain = pool, pool.get()
+    transport = httpx.ASGITransport(app=api_module.app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://gateway", timeout=300) as client:
+        async def one(i):
+            start = time.perf_counter()
+            resp = await client.post("/v1.3/registration", json=dict(
+                PAYLOAD, cbsdSerialNumber=f"ASYNC-{i}", private_key=keys[i]))
+            resp.raise_for_status()
+            return start, time.perf_counter()
+
+        start = time.perf_counter()
+        intervals = await asyncio.gather(*[one(i) for i in range(len(keys))])
+        return intervals, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--block-time", type=float, default=1.0)
+    parser.add_argument("--skip-blocking", action="store_true", help="não executar o caminho síncrono (lento)")
+    args = parser.parse_args()
+
+    # Uma conta por requisição, como nos planos JMeter (accounts.csv)
+    keys = [Account.create().key.hex() for _ in range(args.requests)]
+
+    with RPCStandInServer(ChainStandIn(block_time=args.block_time)) as server:
+        settings.RPC_URL = server.url
+        print(f"{args.requests} registrations concorrentes, bloco a cada {args.block_time}s\n")
+        if not args.skip_blocking:
+            report("Blockchain síncrono (antes)", *asyncio.run(run_blocking(keys)))
+        report("AsyncBlockchain (depois)", *asyncio.run(run_async_endpoints(server.url, keys)))
+
+
+if __name__ == "__main__":
+    main()
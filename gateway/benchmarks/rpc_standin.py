@@ -0,0 +1,411 @@
+"""
+Nó JSON-RPC local (stand-in) para benchmarks e testes sem Besu
+
+Simula o subconjunto de métodos usado pelo gateway: conexão, blocos, nonce,
+gas, envio de transações assinadas, recibos e logs. Não executa EVM: cada
+transação aceita é minerada com status 1 (ou 0 se o gas limit for menor que
+o gas simulado) e pode gerar logs sintéticos através de ``log_factory``.
+
+Também conta requisições HTTP e chamadas RPC para medir overhead.
+"""
+
+import json
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+
+import rlp
+from eth_abi import encode
+from eth_account import Account
+from eth_utils import keccak, to_checksum_address
+
+ZERO_HASH = "0x" + "00" * 32
+
+
+def _hex(value: int) -> str:
+    return hex(value)
+
+
+def decode_raw_transaction(raw: bytes) -> dict:
+    """Extrai remetente, nonce, gas, destino e data de uma transação assinada"""
+    if raw[0] >= 0xc0:
+        nonce, gas_price, gas, to, value, data = rlp.decode(raw)[:6]
+    else:
+        # Transações tipadas (EIP-2930/EIP-1559): chainId vem antes do nonce
+        fields = rlp.decode(raw[1:])
+        if raw[0] == 0x02:
+            nonce, gas_price, gas, to, value, data = fields[1], fields[3], fields[4], fields[5], fields[6], fields[7]
+        else:
+            nonce, gas_price, gas, to, value, data = fields[1:7]
+    return {
+        "from": Account.recover_transaction(raw),
+        "nonce": int.from_bytes(nonce, "big"),
+        "gas": int.from_bytes(gas, "big"),
+        "to": to_checksum_address(to) if to else None,
+        "data": bytes(data),
+        "hash": "0x" + keccak(raw).hex(),
+    }
+
+
+def encode_event_log(address: str, event_abi: dict, args: dict) -> dict:
+    """
+    Log de um evento do ABI como o contrato emitiria
+
+    Campos indexados vão nos tópicos (``string``/``bytes`` como hash keccak),
+    os demais ABI-codificados em ``data``.
+    """
+    inputs = event_abi["inputs"]
+    signature = f"{event_abi['name']}({','.join(i['type'] for i in inputs)})"
+    topics = ["0x" + keccak(text=signature).hex()]
+    for i in inputs:
+        if i["indexed"]:
+            value = args[i["name"]]
+            if i["type"] in ("string", "bytes"):
+                topic = keccak(text=value) if isinstance(value, str) else keccak(value)
+            else:
+                topic = encode([i["type"]], [value])
+            topics.append("0x" + topic.hex())
+    data = [i for i in inputs if not i["indexed"]]
+    return {
+        "address": address,
+        "topics": topics,
+        "data": "0x" + encode([i["type"] for i in data], [args[i["name"]] for i in data]).hex(),
+    }
+
+
+class RPCError(Exception):
+    def __init__(self, message: str, code: int = -32000):
+        super().__init__(message)
+        self.code = code
+
+
+class ChainStandIn:
+    """
+    Estado em memória de uma cadeia simulada
+
+    - ``block_time=0``: cada transação é minerada imediatamente no seu bloco
+    - ``block_time>0``: uma thread minera o pool a cada ``block_time`` segundos
+    - ``gas_used_fn(data)`` define o gas consumido (e retornado por eth_estimateGas)
+    - ``log_factory(tx, block_number)`` devolve logs sintéticos para a transação
+    - ``max_logs``: ``eth_getLogs`` com mais resultados que isso falha, como
+      o limite de resposta de um nó real; ``logs_latency`` simula o tempo de
+      consulta do nó por chamada (fora do lock: chamadas concorrentes se sobrepõem)
+    """
+
+    def __init__(self, chain_id: int = 1337, block_time: float = 0,
+                 gas_price: int = 0, gas_used_fn: Optional[Callable[[bytes], int]] = None,
+                 log_factory: Optional[Callable[[dict, int], List[dict]]] = None,
+                 max_logs: Optional[int] = None, logs_latency: float = 0):
+        self.chain_id = chain_id
+        self.block_time = block_time
+        self.gas_price = gas_price
+        self.gas_used_fn = gas_used_fn or (lambda data: 21000 + 16 * len(data))
+        self.log_factory = log_factory
+        self.max_logs = max_logs
+        self.logs_latency = logs_latency
+        self.lock = threading.RLock()
+        self.blocks: List[dict] = []
+        self.logs: List[dict] = []
+        # Bloco de cada log (mesma ordem de ``logs``) para localizar faixas com bisect
+        self._log_blocks: List[int] = []
+        self.nonces: Dict[str, int] = {}
+        self.pool: Dict[str, Dict[int, dict]] = {}
+        self.receipts: Dict[str, dict] = {}
+        self.transactions: Dict[str, dict] = {}
+        self.mined_at: Dict[str, float] = {}
+        self.call_counts: Dict[str, int] = {}
+        self.rejected_nonces = 0
+        # Reorgs simulados (entra no hash dos blocos minerados depois de cada um)
+        self.forks = 0
+        self._stop = threading.Event()
+        self._mine_block([])
+        if block_time > 0:
+            threading.Thread(target=self._miner, daemon=True).start()
+
+    # ------------------------------------------------------------------ estado
+
+    @property
+    def block_number(self) -> int:
+        return len(self.blocks) - 1
+
+    def _block_hash(self, number: int) -> str:
+        fork = f"-fork-{self.forks}" if self.forks else ""
+        return "0x" + keccak(f"standin-block-{number}{fork}".encode()).hex()
+
+    def _miner(self):
+        while not self._stop.wait(self.block_time):
+            self.mine()
+
+    def stop(self):
+        self._stop.set()
+
+    def mine(self) -> int:
+        """Minera as transações executáveis (nonces contíguos) do pool"""
+        with self.lock:
+            txs = []
+            for sender, queued in self.pool.items():
+                nonce = self.nonces.get(sender, 0)
+                while nonce in queued:
+                    txs.append(queued.pop(nonce))
+                    nonce += 1
+                self.nonces[sender] = nonce
+            self._mine_block(txs)
+            return self.block_number
+
+    def _mine_block(self, txs: List[dict]):
+        number = len(self.blocks)
+        block_hash = self._block_hash(number)
+        mined_at = time.time()
+        for index, tx in enumerate(txs):
+            self.mined_at[tx["hash"]] = mined_at
+            gas_needed = self.gas_used_fn(tx["data"])
+            status = 1 if tx["gas"] >= gas_needed else 0
+            logs = []
+            if status and self.log_factory:
+                for log in self.log_factory(tx, number):
+                    log = dict(log, blockNumber=_hex(number), blockHash=block_hash,
+                               transactionHash=tx["hash"], transactionIndex=_hex(index),
+                               logIndex=_hex(len(self.logs)), removed=False)
+                    logs.append(log)
+                    self.logs.append(log)
+                    self._log_blocks.append(number)
+            self.receipts[tx["hash"]] = {
+                "transactionHash": tx["hash"],
+                "transactionIndex": _hex(index),
+                "blockHash": block_hash,
+                "blockNumber": _hex(number),
+                "from": tx["from"],
+                "to": tx["to"],
+                "cumulativeGasUsed": _hex(min(gas_needed, tx["gas"])),
+                "gasUsed": _hex(min(gas_needed, tx["gas"])),
+                "effectiveGasPrice": _hex(self.gas_price),
+                "contractAddress": None,
+                "logs": logs,
+                "logsBloom": "0x" + "00" * 256,
+                "status": _hex(status),
+                "type": "0x0",
+            }
+        self.blocks.append({
+            "number": _hex(number),
+            "hash": block_hash,
+            "parentHash": self.blocks[-1]["hash"] if number else ZERO_HASH,
+            "timestamp": _hex(int(time.time())),
+            "gasLimit": _hex(30_000_000),
+            "gasUsed": "0x0",
+            "miner": "0x" + "00" * 20,
+            "transactions": [tx["hash"] for tx in txs],
+            "baseFeePerGas": "0x0",
+        })
+
+    def add_logs(self, logs: List[dict], block_number: Optional[int] = None):
+        """Injeta logs sintéticos (ex.: para benchmarks de eth_getLogs)"""
+        with self.lock:
+            for log in logs:
+                number = block_number if block_number is not None else int(log["blockNumber"], 16)
+                while self.block_number < number:
+                    self._mine_block([])
+                log = dict(log, blockNumber=_hex(number), blockHash=self.blocks[number]["hash"],
+                           logIndex=_hex(len(self.logs)), removed=False)
+                log.setdefault("transactionHash", ZERO_HASH)
+                log.setdefault("transactionIndex", "0x0")
+                position = bisect_right(self._log_blocks, number)
+                self._log_blocks.insert(position, number)
+                self.logs.insert(position, log)
+
+    def reorg(self, depth: int) -> int:
+        """
+        Troca os ``depth`` últimos blocos por um fork da mesma altura
+
+        Os blocos e seus logs/recibos são descartados e os blocos minerados no
+        lugar têm outros hashes (logs do fork podem ser injetados com
+        ``add_logs``). Retorna o primeiro bloco substituído.
+        """
+        with self.lock:
+            height = self.block_number
+            first = height - depth + 1
+            del self.blocks[first:]
+            cut = bisect_left(self._log_blocks, first)
+            del self.logs[cut:]
+            del self._log_blocks[cut:]
+            self.receipts = {tx_hash: receipt for tx_hash, receipt in self.receipts.items()
+                             if int(receipt["blockNumber"], 16) < first}
+            self.forks += 1
+            while self.block_number < height:
+                self._mine_block([])
+            return first
+
+    def _resolve_block(self, tag) -> int:
+        if tag in (None, "latest", "pending", "safe", "finalized"):
+            return self.block_number
+        if tag == "earliest":
+            return 0
+        return int(tag, 16)
+
+    # -------------------------------------------------------------- métodos RPC
+
+    def eth_sendRawTransaction(self, raw_hex):
+        tx = decode_raw_transaction(bytes.fromhex(raw_hex[2:]))
+        with self.lock:
+            sender = tx["from"]
+            queued = self.pool.setdefault(sender, {})
+            if tx["nonce"] < self.nonces.get(sender, 0):
+                self.rejected_nonces += 1
+                raise RPCError("nonce too low")
+            if tx["nonce"] in queued:
+                self.rejected_nonces += 1
+                raise RPCError("replacement transaction underpriced")
+            queued[tx["nonce"]] = tx
+            self.transactions[tx["hash"]] = tx
+            if self.block_time <= 0:
+                self.mine()
+        return tx["hash"]
+
+    def eth_getTransactionReceipt(self, tx_hash):
+        return self.receipts.get(tx_hash)
+
+    def eth_getTransactionByHash(self, tx_hash):
+        tx = self.transactions.get(tx_hash)
+        if tx is None:
+            return None
+        receipt = self.receipts.get(tx_hash, {})
+        return {"hash": tx["hash"], "from": tx["from"], "to": tx["to"], "nonce": _hex(tx["nonce"]),
+                "gas": _hex(tx["gas"]), "gasPrice": _hex(self.gas_price), "value": "0x0",
+                "input": "0x" + tx["data"].hex(), "blockNumber": receipt.get("blockNumber"),
+                "blockHash": receipt.get("blockHash"), "transactionIndex": receipt.get("transactionIndex")}
+
+    def eth_getTransactionCount(self, address, tag="latest"):
+        with self.lock:
+            address = to_checksum_address(address)
+            nonce = self.nonces.get(address, 0)
+            if tag == "pending":
+                queued = self.pool.get(address, {})
+                while nonce in queued:
+                    nonce += 1
+            return _hex(nonce)
+
+    def eth_blockNumber(self):
+        return _hex(self.block_number)
+
+    def eth_getBlockByNumber(self, tag, full=False):
+        with self.lock:
+            number = self._resolve_block(tag)
+            return self.blocks[number] if number <= self.block_number else None
+
+    def eth_getLogs(self, params):
+        with self.lock:
+            from_block = self._resolve_block(params.get("fromBlock", "latest"))
+            to_block = self._resolve_block(params.get("toBlock", "latest"))
+            address = params.get("address")
+            addresses = {a.lower() for a in ([address] if isinstance(address, str) else address or [])}
+            topics = params.get("topics") or []
+            result = []
+            first = bisect_left(self._log_blocks, from_block)
+            last = bisect_right(self._log_blocks, to_block)
+            for log in self.logs[first:last]:
+                if addresses and log.get("address", "").lower() not in addresses:
+                    continue
+                if not _match_topics(log.get("topics", []), topics):
+                    continue
+                result.append(log)
+        if self.logs_latency:
+            time.sleep(self.logs_latency)
+        if self.max_logs is not None and len(result) > self.max_logs:
+            raise RPCError(f"query returned more than {self.max_logs} results", code=-32005)
+        return result
+
+    def eth_gasPrice(self):
+        return _hex(self.gas_price)
+
+    def eth_estimateGas(self, tx, *args):
+        data = tx.get("data") or tx.get("input") or "0x"
+        return _hex(self.gas_used_fn(bytes.fromhex(data[2:])))
+
+    def eth_chainId(self):
+        return _hex(self.chain_id)
+
+    def net_version(self):
+        return str(self.chain_id)
+
+    def web3_clientVersion(self):
+        return "rpc-standin/1.0"
+
+    def eth_call(self, tx, *args):
+        return "0x" + "00" * 32
+
+    def dispatch(self, request: dict) -> dict:
+        method = request.get("method")
+        with self.lock:
+            self.call_counts[method] = self.call_counts.get(method, 0) + 1
+        response = {"jsonrpc": "2.0", "id": request.get("id")}
+        handler = getattr(self, method, None) if method and not method.startswith("_") else None
+        if handler is None:
+            response["error"] = {"code": -32601, "message": f"method {method} not found"}
+            return response
+        try:
+            response["result"] = handler(*request.get("params", []))
+        except RPCError as e:
+            response["error"] = {"code": e.code, "message": str(e)}
+        return response
+
+
+def _match_topics(log_topics: List[str], filters: List) -> bool:
+    for position, wanted in enumerate(filters):
+        if wanted is None:
+            continue
+        if position >= len(log_topics):
+            return False
+        options = wanted if isinstance(wanted, list) else [wanted]
+        if log_topics[position].lower() not in [o.lower() for o in options]:
+            return False
+    return True
+
+
+class RPCStandInServer:
+    """Servidor HTTP JSON-RPC (com suporte a batch) sobre um ChainStandIn"""
+
+    def __init__(self, chain: Optional[ChainStandIn] = None, host: str = "127.0.0.1", port: int = 0):
+        self.chain = chain or ChainStandIn()
+        self.http_requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length))
+                server.http_requests += 1
+                if isinstance(payload, list):
+                    result = [server.chain.dispatch(item) for item in payload]
+                else:
+                    result = server.chain.dispatch(payload)
+                body = json.dumps(result).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://{host}:{self.httpd.server_address[1]}"
+
+    def start(self) -> "RPCStandInServer":
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.chain.stop()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -32,7 +32,6 @@ pip install -r requirements.txt
 # Criar diretórios necessários
 echo "📁 Criando diretórios..."
 mkdir -p logs
-mkdir -p abi
 
 # Configurar arquivo .env se não existir
 if [ ! -f .env ]; then
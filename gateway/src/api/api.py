@@ -1,13 +1,30 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Request, Body
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request, Body, Query
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Union
 import uvicorn
 import logging
-from blockchain.blockchain import Blockchain
-from repository.repository import CBSDRepository
+from blockchain.async_blockchain import AsyncBlockchain
+from blockchain.signer_pool import SignerPool
+from blockchain.receipt_cache import ReceiptCache
+from blockchain.receipt_watcher import ReceiptWatcher
+from blockchain.gas_policy import GasPolicy
+from blockchain.micro_batcher import MicroBatcher
+from blockchain.event_indexer import EventIndexer
+from blockchain.blockchain import event_topics
+from blockchain.event_decoder import EventDecoder, RECORD_TYPES, record_json
+from blockchain.event_stream import CursorExpired, EventBroadcaster, Subscription, parse_cursor
+from handlers.handlers import EVENT_HANDLERS, repo
+from handlers.conflicts import ConflictMonitor, conflict_json
+from repository.repository import cbsd_key
+from repository.activity_dump import dump_chunks
+from config.settings import settings
 import asyncio
 import json
+import time
+from itertools import islice
 from web3 import Web3
 from datetime import datetime, timezone
 
@@ -33,7 +50,14 @@ app.add_middleware(
 
 # Instâncias globais
 blockchain = None
-repo = CBSDRepository()
+signer_pool = None
+receipt_watcher = None
+micro_batcher = None
+event_indexer = None
+event_broadcaster = None
+conflict_monitor = None
+conflict_broadcaster = None
+receipt_cache = ReceiptCache()
 
 # Modelos Pydantic para SAS-SAS
 class RegistrationRequest(BaseModel):
@@ -98,17 +122,174 @@ class DeregistrationRequestWithKey(DeregistrationRequest):
 class SASAuthorizationWithKey(SASAuthorization):
     private_key: str = None
 
+# Lotes no formato WInnForum: {"registrationRequest": [...]} → {"registrationResponse": [...]}
+# O tamanho é conferido em process_batch: com max_length aqui um lote grande demais
+# falharia contra todos os membros da Union e o 422 listaria erros de item único
+class RegistrationBatchRequest(BaseModel):
+    registrationRequest: List[RegistrationRequest]
+    private_key: str = None
+class GrantBatchRequest(BaseModel):
+    grantRequest: List[GrantRequest]
+    private_key: str = None
+class RelinquishmentBatchRequest(BaseModel):
+    relinquishmentRequest: List[RelinquishmentRequest]
+    private_key: str = None
+class DeregistrationBatchRequest(BaseModel):
+    deregistrationRequest: List[DeregistrationRequest]
+    private_key: str = None
+
+def get_signer(private_key: Optional[str] = None) -> AsyncBlockchain:
+    """Obtém o contexto de assinatura da chave a partir do pool (criado sob demanda)"""
+    if signer_pool is None:
+        create_signer_pool()
+    return signer_pool.get(private_key)
+
+def create_signer_pool() -> SignerPool:
+    """Cria o AsyncWeb3 compartilhado, o watcher único de recibos e o pool de contas"""
+    global signer_pool, receipt_watcher, micro_batcher
+    web3 = AsyncBlockchain.create_web3()
+    receipt_watcher = ReceiptWatcher(web3, receipt_cache)
+    signer_pool = SignerPool(web3=web3, signer_class=AsyncBlockchain, receipt_watcher=receipt_watcher,
+                             gas_policy=GasPolicy(web3, receipt_watcher))
+    if settings.MICRO_BATCH_ENABLED:
+        micro_batcher = MicroBatcher(get_signer)
+    return signer_pool
+
+async def execute_operation(blockchain: AsyncBlockchain, operation: str, req):
+    """
+    Executa a operação e retorna o recibo
+
+    Com ``MICRO_BATCH_ENABLED`` a chamada entra no lote agrupado da conta e o
+    recibo é o da transação do lote.
+    """
+    payload = req.dict(exclude={"private_key"})
+    if micro_batcher is None:
+        return await getattr(blockchain, operation)(payload)
+    result = await micro_batcher.submit(operation, req.private_key, payload)
+    if not result["success"]:
+        raise Exception(result["error"] or "Item do lote revertido")
+    return result["receipt"]
+
+def wants_fire_and_track(request: Request) -> bool:
+    """Modo fire-and-track: habilitado globalmente ou pedido com 'Prefer: respond-async'"""
+    return settings.FIRE_AND_TRACK or "respond-async" in request.headers.get("prefer", "").lower()
+
+def track_transaction(tx_hash) -> str:
+    """Registra a transação como pendente no cache e no watcher; retorna o hash em hex"""
+    receipt_cache.track(tx_hash)
+    if receipt_watcher is not None:
+        receipt_watcher.watch(tx_hash)
+    return tx_hash.hex()
+
+def accepted_response(tx_hash) -> JSONResponse:
+    """Resposta 202 com o hash da transação recém-submetida"""
+    tx_hash_hex = track_transaction(tx_hash)
+    return JSONResponse(status_code=202, content={
+        "success": True,
+        "status": ReceiptCache.PENDING,
+        "message": "Transação submetida; acompanhe o status pelo status_url",
+        "transaction_hash": tx_hash_hex,
+        "status_url": f"/v1.3/tx/{tx_hash_hex}"
+    })
+
+async def process_batch(request: Request, operation: str, items: list, private_key: Optional[str]) -> JSONResponse:
+    """
+    Executa um lote WInnForum: uma transação por item, nonces consecutivos e
+    um único envio JSON-RPC. A resposta mantém a ordem e traz o status por item.
+
+    Com ``BATCH_ONCHAIN=true`` o lote vira uma única transação ``<operação>Batch``.
+    Lote vazio responde 400 e acima de ``BATCH_MAX_SIZE`` itens, 413.
+    """
+    if not items:
+        raise HTTPException(status_code=400, detail="Lote vazio")
+    if len(items) > settings.BATCH_MAX_SIZE:
+        raise HTTPException(status_code=413,
+                            detail=f"Lote com {len(items)} itens excede BATCH_MAX_SIZE ({settings.BATCH_MAX_SIZE})")
+    blockchain = get_signer(private_key)
+    fire_and_track = wants_fire_and_track(request)
+    if settings.BATCH_ONCHAIN:
+        return await process_onchain_batch(blockchain, fire_and_track, operation, items)
+    calls = [blockchain.build_call(operation, item.dict()) for item in items]
+    results = await blockchain.send_batch(calls, wait=not fire_and_track)
+
+    responses = []
+    for result in results:
+        tx_hash, receipt = result["tx_hash"], result["receipt"]
+        item = {"transaction_hash": tx_hash.hex() if tx_hash is not None else None}
+        if fire_and_track and tx_hash is not None:
+            track_transaction(tx_hash)
+            item.update(success=True, status=ReceiptCache.PENDING, status_url=f"/v1.3/tx/{item['transaction_hash']}")
+        elif receipt is not None:
+            entry = receipt_cache.resolve(receipt)
+            item.update(success=entry["status"] == ReceiptCache.MINED, status=entry["status"],
+                        block_number=receipt["blockNumber"])
+        else:
+            item.update(success=False, status="failed", error=result["error"])
+        responses.append(item)
+
+    logger.info(f"Lote {operation}: {sum(r['success'] for r in responses)}/{len(responses)} itens com sucesso")
+    return JSONResponse(status_code=202 if fire_and_track else 200,
+                        content={f"{operation}Response": responses})
+
+async def process_onchain_batch(blockchain: AsyncBlockchain, fire_and_track: bool, operation: str, items: list) -> JSONResponse:
+    """Lote numa única transação; falhas por item vêm dos eventos BatchItemFailed"""
+    payloads = [item.dict() for item in items]
+    if fire_and_track:
+        tx_hash_hex = track_transaction(await blockchain.send_onchain_batch(operation, payloads, wait=False))
+        responses = [{"transaction_hash": tx_hash_hex, "success": True, "status": ReceiptCache.PENDING,
+                      "status_url": f"/v1.3/tx/{tx_hash_hex}"} for _ in items]
+        return JSONResponse(status_code=202, content={f"{operation}Response": responses})
+
+    batch = await blockchain.send_onchain_batch(operation, payloads)
+    receipt = batch["receipt"]
+    receipt_cache.resolve(receipt)
+    responses = []
+    for result in batch["results"]:
+        item = {"transaction_hash": receipt["transactionHash"].hex(), "success": result["success"],
+                "status": ReceiptCache.MINED if result["success"] else "failed",
+                "block_number": receipt["blockNumber"]}
+        if not result["success"]:
+            item["error"] = result["reason"]
+        responses.append(item)
+    logger.info(f"Lote on-chain {operation}: {sum(r['success'] for r in responses)}/{len(responses)} itens com sucesso")
+    return JSONResponse(status_code=200, content={f"{operation}Response": responses})
+
 @app.on_event("startup")
 async def startup_event():
     """Inicializar blockchain na startup"""
-    global blockchain
+    global blockchain, event_indexer, event_broadcaster, conflict_monitor, conflict_broadcaster
     try:
-        blockchain = Blockchain()
+        blockchain = create_signer_pool().get()
+        # Tópicos dos eventos calculados uma vez (usados por /events/recent)
+        event_topics()
+        if not await blockchain.is_connected():
+            raise ConnectionError(f"Não foi possível conectar ao Besu em {settings.RPC_URL}")
+        if settings.INDEXER_ENABLED:
+            event_indexer = EventIndexer(blockchain.web3, blockchain.contract, EVENT_HANDLERS, repository=repo)
+            event_broadcaster = EventBroadcaster(event_indexer.next_block, backfill=stream_backfill)
+            event_indexer.listeners.append(event_broadcaster.publish)
+            event_indexer.rollback_listeners.append(event_broadcaster.rollback)
+            # Conflitos dos grants criados: verificados após cada faixa, num stream próprio
+            conflict_broadcaster = EventBroadcaster(event_indexer.next_block)
+            conflict_monitor = ConflictMonitor(repo, conflict_broadcaster, head=lambda: event_indexer.head)
+            event_indexer.listeners.append(conflict_monitor)
+            event_indexer.rollback_listeners.append(conflict_broadcaster.rollback)
+            event_indexer.start()
         logger.info("API iniciada com sucesso")
     except Exception as e:
         logger.error(f"Erro ao inicializar blockchain: {e}")
         raise
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Encerrar tarefas em background e fechar as sessões HTTP do provider"""
+    if event_indexer is not None:
+        await event_indexer.stop()
+    if receipt_watcher is not None:
+        await receipt_watcher.close()
+    if signer_pool is not None:
+        await signer_pool.close()
+
 @app.get("/")
 async def root():
     """Endpoint raiz"""
@@ -123,8 +304,8 @@ async def health_check():
     """Health check da API"""
     try:
         if blockchain:
-            latest_block = blockchain.get_latest_block()
-            owner = blockchain.get_owner()
+            latest_block = await blockchain.get_latest_block()
+            owner = await blockchain.get_owner()
             return {
                 "status": "healthy",
                 "blockchain_connected": True,
@@ -140,107 +321,381 @@ async def health_check():
 # Endpoints SAS-SAS
 
 @app.post("/v1.3/registration")
-async def registration(req: RegistrationRequestWithKey):
+async def registration(req: Union[RegistrationRequestWithKey, RegistrationBatchRequest], request: Request):
     """Registration - Registra um CBSD via SAS-SAS"""
     try:
-        # Print para debug
-        logger.info(f"=== REGISTRATION DEBUG ===")
-        logger.info(f"fccId: {req.fccId}")
-        logger.info(f"userId: {req.userId}")
-        logger.info(f"cbsdSerialNumber: {req.cbsdSerialNumber}")
-        logger.info(f"cbsdAddress: {req.cbsdAddress}")
-        logger.info(f"private_key: {req.private_key[:10]}...")
-        logger.info(f"==========================")
-        
-        blockchain = Blockchain(req.private_key)
-        receipt = blockchain.registration(req.dict(exclude={"private_key"}))
+        if isinstance(req, RegistrationBatchRequest):
+            return await process_batch(request, "registration", req.registrationRequest, req.private_key)
+        blockchain = get_signer(req.private_key)
+        logger.debug(f"Registration {req.fccId}/{req.cbsdSerialNumber} pela conta {blockchain.account.address}")
+        if wants_fire_and_track(request):
+            return accepted_response(await blockchain.registration(req.dict(exclude={"private_key"}), wait=False))
+        receipt = await execute_operation(blockchain, "registration", req)
+        receipt_cache.resolve(receipt)
         return {
             "success": True,
             "message": f"CBSD {req.fccId}/{req.cbsdSerialNumber} registrado via SAS-SAS",
             "transaction_hash": receipt['transactionHash'].hex(),
             "block_number": receipt['blockNumber']
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Erro no registro SAS-SAS: {e}")
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/v1.3/grant")
-async def grant_spectrum(req: GrantRequestWithKey):
+async def grant_spectrum(req: Union[GrantRequestWithKey, GrantBatchRequest], request: Request):
     """Grant - Solicita espectro via SAS-SAS"""
     try:
-        # Print para debug
-        logger.info(f"=== GRANT DEBUG ===")
-        logger.info(f"fccId: {req.fccId}")
-        logger.info(f"cbsdSerialNumber: {req.cbsdSerialNumber}")
-        logger.info(f"private_key: {req.private_key[:10]}...")
-        logger.info(f"===================")
-        
-        blockchain = Blockchain(req.private_key)
-        receipt = blockchain.grant(req.dict(exclude={"private_key"}))
+        if isinstance(req, GrantBatchRequest):
+            return await process_batch(request, "grant", req.grantRequest, req.private_key)
+        blockchain = get_signer(req.private_key)
+        logger.debug(f"Grant {req.fccId}/{req.cbsdSerialNumber} pela conta {blockchain.account.address}")
+        if wants_fire_and_track(request):
+            return accepted_response(await blockchain.grant(req.dict(exclude={"private_key"}), wait=False))
+        receipt = await execute_operation(blockchain, "grant", req)
+        receipt_cache.resolve(receipt)
         return {
             "success": True,
             "message": f"Grant solicitado para {req.fccId}/{req.cbsdSerialNumber} via SAS-SAS",
             "transaction_hash": receipt['transactionHash'].hex(),
             "block_number": receipt['blockNumber']
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Erro no grant SAS-SAS: {e}")
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/v1.3/relinquishment")
-async def relinquishment(req: RelinquishmentRequestWithKey):
+async def relinquishment(req: Union[RelinquishmentRequestWithKey, RelinquishmentBatchRequest], request: Request):
     """Relinquishment - Libera grant via SAS-SAS"""
     try:
-        # Print para debug
-        logger.info(f"=== RELINQUISHMENT DEBUG ===")
-        logger.info(f"fccId: {req.fccId}")
-        logger.info(f"cbsdSerialNumber: {req.cbsdSerialNumber}")
-        logger.info(f"grantId: {req.grantId}")
-        logger.info(f"private_key: {req.private_key[:10]}...")
-        logger.info(f"============================")
-        
-        blockchain = Blockchain(req.private_key)
-        receipt = blockchain.relinquishment(req.dict(exclude={"private_key"}))
+        if isinstance(req, RelinquishmentBatchRequest):
+            return await process_batch(request, "relinquishment", req.relinquishmentRequest, req.private_key)
+        blockchain = get_signer(req.private_key)
+        logger.debug(f"Relinquishment {req.fccId}/{req.cbsdSerialNumber} grant {req.grantId} "
+                     f"pela conta {blockchain.account.address}")
+        if wants_fire_and_track(request):
+            return accepted_response(await blockchain.relinquishment(req.dict(exclude={"private_key"}), wait=False))
+        receipt = await execute_operation(blockchain, "relinquishment", req)
+        receipt_cache.resolve(receipt)
         return {
             "success": True,
             "message": f"Relinquishment executado para {req.fccId}/{req.cbsdSerialNumber} via SAS-SAS",
             "transaction_hash": receipt['transactionHash'].hex(),
             "block_number": receipt['blockNumber']
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Erro no relinquishment SAS-SAS: {e}")
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/v1.3/deregistration")
-async def deregistration(req: DeregistrationRequestWithKey):
+async def deregistration(req: Union[DeregistrationRequestWithKey, DeregistrationBatchRequest], request: Request):
     """Deregistration - Remove CBSD via SAS-SAS"""
     try:
-        # Print para debug
-        logger.info(f"=== DEREGISTRATION DEBUG ===")
-        logger.info(f"fccId: {req.fccId}")
-        logger.info(f"cbsdSerialNumber: {req.cbsdSerialNumber}")
-        logger.info(f"private_key: {req.private_key[:10]}...")
-        logger.info(f"============================")
-        
-        blockchain = Blockchain(req.private_key)
-        receipt = blockchain.deregistration(req.dict(exclude={"private_key"}))
+        if isinstance(req, DeregistrationBatchRequest):
+            return await process_batch(request, "deregistration", req.deregistrationRequest, req.private_key)
+        blockchain = get_signer(req.private_key)
+        logger.debug(f"Deregistration {req.fccId}/{req.cbsdSerialNumber} pela conta {blockchain.account.address}")
+        if wants_fire_and_track(request):
+            return accepted_response(await blockchain.deregistration(req.dict(exclude={"private_key"}), wait=False))
+        receipt = await execute_operation(blockchain, "deregistration", req)
+        receipt_cache.resolve(receipt)
         return {
             "success": True,
             "message": f"Deregistration executado para {req.fccId}/{req.cbsdSerialNumber} via SAS-SAS",
             "transaction_hash": receipt['transactionHash'].hex(),
             "block_number": receipt['blockNumber']
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Erro no deregistration SAS-SAS: {e}")
         raise HTTPException(status_code=400, detail=str(e))
 
+@app.get("/v1.3/tx/{tx_hash}")
+async def transaction_status(tx_hash: str):
+    """Status de uma transação: pending, mined ou reverted"""
+    try:
+        entry = receipt_cache.get(tx_hash)
+        if entry is None or entry["status"] == ReceiptCache.PENDING:
+            receipt = await blockchain.get_receipt("0x" + ReceiptCache.normalize(tx_hash))
+            if receipt is not None:
+                entry = receipt_cache.resolve(receipt)
+            elif entry is None:
+                raise HTTPException(status_code=404, detail=f"Transação {tx_hash} desconhecida")
+        return {
+            "transaction_hash": ReceiptCache.normalize(tx_hash),
+            **entry
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Erro ao consultar transação {tx_hash}: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+# Consultas ao estado indexado (repositório em memória, sem RPC)
+
+def indexed_block():
+    return event_indexer.last_indexed_block if event_indexer is not None else None
+
+def get_indexed_cbsd(fcc_id: str, serial_number: str) -> dict:
+    cbsd = repo.get(cbsd_key(fcc_id, serial_number))
+    if cbsd is None:
+        raise HTTPException(status_code=404, detail=f"CBSD {fcc_id}/{serial_number} não encontrado")
+    return cbsd
+
+def cbsd_json(cbsd: dict) -> dict:
+    return {
+        "fccId": cbsd["fcc_id"],
+        "cbsdSerialNumber": cbsd["serial_number"],
+        "sasOrigin": cbsd["sas_origin"],
+        "status": cbsd["status"],
+        "block_number": cbsd["block_number"],
+        "transaction_hash": cbsd["transaction_hash"],
+        "latitude": cbsd.get("latitude"),
+        "longitude": cbsd.get("longitude"),
+        "grants": len(cbsd.get("grants", []))
+    }
+
+def grant_json(grant: dict) -> dict:
+    return {
+        "grantId": grant["grant_id"],
+        "sasOrigin": grant["sas_origin"],
+        "created_at": grant["created_at"],
+        "transaction_hash": grant["transaction_hash"],
+        "terminated": grant.get("terminated", False),
+        "terminated_at": grant.get("terminated_at"),
+        "lowFrequency": grant.get("low_frequency"),
+        "highFrequency": grant.get("high_frequency"),
+        "maxEirp": grant.get("max_eirp")
+    }
+
+def page(items, offset: int, limit: int) -> tuple:
+    """Itens ``[offset, offset + limit)`` de um iterador preguiçoso e o offset da próxima página (ou None)"""
+    items = list(islice(items, offset, offset + limit + 1))
+    return items[:limit], offset + limit if len(items) > limit else None
+
+@app.get("/v1.3/cbsd/{fcc_id}/{serial_number}")
+async def get_cbsd(fcc_id: str, serial_number: str):
+    """Estado do CBSD segundo os eventos indexados"""
+    cbsd = get_indexed_cbsd(fcc_id, serial_number)
+    return dict(cbsd_json(dict(cbsd, fcc_id=fcc_id, serial_number=serial_number)), indexed_block=indexed_block())
+
+@app.get("/v1.3/cbsd/{fcc_id}/{serial_number}/grants")
+async def get_cbsd_grants(fcc_id: str, serial_number: str):
+    """Grants do CBSD segundo os eventos indexados"""
+    cbsd = get_indexed_cbsd(fcc_id, serial_number)
+    return {
+        "fccId": fcc_id,
+        "cbsdSerialNumber": serial_number,
+        "grants": [grant_json(grant) for grant in cbsd.get("grants", [])],
+        "indexed_block": indexed_block()
+    }
+
+@app.get("/v1.3/cbsd/{fcc_id}/{serial_number}/grants/{grant_id}/conflicts")
+async def get_grant_conflicts(fcc_id: str, serial_number: str, grant_id: str,
+                              radiusKm: float = Query(settings.CONFLICT_RADIUS_KM, ge=0,
+                                                      le=settings.QUERY_MAX_RADIUS_KM),
+                              offset: int = Query(0, ge=0),
+                              limit: int = Query(settings.QUERY_PAGE_SIZE, ge=1, le=settings.QUERY_MAX_PAGE_SIZE)):
+    """
+    Conflitos co-canal atuais do grant: grants ativos de outros SAS com faixa sobreposta a até ``radiusKm`` km
+
+    Calculados na hora sobre as colunas dos grants ativos do repositório (uma
+    passada vetorizada sobre os grants da vizinhança), do mais próximo ao mais
+    distante. Um grant encerrado ou sem faixa/localização não tem conflitos.
+    """
+    cbsd = get_indexed_cbsd(fcc_id, serial_number)
+    if not any(grant["grant_id"] == grant_id for grant in cbsd.get("grants", [])):
+        raise HTTPException(status_code=404, detail=f"Grant {grant_id} não encontrado em {fcc_id}/{serial_number}")
+    conflicts, next_offset = page(iter(repo.find_conflicts(cbsd_key(fcc_id, serial_number), grant_id, radiusKm)),
+                                  offset, limit)
+    return {
+        "fccId": fcc_id,
+        "cbsdSerialNumber": serial_number,
+        "grantId": grant_id,
+        "radiusKm": radiusKm,
+        "conflicts": [conflict_json(conflict) for conflict in conflicts],
+        "offset": offset,
+        "limit": limit,
+        "next_offset": next_offset,
+        "indexed_block": indexed_block()
+    }
+
+@app.get("/v1.3/cbsds")
+async def find_cbsds(sasOrigin: Optional[str] = None, fccId: Optional[str] = None, status: Optional[str] = None,
+                     offset: int = Query(0, ge=0),
+                     limit: int = Query(settings.QUERY_PAGE_SIZE, ge=1, le=settings.QUERY_MAX_PAGE_SIZE)):
+    """
+    CBSDs do índice por SAS de origem, FCC ID e/ou status, paginados
+
+    Lidos pelos índices secundários do repositório: o custo é o da página
+    (mais o ``offset``), não o do total de CBSDs. ``next_offset`` é nulo na
+    última página.
+    """
+    cbsds, next_offset = page(repo.find_cbsds(sas_origin=sasOrigin, fcc_id=fccId, status=status), offset, limit)
+    return {
+        "cbsds": [dict(cbsd_json(cbsd), cbsdKey="0x" + cbsd_id) for cbsd_id, cbsd in cbsds],
+        "offset": offset,
+        "limit": limit,
+        "next_offset": next_offset,
+        "indexed_block": indexed_block()
+    }
+
+@app.get("/v1.3/cbsds/near")
+async def find_cbsds_near(lat: float = Query(..., ge=-90, le=90), lon: float = Query(..., ge=-180, le=180),
+                          radiusKm: float = Query(..., ge=0, le=settings.QUERY_MAX_RADIUS_KM),
+                          offset: int = Query(0, ge=0),
+                          limit: int = Query(settings.QUERY_PAGE_SIZE, ge=1, le=settings.QUERY_MAX_PAGE_SIZE)):
+    """
+    CBSDs a até ``radiusKm`` km de (``lat``, ``lon``) em graus, do mais próximo ao mais distante
+
+    Lidos pelo índice espacial do repositório: só os CBSDs das células que
+    cobrem o círculo são candidatos, e as distâncias são calculadas de uma vez
+    (NumPy). Cada item traz ``distanceKm``.
+    """
+    cbsds, next_offset = page(repo.find_near(lat, lon, radiusKm), offset, limit)
+    return {
+        "cbsds": [dict(cbsd_json(cbsd), cbsdKey="0x" + cbsd_id, distanceKm=round(cbsd["distance_km"], 3))
+                  for cbsd_id, cbsd in cbsds],
+        "offset": offset,
+        "limit": limit,
+        "next_offset": next_offset,
+        "indexed_block": indexed_block()
+    }
+
+@app.get("/v1.3/cbsds/within")
+async def find_cbsds_within(minLat: float = Query(..., ge=-90, le=90), minLon: float = Query(..., ge=-180, le=180),
+                            maxLat: float = Query(..., ge=-90, le=90), maxLon: float = Query(..., ge=-180, le=180),
+                            offset: int = Query(0, ge=0),
+                            limit: int = Query(settings.QUERY_PAGE_SIZE, ge=1, le=settings.QUERY_MAX_PAGE_SIZE)):
+    """
+    CBSDs no retângulo (graus), paginados como ``/v1.3/cbsds``
+
+    ``minLon > maxLon`` indica um retângulo que cruza o antimeridiano;
+    ``minLat > maxLat`` retorna 400.
+    """
+    try:
+        cbsds = repo.find_in_box(minLat, minLon, maxLat, maxLon)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    cbsds, next_offset = page(cbsds, offset, limit)
+    return {
+        "cbsds": [dict(cbsd_json(cbsd), cbsdKey="0x" + cbsd_id) for cbsd_id, cbsd in cbsds],
+        "offset": offset,
+        "limit": limit,
+        "next_offset": next_offset,
+        "indexed_block": indexed_block()
+    }
+
+@app.get("/v1.3/grants")
+async def find_grants(state: str = "active", low: Optional[int] = Query(None, ge=0),
+                      high: Optional[int] = Query(None, ge=0), offset: int = Query(0, ge=0),
+                      limit: int = Query(settings.QUERY_PAGE_SIZE, ge=1, le=settings.QUERY_MAX_PAGE_SIZE)):
+    """
+    Grants do índice no estado ``active`` ou ``terminated``, paginados como ``/v1.3/cbsds``
+
+    Com ``low`` e ``high`` (Hz): os grants ativos cuja faixa sobrepõe
+    ``[low, high)``, pelo índice de intervalos (O(log R + k)).
+    """
+    try:
+        grants = repo.find_grants(state, low=low, high=high)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    grants, next_offset = page(grants, offset, limit)
+    return {
+        "grants": [dict(grant_json(grant), fccId=grant["fcc_id"], cbsdSerialNumber=grant["serial_number"],
+                        cbsdKey="0x" + cbsd_id) for cbsd_id, grant in grants],
+        "offset": offset,
+        "limit": limit,
+        "next_offset": next_offset,
+        "indexed_block": indexed_block()
+    }
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """Se o ``Accept-Encoding`` aceita gzip: ``gzip;q=0`` recusa, ``*`` vale para o que não foi listado"""
+    qualities = {}
+    for item in accept_encoding.split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality
+    for coding in ("gzip", "x-gzip", "*"):
+        if coding in qualities:
+            return qualities[coding] > 0
+    return False
+
+@app.get("/v1.2/fullActivityDump")
+async def full_activity_dump(request: Request):
+    """
+    Full Activity Dump do registro, gerado do índice local como NDJSON em partes
+
+    Consistente com o bloco informado em ``X-Block-Height`` (e no cabeçalho do
+    dump), mesmo com a indexação avançando durante o envio. Comprimido em gzip
+    se o cliente aceitar (``Accept-Encoding`` com ``gzip`` ou ``*`` e q > 0).
+    """
+    snapshot = repo.snapshot()
+    gzip = accepts_gzip(request.headers.get("accept-encoding", ""))
+
+    async def chunks():
+        for chunk in dump_chunks(snapshot, gzip=gzip):
+            yield chunk
+            # Devolve o loop ao indexador e às demais requisições entre as partes
+            await asyncio.sleep(0)
+
+    headers = {"X-Block-Height": str(snapshot[0]) if snapshot[0] is not None else ""}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(chunks(), media_type="application/x-ndjson", headers=headers)
+
+# Eventos do histórico de um CBSD (todos com ``cbsdKey`` indexado no primeiro tópico)
+CBSD_HISTORY_EVENTS = ('CBSDRegistered', 'CBSDDeregistered', 'GrantCreated', 'GrantTerminated')
+
+@app.get("/v1.3/cbsd/{fcc_id}/{serial_number}/history")
+async def get_cbsd_history(fcc_id: str, serial_number: str, from_block: Optional[int] = None,
+                           to_block: Optional[int] = None):
+    """
+    Histórico de eventos do CBSD direto do nó
+
+    O ``eth_getLogs`` filtra pelo tópico ``cbsdKey``: o nó devolve só os logs
+    deste CBSD, sem trazer e decodificar os eventos de todos os outros.
+    """
+    key = "0x" + cbsd_key(fcc_id, serial_number)
+    from_block = settings.INDEXER_START_BLOCK if from_block is None else from_block
+    try:
+        logs = await blockchain.get_logs(CBSD_HISTORY_EVENTS, from_block,
+                                         'latest' if to_block is None else to_block, topics=[key])
+    except Exception as e:
+        logger.error(f"Erro ao obter histórico do CBSD: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "fccId": fcc_id,
+        "cbsdSerialNumber": serial_number,
+        "cbsdKey": key,
+        "from_block": from_block,
+        "events": [record_json(record) for record in event_decoder.decode_all(logs)]
+    }
+
 # Endpoints de autorização SAS
 
 @app.get("/sas/{sas_address}/authorized")
 async def check_sas_authorization(sas_address: str):
     """Verifica se um endereço é um SAS autorizado"""
     try:
-        is_authorized = blockchain.is_authorized_sas(sas_address)
+        is_authorized = await blockchain.is_authorized_sas(sas_address)
         return {
             "sas_address": sas_address,
             "authorized": is_authorized
@@ -250,10 +705,13 @@ async def check_sas_authorization(sas_address: str):
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/sas/authorize")
-async def authorize_sas(req: SASAuthorizationWithKey):
+async def authorize_sas(req: SASAuthorizationWithKey, request: Request):
     try:
-        blockchain = Blockchain(req.private_key)
-        receipt = blockchain.authorize_sas(req.sas_address)
+        blockchain = get_signer(req.private_key)
+        if wants_fire_and_track(request):
+            return accepted_response(await blockchain.authorize_sas(req.sas_address, wait=False))
+        receipt = await blockchain.authorize_sas(req.sas_address)
+        receipt_cache.resolve(receipt)
         return {
             "success": True,
             "message": f"SAS {req.sas_address} autorizado",
@@ -265,10 +723,13 @@ async def authorize_sas(req: SASAuthorizationWithKey):
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/sas/revoke")
-async def revoke_sas(req: SASAuthorizationWithKey):
+async def revoke_sas(req: SASAuthorizationWithKey, request: Request):
     try:
-        blockchain = Blockchain(req.private_key)
-        receipt = blockchain.revoke_sas(req.sas_address)
+        blockchain = get_signer(req.private_key)
+        if wants_fire_and_track(request):
+            return accepted_response(await blockchain.revoke_sas(req.sas_address, wait=False))
+        receipt = await blockchain.revoke_sas(req.sas_address)
+        receipt_cache.resolve(receipt)
         return {
             "success": True,
             "message": f"SAS {req.sas_address} revogado",
@@ -285,99 +746,152 @@ async def revoke_sas(req: SASAuthorizationWithKey):
 async def get_stats():
     """Obtém estatísticas do contrato"""
     try:
-        owner = blockchain.get_owner()
-        latest_block = blockchain.get_latest_block()
+        owner = await blockchain.get_owner()
+        latest_block = await blockchain.get_latest_block()
         return {
             "owner": owner,
             "contract_address": blockchain.contract.address,
             "latest_block": latest_block,
-            "version": "3.0.0 (SAS-SAS)"
+            "version": "3.0.0 (SAS-SAS)",
+            "receipt_watcher": receipt_watcher.get_stats() if receipt_watcher else None,
+            "gas_policy": blockchain.gas_policy.get_stats(),
+            "micro_batcher": micro_batcher.get_stats() if micro_batcher else None,
+            "event_indexer": event_indexer.get_stats() if event_indexer else None,
+            "event_stream": event_broadcaster.get_stats() if event_broadcaster else None,
+            "conflicts": conflict_monitor.get_stats() if conflict_monitor else None,
+            "conflict_stream": conflict_broadcaster.get_stats() if conflict_broadcaster else None,
+            "rpc_provider": blockchain.web3.provider.get_stats() if hasattr(blockchain.web3.provider, "get_stats") else None
         }
     except Exception as e:
         logger.error(f"Erro ao obter estatísticas: {e}")
         raise HTTPException(status_code=400, detail=str(e))
 
+# Eventos listados em /events/recent e janela de blocos consultada
+RECENT_EVENTS = ('CBSDRegistered', 'CBSDDeregistered', 'GrantCreated', 'GrantTerminated', 'SASAuthorized',
+                 'SASRevoked')
+RECENT_EVENTS_BLOCKS = 10
+# Última resposta de /events/recent, válida enquanto o bloco mais recente não mudar
+recent_events_cache = {"block": None, "checked_at": 0.0, "response": None}
+recent_events_lock = asyncio.Lock()
+# Decodificadores (tópico 0 -> registro) dos eventos de /events/recent, montados uma vez
+event_decoder = EventDecoder(records=[record for record in RECORD_TYPES if record.__name__ in RECENT_EVENTS])
+
+def build_recent_events(logs) -> dict:
+    """Decodifica os logs de /events/recent (mais recentes primeiro, até 50)"""
+    events = []
+    for record in event_decoder.decode_all(logs):
+        event_data = record_json(record)
+        if "fccId" in event_data:
+            # Eventos SAS-SAS: mantém o campo timestamp (número do bloco)
+            event_data["timestamp"] = record.block_number
+        events.append(event_data)
+
+    # Ordenar por bloco
+    events.sort(key=lambda x: x['block_number'], reverse=True)
+
+    return {
+        "events": events[:50],  # Limitar a 50 eventos
+        "total": len(events)
+    }
+
 @app.get("/events/recent")
 async def get_recent_events():
-    """Obtém eventos recentes do contrato"""
+    """
+    Obtém eventos recentes do contrato
+
+    Um único ``eth_getLogs`` (OR dos tópicos dos eventos) sobre os últimos
+    blocos, sem instalar filtros no nó. A resposta fica em cache pelo número
+    do bloco mais recente, consultado no máximo a cada
+    ``RECENT_EVENTS_BLOCK_TTL``: polls repetidos dentro desse intervalo não
+    fazem chamadas RPC.
+    """
     try:
-        # Obter eventos dos últimos 10 blocos
-        from_block = blockchain.get_latest_block() - 10
-        
-        events = []
-        
-        # Eventos SAS-SAS (têm sasOrigin, grantId, registrationTimestamp/grantTimestamp)
-        for event_name in ['CBSDRegistered', 'GrantCreated', 'GrantTerminated']:
-            try:
-                event_filter = blockchain.get_event_filter(event_name, from_block)
-                event_entries = event_filter.get_all_entries()
-
-                for event in event_entries:
-                    try:
-                        decoded_logs = blockchain.contract.events[event_name].process_log(event)
-                        event_data = {
-                            "event": event_name,
-                            "block_number": int(event['blockNumber']),
-                            "transaction_hash": event['transactionHash'].hex() if isinstance(event['transactionHash'], bytes) else str(event['transactionHash']),
-                        }
-                        # Campos específicos por evento
-                        if event_name == 'CBSDRegistered':
-                            event_data["sasOrigin"] = str(decoded_logs['args']['sasOrigin'])
-                            event_data["fccId"] = str(decoded_logs['args']['fccId'])
-                            event_data["serialNumber"] = str(decoded_logs['args']['serialNumber'])
-                            event_data["timestamp"] = int(event['blockNumber'])
-                        elif event_name == 'GrantCreated':
-                            event_data["sasOrigin"] = str(decoded_logs['args']['sasOrigin'])
-                            event_data["fccId"] = str(decoded_logs['args']['fccId'])
-                            event_data["serialNumber"] = str(decoded_logs['args']['serialNumber'])
-                            event_data["grantId"] = str(decoded_logs['args']['grantId'])
-                            event_data["timestamp"] = int(event['blockNumber'])
-                        elif event_name == 'GrantTerminated':
-                            event_data["sasOrigin"] = str(decoded_logs['args']['sasOrigin'])
-                            event_data["fccId"] = str(decoded_logs['args']['fccId'])
-                            event_data["serialNumber"] = str(decoded_logs['args']['serialNumber'])
-                            event_data["grantId"] = str(decoded_logs['args']['grantId'])
-                            event_data["timestamp"] = int(event['blockNumber'])
-                        events.append(event_data)
-                    except Exception as decode_error:
-                        logger.warning(f"Erro ao decodificar evento {event_name}: {decode_error}")
-                        continue
-            except Exception as e:
-                logger.warning(f"Erro ao obter eventos {event_name}: {e}")
-        
-        # Eventos de autorização SAS (têm apenas sas)
-        for event_name in ['SASAuthorized', 'SASRevoked']:
-            try:
-                event_filter = blockchain.get_event_filter(event_name, from_block)
-                event_entries = event_filter.get_all_entries()
-                
-                for event in event_entries:
-                    try:
-                        # Decodificar os logs do evento
-                        decoded_logs = blockchain.contract.events[event_name].process_log(event)
-                        events.append({
-                            "event": event_name,
-                            "block_number": int(event['blockNumber']),
-                            "transaction_hash": event['transactionHash'].hex() if isinstance(event['transactionHash'], bytes) else str(event['transactionHash']),
-                            "sas": decoded_logs['args']['sas']
-                        })
-                    except Exception as decode_error:
-                        logger.warning(f"Erro ao decodificar evento {event_name}: {decode_error}")
-                        continue
-                        
-            except Exception as e:
-                logger.warning(f"Erro ao obter eventos {event_name}: {e}")
-        
-        # Ordenar por bloco
-        events.sort(key=lambda x: x['block_number'], reverse=True)
-        
-        return {
-            "events": events[:50],  # Limitar a 50 eventos
-            "total": len(events)
-        }
+        async with recent_events_lock:
+            now = time.monotonic()
+            cache = recent_events_cache
+            if cache["response"] is not None and now - cache["checked_at"] < settings.RECENT_EVENTS_BLOCK_TTL:
+                return cache["response"]
+            latest_block = await blockchain.get_latest_block()
+            if cache["response"] is None or latest_block != cache["block"]:
+                logs = await blockchain.get_logs(RECENT_EVENTS, max(latest_block - RECENT_EVENTS_BLOCKS, 0), latest_block)
+                cache["response"] = build_recent_events(logs)
+                cache["block"] = latest_block
+            cache["checked_at"] = now
+            return cache["response"]
     except Exception as e:
         logger.error(f"Erro ao obter eventos recentes: {e}")
         raise HTTPException(status_code=400, detail=str(e))
 
+async def stream_backfill(from_block: int, to_block: int):
+    """Eventos anteriores ao histórico do stream, buscados no nó uma faixa de INDEXER_CHUNK_SIZE blocos por vez"""
+    for start in range(from_block, to_block + 1, settings.INDEXER_CHUNK_SIZE):
+        end = min(to_block, start + settings.INDEXER_CHUNK_SIZE - 1)
+        logs = await blockchain.get_logs(EventIndexer.EVENTS, start, end)
+        yield event_indexer.decoder.decode_all(logs)
+
+@app.get("/events/stream")
+async def stream_events(request: Request, types: Optional[str] = None, sasOrigin: Optional[str] = None,
+                        from_block: Optional[int] = None):
+    """
+    Stream (Server-Sent Events) dos eventos do registro à medida que são indexados
+
+    - ``types``: nomes de eventos separados por vírgula (ex.: ``GrantCreated,GrantTerminated``)
+    - ``sasOrigin``: somente eventos desse SAS
+    - ``from_block`` ou o cabeçalho ``Last-Event-ID`` (``bloco-logIndex``): retoma a
+      partir do cursor, sem perder eventos entre conexões
+    """
+    if event_broadcaster is None:
+        raise HTTPException(status_code=503, detail="Indexador de eventos desabilitado")
+    event_types = [t.strip() for t in types.split(",") if t.strip()] if types else None
+    unknown = set(event_types or []) - set(EventIndexer.EVENTS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Eventos desconhecidos: {', '.join(sorted(unknown))}")
+    return stream_response(event_broadcaster, request, event_types, sasOrigin, from_block)
+
+@app.get("/v1.3/conflicts/stream")
+async def stream_conflicts(request: Request, sasOrigin: Optional[str] = None, from_block: Optional[int] = None):
+    """
+    Stream (Server-Sent Events) dos conflitos co-canal dos grants criados, à medida que são indexados
+
+    Um evento ``GrantConflicts`` por GrantCreated com conflitos (mesmo cursor
+    ``bloco-logIndex`` do GrantCreated): o grant criado, ``conflictCount`` e os
+    ``CONFLICT_MAX_REPORTED`` grants conflitantes mais próximos.
+
+    - ``sasOrigin``: somente conflitos de grants criados por esse SAS
+    - ``from_block`` ou ``Last-Event-ID``: retoma a partir do cursor, dentro do
+      histórico em memória do stream
+    """
+    if conflict_broadcaster is None:
+        raise HTTPException(status_code=503, detail="Indexador de eventos desabilitado")
+    return stream_response(conflict_broadcaster, request, None, sasOrigin, from_block)
+
+def stream_response(broadcaster: EventBroadcaster, request: Request, event_types: Optional[List[str]],
+                    sas_origin: Optional[str], from_block: Optional[int]) -> StreamingResponse:
+    """
+    Resposta SSE de um assinante do ``broadcaster``, retomando do ``Last-Event-ID`` ou de ``from_block``
+
+    O assinante é registrado antes da resposta: acima do limite de assinantes
+    a resposta é 503 e um cursor além de ``STREAM_MAX_BACKFILL_BLOCKS`` é 410.
+    """
+    last_event_id = request.headers.get("last-event-id")
+    try:
+        after = parse_cursor(last_event_id) if last_event_id else (from_block, -1) if from_block is not None else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Cursor inválido: {last_event_id}")
+    subscription = Subscription(event_types, sas_origin, after)
+    try:
+        replay = broadcaster.subscribe(subscription)
+    except OverflowError:
+        raise HTTPException(status_code=503, detail="Limite de assinantes do stream atingido")
+    except CursorExpired as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    return StreamingResponse(
+        broadcaster.events(subscription, replay=replay),
+        media_type="text/event-stream",
+        # Libera a vaga mesmo se o corpo não chegar a ser iterado (cliente desconectado antes)
+        background=BackgroundTask(broadcaster.unsubscribe, subscription),
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
@@ -0,0 +1,380 @@
+from hexbytes import HexBytes
+from web3 import AsyncWeb3
+from web3.exceptions import ContractLogicError, TransactionNotFound
+from config.settings import settings
+from .blockchain import (
+    load_contract_abi, registration_args, grant_args, batch_args, batch_item_results, event_topics, logs_filter
+)
+from .nonce_manager import NonceManager
+from .gas_policy import GasPolicy
+from .batching_provider import BatchingHTTPProvider
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+class AsyncBlockchain:
+    """
+    Variante assíncrona do cliente Blockchain (AsyncWeb3)
+
+    Envio, espera de recibo e chamadas view são aguardados sem bloquear o
+    event loop, permitindo que um único worker do uvicorn mantenha várias
+    transações em andamento ao mesmo tempo.
+    """
+
+    def __init__(self, private_key=None, web3=None, contract=None, receipt_watcher=None, gas_policy=None):
+        self.web3 = web3 or self.create_web3()
+        # Watcher compartilhado de recibos (sem ele, cada espera faz seu próprio polling)
+        self.receipt_watcher = receipt_watcher
+        # Gas price por bloco e gas limits aprendidos (compartilhada pelo SignerPool)
+        self.gas_policy = gas_policy or GasPolicy(self.web3, receipt_watcher)
+
+        # Configurar conta (com provider compartilhado a conta é sempre explícita)
+        key = private_key or settings.OWNER_PRIVATE_KEY
+        self.account = self.web3.eth.account.from_key(key)
+
+        # Inicializar NonceManager
+        self.nonce_manager = NonceManager(self.web3, self.account.address, self.account.key, receipt_watcher)
+
+        # Instanciar contrato
+        self.contract = contract or self.web3.eth.contract(
+            address=settings.CONTRACT_ADDRESS,
+            abi=load_contract_abi()
+        )
+
+    @staticmethod
+    def create_web3():
+        """
+        Cria o provider HTTP assíncrono (a conexão é verificada com ``is_connected``)
+
+        Com ``RPC_BATCHING`` as chamadas concorrentes saem agrupadas em batches
+        JSON-RPC (BatchingHTTPProvider).
+        """
+        if settings.RPC_BATCHING:
+            return AsyncWeb3(BatchingHTTPProvider(settings.RPC_URL))
+        return AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(settings.RPC_URL))
+
+    async def is_connected(self):
+        """Verifica a conexão com o Besu"""
+        return await self.web3.is_connected()
+
+    async def get_event_filter(self, event_name, from_block='latest'):
+        """Cria filtro para eventos do contrato"""
+        try:
+            filter_params = {
+                'address': self.contract.address,
+                'topics': [event_topics()[event_name].to_0x_hex()],
+                'fromBlock': from_block
+            }
+            return await self.web3.eth.filter(filter_params)
+        except KeyError:
+            logger.error(f"Evento {event_name} não encontrado no contrato")
+            raise
+        except Exception as e:
+            logger.error(f"Erro ao criar filtro para evento {event_name}: {e}")
+            raise
+
+    async def get_logs(self, event_names, from_block, to_block='latest', topics=()):
+        """Logs de vários eventos numa única chamada eth_getLogs, sem instalar filtro no nó"""
+        return await self.web3.eth.get_logs(logs_filter(self.contract, event_names, from_block, to_block, topics))
+
+    async def get_latest_block(self):
+        """Retorna o número do último bloco"""
+        return await self.web3.eth.block_number
+
+    async def get_gas_price(self):
+        """Obtém o preço do gas atual (cacheado por bloco)"""
+        return await self.gas_policy.gas_price()
+
+    async def estimate_gas(self, function_call):
+        """Estima o gas necessário para uma transação"""
+        try:
+            return await function_call.estimate_gas({'from': self.account.address})
+        except ContractLogicError as e:
+            logger.error(f"Erro ao estimar gas: {e}")
+            raise
+
+    async def get_nonce(self):
+        """Obtém o nonce atual da conta"""
+        return await self.web3.eth.get_transaction_count(self.account.address)
+
+    async def build_transaction(self, function_call, gas_limit=None, nonce=None):
+        """Constrói uma transação para Besu (sem ``nonce``, consulta a rede)"""
+        gas_price = await self.get_gas_price()
+        if nonce is None:
+            nonce = await self.get_nonce()
+
+        tx_params = {
+            'from': self.account.address,
+            'gasPrice': gas_price,
+            'nonce': nonce,
+            'chainId': settings.CHAIN_ID
+        }
+
+        tx_params['gas'] = gas_limit or await self.gas_policy.gas_limit(function_call, self.account.address)
+
+        return await function_call.build_transaction(tx_params)
+
+    async def submit_transaction(self, function_call, gas_limit=None):
+        """
+        Assina e envia a transação sem aguardar mineração; retorna o hash
+
+        O nonce é alocado localmente pelo NonceManager, então várias
+        transações da mesma conta podem estar em andamento ao mesmo tempo.
+        """
+        async def send(nonce):
+            tx = await self.build_transaction(function_call, gas_limit, nonce)
+            signed_tx = self.web3.eth.account.sign_transaction(tx, self.account.key)
+            return await self.web3.eth.send_raw_transaction(signed_tx.raw_transaction)
+
+        return await self.nonce_manager.send_with_nonce(send)
+
+    async def wait_for_receipt(self, tx_hash, timeout=120):
+        """Aguarda o recibo da transação sem bloquear o event loop"""
+        if self.receipt_watcher is not None:
+            return await self.receipt_watcher.wait(tx_hash, timeout=timeout)
+        return await self.web3.eth.wait_for_transaction_receipt(tx_hash, timeout=timeout)
+
+    async def get_receipt(self, tx_hash):
+        """Consulta o recibo uma única vez; retorna None se ainda não minerado"""
+        try:
+            return await self.web3.eth.get_transaction_receipt(tx_hash)
+        except TransactionNotFound:
+            return None
+
+    async def send_transaction(self, function_call, gas_limit=None, wait=True):
+        """
+        Envia uma transação e aguarda o recibo
+
+        Com ``wait=False`` retorna o hash logo após ``send_raw_transaction``
+        (modo fire-and-track), sem aguardar a mineração.
+
+        O gas limit vem da GasPolicy; se a transação reverter por falta de gas
+        (e o limite não foi passado explicitamente) ela é reestimada e
+        reenviada uma vez.
+        """
+        try:
+            explicit_gas = gas_limit is not None
+            if not explicit_gas:
+                gas_limit = await self.gas_policy.gas_limit(function_call, self.account.address)
+            tx_hash = await self.submit_transaction(function_call, gas_limit)
+            if not wait:
+                logger.info(f"Transação submetida: {tx_hash.hex()}")
+                return tx_hash
+            receipt = await self.wait_for_receipt(tx_hash)
+            if not explicit_gas and GasPolicy.is_out_of_gas(receipt, gas_limit):
+                gas_limit = await self.gas_policy.on_out_of_gas(function_call, self.account.address)
+                tx_hash = await self.submit_transaction(function_call, gas_limit)
+                receipt = await self.wait_for_receipt(tx_hash)
+            self.gas_policy.observe(function_call, receipt)
+            logger.info(f"Transação enviada: {tx_hash.hex()}")
+            return receipt
+        except Exception as e:
+            logger.error(f"Erro ao enviar transação: {e}")
+            raise
+
+    def build_call(self, operation: str, data: dict):
+        """Monta a chamada de contrato de uma operação SAS-SAS a partir do payload"""
+        functions = self.contract.functions
+        if operation == "registration":
+            return functions.registration(registration_args(data))
+        if operation == "grant":
+            return functions.grant(grant_args(data))
+        if operation == "relinquishment":
+            return functions.relinquishment(data["fccId"], data["cbsdSerialNumber"], data["grantId"])
+        if operation == "deregistration":
+            return functions.deregistration(data["fccId"], data["cbsdSerialNumber"])
+        raise ValueError(f"Operação desconhecida: {operation}")
+
+    async def send_batch(self, function_calls, wait=True):
+        """
+        Envia várias transações da conta de uma vez
+
+        Os nonces são alocados juntos (faixa consecutiva), as transações são
+        assinadas localmente e submetidas num único batch JSON-RPC de
+        ``eth_sendRawTransaction``. Retorna, na mesma ordem, um dict por item
+        com ``tx_hash``, ``receipt`` (None com ``wait=False``) e ``error``.
+
+        Um item rejeitado pelo nó devolve o nonce e é reenviado uma vez pelo
+        caminho individual, que preenche a lacuna para não travar os demais.
+        """
+        gas_limits = [await self.gas_policy.gas_limit(call, self.account.address) for call in function_calls]
+        nonces = await self.nonce_manager.get_nonces(len(function_calls))
+        results = [{"tx_hash": None, "receipt": None, "error": None} for _ in function_calls]
+
+        raws = []
+        for call, gas_limit, nonce in zip(function_calls, gas_limits, nonces):
+            tx = await self.build_transaction(call, gas_limit, nonce)
+            raws.append(self.web3.eth.account.sign_transaction(tx, self.account.key).raw_transaction)
+
+        responses = await self.web3.provider.make_batch_request(
+            [("eth_sendRawTransaction", [raw.to_0x_hex()]) for raw in raws]
+        )
+        retry = []
+        for index, response in enumerate(responses):
+            if "error" in response:
+                logger.warning(f"Item {index} do lote rejeitado (nonce {nonces[index]}): {response['error']}")
+                await self.nonce_manager.release_nonce(nonces[index])
+                retry.append(index)
+            else:
+                results[index]["tx_hash"] = HexBytes(response["result"])
+        if any(NonceManager.is_nonce_error(responses[i]["error"]) for i in retry):
+            await self.nonce_manager.reset_nonce()
+        for index in retry:
+            try:
+                results[index]["tx_hash"] = await self.submit_transaction(function_calls[index], gas_limits[index])
+            except Exception as e:
+                results[index]["error"] = str(e)
+
+        if wait:
+            async def wait_item(index):
+                try:
+                    receipt = await self.wait_for_receipt(results[index]["tx_hash"])
+                    self.gas_policy.observe(function_calls[index], receipt)
+                    results[index]["receipt"] = receipt
+                except Exception as e:
+                    results[index]["error"] = str(e)
+            await asyncio.gather(*[wait_item(i) for i, r in enumerate(results) if r["tx_hash"] is not None])
+
+        logger.info(f"Lote de {len(function_calls)} transações enviado ({len(retry)} reenviadas)")
+        return results
+
+    async def send_transaction_with_nonce_manager(self, function_call, gas_limit=None):
+        """Envia uma transação usando NonceManager para evitar conflitos"""
+        try:
+            receipt = await self.nonce_manager.send_transaction_with_retry(function_call)
+            logger.info(f"Transação enviada com NonceManager: {receipt['transactionHash'].hex()}")
+            return receipt
+        except Exception as e:
+            logger.error(f"Erro ao enviar transação com NonceManager: {e}")
+            raise
+
+    async def call_function(self, function_call):
+        """Executa uma chamada de função (view/pure)"""
+        try:
+            return await function_call.call({'from': self.account.address})
+        except ContractLogicError as e:
+            logger.error(f"Erro na chamada da função: {e}")
+            raise
+
+    # Funções SAS-SAS
+    async def registration(self, data: dict, wait=True):
+        """Executa operação SAS-SAS Registration (struct RegistrationRequest)"""
+        try:
+            tx = self.contract.functions.registration(registration_args(data))
+            return await self.send_transaction(tx, wait=wait)
+        except Exception as e:
+            logger.error(f"Erro na operação registration: {e}")
+            raise
+
+    async def grant(self, data: dict, wait=True):
+        """Executa operação SAS-SAS Grant (struct GrantRequest)"""
+        try:
+            tx = self.contract.functions.grant(grant_args(data))
+            return await self.send_transaction(tx, wait=wait)
+        except Exception as e:
+            logger.error(f"Erro na operação grant: {e}")
+            raise
+
+    async def relinquishment(self, data: dict, wait=True):
+        """Executa operação SAS-SAS Relinquishment"""
+        try:
+            tx = self.contract.functions.relinquishment(
+                data["fccId"], data["cbsdSerialNumber"], data["grantId"]
+            )
+            return await self.send_transaction(tx, wait=wait)
+        except Exception as e:
+            logger.error(f"Erro na operação relinquishment: {e}")
+            raise
+
+    async def deregistration(self, data: dict, wait=True):
+        """Executa operação SAS-SAS Deregistration"""
+        try:
+            tx = self.contract.functions.deregistration(
+                data["fccId"], data["cbsdSerialNumber"]
+            )
+            return await self.send_transaction(tx, wait=wait)
+        except Exception as e:
+            logger.error(f"Erro na operação deregistration: {e}")
+            raise
+
+    # Lotes on-chain: uma transação para vários itens (registrationBatch, grantBatch, ...)
+    async def send_onchain_batch(self, operation: str, items: list, wait=True):
+        """
+        Executa ``<operação>Batch`` e retorna o recibo e o status por item
+
+        O gas de um lote cresce com o número de itens, então o limite vem de
+        uma estimativa por lote (e não do limite aprendido por seletor). Com
+        ``wait=False`` retorna apenas o hash.
+        """
+        try:
+            tx = getattr(self.contract.functions, f"{operation}Batch")(batch_args(operation, items))
+            try:
+                gas_limit = int(await self.estimate_gas(tx) * self.gas_policy.margin)
+            except Exception:
+                gas_limit = settings.GAS_LIMIT
+            result = await self.send_transaction(tx, gas_limit=gas_limit, wait=wait)
+            if not wait:
+                return result
+            return {"receipt": result, "results": batch_item_results(self.contract, result, len(items))}
+        except Exception as e:
+            logger.error(f"Erro no lote {operation} ({len(items)} itens): {e}")
+            raise
+
+    async def registration_batch(self, items: list, wait=True):
+        """Registration de vários CBSDs numa única transação"""
+        return await self.send_onchain_batch("registration", items, wait)
+
+    async def grant_batch(self, items: list, wait=True):
+        """Grant de vários CBSDs numa única transação"""
+        return await self.send_onchain_batch("grant", items, wait)
+
+    async def relinquishment_batch(self, items: list, wait=True):
+        """Relinquishment de vários grants numa única transação"""
+        return await self.send_onchain_batch("relinquishment", items, wait)
+
+    async def deregistration_batch(self, items: list, wait=True):
+        """Deregistration de vários CBSDs numa única transação"""
+        return await self.send_onchain_batch("deregistration", items, wait)
+
+    # Funções de autorização SAS
+    async def authorize_sas(self, sas_address: str, wait=True):
+        """Autoriza um endereço como SAS"""
+        try:
+            address = self.web3.to_checksum_address(sas_address)
+            tx = self.contract.functions.authorizeSAS(address)
+            return await self.send_transaction(tx, wait=wait)
+        except Exception as e:
+            logger.error(f"Erro ao autorizar SAS {sas_address}: {e}")
+            raise
+
+    async def revoke_sas(self, sas_address: str, wait=True):
+        """Revoga autorização de um SAS"""
+        try:
+            address = self.web3.to_checksum_address(sas_address)
+            tx = self.contract.functions.revokeSAS(address)
+            return await self.send_transaction(tx, wait=wait)
+        except Exception as e:
+            logger.error(f"Erro ao revogar SAS {sas_address}: {e}")
+            raise
+
+    async def is_authorized_sas(self, sas_address: str):
+        """Verifica se um endereço é um SAS autorizado"""
+        try:
+            address = self.web3.to_checksum_address(sas_address)
+            return await self.contract.functions.authorizedSAS(address).call()
+        except Exception as e:
+            logger.error(f"Erro ao verificar SAS {sas_address}: {e}")
+            raise
+
+    async def get_owner(self):
+        """Obtém o endereço do owner do contrato"""
+        try:
+            return await self.contract.functions.owner().call()
+        except Exception as e:
+            logger.error(f"Erro ao obter owner: {e}")
+            raise
+
+    def get_nonce_manager_stats(self):
+        """Obtém estatísticas do NonceManager para debug"""
+        return self.nonce_manager.get_stats()
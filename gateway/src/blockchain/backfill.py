@@ -0,0 +1,175 @@
+import asyncio
+import heapq
+import inspect
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Trechos das mensagens de erro com que os nós recusam faixas grandes demais
+# (Besu/Geth: "query returned more than 10000 results", limites de faixa ou
+# de tamanho de resposta de provedores)
+TOO_LARGE_ERRORS = ("more than", "too many", "too large", "limit exceeded", "exceeds", "response size",
+                    "block range")
+
+def is_too_large(error: Exception) -> bool:
+    """Erro do nó indicando que a faixa de blocos tem logs demais para uma resposta"""
+    if isinstance(error, asyncio.TimeoutError):
+        return True
+    message = str(error).lower()
+    return any(pattern in message for pattern in TOO_LARGE_ERRORS)
+
+class Backfill:
+    """
+    Busca paralela de logs de uma faixa de blocos, aplicada em ordem
+
+    Divide ``[from_block, to_block]`` em faixas buscadas por até
+    ``INDEXER_BACKFILL_WORKERS`` chamadas concorrentes de ``fetch`` (ex.:
+    ``eth_getLogs`` + decodificação). O tamanho da faixa se adapta:
+
+    - resposta recusada por ser grande demais (ou timeout): a faixa é dividida
+      ao meio e o tamanho cai pela metade
+    - resposta com mais de ``INDEXER_TARGET_LOGS`` logs: o tamanho cai pela metade
+    - resposta esparsa (menos de 1/4 do alvo): o tamanho dobra, até
+      ``INDEXER_MAX_CHUNK_SIZE``
+
+    Os resultados são entregues a ``apply(registros, último bloco)`` (função ou
+    corrotina) estritamente na ordem dos blocos; faixas que chegam adiantadas esperam num buffer
+    limitado (no máximo ``4 * workers`` faixas em voo ou aguardando).
+    """
+
+    def __init__(self, fetch: Callable[[int, int], Awaitable[List]], workers: Optional[int] = None,
+                 chunk_size: Optional[int] = None, max_chunk_size: Optional[int] = None,
+                 target_logs: Optional[int] = None, progress_interval: Optional[float] = None,
+                 max_retries: int = 3):
+        self.fetch = fetch
+        self.workers = workers or settings.INDEXER_BACKFILL_WORKERS
+        self.max_chunk_size = max_chunk_size or settings.INDEXER_MAX_CHUNK_SIZE
+        self.chunk_size = min(chunk_size or settings.INDEXER_CHUNK_SIZE, self.max_chunk_size)
+        self.target_logs = target_logs or settings.INDEXER_TARGET_LOGS
+        self.progress_interval = progress_interval or settings.INDEXER_PROGRESS_INTERVAL
+        self.max_retries = max_retries
+        self.requests = 0
+        self.splits = 0
+        self.retries = 0
+        self.blocks = 0
+        self.logs = 0
+        self.elapsed = 0.0
+        self._target: Optional[Tuple[int, int]] = None
+        self._applied_to: Optional[int] = None
+
+    async def run(self, from_block: int, to_block: int, apply: Callable[[List, int], Any]) -> int:
+        """Busca e aplica ``[from_block, to_block]``; retorna o último bloco aplicado"""
+        if from_block > to_block:
+            return from_block - 1
+        self._target = (from_block, to_block)
+        self._applied_to = from_block - 1
+        next_start = from_block
+        # Faixas divididas após erro, buscadas antes das novas (menor bloco primeiro)
+        retry: List[Tuple[int, int, int]] = []
+        results: Dict[int, Tuple[int, List]] = {}
+        in_flight: Dict[asyncio.Task, Tuple[int, int, int]] = {}
+        max_pending = self.workers * 4
+        started = time.monotonic()
+        last_report = started
+        try:
+            while True:
+                while len(in_flight) < self.workers:
+                    if retry:
+                        start, end, attempt = heapq.heappop(retry)
+                    elif next_start <= to_block and len(in_flight) + len(results) < max_pending:
+                        start, end, attempt = next_start, min(to_block, next_start + self.chunk_size - 1), 0
+                        next_start = end + 1
+                    else:
+                        break
+                    in_flight[asyncio.ensure_future(self._fetch(start, end, attempt))] = (start, end, attempt)
+                    self.requests += 1
+                if not in_flight:
+                    break
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    start, end, attempt = in_flight.pop(task)
+                    try:
+                        records = task.result()
+                    except Exception as e:
+                        self._failed(e, start, end, attempt, retry)
+                        continue
+                    results[start] = (end, records)
+                    self._adapt(end - start + 1, len(records))
+                applied = self._applied_to + 1
+                while applied in results:
+                    end, records = results.pop(applied)
+                    result = apply(records, end)
+                    if inspect.isawaitable(result):
+                        # Buscas em voo continuam enquanto a faixa é aplicada
+                        await result
+                    self.blocks += end - applied + 1
+                    self.logs += len(records)
+                    self._applied_to = end
+                    applied = end + 1
+                now = time.monotonic()
+                self.elapsed += now - started
+                started = now
+                if now - last_report >= self.progress_interval:
+                    last_report = now
+                    self._report()
+        finally:
+            for task in in_flight:
+                task.cancel()
+        return self._applied_to
+
+    async def _fetch(self, start: int, end: int, attempt: int) -> List:
+        if attempt:
+            await asyncio.sleep(0.5 * attempt)
+        return await self.fetch(start, end)
+
+    def _failed(self, error: Exception, start: int, end: int, attempt: int, retry: list):
+        if is_too_large(error) and end > start:
+            middle = (start + end) // 2
+            heapq.heappush(retry, (start, middle, 0))
+            heapq.heappush(retry, (middle + 1, end, 0))
+            self.chunk_size = max(1, min(self.chunk_size, end - start + 1) // 2)
+            self.splits += 1
+            logger.info(f"Faixa {start}-{end} grande demais para o nó, dividida (faixas de {self.chunk_size} blocos)")
+            return
+        if attempt >= self.max_retries:
+            raise error
+        self.retries += 1
+        logger.warning(f"Erro ao buscar logs dos blocos {start}-{end} (tentativa {attempt + 1}): {error}")
+        heapq.heappush(retry, (start, end, attempt + 1))
+
+    def _adapt(self, size: int, count: int):
+        if count > self.target_logs:
+            self.chunk_size = max(1, min(self.chunk_size, size) // 2)
+        elif count < self.target_logs // 4 and size >= self.chunk_size:
+            self.chunk_size = min(self.max_chunk_size, self.chunk_size * 2)
+
+    def _report(self):
+        stats = self.get_stats()
+        logger.info(f"Backfill: bloco {stats['applied_to']} de {stats['to_block']} ({stats['progress']:.1%}), "
+                    f"{stats['blocks_per_s']:.0f} blocos/s, {stats['logs_per_s']:.0f} logs/s, "
+                    f"faixas de {self.chunk_size} blocos")
+
+    def get_stats(self) -> dict:
+        """Progresso e vazão do backfill para debug"""
+        from_block, to_block = self._target or (None, None)
+        progress = None
+        if self._target is not None:
+            progress = (self._applied_to - from_block + 1) / (to_block - from_block + 1)
+        return {
+            "from_block": from_block,
+            "to_block": to_block,
+            "applied_to": self._applied_to,
+            "progress": progress,
+            "chunk_size": self.chunk_size,
+            "workers": self.workers,
+            "requests": self.requests,
+            "splits": self.splits,
+            "retries": self.retries,
+            "blocks": self.blocks,
+            "logs": self.logs,
+            "blocks_per_s": self.blocks / self.elapsed if self.elapsed else 0.0,
+            "logs_per_s": self.logs / self.elapsed if self.elapsed else 0.0
+        }
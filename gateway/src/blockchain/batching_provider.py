@@ -0,0 +1,102 @@
+import asyncio
+import logging
+from typing import Any, List, Optional, Tuple
+from web3 import AsyncHTTPProvider
+from web3.types import RPCEndpoint, RPCResponse
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+class BatchingHTTPProvider(AsyncHTTPProvider):
+    """
+    AsyncHTTPProvider que agrupa chamadas RPC concorrentes em batches JSON-RPC
+
+    O provider padrão faz um POST por método (``eth_gasPrice``,
+    ``eth_getTransactionCount``, ``eth_sendRawTransaction``,
+    ``eth_getTransactionReceipt``...). Aqui cada ``make_request`` entra numa fila
+    que é enviada como um único array JSON-RPC:
+
+    - ``window_ms=0`` (padrão): no próximo ciclo do event loop, agrupando tudo o
+      que foi disparado no mesmo ciclo (ex.: um ``asyncio.gather`` de envios)
+      sem acrescentar latência
+    - ``window_ms>0``: após a janela, para agrupar também chamadas espaçadas
+
+    Cada chamador recebe a sua própria resposta (o batch é ordenado por id).
+    Uma chamada isolada segue como requisição simples.
+    """
+
+    # Limite de itens por POST (Besu: --rpc-http-max-batch-size, padrão 1024)
+    MAX_BATCH_SIZE = 1000
+
+    def __init__(self, endpoint_uri: Optional[str] = None, window_ms: Optional[float] = None, **kwargs):
+        super().__init__(endpoint_uri, **kwargs)
+        self.window = (settings.RPC_BATCH_WINDOW_MS if window_ms is None else window_ms) / 1000
+        self._pending: List[Tuple[RPCEndpoint, Any, asyncio.Future]] = []
+        self._scheduled = False
+        self._tasks: set = set()
+        self.calls = 0
+        self.posts = 0
+        self.batches = 0
+
+    async def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((method, params, future))
+        self.calls += 1
+        if not self._scheduled:
+            self._scheduled = True
+            if self.window > 0:
+                loop.call_later(self.window, self._flush)
+            else:
+                loop.call_soon(self._flush)
+        return await future
+
+    def _flush(self):
+        self._scheduled = False
+        pending, self._pending = self._pending, []
+        loop = asyncio.get_running_loop()
+        for start in range(0, len(pending), self.MAX_BATCH_SIZE):
+            task = loop.create_task(self._send(pending[start:start + self.MAX_BATCH_SIZE]))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, chunk: List[Tuple[RPCEndpoint, Any, asyncio.Future]]):
+        self.posts += 1
+        try:
+            if len(chunk) == 1:
+                method, params, _ = chunk[0]
+                responses = [await super().make_request(method, params)]
+            else:
+                self.batches += 1
+                responses = await super().make_batch_request([(method, params) for method, params, _ in chunk])
+                if not isinstance(responses, list):
+                    # Erro no batch inteiro: o nó devolve um único objeto de erro
+                    responses = [responses] * len(chunk)
+        except Exception as e:
+            logger.warning(f"Erro no batch JSON-RPC ({len(chunk)} chamadas): {e}")
+            for _, _, future in chunk:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, _, future), response in zip(chunk, responses):
+            if not future.done():
+                future.set_result(response)
+
+    async def disconnect(self) -> None:
+        """Envia o que está na fila e aguarda os POSTs em andamento antes de fechar as sessões"""
+        if self._pending:
+            self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        await super().disconnect()
+
+    def get_stats(self) -> dict:
+        """Retorna estatísticas do provider para debug"""
+        return {
+            "calls": self.calls,
+            "posts": self.posts,
+            "batches": self.batches,
+            "calls_per_post": round(self.calls / self.posts, 2) if self.posts else None,
+            "window_ms": self.window * 1000
+        }
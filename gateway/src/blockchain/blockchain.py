@@ -1,72 +1,177 @@
+from hexbytes import HexBytes
 from web3 import Web3
 from web3.exceptions import ContractLogicError
+from web3.logs import DISCARD
 from config.settings import settings
-from .nonce_manager import NonceManager
 import json
 import os
 import logging
-import asyncio
+from functools import lru_cache
 
 logger = logging.getLogger(__name__)
 
+ABI_PATH = os.path.join(os.path.dirname(__file__), 'abi', 'SASSharedRegistry.json')
+
+@lru_cache(maxsize=None)
+def load_contract_abi():
+    """Carrega e faz o parse do ABI do contrato uma única vez por processo"""
+    try:
+        with open(ABI_PATH) as f:
+            abi_data = json.load(f)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"ABI não encontrado em {ABI_PATH}")
+    # Extrair apenas o array ABI do arquivo do Hardhat
+    if isinstance(abi_data, dict) and 'abi' in abi_data:
+        return abi_data['abi']
+    return abi_data
+
+@lru_cache(maxsize=None)
+def event_topics():
+    """Tópico 0 (keccak da assinatura) de cada evento do ABI, calculado uma única vez por processo"""
+    return {
+        entry['name']: HexBytes(Web3.keccak(text=f"{entry['name']}({','.join(i['type'] for i in entry['inputs'])})"))
+        for entry in load_contract_abi() if entry['type'] == 'event'
+    }
+
+def logs_filter(contract, event_names, from_block, to_block, topics=()) -> dict:
+    """
+    Parâmetros de eth_getLogs para os eventos do contrato (OR dos tópicos na posição 0)
+
+    ``topics`` filtra os tópicos indexados seguintes no nó (ex.: ``cbsdKey``).
+    """
+    signatures = event_topics()
+    return {
+        'address': contract.address,
+        'fromBlock': from_block,
+        'toBlock': to_block,
+        'topics': [[signatures[name].to_0x_hex() for name in event_names], *topics]
+    }
+
+def registration_args(data: dict) -> list:
+    """Converte o payload de Registration na struct RegistrationRequest do contrato"""
+    return [
+        data["fccId"],
+        data["userId"],
+        data["cbsdSerialNumber"],
+        data["callSign"],
+        data["cbsdCategory"],
+        data["airInterface"],
+        data["measCapability"],
+        data["eirpCapability"],
+        data["latitude"],
+        data["longitude"],
+        data["height"],
+        data["heightType"],
+        data["indoorDeployment"],
+        data["antennaGain"],
+        data["antennaBeamwidth"],
+        data["antennaAzimuth"],
+        data["groupingParam"],
+        data["cbsdAddress"]
+    ]
+
+def grant_args(data: dict) -> list:
+    """Converte o payload de Grant na struct GrantRequest do contrato"""
+    return [
+        data["fccId"],
+        data["cbsdSerialNumber"],
+        data["channelType"],
+        data["maxEirp"],
+        data["lowFrequency"],
+        data["highFrequency"],
+        data["requestedMaxEirp"],
+        data["requestedLowFrequency"],
+        data["requestedHighFrequency"],
+        data["grantExpireTime"]
+    ]
+
+def batch_args(operation: str, items: list) -> list:
+    """Converte os payloads de um lote no array de structs da função ``<operação>Batch``"""
+    if operation == "registration":
+        return [registration_args(item) for item in items]
+    if operation == "grant":
+        return [grant_args(item) for item in items]
+    if operation == "relinquishment":
+        return [[item["fccId"], item["cbsdSerialNumber"], item["grantId"]] for item in items]
+    if operation == "deregistration":
+        return [[item["fccId"], item["cbsdSerialNumber"]] for item in items]
+    raise ValueError(f"Operação desconhecida: {operation}")
+
+def batch_item_results(contract, receipt, count: int) -> list:
+    """
+    Status por item de um lote on-chain a partir dos eventos BatchItemFailed
+
+    Itens sem BatchItemFailed foram aplicados; se a transação inteira
+    reverteu, todos falham.
+    """
+    if receipt["status"] != 1:
+        return [{"success": False, "reason": "transaction reverted"} for _ in range(count)]
+    failures = {
+        event["args"]["index"]: event["args"]["reason"]
+        for event in contract.events.BatchItemFailed().process_receipt(receipt, errors=DISCARD)
+    }
+    return [
+        {"success": index not in failures, "reason": failures.get(index)}
+        for index in range(count)
+    ]
+
 class Blockchain:
-    def __init__(self, private_key=None):
-        self.web3 = Web3(Web3.HTTPProvider(settings.RPC_URL))
-        
-        # Verificar conexão com Besu
-        if not self.web3.is_connected():
-            raise ConnectionError(f"Não foi possível conectar ao Besu em {settings.RPC_URL}")
+    def __init__(self, private_key=None, web3=None, contract=None):
+        """
+        Cliente do contrato para uma conta.
+
+        Se ``web3``/``contract`` forem fornecidos (ex.: pelo SignerPool), reutiliza
+        o provider e o contrato compartilhados e não refaz a checagem de conexão.
+        """
+        shared = web3 is not None
+        self.web3 = web3 or self.create_web3()
         
         # Configurar conta
         key = private_key or settings.OWNER_PRIVATE_KEY
         self.account = self.web3.eth.account.from_key(key)
-        self.web3.eth.default_account = self.account.address
-        
-        # Inicializar NonceManager
-        self.nonce_manager = NonceManager(self.web3, self.account.address)
-        
-        # Carregar ABI
-        abi_path = os.path.join(os.path.dirname(__file__), 'abi', 'SASSharedRegistry.json')
-        try:
-            with open(abi_path) as f:
-                abi_data = json.load(f)
-                # Extrair apenas o array ABI do arquivo do Hardhat
-                if isinstance(abi_data, dict) and 'abi' in abi_data:
-                    abi = abi_data['abi']
-                else:
-                    abi = abi_data
-        except FileNotFoundError:
-            raise FileNotFoundError(f"ABI não encontrado em {abi_path}")
+        if not shared:
+            # Com provider compartilhado a conta é sempre passada explicitamente
+            self.web3.eth.default_account = self.account.address
         
         # Instanciar contrato
-        self.contract = self.web3.eth.contract(
+        self.contract = contract or self.web3.eth.contract(
             address=settings.CONTRACT_ADDRESS, 
-            abi=abi
+            abi=load_contract_abi()
         )
         
-        logger.info(f"Conectado ao Besu. Conta: {self.account.address}")
-        logger.info(f"Contrato: {settings.CONTRACT_ADDRESS}")
-        logger.info(f"NonceManager inicializado para conta: {self.account.address}")
+        if not shared:
+            logger.info(f"Conectado ao Besu. Conta: {self.account.address}")
+            logger.info(f"Contrato: {settings.CONTRACT_ADDRESS}")
+
+    @staticmethod
+    def create_web3():
+        """Cria o provider HTTP e verifica a conexão com o Besu"""
+        web3 = Web3(Web3.HTTPProvider(settings.RPC_URL))
+        if not web3.is_connected():
+            raise ConnectionError(f"Não foi possível conectar ao Besu em {settings.RPC_URL}")
+        return web3
 
     def get_event_filter(self, event_name, from_block='latest'):
         """Cria filtro para eventos do contrato"""
         try:
-            event_abi = getattr(self.contract.events, event_name)._get_event_abi()
-            # Usar w3.eth.filter para eventos futuros
-            event_signature_hash = self.web3.keccak(text=f"{event_name}({','.join([input['type'] for input in event_abi['inputs']])})").hex()
+            # Usar w3.eth.filter para eventos futuros (o filtro fica instalado no nó)
             filter_params = {
                 'address': self.contract.address,
-                'topics': [event_signature_hash],
+                'topics': [event_topics()[event_name].to_0x_hex()],
                 'fromBlock': from_block
             }
             return self.web3.eth.filter(filter_params)
-        except AttributeError:
+        except KeyError:
             logger.error(f"Evento {event_name} não encontrado no contrato")
             raise
         except Exception as e:
             logger.error(f"Erro ao criar filtro para evento {event_name}: {e}")
             raise
 
+    def get_logs(self, event_names, from_block, to_block='latest', topics=()):
+        """Logs de vários eventos numa única chamada eth_getLogs, sem instalar filtro no nó"""
+        return self.web3.eth.get_logs(logs_filter(self.contract, event_names, from_block, to_block, topics))
+
     def get_latest_block(self):
         """Retorna o número do último bloco"""
         return self.web3.eth.block_number
@@ -78,7 +183,7 @@ class Blockchain:
     def estimate_gas(self, function_call):
         """Estima o gas necessário para uma transação"""
         try:
-            return function_call.estimate_gas()
+            return function_call.estimate_gas({'from': self.account.address})
         except ContractLogicError as e:
             logger.error(f"Erro ao estimar gas: {e}")
             raise
@@ -109,18 +214,6 @@ class Blockchain:
         
         return function_call.build_transaction(tx_params)
 
-    async def send_transaction_with_nonce_manager(self, function_call, gas_limit=None):
-        """Envia uma transação usando NonceManager para evitar conflitos"""
-        try:
-            # Usar NonceManager para enviar transação com retry
-            receipt = await self.nonce_manager.send_transaction_with_retry(function_call)
-            logger.info(f"Transação enviada com NonceManager: {receipt['transactionHash'].hex()}")
-            return receipt
-            
-        except Exception as e:
-            logger.error(f"Erro ao enviar transação com NonceManager: {e}")
-            raise
-
     def send_transaction(self, function_call, gas_limit=None):
         """Envia uma transação para o Besu (método legado)"""
         try:
@@ -146,135 +239,32 @@ class Blockchain:
     def call_function(self, function_call):
         """Executa uma chamada de função (view/pure)"""
         try:
-            return function_call.call()
+            return function_call.call({'from': self.account.address})
         except ContractLogicError as e:
             logger.error(f"Erro na chamada da função: {e}")
             raise
 
-    # Funções SAS-SAS com NonceManager (recomendadas para redes reais)
-    async def registration_with_nonce_manager(self, data: dict):
-        """Executa operação SAS-SAS Registration usando NonceManager"""
-        try:
-            args = [
-                data["fccId"],
-                data["userId"],
-                data["cbsdSerialNumber"],
-                data["callSign"],
-                data["cbsdCategory"],
-                data["airInterface"],
-                data["measCapability"],
-                data["eirpCapability"],
-                data["latitude"],
-                data["longitude"],
-                data["height"],
-                data["heightType"],
-                data["indoorDeployment"],
-                data["antennaGain"],
-                data["antennaBeamwidth"],
-                data["antennaAzimuth"],
-                data["groupingParam"],
-                data["cbsdAddress"]
-            ]
-            tx = self.contract.functions.registration(args)
-            return await self.send_transaction_with_nonce_manager(tx)
-        except Exception as e:
-            logger.error(f"Erro na operação registration com NonceManager: {e}")
-            raise
-
     # Funções SAS-SAS (métodos legados - mantidos para compatibilidade)
     def registration(self, data: dict):
         """Executa operação SAS-SAS Registration (struct RegistrationRequest)"""
         try:
-            args = [
-                data["fccId"],
-                data["userId"],
-                data["cbsdSerialNumber"],
-                data["callSign"],
-                data["cbsdCategory"],
-                data["airInterface"],
-                data["measCapability"],
-                data["eirpCapability"],
-                data["latitude"],
-                data["longitude"],
-                data["height"],
-                data["heightType"],
-                data["indoorDeployment"],
-                data["antennaGain"],
-                data["antennaBeamwidth"],
-                data["antennaAzimuth"],
-                data["groupingParam"],
-                data["cbsdAddress"]
-            ]
+            args = registration_args(data)
             tx = self.contract.functions.registration(args)
             return self.send_transaction(tx)
         except Exception as e:
             logger.error(f"Erro na operação registration: {e}")
             raise
 
-    async def grant_with_nonce_manager(self, data: dict):
-        """Executa operação SAS-SAS Grant usando NonceManager"""
-        try:
-            args = [
-                data["fccId"],
-                data["cbsdSerialNumber"],
-                data["channelType"],
-                data["maxEirp"],
-                data["lowFrequency"],
-                data["highFrequency"],
-                data["requestedMaxEirp"],
-                data["requestedLowFrequency"],
-                data["requestedHighFrequency"],
-                data["grantExpireTime"]
-            ]
-            tx = self.contract.functions.grant(args)
-            return await self.send_transaction_with_nonce_manager(tx)
-        except Exception as e:
-            logger.error(f"Erro na operação grant com NonceManager: {e}")
-            raise
-
     def grant(self, data: dict):
         """Executa operação SAS-SAS Grant (struct GrantRequest)"""
         try:
-            args = [
-                data["fccId"],
-                data["cbsdSerialNumber"],
-                data["channelType"],
-                data["maxEirp"],
-                data["lowFrequency"],
-                data["highFrequency"],
-                data["requestedMaxEirp"],
-                data["requestedLowFrequency"],
-                data["requestedHighFrequency"],
-                data["grantExpireTime"]
-            ]
+            args = grant_args(data)
             tx = self.contract.functions.grant(args)
             return self.send_transaction(tx)
         except Exception as e:
             logger.error(f"Erro na operação grant: {e}")
             raise
 
-    async def relinquishment_with_nonce_manager(self, data: dict):
-        """Executa operação SAS-SAS Relinquishment usando NonceManager"""
-        try:
-            tx = self.contract.functions.relinquishment(
-                data["fccId"], data["cbsdSerialNumber"], data["grantId"]
-            )
-            return await self.send_transaction_with_nonce_manager(tx)
-        except Exception as e:
-            logger.error(f"Erro na operação relinquishment com NonceManager: {e}")
-            raise
-
-    async def deregistration_with_nonce_manager(self, data: dict):
-        """Executa operação SAS-SAS Deregistration usando NonceManager"""
-        try:
-            tx = self.contract.functions.deregistration(
-                data["fccId"], data["cbsdSerialNumber"]
-            )
-            return await self.send_transaction_with_nonce_manager(tx)
-        except Exception as e:
-            logger.error(f"Erro na operação deregistration com NonceManager: {e}")
-            raise
-
     def relinquishment(self, data: dict):
         """Executa operação SAS-SAS Relinquishment"""
         try:
@@ -297,28 +287,32 @@ class Blockchain:
             logger.error(f"Erro na operação deregistration: {e}")
             raise
 
-    # Funções de autorização SAS com NonceManager
-    async def authorize_sas_with_nonce_manager(self, sas_address: str):
-        """Autoriza um endereço como SAS usando NonceManager"""
+    # Lotes on-chain: uma transação para vários itens (registrationBatch, grantBatch, ...)
+    def send_onchain_batch(self, operation: str, items: list):
+        """Executa ``<operação>Batch`` e retorna o recibo e o status por item"""
         try:
-            # Converter endereço para o tipo correto
-            address = self.web3.to_checksum_address(sas_address)
-            tx = self.contract.functions.authorizeSAS(address)
-            return await self.send_transaction_with_nonce_manager(tx)
+            tx = getattr(self.contract.functions, f"{operation}Batch")(batch_args(operation, items))
+            receipt = self.send_transaction(tx)
+            return {"receipt": receipt, "results": batch_item_results(self.contract, receipt, len(items))}
         except Exception as e:
-            logger.error(f"Erro ao autorizar SAS {sas_address} com NonceManager: {e}")
+            logger.error(f"Erro no lote {operation} ({len(items)} itens): {e}")
             raise
 
-    async def revoke_sas_with_nonce_manager(self, sas_address: str):
-        """Revoga autorização de um SAS usando NonceManager"""
-        try:
-            # Converter endereço para o tipo correto
-            address = self.web3.to_checksum_address(sas_address)
-            tx = self.contract.functions.revokeSAS(address)
-            return await self.send_transaction_with_nonce_manager(tx)
-        except Exception as e:
-            logger.error(f"Erro ao revogar SAS {sas_address} com NonceManager: {e}")
-            raise
+    def registration_batch(self, items: list):
+        """Registration de vários CBSDs numa única transação"""
+        return self.send_onchain_batch("registration", items)
+
+    def grant_batch(self, items: list):
+        """Grant de vários CBSDs numa única transação"""
+        return self.send_onchain_batch("grant", items)
+
+    def relinquishment_batch(self, items: list):
+        """Relinquishment de vários grants numa única transação"""
+        return self.send_onchain_batch("relinquishment", items)
+
+    def deregistration_batch(self, items: list):
+        """Deregistration de vários CBSDs numa única transação"""
+        return self.send_onchain_batch("deregistration", items)
 
     # Funções de autorização SAS (métodos legados - mantidos para compatibilidade)
     def authorize_sas(self, sas_address: str):
@@ -360,11 +354,3 @@ class Blockchain:
         except Exception as e:
             logger.error(f"Erro ao obter owner: {e}")
             raise
-
-    def get_nonce_manager_stats(self):
-        """Obtém estatísticas do NonceManager para debug"""
-        try:
-            return self.nonce_manager.get_stats()
-        except Exception as e:
-            logger.error(f"Erro ao obter estatísticas do NonceManager: {e}")
-            raise 
\ No newline at end of file
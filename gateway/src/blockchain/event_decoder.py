@@ -0,0 +1,252 @@
+import logging
+from typing import Dict, Iterable, List, NamedTuple, Optional
+from eth_abi.decoding import ContextFramesBytesIO
+from eth_abi.registry import registry
+from eth_utils import to_checksum_address
+from hexbytes import HexBytes
+from web3 import Web3
+from .blockchain import load_contract_abi
+
+logger = logging.getLogger(__name__)
+
+# Registros compactos dos eventos: metadados do log seguidos dos argumentos na
+# ordem do ABI. ``cbsd_key`` é o tópico indexado (a chave do CBSD no contrato);
+# fccId e serialNumber vêm em texto.
+
+class CBSDRegistered(NamedTuple):
+    block_number: int
+    log_index: int
+    transaction_hash: bytes
+    cbsd_key: bytes
+    fcc_id: str
+    serial_number: str
+    sas_origin: str
+    latitude: int
+    longitude: int
+
+class CBSDDeregistered(NamedTuple):
+    block_number: int
+    log_index: int
+    transaction_hash: bytes
+    cbsd_key: bytes
+    fcc_id: str
+    serial_number: str
+    sas_origin: str
+
+class GrantCreated(NamedTuple):
+    block_number: int
+    log_index: int
+    transaction_hash: bytes
+    cbsd_key: bytes
+    fcc_id: str
+    serial_number: str
+    grant_id: str
+    sas_origin: str
+    low_frequency: int
+    high_frequency: int
+    max_eirp: int
+
+class GrantTerminated(NamedTuple):
+    block_number: int
+    log_index: int
+    transaction_hash: bytes
+    cbsd_key: bytes
+    fcc_id: str
+    serial_number: str
+    grant_id: str
+    sas_origin: str
+
+class SASAuthorized(NamedTuple):
+    block_number: int
+    log_index: int
+    transaction_hash: bytes
+    sas: str
+
+class SASRevoked(NamedTuple):
+    block_number: int
+    log_index: int
+    transaction_hash: bytes
+    sas: str
+
+class BatchItemFailed(NamedTuple):
+    block_number: int
+    log_index: int
+    transaction_hash: bytes
+    index: int
+    operation: str
+    reason: str
+
+RECORD_TYPES = (CBSDRegistered, CBSDDeregistered, GrantCreated, GrantTerminated, SASAuthorized, SASRevoked, BatchItemFailed)
+
+# Nome do campo do registro -> chave na resposta JSON da API
+JSON_FIELDS = {
+    'cbsd_key': 'cbsdKey',
+    'fcc_id': 'fccId',
+    'serial_number': 'serialNumber',
+    'sas_origin': 'sasOrigin',
+    'grant_id': 'grantId',
+    'low_frequency': 'lowFrequency',
+    'high_frequency': 'highFrequency',
+    'max_eirp': 'maxEirp',
+    'conflict_count': 'conflictCount',
+    'latitude': 'latitude',
+    'longitude': 'longitude',
+    'sas': 'sas',
+    'index': 'index',
+    'operation': 'operation',
+    'reason': 'reason'
+}
+
+META_FIELDS = 3
+
+# Inteiros dos eventos (uint256/int256 no ABI) são guardados em 64 bits com sinal:
+# colunas ``array('q')`` dos grants, INTEGER do SQLite e colunas NumPy dos índices.
+# A faixa é simétrica: ``abs(-2^63)`` estoura nos triggers de localização do SQLite
+INT64_MIN, INT64_MAX = -(2 ** 63 - 1), 2 ** 63 - 1
+
+class ValueOutOfRange(ValueError):
+    """Inteiro do evento fora da faixa de 64 bits com sinal do repositório"""
+
+class _CompiledEvent:
+    """Decodificador de um evento montado uma única vez a partir do ABI"""
+
+    __slots__ = ('record', 'arg_names', 'topic_decoders', 'topic_positions', 'data_positions', 'data_decoder',
+                 'size', 'int_positions')
+
+    def __init__(self, record, event_abi: dict, addresses: Dict[bytes, str]):
+        inputs = event_abi['inputs']
+        if len(record._fields) - META_FIELDS != len(inputs):
+            raise ValueError(f"Registro {record.__name__} não corresponde ao ABI do evento")
+        self.record = record
+        self.arg_names = [item['name'] for item in inputs]
+        self.size = len(inputs)
+        self.topic_positions = [i for i, item in enumerate(inputs) if item['indexed']]
+        self.topic_decoders = [_topic_decoder(inputs[i]['type'], addresses) for i in self.topic_positions]
+        self.data_positions = [i for i, item in enumerate(inputs) if not item['indexed']]
+        data_types = [inputs[i]['type'] for i in self.data_positions]
+        self.data_decoder = registry.get_tuple_decoder(*data_types) if data_types else None
+        self.int_positions = [i for i, item in enumerate(inputs)
+                              if item['type'].startswith(('uint', 'int')) and not item['type'].endswith(']')]
+
+    def decode(self, log):
+        topics = log['topics']
+        values = [None] * self.size
+        for position, decode, topic in zip(self.topic_positions, self.topic_decoders, topics[1:]):
+            values[position] = decode(topic)
+        if self.data_decoder is not None:
+            decoded = self.data_decoder(ContextFramesBytesIO(log['data']))
+            for position, value in zip(self.data_positions, decoded):
+                values[position] = value
+        for position in self.int_positions:
+            if not INT64_MIN <= values[position] <= INT64_MAX:
+                raise ValueOutOfRange(f"{self.record.__name__}.{self.arg_names[position]} = {values[position]} "
+                                      "não cabe em 64 bits com sinal")
+        return self.record(log['blockNumber'], log['logIndex'], log['transactionHash'], *values)
+
+def _topic_decoder(abi_type: str, addresses: Dict[bytes, str]):
+    if abi_type == 'address':
+        def decode_address(topic):
+            # Checksum custa um keccak: os endereços (SAS) se repetem, então ficam em cache
+            raw = bytes(topic[12:])
+            address = addresses.get(raw)
+            if address is None:
+                address = addresses[raw] = to_checksum_address(raw)
+            return address
+        return decode_address
+    if abi_type.startswith(('uint', 'int')):
+        signed = abi_type.startswith('int')
+        return lambda topic: int.from_bytes(topic, 'big', signed=signed)
+    if abi_type == 'bool':
+        return lambda topic: topic[-1] == 1
+    if abi_type.startswith('bytes') and abi_type != 'bytes':
+        size = int(abi_type[5:])
+        return lambda topic: bytes(topic[:size])
+    # string/bytes/arrays indexados: só o hash keccak
+    return bytes
+
+class EventDecoder:
+    """
+    Registro de decodificadores de logs indexado pelo tópico 0
+
+    Substitui ``contract.events[name].process_log`` nos caminhos que
+    decodificam muitos logs: o decodificador de cada evento (tipos do ABI,
+    posições dos campos indexados, ``TupleDecoder`` do ``eth_abi`` para o
+    ``data``) é montado uma vez no registro e cada log vira um registro
+    compacto (NamedTuple) em vez do AttributeDict do web3.
+    """
+
+    def __init__(self, abi: Optional[list] = None, records: Iterable = RECORD_TYPES):
+        abi = abi if abi is not None else load_contract_abi()
+        events = {entry['name']: entry for entry in abi if entry['type'] == 'event'}
+        self._addresses: Dict[bytes, str] = {}
+        self._decoders: Dict[bytes, _CompiledEvent] = {}
+        self._by_record: Dict[type, _CompiledEvent] = {}
+        self.names: Dict[bytes, str] = {}
+        # Logs recusados por ValueOutOfRange (o índice deixa de refletir esses eventos)
+        self.rejected = 0
+        for record in records:
+            event_abi = events.get(record.__name__)
+            if event_abi is None:
+                continue
+            topic = bytes(Web3.keccak(text=f"{event_abi['name']}({','.join(i['type'] for i in event_abi['inputs'])})"))
+            self._decoders[topic] = self._by_record[record] = _CompiledEvent(record, event_abi, self._addresses)
+            self.names[topic] = record.__name__
+
+    def topics(self, names: Iterable[str]) -> List[bytes]:
+        """Tópicos 0 registrados para os eventos ``names``"""
+        wanted = set(names)
+        return [topic for topic, name in self.names.items() if name in wanted]
+
+    def decode(self, log):
+        """Registro do log, ou None se o tópico 0 não estiver registrado"""
+        topics = log['topics']
+        if not topics:
+            return None
+        decoder = self._decoders.get(bytes(topics[0]))
+        return decoder.decode(log) if decoder is not None else None
+
+    def decode_all(self, logs) -> list:
+        """
+        Registros dos logs conhecidos (logs inválidos são descartados com aviso)
+
+        Um inteiro fora de 64 bits com sinal (``ValueOutOfRange``) recusa o
+        log com erro e conta em ``rejected``, em vez de falhar adiante na
+        gravação do repositório.
+        """
+        records = []
+        for log in logs:
+            try:
+                record = self.decode(log)
+            except ValueOutOfRange as e:
+                self.rejected += 1
+                logger.error(f"Evento do bloco {log.get('blockNumber')} (log {log.get('logIndex')}) recusado: {e}")
+                continue
+            except Exception as e:
+                logger.warning(f"Erro ao decodificar log do bloco {log.get('blockNumber')}: {e}")
+                continue
+            if record is not None:
+                records.append(record)
+        return records
+
+    def as_event(self, record) -> dict:
+        """Registro no formato de evento do web3 (``args`` pelos nomes do ABI), usado pelos handlers"""
+        compiled = self._by_record[type(record)]
+        return {
+            'event': type(record).__name__,
+            'args': dict(zip(compiled.arg_names, record[META_FIELDS:])),
+            'blockNumber': record.block_number,
+            'logIndex': record.log_index,
+            'transactionHash': record.transaction_hash
+        }
+
+def record_json(record) -> dict:
+    """Registro no formato de /events/recent (hashes e bytes em hex com 0x)"""
+    event = {
+        "event": type(record).__name__,
+        "block_number": record.block_number,
+        "transaction_hash": HexBytes(record.transaction_hash).hex(),
+    }
+    for field in record._fields[META_FIELDS:]:
+        value = getattr(record, field)
+        event[JSON_FIELDS.get(field, field)] = HexBytes(value).to_0x_hex() if isinstance(value, bytes) else value
+    return event
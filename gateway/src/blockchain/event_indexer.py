@@ -0,0 +1,272 @@
+import asyncio
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+from web3 import AsyncWeb3, Web3
+from web3.exceptions import BlockNotFound
+from config.settings import settings
+from .backfill import Backfill
+from handlers.pipeline import HandlerPipeline
+from .event_decoder import EventDecoder, RECORD_TYPES
+
+logger = logging.getLogger(__name__)
+
+class ChainReorganized(Exception):
+    """Logs ou cabeçalhos buscados não se encadeiam com os blocos já indexados"""
+
+class EventIndexer:
+    """
+    Indexador em background dos eventos do contrato
+
+    Acompanha a chain e aplica os logs aos handlers dos eventos
+    (``EVENT_HANDLERS``) pelo ``HandlerPipeline``, mantendo o repositório em
+    memória atualizado. As
+    consultas de CBSDs e grants passam a ser lidas do repositório, sem
+    ``eth_call`` por item.
+
+    A cada ``INDEXER_POLL_INTERVAL``:
+
+    1. Consulta ``eth_blockNumber``
+    2. Busca os logs dos blocos ainda não indexados com ``eth_getLogs``,
+       filtrando por endereço do contrato e pelo OR dos tópicos dos eventos
+       com handler. Um atraso grande (ex.: primeira indexação de um histórico
+       longo) é buscado pelo ``Backfill``: faixas de tamanho adaptativo
+       buscadas em paralelo
+    3. Decodifica (EventDecoder) e aplica os registros em lotes, particionados
+       por CBSD, mantendo a ordem dos eventos de cada CBSD
+    4. Entrega os registros da faixa aos ``listeners`` (ex.: streaming para
+       os SAS pares), depois de aplicados; num reorg os
+       ``rollback_listeners`` recebem o último bloco em comum, para
+       descartar o que receberam dos blocos desfeitos
+
+    Com um ``repository`` cada faixa é aplicada numa transação junto com o
+    checkpoint do último bloco processado; sem ``start_block`` explícito a
+    indexação continua do bloco seguinte ao checkpoint.
+
+    Reorgs: os eventos dos últimos ``INDEXER_CONFIRMATIONS`` blocos (ainda sem
+    confirmação) são aplicados dentro de ``repository.journal(bloco)``, que
+    guarda como desfazê-los, e o hash de cada um desses blocos é gravado junto
+    com o checkpoint. A cada consulta o hash do último bloco indexado é
+    comparado com o do nó; se divergir, o indexador procura o último bloco em
+    comum, desfaz o que veio depois (``repository.rollback``) e reindexa a
+    partir dele. Blocos que passam da profundidade de confirmação têm o
+    desfazer e o hash descartados (``repository.prune``).
+    """
+
+    EVENTS = ('CBSDRegistered', 'CBSDDeregistered', 'GrantCreated', 'GrantTerminated', 'SASAuthorized', 'SASRevoked')
+
+    def __init__(self, web3: AsyncWeb3, contract, handlers: Dict[str, Callable], start_block: Optional[int] = None,
+                 poll_interval: Optional[float] = None, chunk_size: Optional[int] = None, repository=None,
+                 decoder: Optional[EventDecoder] = None, workers: Optional[int] = None,
+                 confirmations: Optional[int] = None, partitions: Optional[int] = None,
+                 batch_size: Optional[int] = None):
+        self.web3 = web3
+        self.contract = contract
+        self.handlers = handlers
+        self.repository = repository
+        if start_block is None:
+            checkpoint = repository.get_checkpoint() if repository is not None else None
+            start_block = settings.INDEXER_START_BLOCK if checkpoint is None else checkpoint + 1
+        self.next_block = start_block
+        self.poll_interval = poll_interval or settings.INDEXER_POLL_INTERVAL
+        self.confirmations = settings.INDEXER_CONFIRMATIONS if confirmations is None else confirmations
+        # Rastreamento de reorgs precisa do repositório (journal/rollback)
+        self.tracking = repository is not None and self.confirmations > 0
+        self._hashes: Dict[int, str] = repository.get_block_hashes() if self.tracking else {}
+        # (hash, parentHash) dos blocos sem confirmação buscados e ainda não aplicados
+        self._fetched: Dict[int, Tuple[str, str]] = {}
+        self._confirmed = -1
+        self.decoder = decoder or EventDecoder(
+            records=[record for record in RECORD_TYPES if record.__name__ in self.EVENTS and record.__name__ in handlers]
+        )
+        self._topics = [["0x" + topic.hex() for topic in self.decoder.names]]
+        self.pipeline = HandlerPipeline(handlers, decoder=self.decoder, repository=repository,
+                                        partitions=partitions, batch_size=batch_size)
+        self.backfill = Backfill(self._fetch, workers=workers, chunk_size=chunk_size)
+        # Callbacks chamados com (registros, último bloco) após cada faixa aplicada
+        self.listeners: List[Callable] = []
+        # Callbacks chamados com o último bloco mantido quando um reorg desfaz os blocos seguintes
+        self.rollback_listeners: List[Callable[[int], None]] = []
+        self._head: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop = None
+        self.polls = 0
+        self.reorgs = 0
+        self.reverted_blocks = 0
+
+    @property
+    def log_requests(self) -> int:
+        return self.backfill.requests
+
+    @property
+    def applied(self) -> int:
+        return self.pipeline.applied
+
+    @property
+    def errors(self) -> int:
+        return self.pipeline.errors
+
+    @property
+    def head(self) -> Optional[int]:
+        """Bloco mais recente da cadeia na última sincronização (None antes da primeira)"""
+        return self._head
+
+    @property
+    def last_indexed_block(self) -> int:
+        """Último bloco cujos eventos já estão no repositório"""
+        return self.next_block - 1
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._task = loop.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sync()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Erro na indexação de eventos: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def sync(self) -> int:
+        """Indexa até o bloco atual e retorna o último bloco indexado"""
+        self.polls += 1
+        self._head = await self.web3.eth.block_number
+        self._confirmed = self._head - self.confirmations
+        if self.tracking:
+            await self._check_reorg()
+        self._fetched.clear()
+        try:
+            await self.backfill.run(self.next_block, self._head, self._apply_range)
+        except ChainReorganized as e:
+            # O desfazer acontece na próxima consulta (_check_reorg)
+            logger.warning(f"Reorg durante a indexação: {e}")
+        return self.last_indexed_block
+
+    async def _fetch(self, from_block: int, to_block: int) -> list:
+        logs = await self.web3.eth.get_logs({
+            "address": self.contract.address,
+            "fromBlock": from_block,
+            "toBlock": to_block,
+            "topics": self._topics
+        })
+        if self.tracking and to_block > self._confirmed:
+            await self._fetch_hashes(max(from_block, self._confirmed + 1), to_block, logs)
+        return self.decoder.decode_all(logs)
+
+    async def _get_block(self, number: int):
+        try:
+            return await self.web3.eth.get_block(number)
+        except BlockNotFound:
+            return None
+
+    async def _fetch_hashes(self, from_block: int, to_block: int, logs):
+        """Busca os hashes dos blocos sem confirmação da faixa e confere os logs contra eles"""
+        blocks = await asyncio.gather(*(self._get_block(n) for n in range(from_block, to_block + 1)))
+        if any(block is None for block in blocks):
+            raise ChainReorganized(f"blocos {from_block}-{to_block} não encontrados no nó")
+        hashes = {block['number']: (Web3.to_hex(block['hash']), Web3.to_hex(block['parentHash']))
+                  for block in blocks}
+        for log in logs:
+            expected = hashes.get(log['blockNumber'])
+            if expected is not None and Web3.to_hex(log['blockHash']) != expected[0]:
+                raise ChainReorganized(f"log do bloco {log['blockNumber']} não pertence ao bloco atual do nó")
+        self._fetched.update(hashes)
+
+    async def _check_reorg(self):
+        """Compara o último bloco indexado com o nó; em divergência desfaz até o último bloco em comum"""
+        if not self._hashes:
+            return
+        tip = max(self._hashes)
+        block = await self._get_block(tip)
+        if block is not None and Web3.to_hex(block['hash']) == self._hashes[tip]:
+            return
+        numbers = sorted(self._hashes, reverse=True)
+        blocks = await asyncio.gather(*(self._get_block(n) for n in numbers))
+        for number, block in zip(numbers, blocks):
+            if block is not None and Web3.to_hex(block['hash']) == self._hashes[number]:
+                fork = number
+                break
+        else:
+            fork = numbers[-1] - 1
+            logger.error(f"Reorg mais profundo que INDEXER_CONFIRMATIONS ({self.confirmations} blocos): "
+                         f"eventos até o bloco {fork} não podem ser desfeitos")
+        self._rollback(fork)
+
+    def _rollback(self, block_number: int):
+        last = self.last_indexed_block
+        undone = self.repository.rollback(block_number)
+        self._hashes = {n: h for n, h in self._hashes.items() if n <= block_number}
+        self.next_block = block_number + 1
+        self.reorgs += 1
+        self.reverted_blocks += last - block_number
+        logger.warning(f"Reorg: blocos {block_number + 1}-{last} desfeitos ({undone} alterações), reindexando")
+        for listener in self.rollback_listeners:
+            listener(block_number)
+
+    async def _apply_range(self, records, to_block: int):
+        """
+        Aplica os registros de uma faixa (já na ordem dos blocos) e avança o checkpoint
+
+        Com repositório, a faixa é aplicada sem ceder o loop enquanto a
+        transação está aberta: a API lê a mesma conexão e só vê faixas
+        inteiras, com o checkpoint correspondente.
+        """
+        journal_from = self._confirmed + 1 if self.tracking else None
+        if self.repository is None:
+            await self.pipeline.process(records)
+        else:
+            with self.repository.transaction():
+                if self.tracking:
+                    self._record_hashes(to_block)
+                await self.pipeline.process(records, journal_from, cooperative=False)
+                self.repository.set_checkpoint(to_block)
+                if self.tracking and self._hashes and min(self._hashes) <= self._confirmed:
+                    self.repository.prune(self._confirmed)
+                    self._hashes = {n: h for n, h in self._hashes.items() if n > self._confirmed}
+        self.next_block = to_block + 1
+        for listener in self.listeners:
+            listener(records, to_block)
+
+    def _record_hashes(self, to_block: int):
+        """Grava os hashes dos blocos sem confirmação da faixa, conferindo o encadeamento com os anteriores"""
+        hashes = {}
+        for number in range(max(self.next_block, self._confirmed + 1), to_block + 1):
+            block_hash, parent_hash = self._fetched.pop(number)
+            previous = hashes.get(number - 1, self._hashes.get(number - 1))
+            if previous is not None and previous != parent_hash:
+                raise ChainReorganized(f"bloco {number} não é filho do bloco {number - 1} indexado")
+            hashes[number] = block_hash
+        for number, block_hash in hashes.items():
+            self.repository.set_block_hash(number, block_hash)
+        self._hashes.update(hashes)
+
+    def get_stats(self) -> dict:
+        """Retorna estatísticas do indexador para debug"""
+        return {
+            "last_indexed_block": self.last_indexed_block,
+            "head": self._head,
+            "lag": self._head - self.last_indexed_block if self._head is not None else None,
+            "polls": self.polls,
+            "log_requests": self.log_requests,
+            "applied": self.applied,
+            "errors": self.errors,
+            "rejected_events": self.decoder.rejected,
+            "confirmations": self.confirmations,
+            "reorgs": self.reorgs,
+            "reverted_blocks": self.reverted_blocks,
+            "backfill": self.backfill.get_stats(),
+            "pipeline": self.pipeline.get_stats()
+        }
@@ -0,0 +1,261 @@
+import asyncio
+import json
+import logging
+from collections import deque
+from typing import AsyncIterator, Callable, Iterable, List, Optional, Tuple
+from config.settings import settings
+from .event_decoder import record_json
+
+logger = logging.getLogger(__name__)
+
+class CursorExpired(Exception):
+    """Cursor de retomada mais antigo que o backfill permitido (STREAM_MAX_BACKFILL_BLOCKS)"""
+
+def sse_frame(record) -> str:
+    """Evento no formato Server-Sent Events (id = cursor ``bloco-logIndex``)"""
+    return (f"id: {record.block_number}-{record.log_index}\n"
+            f"event: {type(record).__name__}\n"
+            f"data: {json.dumps(record_json(record))}\n\n")
+
+def reorg_frame(block_number: int) -> str:
+    """Aviso de reorg: eventos posteriores a ``block_number`` foram desfeitos; ``id`` é o cursor para retomar"""
+    return (f"id: {block_number + 1}\n"
+            f"event: reorg\n"
+            f"data: {json.dumps({'block_number': block_number, 'cursor': str(block_number + 1)})}\n\n")
+
+def parse_cursor(value: str) -> Tuple[int, int]:
+    """Cursor ``bloco-logIndex`` (Last-Event-ID) em tupla comparável"""
+    block, _, log_index = value.partition("-")
+    return int(block), int(log_index) if log_index else -1
+
+class Subscription:
+    """Assinante do stream: filtros, cursor e buffer limitado"""
+
+    # Sinaliza ao consumidor que foi removido por lentidão
+    EVICTED = None
+
+    def __init__(self, types: Optional[Iterable[str]] = None, sas_origin: Optional[str] = None,
+                 after: Optional[Tuple[int, int]] = None):
+        self.types = frozenset(types) if types else None
+        self.sas_origin = sas_origin.lower() if sas_origin else None
+        # Último evento entregue (bloco, logIndex); eventos até ele não são reenviados
+        self.cursor = after
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.evicted = False
+        self.delivered = 0
+        # Falso enquanto o assinante recupera do nó os eventos anteriores ao histórico:
+        # até lá o publish não usa a fila (os eventos ao vivo vêm depois, do histórico)
+        self.live = True
+
+    def matches(self, record) -> bool:
+        if self.cursor is not None and (record.block_number, record.log_index) <= self.cursor:
+            return False
+        if self.types is not None and type(record).__name__ not in self.types:
+            return False
+        if self.sas_origin is not None:
+            origin = getattr(record, 'sas_origin', None) or getattr(record, 'sas', None)
+            if origin is None or origin.lower() != self.sas_origin:
+                return False
+        return True
+
+    def delivered_to(self, record):
+        self.cursor = (record.block_number, record.log_index)
+        self.delivered += 1
+
+class EventBroadcaster:
+    """
+    Distribui os eventos indexados para os assinantes do stream
+
+    Recebe os registros do EventIndexer (uma única assinatura de logs no nó)
+    e os repassa a cada assinante cujo filtro (tipo de evento, ``sasOrigin``)
+    aceita o evento. O frame SSE é montado uma vez por evento.
+
+    - Histórico: os últimos ``STREAM_HISTORY_SIZE`` eventos ficam em memória
+      para retomar a partir de um cursor; cursores mais antigos são
+      completados com ``backfill`` (``eth_getLogs``), uma faixa de blocos por
+      vez, até ``STREAM_MAX_BACKFILL_BLOCKS`` blocos antes do histórico
+    - Buffer por assinante limitado a ``STREAM_BUFFER_SIZE`` eventos: um
+      consumidor que não acompanha é removido (recebe ``evicted`` com o
+      cursor para reconectar) sem atrasar os demais
+    - Reorg (``rollback``, chamado pelo EventIndexer): eventos dos blocos
+      desfeitos saem do histórico e das filas, e os assinantes que já os
+      receberam recebem ``event: reorg`` com o cursor a partir do qual os
+      eventos do novo fork serão enviados
+    """
+
+    def __init__(self, start_block: int, backfill: Optional[Callable[[int, int], AsyncIterator[List]]] = None,
+                 buffer_size: Optional[int] = None, history_size: Optional[int] = None,
+                 max_subscribers: Optional[int] = None, max_backfill_blocks: Optional[int] = None):
+        # Gerador assíncrono: registros de [from_block, to_block] em listas, uma por faixa buscada
+        self.backfill = backfill
+        self.max_backfill_blocks = (settings.STREAM_MAX_BACKFILL_BLOCKS if max_backfill_blocks is None
+                                    else max_backfill_blocks)
+        self.buffer_size = buffer_size or settings.STREAM_BUFFER_SIZE
+        self.history: deque = deque()
+        self.history_size = history_size or settings.STREAM_HISTORY_SIZE
+        # Primeiro bloco cujos eventos estão todos no histórico
+        self.history_from_block = start_block
+        self.last_block = start_block - 1
+        self.max_subscribers = max_subscribers or settings.STREAM_MAX_SUBSCRIBERS
+        self.subscribers: set = set()
+        self.published = 0
+        self.evictions = 0
+        self.rollbacks = 0
+
+    def publish(self, records, last_block: int):
+        """Entrega os registros de uma faixa indexada (listener do EventIndexer)"""
+        for record in records:
+            item = (record, sse_frame(record))
+            self.history.append(item)
+            for subscription in list(self.subscribers):
+                if subscription.live and subscription.matches(record):
+                    self._offer(subscription, item)
+            self.published += 1
+        while len(self.history) > self.history_size:
+            dropped, _ = self.history.popleft()
+            self.history_from_block = dropped.block_number + 1
+        self.last_block = last_block
+
+    def rollback(self, block_number: int):
+        """Descarta os eventos posteriores a ``block_number`` (reorg) e avisa quem já os recebeu"""
+        resume = (block_number + 1, -1)
+        while self.history and self.history[-1][0].block_number > block_number:
+            self.history.pop()
+        self.history_from_block = min(self.history_from_block, block_number + 1)
+        self.last_block = min(self.last_block, block_number)
+        for subscription in list(self.subscribers):
+            pending = []
+            while not subscription.queue.empty():
+                item = subscription.queue.get_nowait()
+                if item is Subscription.EVICTED or item[0] is None or item[0].block_number <= block_number:
+                    pending.append(item)
+            for item in pending:
+                subscription.queue.put_nowait(item)
+            if subscription.cursor is not None and subscription.cursor > resume:
+                # Os eventos do novo fork a partir de block_number + 1 voltam a passar pelo filtro
+                subscription.cursor = resume
+                if subscription.live:
+                    subscription.queue.put_nowait((None, reorg_frame(block_number)))
+        self.rollbacks += 1
+        logger.warning(f"Stream: eventos após o bloco {block_number} descartados por reorg")
+
+    def _offer(self, subscription: Subscription, item):
+        if subscription.queue.qsize() >= self.buffer_size:
+            self._evict(subscription)
+            return
+        subscription.queue.put_nowait(item)
+
+    def _evict(self, subscription: Subscription):
+        self.subscribers.discard(subscription)
+        subscription.evicted = True
+        subscription.queue.put_nowait(Subscription.EVICTED)
+        self.evictions += 1
+        logger.warning(f"Assinante do stream removido por lentidão (cursor {subscription.cursor})")
+
+    def needs_backfill(self, subscription: Subscription) -> bool:
+        return (subscription.cursor is not None and self.backfill is not None
+                and subscription.cursor[0] < self.history_from_block)
+
+    def subscribe(self, subscription: Subscription) -> list:
+        """
+        Registra o assinante e retorna o histórico a reenviar (mesmo instante, sem lacunas)
+
+        Com cursor anterior ao histórico o assinante entra sem receber eventos
+        ao vivo (``live`` falso) e o histórico é reenviado depois do backfill.
+        Levanta ``OverflowError`` acima do limite de assinantes e
+        ``CursorExpired`` para cursores além de ``max_backfill_blocks``.
+        """
+        if len(self.subscribers) >= self.max_subscribers:
+            raise OverflowError(f"Limite de {self.max_subscribers} assinantes do stream atingido")
+        if self.needs_backfill(subscription):
+            if self.history_from_block - subscription.cursor[0] > self.max_backfill_blocks:
+                raise CursorExpired(f"Cursor no bloco {subscription.cursor[0]} anterior ao backfill permitido "
+                                    f"(a partir do bloco {self.history_from_block - self.max_backfill_blocks})")
+            subscription.live = False
+            self.subscribers.add(subscription)
+            return []
+        self.subscribers.add(subscription)
+        return self._replay(subscription)
+
+    def _replay(self, subscription: Subscription) -> list:
+        subscription.live = True
+        if subscription.cursor is None:
+            return []
+        return [item for item in self.history
+                if item[0].block_number >= self.history_from_block and subscription.matches(item[0])]
+
+    def unsubscribe(self, subscription: Subscription):
+        self.subscribers.discard(subscription)
+
+    async def _catch_up(self, subscription: Subscription):
+        """
+        Frames dos eventos anteriores ao histórico, buscados faixa a faixa
+
+        Repete enquanto o histórico avança durante a busca; a passagem para o
+        histórico e os eventos ao vivo (``_replay``) acontece logo após a
+        última verificação, sem ``await`` no meio.
+        """
+        position = subscription.cursor[0]
+        while position < self.history_from_block:
+            to_block = self.history_from_block - 1
+            async for records in self.backfill(position, to_block):
+                for record in records:
+                    if subscription.matches(record):
+                        subscription.delivered_to(record)
+                        yield sse_frame(record)
+            position = to_block + 1
+
+    async def events(self, subscription: Subscription, heartbeat: Optional[float] = None,
+                     replay: Optional[list] = None):
+        """
+        Gera os frames SSE do assinante: backfill, histórico e eventos ao vivo
+
+        ``replay`` é o retorno de ``subscribe`` quando o assinante já foi
+        registrado; sem ele o registro acontece aqui. Gera um comentário de
+        keepalive a cada ``heartbeat`` segundos sem eventos.
+        """
+        heartbeat = heartbeat or settings.STREAM_HEARTBEAT
+        if replay is None:
+            replay = self.subscribe(subscription)
+        try:
+            if not subscription.live:
+                async for frame in self._catch_up(subscription):
+                    yield frame
+                replay = self._replay(subscription)
+            for record, frame in replay:
+                if subscription.matches(record):
+                    subscription.delivered_to(record)
+                    yield frame
+            while True:
+                try:
+                    item = await asyncio.wait_for(subscription.queue.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if item is Subscription.EVICTED:
+                    cursor = subscription.cursor
+                    yield (f"event: evicted\ndata: "
+                           f"{json.dumps({'cursor': f'{cursor[0]}-{cursor[1]}' if cursor else None})}\n\n")
+                    return
+                record, frame = item
+                if record is None:
+                    # Aviso de reorg (o cursor do assinante já foi recuado em rollback)
+                    yield frame
+                elif subscription.matches(record):
+                    subscription.delivered_to(record)
+                    yield frame
+        finally:
+            self.unsubscribe(subscription)
+
+    def get_stats(self) -> dict:
+        """Retorna estatísticas do stream para debug"""
+        return {
+            "subscribers": len(self.subscribers),
+            "published": self.published,
+            "evictions": self.evictions,
+            "rollbacks": self.rollbacks,
+            "history": len(self.history),
+            "history_from_block": self.history_from_block,
+            "last_block": self.last_block,
+            "max_queue": max((s.queue.qsize() for s in self.subscribers), default=0)
+        }
@@ -0,0 +1,122 @@
+import asyncio
+import time
+import logging
+from collections import defaultdict
+from typing import Dict, Optional
+from web3 import AsyncWeb3
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+class GasPolicy:
+    """
+    Política de gas compartilhada por todos os signers do pool
+
+    Evita as chamadas ``eth_gasPrice`` e ``eth_estimateGas`` antes de cada
+    assinatura:
+
+    - Gas price: cacheado e renovado uma vez por bloco novo (bloco visto pelo
+      ReceiptWatcher) ou, sem bloco novo observado, após ``GAS_PRICE_TTL``
+    - Gas limit, por ordem de prioridade:
+      1. limite aprendido para o seletor da função (após out-of-gas)
+      2. limite fixo da operação em ``GAS_LIMITS`` (ex.: ``{"registration": 600000}``)
+      3. limite aprendido a partir da primeira estimativa × ``GAS_LIMIT_MARGIN``
+    - Estimativa só roda para semear um seletor novo ou após uma transação
+      revertida por falta de gas (``on_out_of_gas``)
+    """
+
+    def __init__(self, web3: AsyncWeb3, receipt_watcher=None, fixed_limits: Optional[Dict[str, int]] = None,
+                 margin: Optional[float] = None, price_ttl: Optional[float] = None):
+        self.web3 = web3
+        self.receipt_watcher = receipt_watcher
+        self.fixed_limits = dict(settings.GAS_LIMITS if fixed_limits is None else fixed_limits)
+        self.margin = margin or settings.GAS_LIMIT_MARGIN
+        self.price_ttl = settings.GAS_PRICE_TTL if price_ttl is None else price_ttl
+        self.learned: Dict[str, int] = {}
+        self._price: Optional[int] = None
+        self._price_block: Optional[int] = None
+        self._price_at = 0.0
+        self._price_lock = asyncio.Lock()
+        self._seed_locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self.price_fetches = 0
+        self.estimates = 0
+        self.out_of_gas = 0
+
+    def _current_block(self) -> Optional[int]:
+        return self.receipt_watcher.last_block if self.receipt_watcher is not None else None
+
+    def _price_is_fresh(self) -> bool:
+        if self._price is None:
+            return False
+        block = self._current_block()
+        if block is not None and block != self._price_block:
+            return False
+        return time.monotonic() - self._price_at < self.price_ttl
+
+    async def gas_price(self) -> int:
+        """Gas price do bloco atual (uma consulta RPC por bloco)"""
+        if self._price_is_fresh():
+            return self._price
+        async with self._price_lock:
+            if not self._price_is_fresh():
+                self._price = await self.web3.eth.gas_price
+                self._price_block = self._current_block()
+                self._price_at = time.monotonic()
+                self.price_fetches += 1
+            return self._price
+
+    async def _estimate(self, function_call, from_address: str) -> int:
+        self.estimates += 1
+        estimate = await function_call.estimate_gas({'from': from_address})
+        limit = int(estimate * self.margin)
+        self.learned[function_call.selector] = max(limit, self.learned.get(function_call.selector, 0))
+        logger.info(f"Gas limit aprendido para {function_call.fn_name}: {self.learned[function_call.selector]}")
+        return self.learned[function_call.selector]
+
+    async def gas_limit(self, function_call, from_address: str) -> int:
+        """Gas limit para a chamada, sem estimar se já houver limite aprendido ou fixo"""
+        learned = self.learned.get(function_call.selector)
+        if learned is not None:
+            return learned
+        fixed = self.fixed_limits.get(function_call.fn_name)
+        if fixed is not None:
+            return fixed
+        try:
+            # Requisições concorrentes do mesmo seletor compartilham uma estimativa
+            async with self._seed_locks[function_call.selector]:
+                if function_call.selector in self.learned:
+                    return self.learned[function_call.selector]
+                return await self._estimate(function_call, from_address)
+        except Exception as e:
+            # Simulação reverteu: usa o limite padrão e deixa o contrato responder
+            logger.warning(f"Estimativa de gas falhou para {function_call.fn_name}: {e}")
+            return settings.GAS_LIMIT
+
+    @staticmethod
+    def is_out_of_gas(receipt, gas_limit: int) -> bool:
+        """Revert que consumiu todo o gas disponível"""
+        return receipt["status"] == 0 and receipt["gasUsed"] >= gas_limit
+
+    async def on_out_of_gas(self, function_call, from_address: str) -> int:
+        """Reestima após um revert por falta de gas e retorna o novo limite"""
+        self.out_of_gas += 1
+        logger.warning(f"Transação {function_call.fn_name} reverteu por falta de gas; reestimando")
+        return await self._estimate(function_call, from_address)
+
+    def observe(self, function_call, receipt) -> None:
+        """Eleva o limite aprendido se uma transação bem-sucedida chegou perto dele"""
+        learned = self.learned.get(function_call.selector)
+        if learned is not None and receipt["status"] == 1:
+            self.learned[function_call.selector] = max(learned, int(receipt["gasUsed"] * self.margin))
+
+    def get_stats(self) -> dict:
+        """Retorna estatísticas da política para debug"""
+        return {
+            "gas_price": self._price,
+            "price_block": self._price_block,
+            "price_fetches": self.price_fetches,
+            "estimates": self.estimates,
+            "out_of_gas": self.out_of_gas,
+            "learned_limits": len(self.learned),
+            "fixed_limits": self.fixed_limits
+        }
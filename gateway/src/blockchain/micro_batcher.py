@@ -0,0 +1,163 @@
+import asyncio
+import time
+import logging
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+from config.settings import settings
+from .signer_pool import SignerPool
+
+logger = logging.getLogger(__name__)
+
+class MicroBatcher:
+    """
+    Agrupa chamadas concorrentes da mesma operação e conta num único lote
+
+    Cada chamada de ``submit`` entra na fila da chave (operação, conta) e
+    recebe um future com o seu próprio resultado. A fila é enviada como um lote
+    (``<operação>Batch`` com ``BATCH_ONCHAIN``, senão um batch JSON-RPC de
+    transações individuais) quando:
+
+    - atinge ``max_items``, ou
+    - passa o atraso adaptativo calculado na chegada do primeiro item
+
+    O atraso é o tempo estimado para encher o lote na taxa de chegada atual
+    (média móvel), limitado por ``window``. Com a fila ociosa a taxa é baixa e
+    o atraso é zero: o item sai no próximo ciclo do event loop. Sob carga a
+    taxa sobe e os lotes crescem até ``max_items``.
+    """
+
+    # Peso da última amostra na média móvel da taxa de chegada
+    RATE_ALPHA = 0.2
+    # Amostras de espera em fila mantidas para os percentis
+    WAIT_SAMPLES = 1000
+    # Limites superiores dos buckets do histograma de tamanho de lote
+    SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+    def __init__(self, get_signer: Callable, window_ms: Optional[float] = None, max_items: Optional[int] = None,
+                 onchain: Optional[bool] = None):
+        self.get_signer = get_signer
+        self.window = (settings.MICRO_BATCH_WINDOW_MS if window_ms is None else window_ms) / 1000
+        self.max_items = max_items or settings.MICRO_BATCH_MAX_ITEMS
+        self.onchain = settings.BATCH_ONCHAIN if onchain is None else onchain
+        self._queues: Dict[Tuple[str, Optional[str]], List[tuple]] = {}
+        self._timers: Dict[Tuple[str, Optional[str]], asyncio.TimerHandle] = {}
+        self._rates: Dict[Tuple[str, Optional[str]], float] = {}
+        self._last_arrival: Dict[Tuple[str, Optional[str]], float] = {}
+        self._tasks: set = set()
+        self.batches = 0
+        self.items = 0
+        self.size_histogram = {bucket: 0 for bucket in self.SIZE_BUCKETS}
+        self.waits = deque(maxlen=self.WAIT_SAMPLES)
+        self.last_delay = 0.0
+
+    def _update_rate(self, key, now: float) -> float:
+        last = self._last_arrival.get(key)
+        self._last_arrival[key] = now
+        if last is None:
+            return self._rates.setdefault(key, 0.0)
+        instant = 1 / max(now - last, 1e-6)
+        rate = self.RATE_ALPHA * instant + (1 - self.RATE_ALPHA) * self._rates.get(key, 0.0)
+        self._rates[key] = rate
+        return rate
+
+    def _delay(self, key, rate: float) -> float:
+        """Tempo estimado para encher o lote, limitado pela janela (0 se ocioso)"""
+        if rate * self.window < 1:
+            return 0.0
+        return min(self.window, (self.max_items - len(self._queues[key])) / rate)
+
+    async def submit(self, operation: str, private_key: Optional[str], payload: dict) -> dict:
+        """
+        Enfileira o item e aguarda o resultado do lote
+
+        Retorna ``{"receipt", "success", "error", "batch_size"}`` do item.
+        """
+        loop = asyncio.get_running_loop()
+        # Mesma conta na mesma fila, qualquer que seja a grafia da chave (sem chave: owner)
+        key = (operation, SignerPool.normalize_key(private_key or settings.OWNER_PRIVATE_KEY))
+        now = time.monotonic()
+        rate = self._update_rate(key, now)
+        future = loop.create_future()
+        queue = self._queues.setdefault(key, [])
+        queue.append((payload, future, now))
+
+        if len(queue) >= self.max_items:
+            self._flush(key)
+        elif len(queue) == 1:
+            self.last_delay = self._delay(key, rate)
+            self._timers[key] = loop.call_later(self.last_delay, self._flush, key)
+        return await future
+
+    def _flush(self, key):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        items = self._queues.pop(key, [])
+        if not items:
+            return
+        task = asyncio.get_running_loop().create_task(self._send(key, items))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, key, items: List[tuple]):
+        operation, private_key = key
+        started = time.monotonic()
+        self.batches += 1
+        self.items += len(items)
+        self.waits.extend(started - enqueued for _, _, enqueued in items)
+        for bucket in self.SIZE_BUCKETS:
+            if len(items) <= bucket:
+                self.size_histogram[bucket] += 1
+                break
+
+        try:
+            signer = self.get_signer(private_key)
+            payloads = [payload for payload, _, _ in items]
+            if self.onchain:
+                batch = await signer.send_onchain_batch(operation, payloads)
+                results = [
+                    {"receipt": batch["receipt"], "success": r["success"], "error": r["reason"]}
+                    for r in batch["results"]
+                ]
+            else:
+                sent = await signer.send_batch([signer.build_call(operation, p) for p in payloads])
+                results = [
+                    {"receipt": r["receipt"], "success": r["receipt"] is not None and r["receipt"]["status"] == 1,
+                     "error": r["error"]}
+                    for r in sent
+                ]
+        except Exception as e:
+            logger.error(f"Erro no lote agrupado {operation} ({len(items)} itens): {e}")
+            for _, future, _ in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future, _), result in zip(items, results):
+            if not future.done():
+                future.set_result(dict(result, batch_size=len(items)))
+        logger.debug(f"Lote agrupado {operation}: {len(items)} itens em {time.monotonic() - started:.3f}s")
+
+    def get_stats(self) -> dict:
+        """Retorna métricas de tamanho de lote e espera em fila"""
+        waits = sorted(self.waits)
+
+        def percentile(p):
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))] * 1000, 3) if waits else None
+
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else None,
+            "batch_size_histogram": {f"<={bucket}": count for bucket, count in self.size_histogram.items() if count},
+            "queue_wait_ms": {
+                "p50": percentile(0.5),
+                "p95": percentile(0.95),
+                "max": round(waits[-1] * 1000, 3) if waits else None
+            },
+            "window_ms": self.window * 1000,
+            "max_items": self.max_items,
+            "last_delay_ms": round(self.last_delay * 1000, 3),
+            "queued": sum(len(q) for q in self._queues.values()),
+            "onchain": self.onchain
+        }
@@ -1,8 +1,9 @@
 import asyncio
 import logging
-from typing import Optional, Set
-from web3 import Web3
+from typing import List, Optional, Set
+from web3 import AsyncWeb3
 from web3.exceptions import TransactionNotFound
+from config.settings import settings
 
 logger = logging.getLogger(__name__)
 
@@ -11,37 +12,122 @@ class NonceManager:
     Gerenciador de nonce para evitar conflitos em transações concorrentes
     
     O NonceManager resolve o problema de "fila de nonce" garantindo que:
-    1. Cada transação use um nonce único e sequencial
-    2. Transações não sejam enviadas antes da confirmação da anterior
-    3. Em caso de erro, o nonce seja resetado automaticamente
-    4. Múltiplas threads não conflitem ao usar a mesma conta
+    1. Cada transação use um nonce único e sequencial, alocado localmente
+       (sem ``eth_getTransactionCount`` por transação)
+    2. Várias transações da mesma conta fiquem em andamento ao mesmo tempo
+    3. Nonces de envios que falharam sejam reaproveitados (preenchimento de lacunas)
+    4. Em erro de nonce, o contador seja ressincronizado com a contagem ``pending`` da rede
+    
+    Opera sobre um AsyncWeb3: todas as chamadas RPC são aguardadas sem
+    bloquear o event loop.
     """
     
-    def __init__(self, web3: Web3, account_address: str):
+    # Mensagens de erro do nó que indicam nonce dessincronizado
+    NONCE_ERRORS = ("nonce", "replacement", "already known")
+    
+    def __init__(self, web3: AsyncWeb3, account_address: str, private_key: Optional[str] = None,
+                 receipt_watcher=None):
         self.web3 = web3
         self.account_address = account_address
+        self.private_key = private_key
+        self.receipt_watcher = receipt_watcher
         self.current_nonce: Optional[int] = None
+        self.gaps: Set[int] = set()
         self.pending_transactions: Set[str] = set()
         self.lock = asyncio.Lock()
+        self.allocated = 0
+        self.gaps_filled = 0
+        self.resyncs = 0
+    
+    @classmethod
+    def is_nonce_error(cls, error: Exception) -> bool:
+        error_msg = str(error).lower()
+        return any(marker in error_msg for marker in cls.NONCE_ERRORS)
+    
+    async def _fetch_pending_nonce(self) -> int:
+        return await self.web3.eth.get_transaction_count(self.account_address, 'pending')
     
     async def get_next_nonce(self) -> int:
         """
-        Obtém o próximo nonce disponível de forma thread-safe
+        Aloca o próximo nonce disponível de forma concorrente-segura
+        
+        Na primeira transação busca a contagem ``pending`` da rede. Depois,
+        reaproveita o menor nonce liberado por um envio que falhou ou
+        incrementa o contador local.
+        """
+        async with self.lock:
+            if self.current_nonce is None:
+                self.current_nonce = await self._fetch_pending_nonce()
+                logger.info(f"Nonce inicial obtido da rede: {self.current_nonce}")
+            self.allocated += 1
+            if self.gaps:
+                nonce = min(self.gaps)
+                self.gaps.discard(nonce)
+                self.gaps_filled += 1
+                logger.debug(f"Lacuna de nonce preenchida: {nonce}")
+                return nonce
+            nonce = self.current_nonce
+            self.current_nonce += 1
+            return nonce
+    
+    async def get_nonces(self, count: int) -> List[int]:
+        """
+        Aloca ``count`` nonces de uma vez (envio em lote)
         
-        Se é a primeira transação, busca da rede.
-        Se não, incrementa o nonce local.
+        Lacunas pendentes são preenchidas primeiro; o restante é uma faixa
+        consecutiva do contador local.
         """
         async with self.lock:
             if self.current_nonce is None:
-                # Primeira transação: busca da rede
-                self.current_nonce = await self.web3.eth.get_transaction_count(self.account_address)
+                self.current_nonce = await self._fetch_pending_nonce()
                 logger.info(f"Nonce inicial obtido da rede: {self.current_nonce}")
+            nonces = sorted(self.gaps)[:count]
+            self.gaps.difference_update(nonces)
+            self.gaps_filled += len(nonces)
+            remaining = count - len(nonces)
+            nonces.extend(range(self.current_nonce, self.current_nonce + remaining))
+            self.current_nonce += remaining
+            self.allocated += count
+            return nonces
+    
+    async def release_nonce(self, nonce: int) -> None:
+        """
+        Devolve um nonce cuja transação não chegou ao nó
+        
+        Se for o último alocado, o contador recua; senão vira uma lacuna a ser
+        preenchida pela próxima transação (as de nonce maior ficam presas no
+        txpool até lá).
+        """
+        async with self.lock:
+            if self.current_nonce is None or nonce >= self.current_nonce:
+                return
+            if nonce == self.current_nonce - 1:
+                self.current_nonce = nonce
+                while self.current_nonce - 1 in self.gaps:
+                    self.current_nonce -= 1
+                    self.gaps.discard(self.current_nonce)
             else:
-                # Transações subsequentes: incrementa localmente
-                self.current_nonce += 1
-                logger.debug(f"Nonce incrementado para: {self.current_nonce}")
-            
-            return self.current_nonce
+                self.gaps.add(nonce)
+                logger.warning(f"Lacuna de nonce registrada: {nonce}")
+    
+    async def send_with_nonce(self, send, max_retries: int = 3):
+        """
+        Aloca um nonce e executa ``send(nonce)`` (que constrói, assina e envia)
+        
+        - Erro de nonce: ressincroniza com a rede e tenta com um novo nonce
+        - Outro erro: devolve o nonce (lacuna) e propaga a exceção
+        """
+        for attempt in range(max_retries):
+            nonce = await self.get_next_nonce()
+            try:
+                return await send(nonce)
+            except Exception as e:
+                if self.is_nonce_error(e) and attempt < max_retries - 1:
+                    logger.warning(f"Erro de nonce {nonce} na tentativa {attempt + 1}: {e}")
+                    await self.reset_nonce()
+                    continue
+                await self.release_nonce(nonce)
+                raise
     
     async def mark_transaction_pending(self, tx_hash: str) -> None:
         """Marca uma transação como pendente para evitar duplicatas"""
@@ -63,7 +149,16 @@ class NonceManager:
         - Block time pode ser 1-15 segundos
         - Rede pode estar congestionada
         - Transação pode falhar e precisar ser reenviada
+        
+        Com um ReceiptWatcher a espera é resolvida pelo polling compartilhado,
+        sem loop de tentativas por transação.
         """
+        if self.receipt_watcher is not None:
+            receipt = await self.receipt_watcher.wait(tx_hash, timeout=60 * max_attempts)
+            await self.mark_transaction_confirmed(tx_hash)
+            logger.info(f"Transação {tx_hash} confirmada no bloco {receipt['blockNumber']}")
+            return receipt
+        
         for attempt in range(max_attempts):
             try:
                 receipt = await self.web3.eth.wait_for_transaction_receipt(tx_hash, timeout=60)
@@ -78,22 +173,30 @@ class NonceManager:
     
     async def reset_nonce(self) -> None:
         """
-        Reseta o nonce para o valor atual da rede
+        Ressincroniza o nonce com a contagem ``pending`` da rede
         
         Usado quando:
         - Ocorre erro de nonce
-        - Transação anterior falhou
+        - Outra instância enviou transações pela mesma conta
         - Rede foi resetada
+        
+        Todas as lacunas são descartadas: as abaixo do novo valor já foram
+        ocupadas na rede e as acima voltam a ser alocadas pelo contador.
         """
         async with self.lock:
-            self.current_nonce = await self.web3.eth.get_transaction_count(self.account_address)
-            self.pending_transactions.clear()
-            logger.info(f"Nonce resetado para: {self.current_nonce}")
+            self.current_nonce = await self._fetch_pending_nonce()
+            self.gaps.clear()
+            self.resyncs += 1
+            logger.info(f"Nonce ressincronizado para: {self.current_nonce}")
     
     def get_stats(self) -> dict:
         """Retorna estatísticas do gerenciador para debug"""
         return {
             "current_nonce": self.current_nonce,
+            "gaps": sorted(self.gaps),
+            "allocated": self.allocated,
+            "gaps_filled": self.gaps_filled,
+            "resyncs": self.resyncs,
             "pending_transactions": len(self.pending_transactions),
             "account_address": self.account_address
         }
@@ -102,50 +205,21 @@ class NonceManager:
         """
         Envia uma transação com retry automático em caso de erro de nonce
         
-        Este é o método principal que resolve o problema de fila de nonce:
-        
-        1. Obtém nonce único
-        2. Envia transação
-        3. Aguarda confirmação
-        4. Se falhar por nonce, reseta e tenta novamente
-        5. Usa exponential backoff para evitar spam
+        1. Aloca nonce único (local)
+        2. Constrói, assina e envia
+        3. Se falhar por nonce, ressincroniza e tenta novamente
+        4. Aguarda confirmação
         """
-        for attempt in range(max_retries):
-            try:
-                # 1. Obter nonce único
-                nonce = await self.get_next_nonce()
-                
-                # 2. Construir transação
-                tx = transaction_builder.build_transaction({
-                    'from': self.account_address,
-                    'nonce': nonce,
-                    'gasPrice': await self.web3.eth.gas_price,
-                    'chainId': await self.web3.eth.chain_id
-                })
-                
-                # 3. Assinar e enviar transação
-                signed_tx = self.web3.eth.account.sign_transaction(tx, self.web3.eth.account.from_key(tx['privateKey']))
-                tx_hash = await self.web3.eth.send_raw_transaction(signed_tx.rawTransaction)
-                
-                # 4. Marcar como pendente
-                await self.mark_transaction_pending(tx_hash.hex())
-                
-                # 5. Aguardar confirmação
-                receipt = await self.wait_for_transaction_confirmation(tx_hash.hex())
-                return receipt
-                
-            except Exception as e:
-                error_msg = str(e).lower()
-                
-                # Detectar erros de nonce
-                if "nonce" in error_msg or "replacement" in error_msg or "already known" in error_msg:
-                    logger.warning(f"Erro de nonce na tentativa {attempt + 1}: {e}")
-                    if attempt < max_retries - 1:
-                        await self.reset_nonce()  # Reset nonce
-                        await asyncio.sleep(2 ** attempt)  # Exponential backoff
-                        continue
-                
-                # Outros erros: re-raise
-                raise e
+        async def send(nonce):
+            tx = await transaction_builder.build_transaction({
+                'from': self.account_address,
+                'nonce': nonce,
+                'gasPrice': await self.web3.eth.gas_price,
+                'chainId': settings.CHAIN_ID
+            })
+            signed_tx = self.web3.eth.account.sign_transaction(tx, self.private_key)
+            return await self.web3.eth.send_raw_transaction(signed_tx.raw_transaction)
         
-        raise Exception(f"Falha ao enviar transação após {max_retries} tentativas") 
\ No newline at end of file
+        tx_hash = await self.send_with_nonce(send, max_retries)
+        await self.mark_transaction_pending(tx_hash.hex())
+        return await self.wait_for_transaction_confirmation(tx_hash.hex())
@@ -0,0 +1,71 @@
+import time
+import logging
+from collections import OrderedDict
+from typing import Optional, List
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+class ReceiptCache:
+    """
+    Cache limitado do status das transações enviadas pelo gateway
+
+    Alimenta o modo fire-and-track: a transação é registrada como ``pending``
+    assim que ``send_raw_transaction`` retorna e passa a ``mined`` ou
+    ``reverted`` quando o recibo é obtido. Status finais não mudam, então
+    consultas repetidas não geram novas chamadas RPC.
+    """
+
+    PENDING = "pending"
+    MINED = "mined"
+    REVERTED = "reverted"
+
+    def __init__(self, max_size: Optional[int] = None):
+        self.max_size = max_size or settings.RECEIPT_CACHE_SIZE
+        self._entries: OrderedDict = OrderedDict()
+
+    @staticmethod
+    def normalize(tx_hash) -> str:
+        """Normaliza o hash (bytes, HexBytes ou str com/sem 0x) para hex minúsculo sem prefixo"""
+        if isinstance(tx_hash, (bytes, bytearray)):
+            return bytes(tx_hash).hex()
+        tx_hash = str(tx_hash).lower()
+        return tx_hash[2:] if tx_hash.startswith("0x") else tx_hash
+
+    def _store(self, key: str, entry: dict) -> dict:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return entry
+
+    def track(self, tx_hash) -> dict:
+        """Registra uma transação recém-enviada como pendente"""
+        key = self.normalize(tx_hash)
+        return self._store(key, {
+            "status": self.PENDING,
+            "block_number": None,
+            "gas_used": None,
+            "submitted_at": time.time()
+        })
+
+    def resolve(self, receipt) -> dict:
+        """Atualiza o status a partir do recibo minerado"""
+        key = self.normalize(receipt["transactionHash"])
+        previous = self._entries.get(key, {})
+        return self._store(key, {
+            "status": self.MINED if receipt["status"] == 1 else self.REVERTED,
+            "block_number": receipt["blockNumber"],
+            "gas_used": receipt["gasUsed"],
+            "submitted_at": previous.get("submitted_at")
+        })
+
+    def get(self, tx_hash) -> Optional[dict]:
+        return self._entries.get(self.normalize(tx_hash))
+
+    def pending(self) -> List[str]:
+        """Hashes ainda pendentes"""
+        return [key for key, entry in self._entries.items() if entry["status"] == self.PENDING]
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,190 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+from web3 import AsyncWeb3
+from config.settings import settings
+from .receipt_cache import ReceiptCache
+
+logger = logging.getLogger(__name__)
+
+class ReceiptWatcher:
+    """
+    Observador único de recibos para todas as transações em andamento
+
+    Em vez de cada requisição fazer seu próprio polling de recibo, uma única
+    tarefa em background:
+
+    1. Consulta ``eth_blockNumber`` a cada ``RECEIPT_POLL_INTERVAL``
+    2. A cada bloco novo consulta os recibos de todos os hashes pendentes num
+       único batch JSON-RPC bruto (recibo nulo = ainda não minerada)
+    3. Busca os recibos das mineradas num batch do web3
+       (``eth.get_transaction_receipt``), que aplica os formatadores de
+       resultado do próprio web3, e resolve o future de cada hash (e
+       atualiza o ReceiptCache)
+
+    A carga RPC cresce com a taxa de blocos, não com a concorrência, e a
+    confirmação chega no máximo um intervalo de polling após a inclusão.
+    Hashes novos são verificados no próximo ciclo mesmo sem bloco novo, para
+    cobrir transações mineradas antes de serem registradas no watcher.
+    """
+
+    # Limite de itens por batch (Besu: --rpc-http-max-batch-size, padrão 1024)
+    MAX_BATCH_SIZE = 1000
+    # Hashes não minerados após este tempo (s) deixam de ser observados
+    WATCH_TTL = 600
+
+    def __init__(self, web3: AsyncWeb3, receipt_cache: Optional[ReceiptCache] = None,
+                 poll_interval: Optional[float] = None):
+        self.web3 = web3
+        self.receipt_cache = receipt_cache
+        self.poll_interval = poll_interval or settings.RECEIPT_POLL_INTERVAL
+        self._futures: Dict[str, asyncio.Future] = {}
+        self._watched_at: Dict[str, float] = {}
+        self._fresh: set = set()
+        self._last_block: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop = None
+        self.polls = 0
+        self.batches = 0
+        self.receipts_requested = 0
+        self.resolved = 0
+
+    @property
+    def last_block(self) -> Optional[int]:
+        """Último bloco observado pelo polling"""
+        return self._last_block
+
+    def _ensure_running(self):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            if self._loop is not loop:
+                # Futures de outro event loop não podem mais ser resolvidos
+                self._futures.clear()
+                self._watched_at.clear()
+                self._fresh.clear()
+            self._loop = loop
+            self._task = loop.create_task(self._run())
+
+    def watch(self, tx_hash) -> asyncio.Future:
+        """Registra o hash e retorna o future que recebe o recibo"""
+        self._ensure_running()
+        key = ReceiptCache.normalize(tx_hash)
+        future = self._futures.get(key)
+        if future is None:
+            future = self._loop.create_future()
+            # Evita aviso de exceção não consumida em hashes sem ninguém aguardando
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+            self._futures[key] = future
+            self._watched_at[key] = time.monotonic()
+            self._fresh.add(key)
+        return future
+
+    async def wait(self, tx_hash, timeout: float = 120):
+        """Aguarda o recibo da transação (compartilhando o polling com as demais)"""
+        try:
+            return await asyncio.wait_for(asyncio.shield(self.watch(tx_hash)), timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Transação {ReceiptCache.normalize(tx_hash)} não foi minerada em {timeout}s")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def close(self):
+        """Encerra o polling e cancela os futures ainda pendentes (ninguém mais os resolverá)"""
+        await self.stop()
+        for future in self._futures.values():
+            if not future.done():
+                future.cancel()
+        self._futures.clear()
+        self._watched_at.clear()
+        self._fresh.clear()
+
+    async def _run(self):
+        while True:
+            try:
+                if self._futures:
+                    await self._poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Erro no polling de recibos: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def _poll(self):
+        self.polls += 1
+        block = await self.web3.eth.block_number
+        if block != self._last_block:
+            self._last_block = block
+            hashes = list(self._futures)
+        else:
+            hashes = [h for h in self._fresh if h in self._futures]
+        self._fresh.clear()
+
+        for start in range(0, len(hashes), self.MAX_BATCH_SIZE):
+            chunk = hashes[start:start + self.MAX_BATCH_SIZE]
+            responses = await self.web3.provider.make_batch_request(
+                [("eth_getTransactionReceipt", ["0x" + h]) for h in chunk]
+            )
+            self.batches += 1
+            self.receipts_requested += len(chunk)
+            mined = []
+            for tx_hash, response in zip(chunk, responses):
+                if "error" in response:
+                    logger.warning(f"Erro ao obter recibo {tx_hash}: {response['error']}")
+                elif response.get("result") is not None:
+                    mined.append(tx_hash)
+            if mined:
+                await self._fetch_receipts(mined)
+
+        self._expire()
+
+    async def _fetch_receipts(self, hashes):
+        """
+        Recibos formatados pelo web3 das transações já mineradas
+
+        O batch do web3 falha inteiro (TransactionNotFound) se um recibo vier
+        nulo, por isso só recebe os hashes que a consulta bruta achou.
+        """
+        async with self.web3.batch_requests() as batch:
+            for tx_hash in hashes:
+                batch.add(self.web3.eth.get_transaction_receipt("0x" + tx_hash))
+            receipts = await batch.async_execute()
+        self.batches += 1
+        self.receipts_requested += len(hashes)
+        for tx_hash, receipt in zip(hashes, receipts):
+            self._resolve(tx_hash, receipt)
+
+    def _resolve(self, tx_hash: str, receipt):
+        if self.receipt_cache is not None:
+            self.receipt_cache.resolve(receipt)
+        self._watched_at.pop(tx_hash, None)
+        future = self._futures.pop(tx_hash, None)
+        if future is not None and not future.done():
+            future.set_result(receipt)
+        self.resolved += 1
+
+    def _expire(self):
+        deadline = time.monotonic() - self.WATCH_TTL
+        for tx_hash in [h for h, t in self._watched_at.items() if t < deadline]:
+            self._watched_at.pop(tx_hash)
+            future = self._futures.pop(tx_hash, None)
+            if future is not None and not future.done():
+                future.set_exception(TimeoutError(f"Transação {tx_hash} não foi minerada em {self.WATCH_TTL}s"))
+
+    def get_stats(self) -> dict:
+        """Retorna estatísticas do watcher para debug"""
+        return {
+            "pending": len(self._futures),
+            "last_block": self._last_block,
+            "polls": self.polls,
+            "batches": self.batches,
+            "receipts_requested": self.receipts_requested,
+            "resolved": self.resolved
+        }
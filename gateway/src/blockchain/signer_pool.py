@@ -0,0 +1,101 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional, Type
+from config.settings import settings
+from .blockchain import Blockchain, load_contract_abi
+
+logger = logging.getLogger(__name__)
+
+class SignerPool:
+    """
+    Pool de contextos de assinatura reutilizáveis
+
+    Antes cada requisição de escrita criava um ``Blockchain(private_key)``, o que
+    significava um novo HTTPProvider, um ``is_connected()``, o parse do ABI,
+    ``from_key`` e uma nova instância do contrato. O pool mantém:
+
+    1. Um único provider Web3 e um único objeto de contrato compartilhados
+    2. Um LRU limitado de contextos por chave (conta + NonceManager)
+    3. Remoção do contexto menos usado quando o limite é atingido
+
+    ``signer_class`` define o tipo de contexto: ``Blockchain`` (Web3 síncrono) ou
+    ``AsyncBlockchain`` (AsyncWeb3), que também fornece o provider compartilhado.
+    """
+
+    def __init__(self, web3=None, max_size: Optional[int] = None, signer_class: Type = Blockchain, **shared):
+        self.signer_class = signer_class
+        # Demais recursos compartilhados repassados a todo contexto (ex.: receipt_watcher)
+        self.shared = shared
+        self.web3 = web3 or signer_class.create_web3()
+        self.contract = self.web3.eth.contract(
+            address=settings.CONTRACT_ADDRESS,
+            abi=load_contract_abi()
+        )
+        self.max_size = max_size or settings.SIGNER_POOL_SIZE
+        self._signers: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        logger.info(f"SignerPool ({signer_class.__name__}) para {settings.RPC_URL} (máx. {self.max_size} contas)")
+
+    @staticmethod
+    def normalize_key(private_key: str) -> str:
+        """
+        Chave em hex minúsculo, sem ``0x``: grafias diferentes da mesma chave
+        compartilham o contexto (e o NonceManager da conta)
+        """
+        key = private_key.strip()
+        if key[:2] in ("0x", "0X"):
+            key = key[2:]
+        return key.lower()
+
+    def get(self, private_key: Optional[str] = None):
+        """Obtém (ou cria) o contexto de assinatura da chave; sem chave usa o owner"""
+        key = self.normalize_key(private_key or settings.OWNER_PRIVATE_KEY)
+        with self._lock:
+            signer = self._signers.get(key)
+            if signer is not None:
+                self._signers.move_to_end(key)
+                self.hits += 1
+                return signer
+            self.misses += 1
+
+        # from_key fica fora do lock para não serializar contas diferentes
+        signer = self.signer_class("0x" + key, web3=self.web3, contract=self.contract, **self.shared)
+
+        with self._lock:
+            existing = self._signers.get(key)
+            if existing is not None:
+                # Outra requisição criou o contexto em paralelo: manter o primeiro
+                # para que o estado de nonce seja único por conta
+                self._signers.move_to_end(key)
+                return existing
+            self._signers[key] = signer
+            while len(self._signers) > self.max_size:
+                _, evicted = self._signers.popitem(last=False)
+                self.evictions += 1
+                logger.debug(f"Contexto da conta {evicted.account.address} removido do pool")
+        return signer
+
+    async def close(self):
+        """Fecha as sessões HTTP do provider compartilhado (providers síncronos não têm o que fechar)"""
+        disconnect = getattr(self.web3.provider, "disconnect", None)
+        if disconnect is not None:
+            await disconnect()
+        with self._lock:
+            self._signers.clear()
+
+    def __len__(self):
+        return len(self._signers)
+
+    def get_stats(self) -> dict:
+        """Retorna estatísticas do pool para debug"""
+        return {
+            "size": len(self._signers),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
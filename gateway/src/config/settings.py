@@ -15,6 +15,77 @@ class Settings(BaseSettings):
     OWNER_PRIVATE_KEY: str = "0xac0974bec39a17e36ba4a6b4d238ff944bacb478cbed5efcae784d7bf4f2ff80"
     CHAIN_ID: int = 1337
     GAS_LIMIT: int = 3000000
+    SIGNER_POOL_SIZE: int = 256
+    
+    # Política de gas: limites fixos por operação (JSON), margem sobre estimativas
+    # e validade máxima (s) do gas price cacheado por bloco
+    GAS_LIMITS: dict = {}
+    GAS_LIMIT_MARGIN: float = 1.2
+    GAS_PRICE_TTL: float = 5.0
+    
+    # Fire-and-track: endpoints de escrita respondem 202 logo após o envio
+    FIRE_AND_TRACK: bool = False
+    RECEIPT_CACHE_SIZE: int = 100000
+    RECEIPT_POLL_INTERVAL: float = 0.5
+    
+    # Chamadas RPC concorrentes agrupadas em batches JSON-RPC (0 ms = mesmo ciclo do event loop)
+    RPC_BATCHING: bool = True
+    RPC_BATCH_WINDOW_MS: float = 0
+    
+    # Máximo de itens por lote (registrationRequest, grantRequest, ...)
+    BATCH_MAX_SIZE: int = 500
+    # Lote como uma única transação (registrationBatch, grantBatch, ...) em vez de uma por item
+    BATCH_ONCHAIN: bool = False
+    
+    # Micro-batching: chamadas individuais concorrentes são agrupadas em lotes
+    MICRO_BATCH_ENABLED: bool = False
+    MICRO_BATCH_WINDOW_MS: float = 20
+    MICRO_BATCH_MAX_ITEMS: int = 64
+    
+    # Indexador de eventos: mantém o repositório em memória (consultas de CBSD/grant sem RPC)
+    INDEXER_ENABLED: bool = True
+    INDEXER_START_BLOCK: int = 0
+    INDEXER_POLL_INTERVAL: float = 1.0
+    INDEXER_CHUNK_SIZE: int = 2000
+    # Backfill: buscas paralelas, faixa adaptativa (até MAX) mirando TARGET_LOGS logs por resposta
+    INDEXER_BACKFILL_WORKERS: int = 4
+    INDEXER_MAX_CHUNK_SIZE: int = 100000
+    INDEXER_TARGET_LOGS: int = 5000
+    INDEXER_PROGRESS_INTERVAL: float = 10.0
+    # Profundidade de confirmação: eventos dos últimos N blocos podem ser desfeitos em reorg (0 = desliga)
+    INDEXER_CONFIRMATIONS: int = 12
+    # Pipeline de handlers: partições por CBSD (ordem mantida em cada uma), eventos por lote, resumo do log (s)
+    HANDLER_PARTITIONS: int = 8
+    HANDLER_BATCH_SIZE: int = 500
+    HANDLER_LOG_INTERVAL: float = 10.0
+    # Intervalo mínimo (s) entre consultas do bloco atual em /events/recent (resposta em cache por bloco)
+    RECENT_EVENTS_BLOCK_TTL: float = 1.0
+    # Streaming de eventos (SSE): buffer por assinante, histórico para retomada por cursor
+    STREAM_BUFFER_SIZE: int = 1000
+    STREAM_HISTORY_SIZE: int = 10000
+    STREAM_HEARTBEAT: float = 15.0
+    STREAM_MAX_SUBSCRIBERS: int = 1000
+    # Blocos antes do histórico que um cursor de retomada pode buscar no nó (mais antigos: 410)
+    STREAM_MAX_BACKFILL_BLOCKS: int = 100000
+    # Índice persistente em SQLite (vazio = somente em memória, reconstruído a cada início)
+    INDEX_DB_PATH: str = ""
+    # Repositório em memória: grants em colunas (arrays) em vez de um objeto por grant
+    REPOSITORY_COLUMNAR_GRANTS: bool = False
+    # Paginação das consultas por índice (/v1.3/cbsds, /v1.3/grants): padrão e máximo por página
+    QUERY_PAGE_SIZE: int = 100
+    QUERY_MAX_PAGE_SIZE: int = 1000
+    # Lado (graus) das células do índice espacial dos CBSDs (/v1.3/cbsds/near e /within)
+    SPATIAL_CELL_DEGREES: float = 0.1
+    # Raio máximo (km) de /v1.3/cbsds/near
+    QUERY_MAX_RADIUS_KM: float = 1000.0
+    # Conflitos co-canal: raio (km) em que grants de SAS diferentes com faixas sobrepostas
+    # conflitam, conflitos por aviso no stream e atraso máximo (blocos atrás da cabeça da
+    # cadeia) para verificar um GrantCreated indexado (0 = sempre, inclusive no replay)
+    CONFLICT_RADIUS_KM: float = 40.0
+    CONFLICT_MAX_REPORTED: int = 100
+    CONFLICT_CHECK_MAX_LAG: int = 1000
+    # Tamanho (bytes) de cada parte do /v1.2/fullActivityDump
+    DUMP_CHUNK_SIZE: int = 65536
     
     # API settings
     API_HOST: str = "0.0.0.0"
@@ -0,0 +1,125 @@
+# Verificação de conflitos co-canal dos grants criados, publicados num stream próprio
+import logging
+import time
+from typing import Callable, List, NamedTuple, Optional
+from blockchain.event_decoder import GrantCreated
+from config.settings import settings
+from repository.conflicts import Conflict
+
+logger = logging.getLogger(__name__)
+
+class GrantConflicts(NamedTuple):
+    """Conflitos de um GrantCreated: metadados do log do evento (mesmo cursor) e os grants conflitantes"""
+    block_number: int
+    log_index: int
+    transaction_hash: bytes
+    cbsd_key: bytes
+    fcc_id: str
+    serial_number: str
+    grant_id: str
+    sas_origin: str
+    low_frequency: int
+    high_frequency: int
+    max_eirp: int
+    conflict_count: int
+    # Os CONFLICT_MAX_REPORTED mais próximos, já no formato JSON (``conflict_json``)
+    conflicts: list
+
+def conflict_json(conflict: Conflict) -> dict:
+    return {
+        "cbsdKey": "0x" + conflict.cbsd_id,
+        "grantId": conflict.grant_id,
+        "sasOrigin": conflict.sas_origin,
+        "lowFrequency": conflict.low_frequency,
+        "highFrequency": conflict.high_frequency,
+        "maxEirp": conflict.max_eirp,
+        "distanceKm": round(conflict.distance_km, 3)
+    }
+
+class ConflictMonitor:
+    """
+    Verifica os conflitos co-canal de cada GrantCreated indexado
+
+    Listener do EventIndexer: roda depois que a faixa de blocos foi gravada,
+    contra o estado já aplicado, e consulta ``repository.find_conflicts``
+    (uma passada vetorizada sobre as colunas dos grants ativos da vizinhança)
+    para cada GrantCreated. Grants com conflito geram um ``GrantConflicts``,
+    entregue ao ``broadcaster`` (stream ``/v1.3/conflicts/stream``).
+
+    Eventos a mais de ``CONFLICT_CHECK_MAX_LAG`` blocos da cabeça da cadeia
+    (``head``), como no replay do histórico, não são verificados: os
+    conflitos desses grants continuam consultáveis pela API.
+
+    A verificação é por faixa, não por evento: cada GrantCreated é comparado
+    com os grants ativos ao fim da faixa aplicada. Um grant já encerrado
+    (ou sem faixa/localização) nesse ponto é pulado (``inactive``), e os
+    conflitos de um grant incluem os grants criados depois dele na mesma
+    faixa (o par também aparece no GrantCreated do grant mais novo).
+    Verificar dentro do pipeline, evento a evento, dependeria da ordem entre
+    as partições, que aplicam CBSDs diferentes concorrentemente.
+    """
+
+    def __init__(self, repository, broadcaster=None, head: Optional[Callable[[], Optional[int]]] = None,
+                 radius_km: Optional[float] = None, max_lag: Optional[int] = None,
+                 max_reported: Optional[int] = None):
+        self.repository = repository
+        self.broadcaster = broadcaster
+        self.head = head
+        self.radius_km = settings.CONFLICT_RADIUS_KM if radius_km is None else radius_km
+        self.max_lag = settings.CONFLICT_CHECK_MAX_LAG if max_lag is None else max_lag
+        self.max_reported = max_reported or settings.CONFLICT_MAX_REPORTED
+        self.checks = 0
+        self.skipped = 0
+        self.inactive = 0
+        self.conflicting_grants = 0
+        self.check_time = 0.0
+
+    def check(self, record: GrantCreated) -> Optional[GrantConflicts]:
+        """Conflitos do grant criado, ou None se não há nenhum"""
+        conflicts = self.repository.find_conflicts(record.cbsd_key.hex(), record.grant_id, self.radius_km)
+        if not conflicts:
+            return None
+        return GrantConflicts(record.block_number, record.log_index, record.transaction_hash, record.cbsd_key,
+                              record.fcc_id, record.serial_number, record.grant_id, record.sas_origin,
+                              record.low_frequency, record.high_frequency, record.max_eirp, len(conflicts),
+                              [conflict_json(conflict) for conflict in conflicts[:self.max_reported]])
+
+    def __call__(self, records, last_block: int):
+        head = self.head() if self.head is not None else None
+        found: List[GrantConflicts] = []
+        start = time.perf_counter()
+        for record in records:
+            if not isinstance(record, GrantCreated):
+                continue
+            if self.max_lag and head is not None and head - record.block_number > self.max_lag:
+                self.skipped += 1
+                continue
+            if (record.cbsd_key.hex(), record.grant_id) not in self.repository.active_grants:
+                self.inactive += 1
+                continue
+            self.checks += 1
+            try:
+                result = self.check(record)
+            except Exception as e:
+                logger.warning(f"Erro ao verificar conflitos do grant {record.grant_id}: {e}")
+                continue
+            if result is not None:
+                found.append(result)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"Grant {record.grant_id} ({record.fcc_id}/{record.serial_number}) conflita com "
+                                 f"{result.conflict_count} grants de outros SAS")
+        self.check_time += time.perf_counter() - start
+        self.conflicting_grants += len(found)
+        if self.broadcaster is not None:
+            self.broadcaster.publish(found, last_block)
+
+    def get_stats(self) -> dict:
+        """Retorna estatísticas da verificação de conflitos para debug"""
+        return {
+            "radius_km": self.radius_km,
+            "checks": self.checks,
+            "skipped": self.skipped,
+            "inactive": self.inactive,
+            "conflicting_grants": self.conflicting_grants,
+            "avg_check_ms": round(self.check_time / self.checks * 1000, 3) if self.checks else None
+        }
@@ -1,95 +1,98 @@
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, List
+from web3 import Web3
+from handlers.pipeline import ThrottledLog, batch_handler
 from repository.repository import CBSDRepository
+from repository.sqlite_repository import SQLiteCBSDRepository
+from config.settings import settings
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Instância global do repositório
-repo = CBSDRepository()
+# Instância global do repositório (persistente se INDEX_DB_PATH estiver definido)
+repo = SQLiteCBSDRepository(settings.INDEX_DB_PATH) if settings.INDEX_DB_PATH else CBSDRepository()
 
-def handle_sas_authorized(event: Dict[str, Any]):
-    """Handler para evento SASAuthorized"""
-    sas_address = event['args']['sas']
-    logger.info(f"SAS autorizado: {sas_address}")
-    # Adicione lógica específica para SAS autorizado
+# Contagem periódica dos eventos aplicados (uma linha por evento só em DEBUG)
+event_log = ThrottledLog(logger)
 
-def handle_sas_revoked(event: Dict[str, Any]):
-    """Handler para evento SASRevoked"""
-    sas_address = event['args']['sas']
-    logger.info(f"SAS revogado: {sas_address}")
-    # Adicione lógica específica para SAS revogado
+@batch_handler
+def handle_sas_authorized(records: List):
+    """Handler para lotes de SASAuthorized"""
+    for record in records:
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"SAS autorizado: {record.sas}")
+        repo.set_sas(record.sas, True)
+    event_log.count('SASAuthorized', len(records))
 
-def handle_cbsd_registered(event: Dict[str, Any]):
-    """Handler para evento CBSDRegistered"""
-    fcc_id = event['args']['fccId']
-    serial_number = event['args']['serialNumber']
-    sas_origin = event['args']['sasOrigin']
-    
-    # Gerar ID único do CBSD (fccId + serialNumber)
-    cbsd_id = f"{fcc_id}_{serial_number}"
-    
-    logger.info(f"Novo CBSD registrado - FCC ID: {fcc_id}, Serial: {serial_number}, SAS Origin: {sas_origin}")
-    
-    # Armazenar no repositório
-    repo.add(cbsd_id, {
-        'fcc_id': fcc_id,
-        'serial_number': serial_number,
-        'sas_origin': sas_origin,
-        'status': 'registered',
-        'block_number': event['blockNumber'],
-        'transaction_hash': event['transactionHash']
-    })
+@batch_handler
+def handle_sas_revoked(records: List):
+    """Handler para lotes de SASRevoked"""
+    for record in records:
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"SAS revogado: {record.sas}")
+        repo.set_sas(record.sas, False)
+    event_log.count('SASRevoked', len(records))
 
-def handle_grant_created(event: Dict[str, Any]):
-    """Handler para evento GrantCreated"""
-    fcc_id = event['args']['fccId']
-    serial_number = event['args']['serialNumber']
-    grant_id = event['args']['grantId']
-    sas_origin = event['args']['sasOrigin']
-    
-    cbsd_id = f"{fcc_id}_{serial_number}"
-    
-    logger.info(f"Novo grant criado - FCC ID: {fcc_id}, Serial: {serial_number}, "
-                f"Grant ID: {grant_id}, SAS: {sas_origin}")
-    
-    # Atualizar no repositório
-    cbsd_data = repo.get(cbsd_id)
-    if cbsd_data:
-        if 'grants' not in cbsd_data:
-            cbsd_data['grants'] = []
-        
-        cbsd_data['grants'].append({
-            'grant_id': grant_id,
-            'sas_origin': sas_origin,
-            'created_at': event['blockNumber'],
-            'transaction_hash': event['transactionHash']
+@batch_handler
+def handle_cbsd_registered(records: List):
+    """Handler para lotes de CBSDRegistered"""
+    for record in records:
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Novo CBSD registrado - CBSD: {record.fcc_id}/{record.serial_number}, "
+                         f"SAS Origin: {record.sas_origin}")
+        # ID único do CBSD: a chave do contrato (cbsdKey, tópico indexado do evento)
+        repo.add_cbsd(record.cbsd_key.hex(), {
+            'fcc_id': record.fcc_id,
+            'serial_number': record.serial_number,
+            'sas_origin': record.sas_origin,
+            'status': 'registered',
+            'block_number': record.block_number,
+            'transaction_hash': Web3.to_hex(record.transaction_hash),
+            'latitude': record.latitude,
+            'longitude': record.longitude
         })
-        repo.add(cbsd_id, cbsd_data)
+    event_log.count('CBSDRegistered', len(records))
 
-def handle_grant_terminated(event: Dict[str, Any]):
-    """Handler para evento GrantTerminated"""
-    fcc_id = event['args']['fccId']
-    serial_number = event['args']['serialNumber']
-    grant_id = event['args']['grantId']
-    sas_origin = event['args']['sasOrigin']
-    
-    cbsd_id = f"{fcc_id}_{serial_number}"
-    
-    logger.info(f"Grant terminado - FCC ID: {fcc_id}, Serial: {serial_number}, "
-                f"Grant ID: {grant_id}, SAS: {sas_origin}")
-    
-    # Atualizar no repositório
-    cbsd_data = repo.get(cbsd_id)
-    if cbsd_data and 'grants' in cbsd_data:
-        for grant in cbsd_data['grants']:
-            if grant['grant_id'] == grant_id:
-                grant['terminated'] = True
-                grant['terminated_at'] = event['blockNumber']
-                grant['terminated_by'] = sas_origin
-                break
-        repo.add(cbsd_id, cbsd_data)
+@batch_handler
+def handle_cbsd_deregistered(records: List):
+    """Handler para lotes de CBSDDeregistered"""
+    for record in records:
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"CBSD descadastrado - CBSD: {record.fcc_id}/{record.serial_number}, "
+                         f"SAS Origin: {record.sas_origin}")
+        # O contrato apaga o CBSD e seus grants: o repositório também
+        repo.remove_cbsd(record.cbsd_key.hex())
+    event_log.count('CBSDDeregistered', len(records))
+
+@batch_handler
+def handle_grant_created(records: List):
+    """Handler para lotes de GrantCreated"""
+    for record in records:
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Novo grant criado - CBSD: {record.fcc_id}/{record.serial_number}, "
+                         f"Grant ID: {record.grant_id}, SAS: {record.sas_origin}")
+        repo.add_grant(record.cbsd_key.hex(), {
+            'grant_id': record.grant_id,
+            'sas_origin': record.sas_origin,
+            'created_at': record.block_number,
+            'transaction_hash': Web3.to_hex(record.transaction_hash),
+            'terminated': False,
+            'low_frequency': record.low_frequency,
+            'high_frequency': record.high_frequency,
+            'max_eirp': record.max_eirp
+        })
+    event_log.count('GrantCreated', len(records))
+
+@batch_handler
+def handle_grant_terminated(records: List):
+    """Handler para lotes de GrantTerminated"""
+    for record in records:
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Grant terminado - CBSD: {record.fcc_id}/{record.serial_number}, "
+                         f"Grant ID: {record.grant_id}, SAS: {record.sas_origin}")
+        repo.terminate_grant(record.cbsd_key.hex(), record.grant_id, record.block_number, record.sas_origin)
+    event_log.count('GrantTerminated', len(records))
 
 def handle_fcc_id_injected(event: Dict[str, Any]):
     """Handler para evento FCCIdInjected"""
@@ -113,11 +116,12 @@ def handle_serial_number_blacklisted(event: Dict[str, Any]):
     serial_number = event['args']['serialNumber']
     logger.info(f"Serial number blacklistado - FCC ID: {fcc_id}, Serial: {serial_number}")
 
-# Mapeamento de eventos para handlers
+# Mapeamento de eventos para handlers (os do indexador recebem lotes de registros, ver HandlerPipeline)
 EVENT_HANDLERS = {
     'SASAuthorized': handle_sas_authorized,
     'SASRevoked': handle_sas_revoked,
     'CBSDRegistered': handle_cbsd_registered,
+    'CBSDDeregistered': handle_cbsd_deregistered,
     'GrantCreated': handle_grant_created,
     'GrantTerminated': handle_grant_terminated,
     'FCCIdInjected': handle_fcc_id_injected,
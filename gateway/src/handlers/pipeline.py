@@ -0,0 +1,156 @@
+import asyncio
+import inspect
+import logging
+import time
+from collections import Counter
+from itertools import groupby
+from typing import Callable, Dict, List, Optional
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+def batch_handler(handler: Callable) -> Callable:
+    """Marca o handler como de lotes: recebe uma lista de registros (EventDecoder) em vez de um evento"""
+    handler.batch = True
+    return handler
+
+def partition_key(record):
+    """Chave de partição: o CBSD (cbsdKey) ou, em eventos de SAS, o endereço do SAS"""
+    key = getattr(record, 'cbsd_key', None)
+    if key is None:
+        key = getattr(record, 'sas', type(record).__name__)
+    return key
+
+class ThrottledLog:
+    """
+    Resumo periódico dos eventos aplicados
+
+    Substitui uma linha INFO por evento (que domina o custo de um replay
+    longo) por uma linha a cada ``interval`` segundos com a contagem por tipo.
+    """
+
+    def __init__(self, logger: logging.Logger, interval: Optional[float] = None):
+        self.logger = logger
+        self.interval = interval or settings.HANDLER_LOG_INTERVAL
+        self.counts: Counter = Counter()
+        self.total: Counter = Counter()
+        self._last_flush = time.monotonic()
+
+    def count(self, name: str, n: int = 1):
+        self.counts[name] += n
+        self.total[name] += n
+        if time.monotonic() - self._last_flush >= self.interval:
+            self.flush()
+
+    def flush(self):
+        if self.counts:
+            summary = ", ".join(f"{name}={count}" for name, count in sorted(self.counts.items()))
+            self.logger.info(f"Eventos aplicados ({time.monotonic() - self._last_flush:.0f}s): {summary}")
+            self.counts.clear()
+        self._last_flush = time.monotonic()
+
+class HandlerPipeline:
+    """
+    Aplicação assíncrona e em lotes dos eventos indexados
+
+    Os registros de uma faixa são particionados pela chave do CBSD
+    (``partition_key``) em ``HANDLER_PARTITIONS`` partições. Cada partição
+    mantém a ordem original dos eventos (registro, grant e encerramento do
+    mesmo CBSD nunca se invertem) e é processada por uma tarefa própria; as
+    partições avançam concorrentemente, cedendo o loop entre lotes, de modo
+    que um replay longo não bloqueia a API. Sequências de eventos do mesmo
+    tipo são entregues ao handler em lotes de até ``HANDLER_BATCH_SIZE``.
+
+    Handlers marcados com ``batch_handler`` recebem a lista de registros;
+    os demais recebem um evento por vez (``decoder.as_event``). Um lote que
+    falha é reaplicado evento a evento para isolar o inválido (os handlers
+    do repositório são idempotentes).
+
+    Eventos de blocos a partir de ``journal_from`` (sem confirmação) são
+    aplicados depois, um bloco por vez, dentro de ``repository.journal``:
+    o registro de desfazer é do repositório todo e não pode ser intercalado.
+
+    Com ``cooperative=False`` as partições são aplicadas em sequência, sem
+    ceder o loop: quem processa a faixa dentro de uma transação do
+    repositório garante que os leitores (a API, na mesma conexão SQLite)
+    nunca vejam uma faixa aplicada pela metade. Vale para handlers síncronos,
+    como os do repositório; um handler que suspende ainda cede o loop.
+    """
+
+    def __init__(self, handlers: Dict[str, Callable], decoder=None, repository=None,
+                 partitions: Optional[int] = None, batch_size: Optional[int] = None):
+        self.decoder = decoder
+        self.repository = repository
+        self.partitions = partitions or settings.HANDLER_PARTITIONS
+        self.batch_size = batch_size or settings.HANDLER_BATCH_SIZE
+        self.handlers = {name: handler if getattr(handler, 'batch', False) else self._per_event(handler)
+                         for name, handler in handlers.items()}
+        self.applied = 0
+        self.errors = 0
+        self.batches = 0
+
+    def _per_event(self, handler: Callable) -> Callable:
+        def apply(records):
+            for record in records:
+                handler(self.decoder.as_event(record))
+        return apply
+
+    async def process(self, records: List, journal_from: Optional[int] = None, cooperative: bool = True):
+        """Aplica os registros de uma faixa (na ordem dos blocos) e retorna quando todos foram aplicados"""
+        split = len(records)
+        if journal_from is not None:
+            split = next((i for i, record in enumerate(records) if record.block_number >= journal_from), split)
+        confirmed = records[:split]
+        if confirmed:
+            partitions: List[List] = [[] for _ in range(self.partitions)]
+            for record in confirmed:
+                partitions[hash(partition_key(record)) % self.partitions].append(record)
+            if cooperative:
+                await asyncio.gather(*(self._run(partition) for partition in partitions if partition))
+            else:
+                for batch in (batch for partition in partitions for batch in self._batches(partition)):
+                    await self._apply(batch)
+        for block, group in groupby(records[split:], key=lambda record: record.block_number):
+            with self.repository.journal(block):
+                for batch in self._batches(list(group)):
+                    await self._apply(batch)
+
+    async def _run(self, records: List):
+        for batch in self._batches(records):
+            await self._apply(batch)
+            await asyncio.sleep(0)
+
+    def _batches(self, records: List):
+        """Sequências de registros do mesmo tipo, em lotes de até ``batch_size``"""
+        for _, group in groupby(records, key=type):
+            group = list(group)
+            for start in range(0, len(group), self.batch_size):
+                yield group[start:start + self.batch_size]
+
+    async def _apply(self, batch: List):
+        handler = self.handlers.get(type(batch[0]).__name__)
+        if handler is None:
+            return
+        try:
+            result = handler(batch)
+            if inspect.isawaitable(result):
+                await result
+            self.applied += len(batch)
+            self.batches += 1
+        except Exception as e:
+            if len(batch) > 1:
+                for record in batch:
+                    await self._apply([record])
+                return
+            # Evento inválido não pode travar a indexação dos seguintes
+            self.errors += 1
+            logger.warning(f"Erro ao aplicar evento do bloco {batch[0].block_number}: {e}")
+
+    def get_stats(self) -> dict:
+        return {
+            "partitions": self.partitions,
+            "batch_size": self.batch_size,
+            "applied": self.applied,
+            "batches": self.batches,
+            "errors": self.errors
+        }
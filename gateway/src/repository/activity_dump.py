@@ -0,0 +1,83 @@
+# Full Activity Dump (WInnForum) gerado a partir do índice local, em NDJSON por partes
+import json
+import zlib
+from datetime import datetime, timezone
+from typing import Iterator, Optional
+from config.settings import settings
+
+RECORD_TYPES = ("cbsd", "sas")
+
+def dump_lines(block: Optional[int], cbsds, sas: dict) -> Iterator[str]:
+    """
+    Linhas NDJSON do dump: cabeçalho, um registro por CBSD (com seus grants),
+    um por SAS e o rodapé com as contagens (permite conferir se o arquivo está completo)
+    """
+    yield json.dumps({
+        "recordType": "header",
+        "generationDateTime": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "blockHeight": block,
+        "recordTypes": list(RECORD_TYPES)
+    })
+    counts = dict.fromkeys(RECORD_TYPES + ("grant",), 0)
+    for cbsd_id, cbsd in cbsds:
+        grants = cbsd.get("grants", [])
+        yield json.dumps({
+            "recordType": "cbsd",
+            "id": cbsd_id,
+            "fccId": cbsd["fcc_id"],
+            "cbsdSerialNumber": cbsd["serial_number"],
+            "sasOrigin": cbsd["sas_origin"],
+            "status": cbsd["status"],
+            "block_number": cbsd["block_number"],
+            "transaction_hash": cbsd["transaction_hash"],
+            "latitude": cbsd.get("latitude"),
+            "longitude": cbsd.get("longitude"),
+            "grants": [
+                {
+                    "grantId": grant["grant_id"],
+                    "sasOrigin": grant["sas_origin"],
+                    "created_at": grant["created_at"],
+                    "transaction_hash": grant["transaction_hash"],
+                    "terminated": grant.get("terminated", False),
+                    "terminated_at": grant.get("terminated_at"),
+                    "lowFrequency": grant.get("low_frequency"),
+                    "highFrequency": grant.get("high_frequency"),
+                    "maxEirp": grant.get("max_eirp")
+                }
+                for grant in grants
+            ]
+        })
+        counts["cbsd"] += 1
+        counts["grant"] += len(grants)
+    for address, authorized in sas.items():
+        yield json.dumps({"recordType": "sas", "address": address, "authorized": authorized})
+        counts["sas"] += 1
+    yield json.dumps({"recordType": "footer", "blockHeight": block, "counts": counts})
+
+def dump_chunks(snapshot, gzip: bool = False, chunk_size: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Dump de ``repository.snapshot()`` em blocos de ~``chunk_size`` bytes
+
+    As linhas são geradas sob demanda e agrupadas antes de sair, sem montar o
+    dump inteiro em memória; com ``gzip`` cada bloco passa pelo compressor
+    incremental (um único stream gzip na resposta).
+    """
+    chunk_size = chunk_size or settings.DUMP_CHUNK_SIZE
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None
+    parts, size = [], 0
+    for line in dump_lines(*snapshot):
+        parts.append(line)
+        size += len(line) + 1
+        if size >= chunk_size:
+            data = ("\n".join(parts) + "\n").encode()
+            parts, size = [], 0
+            if compressor is not None:
+                data = compressor.compress(data)
+                if not data:
+                    continue
+            yield data
+    data = ("\n".join(parts) + "\n").encode() if parts else b""
+    if compressor is not None:
+        data = compressor.compress(data) + compressor.flush()
+    if data:
+        yield data
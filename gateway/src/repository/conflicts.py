@@ -0,0 +1,112 @@
+# Grants ativos em colunas NumPy para a verificação de conflitos co-canal entre SAS
+from typing import Dict, Hashable, List, NamedTuple, Optional
+import numpy as np
+from .intervals import is_band
+from .spatial import GridIndex, check_radius, haversine_km, is_location, radius_box, to_degrees
+
+# EIRP desconhecida (ou fora de int64) na coluna ``_eirp``
+NO_EIRP = -1
+
+class Conflict(NamedTuple):
+    """Grant ativo de outro SAS, com faixa sobreposta, a ``distance_km`` do grant verificado"""
+    cbsd_id: str
+    grant_id: str
+    sas_origin: Optional[str]
+    low_frequency: int
+    high_frequency: int
+    max_eirp: Optional[int]
+    distance_km: float
+
+class ConflictIndex(GridIndex):
+    """
+    Grants ativos em colunas NumPy, uma linha por grant (chave ``(cbsd_id, grant_id)``)
+
+    Além da localização do CBSD (colunas e células do ``GridIndex``, em
+    graus) cada linha guarda a faixa ``[low, high)`` em Hz (uint64), a EIRP
+    máxima e o SAS de origem (código numa tabela de endereços). Linhas
+    livres ficam com a faixa vazia e nunca conflitam.
+
+    ``conflicting`` junta as linhas das células que cobrem o raio e testa
+    faixa, SAS e distância de todas numa única passada vetorizada: o custo é
+    o dos grants da vizinhança, não o do total de grants ativos.
+    """
+
+    def __init__(self, cell_size: float = 0.1, capacity: int = 1024):
+        super().__init__(cell_size, capacity)
+        self._low = np.zeros(capacity, dtype=np.uint64)
+        self._high = np.zeros(capacity, dtype=np.uint64)
+        self._eirp = np.full(capacity, NO_EIRP, dtype=np.int64)
+        self._sas = np.zeros(capacity, dtype=np.int32)
+        # Endereço em minúsculas -> código e código -> endereço como recebido
+        self._sas_ids: Dict[str, int] = {}
+        self._sas_names: List[Optional[str]] = []
+
+    def _grow(self):
+        super()._grow()
+        size = len(self._low)
+        self._low = np.concatenate((self._low, np.zeros(size, dtype=np.uint64)))
+        self._high = np.concatenate((self._high, np.zeros(size, dtype=np.uint64)))
+        self._eirp = np.concatenate((self._eirp, np.full(size, NO_EIRP, dtype=np.int64)))
+        self._sas = np.concatenate((self._sas, np.zeros(size, dtype=np.int32)))
+
+    def _sas_id(self, sas_origin: Optional[str]) -> int:
+        name = (sas_origin or '').lower()
+        sas_id = self._sas_ids.get(name)
+        if sas_id is None:
+            sas_id = self._sas_ids[name] = len(self._sas_names)
+            self._sas_names.append(sas_origin)
+        return sas_id
+
+    def put(self, key: Hashable, latitude, longitude, low, high, max_eirp, sas_origin: Optional[str]) -> bool:
+        """
+        Inclui ou atualiza o grant ativo (coordenadas em graus x 1e7 e faixa em Hz, como no contrato)
+
+        Sem localização do CBSD ou faixa válidas o grant não tem como
+        conflitar e sai do índice. Retorna se o grant ficou no índice.
+        """
+        if not (is_location(latitude, longitude) and is_band(low, high)):
+            self.remove(key)
+            return False
+        row = self.add(key, to_degrees(latitude), to_degrees(longitude))
+        self._low[row] = low
+        self._high[row] = high
+        self._eirp[row] = max_eirp if isinstance(max_eirp, int) and 0 <= max_eirp < 1 << 63 else NO_EIRP
+        self._sas[row] = self._sas_id(sas_origin)
+        return True
+
+    def remove(self, key: Hashable) -> Optional[int]:
+        row = super().remove(key)
+        if row is not None:
+            self._low[row] = self._high[row] = 0
+        return row
+
+    def conflicting(self, latitude: float, longitude: float, low: int, high: int, sas_origin: Optional[str],
+                    radius_km: float) -> List[Conflict]:
+        """
+        Grants ativos de outros SAS cuja faixa sobrepõe ``[low, high)`` (Hz) a até
+        ``radius_km`` do ponto (graus), do mais próximo ao mais distante
+        """
+        check_radius(latitude, longitude, radius_km)
+        if not is_band(low, high):
+            raise ValueError(f"Faixa de frequência inválida: [{low}, {high})")
+        rows = self._candidates(*radius_box(latitude, longitude, radius_km))
+        rows = rows[(self._low[rows] < high) & (self._high[rows] > low)
+                    & (self._sas[rows] != self._sas_ids.get((sas_origin or '').lower(), -1))]
+        distances = haversine_km(latitude, longitude, self._lat[rows], self._lon[rows])
+        inside = distances <= radius_km
+        rows, distances = rows[inside], distances[inside]
+        order = np.argsort(distances, kind='stable')
+        rows, distances = rows[order], distances[order]
+        return [Conflict(*self._keys[row], self._sas_names[sas_id], band_low, band_high,
+                         None if eirp == NO_EIRP else eirp, distance)
+                for row, sas_id, band_low, band_high, eirp, distance in
+                zip(rows.tolist(), self._sas[rows].tolist(), self._low[rows].tolist(), self._high[rows].tolist(),
+                    self._eirp[rows].tolist(), distances.tolist())]
+
+    def conflicts_of(self, key: Hashable, radius_km: float) -> List[Conflict]:
+        """Conflitos do grant já indexado (vazio se não está no índice: inativo, sem faixa ou sem localização)"""
+        row = self._rows.get(key)
+        if row is None:
+            return []
+        return self.conflicting(float(self._lat[row]), float(self._lon[row]), int(self._low[row]),
+                                int(self._high[row]), self._sas_names[self._sas[row]], radius_km)
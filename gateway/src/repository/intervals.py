@@ -0,0 +1,122 @@
+# Índice de intervalos de frequência (grants ativos) para consultas de sobreposição
+from bisect import bisect_left, insort
+from typing import Dict, Hashable, Iterator, List, Tuple
+
+# A árvore cobre [0, 2^64) Hz
+ROOT_SHIFT = 64
+
+def is_band(low, high) -> bool:
+    """Faixa indexável: inteiros com ``0 <= low < high < 2^64``"""
+    return isinstance(low, int) and isinstance(high, int) and 0 <= low < high < 1 << ROOT_SHIFT
+
+class _Node:
+    """Nó da árvore: faixas que contêm ``center``, ordenadas pelo início e pelo fim"""
+
+    __slots__ = ('center', 'by_low', 'by_high', 'bands')
+
+    def __init__(self, center: int):
+        self.center = center
+        self.by_low: List[Tuple[int, int]] = []
+        self.by_high: List[Tuple[int, int]] = []
+        # Faixas distintas nesta subárvore (o nó é removido ao chegar a zero)
+        self.bands = 0
+
+class IntervalIndex:
+    """
+    Árvore de intervalos centrada sobre faixas semiabertas ``[low, high)``
+
+    Os nós são os intervalos diádicos de ``[0, 2^64)``: cada faixa fica no
+    menor nó cujo centro ela contém (``low < centro <= high``), calculado
+    pelos bits de ``low`` e ``high`` (sem rebalanceamento). Cada nó guarda
+    suas faixas ordenadas pelo início e pelo fim; grants com a mesma faixa
+    (caso comum: canais de 5/10 MHz) compartilham a entrada.
+
+    ``overlapping(low, high)`` desce pela árvore percorrendo em cada nó só as
+    faixas que sobrepõem a consulta: O(log R + k) para k resultados, com
+    inclusão e remoção incrementais em O(log R + m) (m = faixas distintas no
+    nó).
+    """
+
+    def __init__(self):
+        # Faixa -> {chave: None} (dict como conjunto ordenado pela inserção)
+        self._keys: Dict[Tuple[int, int], dict] = {}
+        self._nodes: Dict[Tuple[int, int], _Node] = {}
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @staticmethod
+    def _path(low: int, high: int) -> Iterator[Tuple[int, int]]:
+        """Nós ``(shift, prefixo)`` da raiz até o nó da faixa"""
+        shift = (low ^ high).bit_length()
+        for level in range(ROOT_SHIFT, shift - 1, -1):
+            yield level, low >> level
+
+    def add(self, key: Hashable, low: int, high: int):
+        if not is_band(low, high):
+            raise ValueError(f"Faixa de frequência inválida: [{low}, {high})")
+        band = (low, high)
+        keys = self._keys.get(band)
+        if keys is None:
+            keys = self._keys[band] = {}
+            for level, prefix in self._path(low, high):
+                node = self._nodes.get((level, prefix))
+                if node is None:
+                    node = self._nodes[(level, prefix)] = _Node((prefix << level) | (1 << (level - 1)))
+                node.bands += 1
+            insort(node.by_low, band)
+            insort(node.by_high, (high, low))
+        if key not in keys:
+            keys[key] = None
+            self._size += 1
+
+    def remove(self, key: Hashable, low: int, high: int):
+        band = (low, high)
+        keys = self._keys.get(band)
+        if keys is None or key not in keys:
+            return
+        del keys[key]
+        self._size -= 1
+        if keys:
+            return
+        del self._keys[band]
+        for level, prefix in self._path(low, high):
+            node = self._nodes[(level, prefix)]
+            node.bands -= 1
+            if not node.bands:
+                del self._nodes[(level, prefix)]
+        del node.by_low[bisect_left(node.by_low, band)]
+        del node.by_high[bisect_left(node.by_high, (high, low))]
+
+    def overlapping(self, low: int, high: int) -> Iterator:
+        """Chaves das faixas que sobrepõem ``[low, high)`` (preguiçoso; consumir sem ceder o loop)"""
+        stack = [(ROOT_SHIFT, 0)]
+        while stack:
+            level, prefix = stack.pop()
+            node = self._nodes.get((level, prefix))
+            if node is None or low >= high:
+                continue
+            center = node.center
+            if high <= center:
+                # Todas as faixas do nó terminam em center ou depois: basta começarem antes de high
+                for band in node.by_low:
+                    if band[0] >= high:
+                        break
+                    yield from self._keys[band]
+            elif low >= center:
+                # Todas começam antes de center: basta terminarem depois de low
+                for index in range(len(node.by_high) - 1, -1, -1):
+                    band_high, band_low = node.by_high[index]
+                    if band_high <= low:
+                        break
+                    yield from self._keys[(band_low, band_high)]
+            else:
+                for band in node.by_low:
+                    yield from self._keys[band]
+            if level > 1:
+                # Direita empilhada primeiro: resultados aproximadamente em ordem de frequência
+                if high > center:
+                    stack.append((level - 1, 2 * prefix + 1))
+                if low < center:
+                    stack.append((level - 1, 2 * prefix))
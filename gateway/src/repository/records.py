@@ -0,0 +1,178 @@
+# Registros compactos do repositório em memória: um objeto com __slots__ por
+# CBSD e por grant (em vez de dicionários), strings repetidas internadas e
+# hashes de transação em bytes
+import sys
+from array import array
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+def intern(value):
+    """Interna strings repetidas entre registros (SAS, FCC ID, status); demais valores inalterados"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+def hash_bytes(value) -> Optional[bytes]:
+    """Hash de transação em bytes (32 em vez dos ~115 da string hex)"""
+    if value is None or isinstance(value, bytes):
+        return value
+    return bytes.fromhex(value[2:] if value.startswith('0x') else value)
+
+def hash_hex(value: Optional[bytes]) -> Optional[str]:
+    return '0x' + value.hex() if value is not None else None
+
+@dataclass(slots=True)
+class GrantRecord:
+    grant_id: str
+    sas_origin: Optional[str] = None
+    created_at: Optional[int] = None
+    transaction_hash: Optional[bytes] = None
+    terminated: bool = False
+    terminated_at: Optional[int] = None
+    terminated_by: Optional[str] = None
+    low_frequency: Optional[int] = None
+    high_frequency: Optional[int] = None
+    max_eirp: Optional[int] = None
+
+    @classmethod
+    def from_dict(cls, grant: dict) -> 'GrantRecord':
+        return cls(grant['grant_id'], intern(grant.get('sas_origin')), grant.get('created_at'),
+                   hash_bytes(grant.get('transaction_hash')), bool(grant.get('terminated', False)),
+                   grant.get('terminated_at'), intern(grant.get('terminated_by')), grant.get('low_frequency'),
+                   grant.get('high_frequency'), grant.get('max_eirp'))
+
+    def as_dict(self) -> dict:
+        return {
+            'grant_id': self.grant_id,
+            'sas_origin': self.sas_origin,
+            'created_at': self.created_at,
+            'transaction_hash': hash_hex(self.transaction_hash),
+            'terminated': self.terminated,
+            'terminated_at': self.terminated_at,
+            'terminated_by': self.terminated_by,
+            'low_frequency': self.low_frequency,
+            'high_frequency': self.high_frequency,
+            'max_eirp': self.max_eirp
+        }
+
+@dataclass(slots=True)
+class CBSDRecord:
+    fcc_id: Optional[str] = None
+    serial_number: Optional[str] = None
+    sas_origin: Optional[str] = None
+    status: Optional[str] = None
+    block_number: Optional[int] = None
+    transaction_hash: Optional[bytes] = None
+    # GrantRecord por grant ou, com grants em colunas, os índices das linhas em GrantColumns
+    grants: list = field(default_factory=list)
+    # Graus x 1e7, como no contrato
+    latitude: Optional[int] = None
+    longitude: Optional[int] = None
+
+    @classmethod
+    def from_dict(cls, data: dict, grants=None) -> 'CBSDRecord':
+        return cls(intern(data.get('fcc_id')), data.get('serial_number'), intern(data.get('sas_origin')),
+                   intern(data.get('status')), data.get('block_number'), hash_bytes(data.get('transaction_hash')),
+                   grants if grants is not None else [], data.get('latitude'), data.get('longitude'))
+
+    def as_dict(self, grants: List[GrantRecord]) -> dict:
+        return {
+            'fcc_id': self.fcc_id,
+            'serial_number': self.serial_number,
+            'sas_origin': self.sas_origin,
+            'status': self.status,
+            'block_number': self.block_number,
+            'transaction_hash': hash_hex(self.transaction_hash),
+            'latitude': self.latitude,
+            'longitude': self.longitude,
+            'grants': [grant.as_dict() for grant in grants]
+        }
+
+NONE = -1
+HASH_SIZE = 32
+
+class GrantColumns:
+    """
+    Grants armazenados em colunas, referenciados pelo índice da linha
+
+    Cada campo é um ``array``/``bytearray`` com um valor por linha (SAS e
+    ``terminated_by`` como índices numa tabela de strings, hashes em 32
+    bytes contíguos); só o ``grant_id`` continua como objeto ``str``. Um
+    hash com tamanho diferente de 32 bytes fica num dicionário à parte.
+    """
+
+    __slots__ = ('grant_id', 'sas_origin', 'created_at', 'transaction_hash', 'terminated', 'terminated_at',
+                 'terminated_by', 'low_frequency', 'high_frequency', 'max_eirp', '_strings', '_string_ids',
+                 '_odd_hashes')
+
+    def __init__(self):
+        self.grant_id: List[str] = []
+        self.sas_origin = array('I')
+        self.created_at = array('q')
+        self.transaction_hash = bytearray()
+        self.terminated = bytearray()
+        self.terminated_at = array('q')
+        self.terminated_by = array('I')
+        self.low_frequency = array('q')
+        self.high_frequency = array('q')
+        self.max_eirp = array('q')
+        self._strings: List[Optional[str]] = [None]
+        self._string_ids: Dict[Optional[str], int] = {None: 0}
+        self._odd_hashes: Dict[int, Optional[bytes]] = {}
+
+    def __len__(self) -> int:
+        return len(self.grant_id)
+
+    def _string_id(self, value: Optional[str]) -> int:
+        string_id = self._string_ids.get(value)
+        if string_id is None:
+            string_id = self._string_ids[value] = len(self._strings)
+            self._strings.append(value)
+        return string_id
+
+    def append(self, grant: GrantRecord) -> int:
+        row = len(self.grant_id)
+        self.grant_id.append(None)
+        self.sas_origin.append(0)
+        self.created_at.append(NONE)
+        self.transaction_hash.extend(bytes(HASH_SIZE))
+        self.terminated.append(0)
+        self.terminated_at.append(NONE)
+        self.terminated_by.append(0)
+        self.low_frequency.append(NONE)
+        self.high_frequency.append(NONE)
+        self.max_eirp.append(NONE)
+        self.set(row, grant)
+        return row
+
+    def set(self, row: int, grant: GrantRecord):
+        self.grant_id[row] = grant.grant_id
+        self.sas_origin[row] = self._string_id(grant.sas_origin)
+        self.created_at[row] = NONE if grant.created_at is None else grant.created_at
+        tx_hash = grant.transaction_hash
+        if tx_hash is not None and len(tx_hash) == HASH_SIZE:
+            self.transaction_hash[row * HASH_SIZE:(row + 1) * HASH_SIZE] = tx_hash
+            self._odd_hashes.pop(row, None)
+        else:
+            self._odd_hashes[row] = tx_hash
+        self.terminated[row] = int(grant.terminated)
+        self.terminated_at[row] = NONE if grant.terminated_at is None else grant.terminated_at
+        self.terminated_by[row] = self._string_id(grant.terminated_by)
+        self.low_frequency[row] = NONE if grant.low_frequency is None else grant.low_frequency
+        self.high_frequency[row] = NONE if grant.high_frequency is None else grant.high_frequency
+        self.max_eirp[row] = NONE if grant.max_eirp is None else grant.max_eirp
+
+    def get(self, row: int) -> GrantRecord:
+        created_at = self.created_at[row]
+        terminated_at = self.terminated_at[row]
+        low_frequency = self.low_frequency[row]
+        high_frequency = self.high_frequency[row]
+        max_eirp = self.max_eirp[row]
+        if row in self._odd_hashes:
+            tx_hash = self._odd_hashes[row]
+        else:
+            tx_hash = bytes(self.transaction_hash[row * HASH_SIZE:(row + 1) * HASH_SIZE])
+        return GrantRecord(self.grant_id[row], self._strings[self.sas_origin[row]],
+                           None if created_at == NONE else created_at, tx_hash, bool(self.terminated[row]),
+                           None if terminated_at == NONE else terminated_at,
+                           self._strings[self.terminated_by[row]], None if low_frequency == NONE else low_frequency,
+                           None if high_frequency == NONE else high_frequency,
+                           None if max_eirp == NONE else max_eirp)
@@ -1,14 +1,464 @@
-# Exemplo de repositório simples em memória
+# Repositório em memória do estado do registro, alimentado pelos eventos do contrato
+import weakref
+from array import array
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+from web3 import Web3
+from config.settings import settings
+from .conflicts import Conflict, ConflictIndex
+from .intervals import IntervalIndex, is_band
+from .records import CBSDRecord, GrantColumns, GrantRecord, hash_bytes, intern
+from .spatial import GridIndex, is_location, to_degrees
+
+def cbsd_key(fcc_id: str, serial_number: str) -> str:
+    """
+    Chave do CBSD no repositório, em hex: a mesma do contrato
+    (``_generateCBSDKey`` = ``keccak256(abi.encodePacked(fccId, serialNumber))``),
+    indexada como ``cbsdKey`` nos eventos
+    """
+    return Web3.keccak(text=fcc_id + serial_number).hex()
+
+# Campos do CBSD com índice secundário (valor -> CBSDs) e estados de grant indexados
+INDEXED_FIELDS = ('sas_origin', 'fcc_id', 'status')
+GRANT_STATES = ('active', 'terminated')
+
+def check_band_query(state: str, low: Optional[int], high: Optional[int]):
+    """Valida os parâmetros de ``find_grants`` (ValueError se inválidos)"""
+    if state not in GRANT_STATES:
+        raise ValueError(f"Estado de grant desconhecido: {state}")
+    if (low is None) != (high is None):
+        raise ValueError("Informe low e high juntos")
+    if low is not None:
+        if state != 'active':
+            raise ValueError("A consulta por faixa de frequência vale só para grants ativos")
+        if low >= high:
+            raise ValueError(f"Faixa inválida: low ({low}) deve ser menor que high ({high})")
+
+def cbsds_at(items, block: Optional[int]):
+    """CBSDs e grants como estavam no bloco ``block`` (ignora alterações posteriores)"""
+    for cbsd_id, cbsd in items:
+        if block is not None and cbsd['block_number'] > block:
+            continue
+        grants = []
+        for grant in cbsd.get('grants', []):
+            if block is not None and grant['created_at'] > block:
+                continue
+            if block is not None and grant.get('terminated') and grant['terminated_at'] > block:
+                grants.append(dict(grant, terminated=False, terminated_at=None, terminated_by=None))
+            else:
+                grants.append(dict(grant))
+        yield cbsd_id, dict(cbsd, grants=grants)
+
+class _SnapshotView:
+    """
+    Leitura em andamento de ``CBSDRepository.snapshot``
+
+    ``iterator`` percorre as chaves de ``cbsds`` (vira uma lista das chaves
+    restantes antes de o dict mudar de tamanho); ``preserved`` guarda o CBSD,
+    como estava no snapshot, antes da primeira alteração depois dele (``None``
+    se ainda não existia).
+    """
+
+    __slots__ = ('iterator', 'detached', 'preserved', '__weakref__')
+
+    def __init__(self, cbsds: dict):
+        self.iterator = iter(cbsds)
+        self.detached = False
+        self.preserved: dict = {}
 
 class CBSDRepository:
-    def __init__(self):
+    """
+    Estado do registro em registros compactos
+
+    Cada CBSD é um ``CBSDRecord`` e cada grant um ``GrantRecord`` (classes
+    com ``__slots__``, strings repetidas internadas, hashes em bytes). Com
+    ``columnar_grants`` (``REPOSITORY_COLUMNAR_GRANTS``) os grants ficam em
+    colunas (``GrantColumns``) e o CBSD guarda só os índices das linhas. As
+    leituras (``get``, ``get_grants``, ``snapshot``) devolvem dicionários,
+    como antes.
+
+    Índices secundários por ``sas_origin``, ``fcc_id`` e ``status`` (valor ->
+    ``{cbsd_id: None}``, um dict usado como conjunto ordenado pela inserção) e
+    por estado do grant (``active``/``terminated`` -> ``{(cbsd_id, grant_id):
+    None}``) são atualizados a cada gravação, remoção e desfazer:
+    ``find_cbsds``/``find_grants`` percorrem só os k resultados, sem varrer
+    todos os CBSDs. Os grants ativos com faixa de frequência ficam também
+    num ``IntervalIndex`` (``find_grants('active', low, high)``), as
+    localizações dos CBSDs num ``GridIndex`` (``find_near``/``find_in_box``) e
+    os grants ativos de CBSDs com localização, com faixa, EIRP e SAS, nas
+    colunas de um ``ConflictIndex`` (``find_conflicts``).
+
+    Alterações feitas dentro de ``journal(bloco)`` (blocos ainda sem
+    confirmação) guardam como desfazê-las: ``rollback(bloco)`` devolve o estado
+    ao fim daquele bloco após um reorg e ``prune(bloco)`` descarta o que já está
+    confirmado.
+    """
+
+    def __init__(self, columnar_grants: Optional[bool] = None):
+        if columnar_grants is None:
+            columnar_grants = settings.REPOSITORY_COLUMNAR_GRANTS
+        self.grant_columns = GrantColumns() if columnar_grants else None
         self.cbsds = {}
+        self.sas = {}
+        self.checkpoint = None
+        self.indexes: Dict[str, dict] = {field: {} for field in INDEXED_FIELDS}
+        self.grant_states: Dict[str, dict] = {state: {} for state in GRANT_STATES}
+        self.active_bands = IntervalIndex()
+        self.locations = GridIndex(settings.SPATIAL_CELL_DEGREES)
+        self.active_grants = ConflictIndex(settings.SPATIAL_CELL_DEGREES)
+        self.block_hashes: Dict[int, str] = {}
+        # (bloco, desfazer), na ordem em que as alterações foram feitas
+        self.undo_log = deque()
+        self._journal_block = None
+        # Leituras de snapshot em andamento (somem com o iterador, mesmo sem consumi-lo)
+        self._snapshots = weakref.WeakSet()
+
+    def _journal(self, undo):
+        if self._journal_block is not None:
+            self.undo_log.append((self._journal_block, undo))
+
+    def _index(self, cbsd_id, cbsd, add: bool):
+        """Inclui (``add``) ou remove o CBSD e seus grants dos índices secundários"""
+        for field, index in self.indexes.items():
+            value = cbsd.get(field) if isinstance(cbsd, dict) else getattr(cbsd, field)
+            if value is None:
+                continue
+            if add:
+                index.setdefault(value, {})[cbsd_id] = None
+                continue
+            bucket = index.get(value)
+            if bucket is not None:
+                bucket.pop(cbsd_id, None)
+                if not bucket:
+                    del index[value]
+        if isinstance(cbsd, dict):
+            latitude, longitude = cbsd.get('latitude'), cbsd.get('longitude')
+        else:
+            latitude, longitude = cbsd.latitude, cbsd.longitude
+        if is_location(latitude, longitude):
+            if add:
+                self.locations.add(cbsd_id, to_degrees(latitude), to_degrees(longitude))
+            else:
+                self.locations.remove(cbsd_id)
+        if isinstance(cbsd, CBSDRecord):
+            for grant in self._grants(cbsd):
+                self._index_grant(cbsd_id, cbsd, grant, add)
+
+    def _index_grant(self, cbsd_id, cbsd: CBSDRecord, grant: GrantRecord, add: bool):
+        states = self.grant_states[GRANT_STATES[grant.terminated]]
+        key = (cbsd_id, grant.grant_id)
+        band = not grant.terminated and is_band(grant.low_frequency, grant.high_frequency)
+        if add:
+            states[key] = None
+            if band:
+                self.active_bands.add(key, grant.low_frequency, grant.high_frequency)
+                self.active_grants.put(key, cbsd.latitude, cbsd.longitude, grant.low_frequency,
+                                       grant.high_frequency, grant.max_eirp, grant.sas_origin)
+        else:
+            states.pop(key, None)
+            if band:
+                self.active_bands.remove(key, grant.low_frequency, grant.high_frequency)
+                self.active_grants.remove(key)
+
+    def _preserve(self, cbsd_id, resize: bool = False):
+        """Antes de alterar o CBSD: guarda, para cada snapshot em andamento, o estado que ele deve ver"""
+        for view in self._snapshots:
+            if resize and not view.detached:
+                # O iterador do dict não sobrevive a inclusões e remoções
+                view.iterator = iter(list(view.iterator))
+                view.detached = True
+            if cbsd_id not in view.preserved:
+                current = self.cbsds.get(cbsd_id)
+                view.preserved[cbsd_id] = None if current is None else self._as_dict(current)
+
+    def _set_cbsd(self, cbsd_id, value):
+        """Grava (ou, com ``None``, remove) o CBSD mantendo os índices; desfazer volta o anterior"""
+        previous = self.cbsds.get(cbsd_id)
+        if self._snapshots:
+            self._preserve(cbsd_id, resize=(previous is None) != (value is None))
+        if previous is not None:
+            self._index(cbsd_id, previous, False)
+        if value is None:
+            self.cbsds.pop(cbsd_id, None)
+        else:
+            self.cbsds[cbsd_id] = value
+            self._index(cbsd_id, value, True)
+        self._journal(lambda: self._set_cbsd(cbsd_id, previous))
+
+    def _grants(self, cbsd: CBSDRecord) -> List[GrantRecord]:
+        if self.grant_columns is None:
+            return cbsd.grants
+        return [self.grant_columns.get(row) for row in cbsd.grants]
+
+    def _as_dict(self, cbsd):
+        # Entradas gravadas com ``add`` ficam como o dicionário recebido
+        return cbsd.as_dict(self._grants(cbsd)) if isinstance(cbsd, CBSDRecord) else cbsd
+
+    def _find_grant(self, cbsd: CBSDRecord, grant_id) -> int:
+        """Posição do grant em ``cbsd.grants``, ou -1"""
+        for index, grant in enumerate(cbsd.grants):
+            if (grant.grant_id if self.grant_columns is None else self.grant_columns.grant_id[grant]) == grant_id:
+                return index
+        return -1
+
+    def _grant_at(self, cbsd: CBSDRecord, index: int) -> GrantRecord:
+        grant = cbsd.grants[index]
+        return grant if self.grant_columns is None else self.grant_columns.get(grant)
+
+    def _replace_grant(self, cbsd_id, cbsd: CBSDRecord, index: int, grant: GrantRecord):
+        if self._snapshots:
+            self._preserve(cbsd_id)
+        previous = self._grant_at(cbsd, index)
+        if self.grant_columns is None:
+            cbsd.grants[index] = grant
+        else:
+            self.grant_columns.set(cbsd.grants[index], grant)
+        self._index_grant(cbsd_id, cbsd, previous, False)
+        self._index_grant(cbsd_id, cbsd, grant, True)
+        self._journal(lambda: self._replace_grant(cbsd_id, cbsd, index, previous))
+
+    def _pop_grant(self, cbsd_id, cbsd: CBSDRecord):
+        # Com grants em colunas a linha fica órfã (só em reorg)
+        if self._snapshots:
+            self._preserve(cbsd_id)
+        self._index_grant(cbsd_id, cbsd, self._grant_at(cbsd, len(cbsd.grants) - 1), False)
+        cbsd.grants.pop()
 
     def add(self, cbsd_id, data):
-        self.cbsds[cbsd_id] = data
+        """Grava o dicionário como recebido (sem conversão para CBSDRecord)"""
+        self._set_cbsd(cbsd_id, data)
 
     def get(self, cbsd_id):
-        return self.cbsds.get(cbsd_id)
+        cbsd = self.cbsds.get(cbsd_id)
+        return self._as_dict(cbsd) if cbsd is not None else None
 
     def all(self):
-        return self.cbsds.values() 
\ No newline at end of file
+        return [self._as_dict(cbsd) for cbsd in self.cbsds.values()]
+
+    def add_cbsd(self, cbsd_id, data):
+        """
+        Registra o CBSD sem grants (um novo registro descarta os anteriores)
+
+        O contrato só registra um CBSD inexistente: o mesmo CBSDRegistered
+        reentregue (mesmo bloco e transação, ex.: lote reaplicado evento a
+        evento) não altera o CBSD nem descarta os grants já aplicados.
+        """
+        previous = self.cbsds.get(cbsd_id)
+        if (isinstance(previous, CBSDRecord) and previous.block_number == data.get('block_number')
+                and previous.transaction_hash == hash_bytes(data.get('transaction_hash'))):
+            return
+        grants = array('I') if self.grant_columns is not None else []
+        self._set_cbsd(cbsd_id, CBSDRecord.from_dict(data, grants))
+
+    def remove_cbsd(self, cbsd_id) -> bool:
+        """Remove o CBSD e seus grants (deregistration); desfazer restaura ambos"""
+        if cbsd_id not in self.cbsds:
+            return False
+        self._set_cbsd(cbsd_id, None)
+        return True
+
+    def add_grant(self, cbsd_id, grant) -> bool:
+        cbsd = self.cbsds.get(cbsd_id)
+        if not isinstance(cbsd, CBSDRecord):
+            return False
+        record = GrantRecord.from_dict(grant)
+        # Mesmo grant_id substitui o anterior (evento reentregue não duplica o grant)
+        index = self._find_grant(cbsd, record.grant_id)
+        if index >= 0:
+            self._replace_grant(cbsd_id, cbsd, index, record)
+            return True
+        if self._snapshots:
+            self._preserve(cbsd_id)
+        cbsd.grants.append(record if self.grant_columns is None else self.grant_columns.append(record))
+        self._index_grant(cbsd_id, cbsd, record, True)
+        self._journal(lambda: self._pop_grant(cbsd_id, cbsd))
+        return True
+
+    def terminate_grant(self, cbsd_id, grant_id, block_number, terminated_by) -> bool:
+        cbsd = self.cbsds.get(cbsd_id)
+        if not isinstance(cbsd, CBSDRecord):
+            return False
+        index = self._find_grant(cbsd, grant_id)
+        if index < 0:
+            return False
+        grant = self._grant_at(cbsd, index)
+        self._replace_grant(cbsd_id, cbsd, index, GrantRecord(grant.grant_id, grant.sas_origin, grant.created_at,
+                                                              grant.transaction_hash, True, block_number,
+                                                              intern(terminated_by), grant.low_frequency,
+                                                              grant.high_frequency, grant.max_eirp))
+        return True
+
+    def get_grants(self, cbsd_id):
+        cbsd = self.cbsds.get(cbsd_id)
+        if cbsd is None:
+            return None
+        if not isinstance(cbsd, CBSDRecord):
+            return cbsd.get('grants', [])
+        return [grant.as_dict() for grant in self._grants(cbsd)]
+
+    def find_cbsds(self, sas_origin=None, fcc_id=None, status=None) -> Iterator[Tuple[str, dict]]:
+        """
+        ``(cbsd_id, cbsd)`` dos CBSDs com os valores dados, na ordem de registro
+
+        Iterador preguiçoso sobre o menor dos índices envolvidos (os demais
+        filtros são testes de pertinência): O(k) para k resultados. Sem
+        filtros percorre todos os CBSDs. Deve ser consumido sem ceder o loop
+        (o índice muda com a indexação).
+        """
+        filters = {'sas_origin': sas_origin, 'fcc_id': fcc_id, 'status': status}
+        buckets = sorted((self.indexes[field].get(value, {}) for field, value in filters.items() if value is not None),
+                         key=len)
+        ids = buckets.pop(0) if buckets else self.cbsds
+        for cbsd_id in ids:
+            if all(cbsd_id in bucket for bucket in buckets):
+                yield cbsd_id, self._as_dict(self.cbsds[cbsd_id])
+
+    def find_grants(self, state: str, low: Optional[int] = None,
+                    high: Optional[int] = None) -> Iterator[Tuple[str, dict]]:
+        """
+        ``(cbsd_id, grant)`` dos grants no estado ``active`` ou ``terminated``
+
+        Iterador preguiçoso sobre o índice do estado, na ordem em que os grants
+        entraram nele; cada grant traz também ``fcc_id`` e ``serial_number`` do CBSD.
+        Com ``low``/``high`` (Hz), só os grants ativos cuja faixa sobrepõe
+        ``[low, high)``, pelo ``IntervalIndex`` (O(log R + k)).
+        """
+        check_band_query(state, low, high)
+        if low is not None:
+            return self._iter_grants(self.active_bands.overlapping(low, high))
+        return self._iter_grants(self.grant_states[state])
+
+    def _iter_grants(self, keys):
+        for cbsd_id, grant_id in keys:
+            cbsd = self.cbsds[cbsd_id]
+            grant = self._grant_at(cbsd, self._find_grant(cbsd, grant_id)).as_dict()
+            grant['fcc_id'] = cbsd.fcc_id
+            grant['serial_number'] = cbsd.serial_number
+            yield cbsd_id, grant
+
+    def find_near(self, latitude: float, longitude: float, radius_km: float) -> Iterator[Tuple[str, dict]]:
+        """
+        ``(cbsd_id, cbsd)`` dos CBSDs a até ``radius_km`` do ponto (graus), do mais próximo ao mais distante
+
+        Cada CBSD traz ``distance_km``. As distâncias dos candidatos das
+        células do ``GridIndex`` são calculadas de uma vez (NumPy) na chamada;
+        os dicionários são montados ao consumir.
+        """
+        keys, distances = self.locations.within_radius(latitude, longitude, radius_km)
+        return self._iter_located(keys, distances.tolist())
+
+    def find_in_box(self, min_lat: float, min_lon: float, max_lat: float,
+                    max_lon: float) -> Iterator[Tuple[str, dict]]:
+        """``(cbsd_id, cbsd)`` dos CBSDs no retângulo (graus; ``min_lon > max_lon`` cruza o antimeridiano)"""
+        return self._iter_located(self.locations.within_box(min_lat, min_lon, max_lat, max_lon))
+
+    def _iter_located(self, keys, distances=None):
+        for i, cbsd_id in enumerate(keys):
+            cbsd = self.cbsds.get(cbsd_id)
+            if cbsd is None:
+                continue
+            cbsd = self._as_dict(cbsd)
+            yield cbsd_id, cbsd if distances is None else dict(cbsd, distance_km=distances[i])
+
+    def find_conflicts(self, cbsd_id, grant_id, radius_km: Optional[float] = None) -> List[Conflict]:
+        """
+        Grants ativos de outros SAS com faixa sobreposta à do grant, a até
+        ``radius_km`` (padrão ``CONFLICT_RADIUS_KM``) do CBSD, do mais próximo
+        ao mais distante
+
+        Uma consulta vetorizada ao ``ConflictIndex``; vazio se o grant não está
+        ativo ou não tem faixa ou localização.
+        """
+        return self.active_grants.conflicts_of((cbsd_id, grant_id),
+                                               settings.CONFLICT_RADIUS_KM if radius_km is None else radius_km)
+
+    def set_sas(self, sas_address, authorized: bool):
+        sas_address = intern(sas_address)
+        previous = self.sas.get(sas_address)
+        self.sas[sas_address] = authorized
+        if previous is None:
+            self._journal(lambda: self.sas.pop(sas_address, None))
+        else:
+            self._journal(lambda: self.sas.__setitem__(sas_address, previous))
+
+    def is_authorized_sas(self, sas_address) -> bool:
+        return self.sas.get(sas_address, False)
+
+    def snapshot(self):
+        """
+        Estado no checkpoint atual para leituras longas (ex.: fullActivityDump)
+
+        Retorna ``(bloco, iterador de (cbsd_id, cbsd), {sas: autorizado})``. O
+        iterador pode ser consumido aos poucos enquanto a indexação continua:
+        cada CBSD é convertido só quando lido, e um CBSD alterado antes disso
+        (gravação, remoção, grant novo ou encerrado, desfazer de reorg) tem o
+        estado anterior copiado no momento da alteração. CBSDs, grants e
+        encerramentos de blocos posteriores são ignorados.
+        """
+        view = _SnapshotView(self.cbsds)
+        self._snapshots.add(view)
+        return self.checkpoint, cbsds_at(self._iter_snapshot(view), self.checkpoint), dict(self.sas)
+
+    def _iter_snapshot(self, view: _SnapshotView):
+        try:
+            while True:
+                cbsd_id = next(view.iterator, None)
+                if cbsd_id is None:
+                    return
+                if cbsd_id in view.preserved:
+                    cbsd = view.preserved.pop(cbsd_id)
+                    if cbsd is not None:
+                        yield cbsd_id, cbsd
+                else:
+                    yield cbsd_id, self._as_dict(self.cbsds[cbsd_id])
+        finally:
+            self._snapshots.discard(view)
+
+    @contextmanager
+    def transaction(self):
+        # Em memória não há rollback: alterações já aplicadas permanecem
+        yield
+
+    def get_checkpoint(self) -> Optional[int]:
+        return self.checkpoint
+
+    def set_checkpoint(self, block_number: int):
+        self.checkpoint = block_number
+
+    @contextmanager
+    def journal(self, block_number: int):
+        """Registra como desfazer as alterações feitas no bloco ``block_number``"""
+        self._journal_block = block_number
+        try:
+            yield
+        finally:
+            self._journal_block = None
+
+    def rollback(self, block_number: int) -> int:
+        """
+        Desfaz as alterações registradas de blocos após ``block_number`` (reorg)
+
+        Descarta os hashes desses blocos, volta o checkpoint para
+        ``block_number`` e retorna quantas alterações foram desfeitas.
+        """
+        undone = 0
+        while self.undo_log and self.undo_log[-1][0] > block_number:
+            self.undo_log.pop()[1]()
+            undone += 1
+        self.block_hashes = {n: h for n, h in self.block_hashes.items() if n <= block_number}
+        self.checkpoint = block_number
+        return undone
+
+    def prune(self, block_number: int):
+        """Esquece o desfazer e os hashes de blocos até ``block_number`` (confirmados)"""
+        while self.undo_log and self.undo_log[0][0] <= block_number:
+            self.undo_log.popleft()
+        for number in [n for n in self.block_hashes if n <= block_number]:
+            del self.block_hashes[number]
+
+    def get_block_hashes(self) -> Dict[int, str]:
+        return dict(self.block_hashes)
+
+    def set_block_hash(self, block_number: int, block_hash: str):
+        self.block_hashes[block_number] = block_hash
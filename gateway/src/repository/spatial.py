@@ -0,0 +1,189 @@
+# Índice espacial (grade) das localizações dos CBSDs para consultas por raio e por retângulo
+import math
+from itertools import chain
+from typing import Dict, Hashable, List, Optional, Tuple
+import numpy as np
+
+# Coordenadas do contrato e dos eventos: graus x 1e7 (int256)
+COORDINATE_SCALE = 10_000_000
+EARTH_RADIUS_KM = 6371.0088
+
+def is_location(latitude, longitude) -> bool:
+    """Localização indexável: inteiros (graus x 1e7) com latitude em [-90, 90] e longitude em [-180, 180]"""
+    return (isinstance(latitude, int) and isinstance(longitude, int)
+            and abs(latitude) <= 90 * COORDINATE_SCALE and abs(longitude) <= 180 * COORDINATE_SCALE)
+
+def to_degrees(value: int) -> float:
+    return value / COORDINATE_SCALE
+
+def check_radius(latitude: float, longitude: float, radius_km: float):
+    """Valida os parâmetros de uma consulta por raio (ValueError se inválidos)"""
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValueError(f"Coordenadas inválidas: ({latitude}, {longitude})")
+    if not radius_km >= 0:
+        raise ValueError(f"Raio inválido: {radius_km}")
+
+def check_box(min_lat: float, min_lon: float, max_lat: float, max_lon: float):
+    """Valida um retângulo (``min_lon > max_lon`` = cruza o antimeridiano; ValueError se inválido)"""
+    if not (-90 <= min_lat <= max_lat <= 90):
+        raise ValueError(f"Latitudes inválidas: min_lat {min_lat}, max_lat {max_lat}")
+    if not (-180 <= min_lon <= 180 and -180 <= max_lon <= 180):
+        raise ValueError(f"Longitudes inválidas: min_lon {min_lon}, max_lon {max_lon}")
+
+def radius_box(latitude: float, longitude: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """
+    Retângulo ``(min_lat, min_lon, max_lat, max_lon)`` que contém o círculo
+
+    A maior diferença de longitude no círculo é ``asin(sin(d) / cos(lat))``
+    (``d`` = raio angular); com um polo dentro do círculo, todas as
+    longitudes. ``min_lon > max_lon`` quando o círculo cruza o antimeridiano.
+    """
+    angle = radius_km / EARTH_RADIUS_KM
+    dlat = math.degrees(angle)
+    min_lat, max_lat = max(latitude - dlat, -90.0), min(latitude + dlat, 90.0)
+    if min_lat <= -90 or max_lat >= 90 or math.sin(angle) >= math.cos(math.radians(latitude)):
+        return min_lat, -180.0, max_lat, 180.0
+    dlon = math.degrees(math.asin(math.sin(angle) / math.cos(math.radians(latitude))))
+    if dlon >= 180:
+        return min_lat, -180.0, max_lat, 180.0
+    min_lon, max_lon = longitude - dlon, longitude + dlon
+    if min_lon < -180:
+        min_lon += 360
+    if max_lon > 180:
+        max_lon -= 360
+    return min_lat, min_lon, max_lat, max_lon
+
+def longitude_ranges(min_lon: float, max_lon: float) -> List[Tuple[float, float]]:
+    """Longitudes do retângulo como intervalos sem volta (dois se cruzar o antimeridiano)"""
+    return [(min_lon, 180.0), (-180.0, max_lon)] if min_lon > max_lon else [(min_lon, max_lon)]
+
+def haversine_km(latitude: float, longitude: float, latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    """Distâncias (km, esfera) de um ponto a arrays de pontos, todos em graus"""
+    lat1, lon1 = math.radians(latitude), math.radians(longitude)
+    lat2, lon2 = np.radians(latitudes), np.radians(longitudes)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+def in_box(latitudes: np.ndarray, longitudes: np.ndarray, min_lat: float, min_lon: float, max_lat: float,
+           max_lon: float) -> np.ndarray:
+    """Máscara dos pontos dentro do retângulo"""
+    inside = (latitudes >= min_lat) & (latitudes <= max_lat)
+    if min_lon > max_lon:
+        return inside & ((longitudes >= min_lon) | (longitudes <= max_lon))
+    return inside & (longitudes >= min_lon) & (longitudes <= max_lon)
+
+class GridIndex:
+    """
+    Grade de células de ``cell_size`` graus sobre latitude/longitude
+
+    As coordenadas (graus) ficam em colunas NumPy, uma linha por chave
+    (linhas liberadas são reaproveitadas), e cada célula guarda as linhas dos
+    seus pontos (``{linha: None}``). Inclusão e remoção são O(1) amortizado.
+
+    ``within_radius`` junta as linhas das células que cobrem o círculo e
+    calcula a distância (haversine) de todas numa única operação vetorizada;
+    ``within_box`` faz o mesmo com o teste do retângulo. O custo é o das
+    células visitadas e dos candidatos nelas, não o do total de pontos.
+    Longitudes dão a volta no antimeridiano.
+    """
+
+    def __init__(self, cell_size: float = 0.1, capacity: int = 1024):
+        if not 0 < cell_size <= 180:
+            raise ValueError(f"Tamanho de célula inválido: {cell_size}")
+        self.cell_size = cell_size
+        self._lon_cells = math.ceil(360 / cell_size)
+        self._lat = np.zeros(capacity)
+        self._lon = np.zeros(capacity)
+        # Linha -> chave (None se livre) e chave -> linha
+        self._keys: List = []
+        self._rows: Dict[Hashable, int] = {}
+        self._free: List[int] = []
+        self._cells: Dict[Tuple[int, int], dict] = {}
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, key) -> bool:
+        return key in self._rows
+
+    def _cell(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        return (math.floor((latitude + 90) / self.cell_size),
+                math.floor((longitude + 180) / self.cell_size) % self._lon_cells)
+
+    def _grow(self):
+        """Dobra a capacidade das colunas"""
+        self._lat = np.concatenate((self._lat, np.zeros(len(self._lat))))
+        self._lon = np.concatenate((self._lon, np.zeros(len(self._lon))))
+
+    def add(self, key: Hashable, latitude: float, longitude: float) -> int:
+        """Inclui (ou move) o ponto da chave; coordenadas em graus. Retorna a linha"""
+        check_radius(latitude, longitude, 0)
+        self.remove(key)
+        if self._free:
+            row = self._free.pop()
+            self._keys[row] = key
+        else:
+            row = len(self._keys)
+            if row == len(self._lat):
+                self._grow()
+            self._keys.append(key)
+        self._lat[row] = latitude
+        self._lon[row] = longitude
+        self._rows[key] = row
+        self._cells.setdefault(self._cell(latitude, longitude), {})[row] = None
+        return row
+
+    def remove(self, key: Hashable) -> Optional[int]:
+        """Remove a chave; retorna a linha liberada (ou None se a chave não estava no índice)"""
+        row = self._rows.pop(key, None)
+        if row is None:
+            return None
+        cell = self._cell(self._lat[row], self._lon[row])
+        rows = self._cells[cell]
+        del rows[row]
+        if not rows:
+            del self._cells[cell]
+        self._keys[row] = None
+        self._free.append(row)
+        return row
+
+    def _candidates(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> np.ndarray:
+        """
+        Linhas das células que cobrem o retângulo
+
+        Percorre as células do retângulo ou, se forem mais que as células
+        ocupadas, as ocupadas filtradas pelos índices do retângulo.
+        """
+        first_lat, first_lon = self._cell(min_lat, min_lon)
+        last_lat = math.floor((max_lat + 90) / self.cell_size)
+        last_lon = math.floor(((max_lon + 360 if min_lon > max_lon else max_lon) + 180) / self.cell_size)
+        span = min(last_lon - math.floor((min_lon + 180) / self.cell_size) + 1, self._lon_cells)
+        if (last_lat - first_lat + 1) * span <= len(self._cells):
+            cells = (self._cells.get((i, (first_lon + j) % self._lon_cells))
+                     for i in range(first_lat, last_lat + 1) for j in range(span))
+            cells = [rows for rows in cells if rows]
+        else:
+            cells = [rows for (i, j), rows in self._cells.items()
+                     if first_lat <= i <= last_lat and (j - first_lon) % self._lon_cells < span]
+        return np.fromiter(chain.from_iterable(cells), dtype=np.intp, count=sum(map(len, cells)))
+
+    def within_radius(self, latitude: float, longitude: float, radius_km: float) -> Tuple[List, np.ndarray]:
+        """Chaves a até ``radius_km`` do ponto (graus) e as distâncias (km), da mais próxima para a mais distante"""
+        check_radius(latitude, longitude, radius_km)
+        rows = self._candidates(*radius_box(latitude, longitude, radius_km))
+        distances = haversine_km(latitude, longitude, self._lat[rows], self._lon[rows])
+        inside = distances <= radius_km
+        rows, distances = rows[inside], distances[inside]
+        order = np.argsort(distances, kind='stable')
+        return [self._keys[row] for row in rows[order].tolist()], distances[order]
+
+    def within_box(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> List:
+        """
+        Chaves com ``min_lat <= lat <= max_lat`` e longitude entre ``min_lon`` e
+        ``max_lon`` (com ``min_lon > max_lon`` o retângulo cruza o antimeridiano),
+        na ordem das linhas
+        """
+        check_box(min_lat, min_lon, max_lat, max_lon)
+        rows = self._candidates(min_lat, min_lon, max_lat, max_lon)
+        inside = in_box(self._lat[rows], self._lon[rows], min_lat, min_lon, max_lat, max_lon)
+        return [self._keys[row] for row in np.sort(rows[inside]).tolist()]
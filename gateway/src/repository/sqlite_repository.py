@@ -0,0 +1,566 @@
+# Repositório persistente (SQLite em modo WAL) com checkpoint do último bloco indexado
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from config.settings import settings
+from .conflicts import Conflict, ConflictIndex
+from .repository import cbsds_at, check_band_query
+from .spatial import (COORDINATE_SCALE, check_box, check_radius, haversine_km, in_box, longitude_ranges,
+                      radius_box)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cbsds (
+    cbsd_id TEXT PRIMARY KEY,
+    fcc_id TEXT,
+    serial_number TEXT,
+    sas_origin TEXT,
+    status TEXT,
+    block_number INTEGER,
+    transaction_hash TEXT,
+    latitude INTEGER,
+    longitude INTEGER
+);
+CREATE TABLE IF NOT EXISTS grants (
+    cbsd_id TEXT NOT NULL,
+    grant_id TEXT NOT NULL,
+    sas_origin TEXT,
+    created_at INTEGER,
+    transaction_hash TEXT,
+    terminated INTEGER NOT NULL DEFAULT 0,
+    terminated_at INTEGER,
+    terminated_by TEXT,
+    low_frequency INTEGER,
+    high_frequency INTEGER,
+    max_eirp INTEGER,
+    PRIMARY KEY (cbsd_id, grant_id)
+);
+CREATE TABLE IF NOT EXISTS sas (
+    address TEXT PRIMARY KEY,
+    authorized INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS checkpoint (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    block_number INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS block_hashes (
+    block_number INTEGER PRIMARY KEY,
+    hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS undo_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    block_number INTEGER NOT NULL,
+    table_name TEXT NOT NULL,
+    row_id INTEGER NOT NULL,
+    row TEXT
+);
+CREATE INDEX IF NOT EXISTS cbsds_sas_origin ON cbsds (sas_origin);
+CREATE INDEX IF NOT EXISTS cbsds_fcc_id ON cbsds (fcc_id);
+CREATE INDEX IF NOT EXISTS cbsds_status ON cbsds (status);
+CREATE INDEX IF NOT EXISTS grants_terminated ON grants (terminated);
+"""
+
+# Faixas dos grants ativos numa R*Tree (1 dimensão), mantida por triggers a cada
+# escrita em ``grants``, inclusive as do rollback. A R*Tree guarda floats de 32
+# bits arredondados para fora: o resultado é conferido nas colunas de ``grants``.
+BANDS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS grant_bands USING rtree(id, low, high);
+CREATE TRIGGER IF NOT EXISTS grant_bands_insert AFTER INSERT ON grants
+WHEN NEW.terminated = 0 AND NEW.low_frequency < NEW.high_frequency
+BEGIN
+    INSERT OR REPLACE INTO grant_bands (id, low, high) VALUES (NEW.rowid, NEW.low_frequency, NEW.high_frequency);
+END;
+CREATE TRIGGER IF NOT EXISTS grant_bands_update AFTER UPDATE ON grants
+BEGIN
+    DELETE FROM grant_bands WHERE id = OLD.rowid;
+    INSERT INTO grant_bands (id, low, high) SELECT NEW.rowid, NEW.low_frequency, NEW.high_frequency
+    WHERE NEW.terminated = 0 AND NEW.low_frequency < NEW.high_frequency;
+END;
+CREATE TRIGGER IF NOT EXISTS grant_bands_delete AFTER DELETE ON grants
+BEGIN
+    DELETE FROM grant_bands WHERE id = OLD.rowid;
+END;
+"""
+
+# Localizações dos CBSDs (graus) numa R*Tree de 2 dimensões, mantida por triggers
+# como ``grant_bands``; as coordenadas exatas (graus x 1e7) ficam em ``cbsds``.
+LOCATIONS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS cbsd_locations USING rtree(id, min_lat, max_lat, min_lon, max_lon);
+CREATE TRIGGER IF NOT EXISTS cbsd_locations_insert AFTER INSERT ON cbsds
+WHEN abs(NEW.latitude) <= 900000000 AND abs(NEW.longitude) <= 1800000000
+BEGIN
+    INSERT OR REPLACE INTO cbsd_locations (id, min_lat, max_lat, min_lon, max_lon)
+    VALUES (NEW.rowid, NEW.latitude / 1e7, NEW.latitude / 1e7, NEW.longitude / 1e7, NEW.longitude / 1e7);
+END;
+CREATE TRIGGER IF NOT EXISTS cbsd_locations_update AFTER UPDATE ON cbsds
+BEGIN
+    DELETE FROM cbsd_locations WHERE id = OLD.rowid;
+    INSERT INTO cbsd_locations (id, min_lat, max_lat, min_lon, max_lon)
+    SELECT NEW.rowid, NEW.latitude / 1e7, NEW.latitude / 1e7, NEW.longitude / 1e7, NEW.longitude / 1e7
+    WHERE abs(NEW.latitude) <= 900000000 AND abs(NEW.longitude) <= 1800000000;
+END;
+CREATE TRIGGER IF NOT EXISTS cbsd_locations_delete AFTER DELETE ON cbsds
+BEGIN
+    DELETE FROM cbsd_locations WHERE id = OLD.rowid;
+END;
+"""
+
+CBSD_FIELDS = ('fcc_id', 'serial_number', 'sas_origin', 'status', 'block_number', 'transaction_hash', 'latitude',
+               'longitude')
+GRANT_FIELDS = ('grant_id', 'sas_origin', 'created_at', 'transaction_hash', 'terminated', 'terminated_at',
+                'terminated_by', 'low_frequency', 'high_frequency', 'max_eirp')
+# Grants com a localização do CBSD, para o ``ConflictIndex`` (``active_grants``)
+GRANT_LOCATIONS_QUERY = (
+    "SELECT g.cbsd_id, g.grant_id, g.terminated, g.low_frequency, g.high_frequency, g.max_eirp, g.sas_origin, "
+    "c.latitude, c.longitude FROM grants g JOIN cbsds c ON c.cbsd_id = g.cbsd_id"
+)
+# Colunas acrescentadas depois da primeira versão do esquema (ALTER TABLE em bancos existentes)
+ADDED_COLUMNS = {'cbsds': (('latitude', 'INTEGER'), ('longitude', 'INTEGER')),
+                 'grants': (('low_frequency', 'INTEGER'), ('high_frequency', 'INTEGER'), ('max_eirp', 'INTEGER'))}
+
+class SQLiteCBSDRepository:
+    """
+    Mesma interface do CBSDRepository, persistida em SQLite
+
+    O indexador grava cada faixa de blocos numa única transação, junto com o
+    checkpoint do último bloco processado: após um restart o estado e o
+    checkpoint são consistentes e a indexação continua do bloco seguinte, sem
+    replay desde o gênese. As consultas vão direto às tabelas (nada é
+    carregado em memória na inicialização). ``sas_origin``, ``fcc_id``,
+    ``status`` e o estado dos grants têm índices (criados também em bancos
+    existentes ao abrir) usados por ``find_cbsds``/``find_grants``; as faixas
+    de frequência dos grants ativos numa R*Tree (``grant_bands``) e as
+    localizações dos CBSDs em outra (``cbsd_locations``).
+
+    A exceção é ``active_grants``, o ``ConflictIndex`` de ``find_conflicts``:
+    carregado das tabelas no primeiro uso, atualizado a cada escrita e
+    descartado (recarregado no uso seguinte) após um rollback.
+
+    Dentro de ``journal(bloco)`` cada linha alterada é copiada (com o rowid)
+    para ``undo_log`` antes da escrita, na mesma transação: ``rollback`` a
+    restaura após um reorg, inclusive depois de um restart.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        # Transações controladas explicitamente (BEGIN/COMMIT em ``transaction``)
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        # Triggers disparam também na remoção feita por INSERT OR REPLACE
+        self.conn.execute("PRAGMA recursive_triggers=ON")
+        self.conn.executescript(SCHEMA)
+        self._add_columns()
+        self.conn.executescript(BANDS_SCHEMA)
+        self.conn.executescript(LOCATIONS_SCHEMA)
+        self._in_transaction = False
+        self._journal_block = None
+        self._active_grants: Optional[ConflictIndex] = None
+
+    def _add_columns(self):
+        for table, columns in ADDED_COLUMNS.items():
+            existing = {row['name'] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+            for name, column_type in columns:
+                if name not in existing:
+                    self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}")
+
+    def close(self):
+        self.conn.close()
+
+    @contextmanager
+    def transaction(self):
+        """Agrupa as escritas numa transação (commit no fim, rollback em erro)"""
+        if self._in_transaction:
+            yield
+            return
+        self.conn.execute("BEGIN")
+        self._in_transaction = True
+        try:
+            yield
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            self._active_grants = None
+            raise
+        else:
+            self.conn.execute("COMMIT")
+        finally:
+            self._in_transaction = False
+
+    def _journal(self, table: str, row_id: int, row: Optional[sqlite3.Row] = None):
+        """Registra como desfazer a alteração: restaurar ``row`` ou, sem ela, apagar a linha ``row_id``"""
+        if self._journal_block is not None:
+            data = json.dumps({key: row[key] for key in row.keys() if key != 'rowid'}) if row is not None else None
+            self.conn.execute("INSERT INTO undo_log (block_number, table_name, row_id, row) VALUES (?, ?, ?, ?)",
+                              (self._journal_block, table, row_id, data))
+
+    def _replace(self, table: str, key: str, key_value, fields, values):
+        """INSERT OR REPLACE com o registro do desfazer (linha substituída e linha nova)"""
+        if self._journal_block is not None:
+            previous = self.conn.execute(f"SELECT rowid, * FROM {table} WHERE {key} = ?", (key_value,)).fetchone()
+            if previous is not None:
+                self._journal(table, previous['rowid'], previous)
+        cursor = self.conn.execute(
+            f"INSERT OR REPLACE INTO {table} ({', '.join(fields)}) VALUES ({', '.join('?' * len(fields))})", values
+        )
+        self._journal(table, cursor.lastrowid)
+
+    @property
+    def active_grants(self) -> ConflictIndex:
+        """Grants ativos com a localização do CBSD em colunas (carregados das tabelas no primeiro uso)"""
+        if self._active_grants is None:
+            index = ConflictIndex(settings.SPATIAL_CELL_DEGREES)
+            for row in self.conn.execute(GRANT_LOCATIONS_QUERY + " WHERE g.terminated = 0"):
+                index.put((row['cbsd_id'], row['grant_id']), row['latitude'], row['longitude'],
+                          row['low_frequency'], row['high_frequency'], row['max_eirp'], row['sas_origin'])
+            self._active_grants = index
+        return self._active_grants
+
+    def _sync_grants(self, cbsd_id, grant_id=None):
+        """Atualiza ``active_grants`` (se carregado) com os grants do CBSD (ou só ``grant_id``) das tabelas"""
+        if self._active_grants is None:
+            return
+        if grant_id is None:
+            rows = self.conn.execute(GRANT_LOCATIONS_QUERY + " WHERE g.cbsd_id = ?", (cbsd_id,))
+        else:
+            rows = self.conn.execute(GRANT_LOCATIONS_QUERY + " WHERE g.cbsd_id = ? AND g.grant_id = ?",
+                                     (cbsd_id, grant_id))
+        for row in rows:
+            key = (cbsd_id, row['grant_id'])
+            if row['terminated']:
+                self._active_grants.remove(key)
+            else:
+                self._active_grants.put(key, row['latitude'], row['longitude'], row['low_frequency'],
+                                        row['high_frequency'], row['max_eirp'], row['sas_origin'])
+
+    def add(self, cbsd_id, data):
+        self._replace('cbsds', 'cbsd_id', cbsd_id, ('cbsd_id',) + CBSD_FIELDS,
+                      (cbsd_id, *(data.get(field) for field in CBSD_FIELDS)))
+        # A localização dos grants que continuam no CBSD pode ter mudado
+        self._sync_grants(cbsd_id)
+
+    def _delete_grants(self, cbsd_id):
+        if self._active_grants is not None:
+            for row in self.conn.execute("SELECT grant_id FROM grants WHERE cbsd_id = ?", (cbsd_id,)).fetchall():
+                self._active_grants.remove((cbsd_id, row['grant_id']))
+        if self._journal_block is not None:
+            # Ordem decrescente: o rollback (ordem inversa) restaura os grants na ordem original
+            for row in self.conn.execute("SELECT rowid, * FROM grants WHERE cbsd_id = ? ORDER BY rowid DESC",
+                                         (cbsd_id,)).fetchall():
+                self._journal('grants', row['rowid'], row)
+        self.conn.execute("DELETE FROM grants WHERE cbsd_id = ?", (cbsd_id,))
+
+    def add_cbsd(self, cbsd_id, data):
+        """Registra o CBSD sem grants; o mesmo evento reentregue não descarta os grants (ver ``CBSDRepository``)"""
+        with self.transaction():
+            row = self.conn.execute("SELECT block_number, transaction_hash FROM cbsds WHERE cbsd_id = ?",
+                                    (cbsd_id,)).fetchone()
+            if row is not None and (row['block_number'], row['transaction_hash']) == (
+                    data.get('block_number'), data.get('transaction_hash')):
+                return
+            self._delete_grants(cbsd_id)
+            self.add(cbsd_id, data)
+
+    def remove_cbsd(self, cbsd_id) -> bool:
+        """Remove o CBSD e seus grants (deregistration); rollback restaura ambos"""
+        with self.transaction():
+            row = self.conn.execute("SELECT rowid, * FROM cbsds WHERE cbsd_id = ?", (cbsd_id,)).fetchone()
+            if row is None:
+                return False
+            self._delete_grants(cbsd_id)
+            self._journal('cbsds', row['rowid'], row)
+            self.conn.execute("DELETE FROM cbsds WHERE rowid = ?", (row['rowid'],))
+        return True
+
+    def get(self, cbsd_id):
+        row = self.conn.execute("SELECT * FROM cbsds WHERE cbsd_id = ?", (cbsd_id,)).fetchone()
+        if row is None:
+            return None
+        return dict({field: row[field] for field in CBSD_FIELDS}, grants=self.get_grants(cbsd_id))
+
+    def all(self):
+        for row in self.conn.execute("SELECT cbsd_id FROM cbsds"):
+            yield self.get(row['cbsd_id'])
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM cbsds").fetchone()[0]
+
+    def add_grant(self, cbsd_id, grant) -> bool:
+        if self.conn.execute("SELECT 1 FROM cbsds WHERE cbsd_id = ?", (cbsd_id,)).fetchone() is None:
+            return False
+        if self._journal_block is not None:
+            previous = self.conn.execute("SELECT rowid, * FROM grants WHERE cbsd_id = ? AND grant_id = ?",
+                                         (cbsd_id, grant['grant_id'])).fetchone()
+            if previous is not None:
+                self._journal('grants', previous['rowid'], previous)
+        cursor = self.conn.execute(
+            f"INSERT OR REPLACE INTO grants (cbsd_id, {', '.join(GRANT_FIELDS)}) VALUES (?{', ?' * len(GRANT_FIELDS)})",
+            (cbsd_id, *(grant.get(field, False if field == 'terminated' else None) for field in GRANT_FIELDS))
+        )
+        self._journal('grants', cursor.lastrowid)
+        self._sync_grants(cbsd_id, grant['grant_id'])
+        return True
+
+    def terminate_grant(self, cbsd_id, grant_id, block_number, terminated_by) -> bool:
+        if self._journal_block is not None:
+            previous = self.conn.execute("SELECT rowid, * FROM grants WHERE cbsd_id = ? AND grant_id = ?",
+                                         (cbsd_id, grant_id)).fetchone()
+            if previous is not None:
+                self._journal('grants', previous['rowid'], previous)
+        cursor = self.conn.execute(
+            "UPDATE grants SET terminated = 1, terminated_at = ?, terminated_by = ? WHERE cbsd_id = ? AND grant_id = ?",
+            (block_number, terminated_by, cbsd_id, grant_id)
+        )
+        if cursor.rowcount == 0:
+            return False
+        self._sync_grants(cbsd_id, grant_id)
+        return True
+
+    def get_grants(self, cbsd_id):
+        rows = self.conn.execute("SELECT * FROM grants WHERE cbsd_id = ? ORDER BY rowid", (cbsd_id,)).fetchall()
+        if not rows and self.conn.execute("SELECT 1 FROM cbsds WHERE cbsd_id = ?", (cbsd_id,)).fetchone() is None:
+            return None
+        return [dict({field: row[field] for field in GRANT_FIELDS}, terminated=bool(row['terminated']))
+                for row in rows]
+
+    def find_cbsds(self, sas_origin=None, fcc_id=None, status=None,
+                   batch_size: int = 256) -> Iterator[Tuple[str, dict]]:
+        """
+        ``(cbsd_id, cbsd)`` dos CBSDs com os valores dados, na ordem de gravação
+
+        Lê pelos índices em lotes de ``batch_size`` (continuando do último
+        rowid, sem cursor aberto entre lotes); sem filtros percorre a tabela.
+        """
+        filters = [(field, value) for field, value in
+                   (('sas_origin', sas_origin), ('fcc_id', fcc_id), ('status', status)) if value is not None]
+        where = ''.join(f" AND {field} = ?" for field, _ in filters)
+        last = 0
+        while True:
+            rows = self.conn.execute(
+                f"SELECT rowid, * FROM cbsds WHERE rowid > ?{where} ORDER BY rowid LIMIT ?",
+                (last, *(value for _, value in filters), batch_size)
+            ).fetchall()
+            for row in rows:
+                yield row['cbsd_id'], dict({field: row[field] for field in CBSD_FIELDS},
+                                           grants=self.get_grants(row['cbsd_id']) or [])
+            if len(rows) < batch_size:
+                return
+            last = rows[-1]['rowid']
+
+    def find_grants(self, state: str, low: Optional[int] = None, high: Optional[int] = None,
+                    batch_size: int = 256) -> Iterator[Tuple[str, dict]]:
+        """
+        ``(cbsd_id, grant)`` dos grants no estado ``active`` ou ``terminated``, com ``fcc_id``/``serial_number``
+
+        Com ``low``/``high`` (Hz), os grants ativos cuja faixa sobrepõe
+        ``[low, high)``, pela R*Tree ``grant_bands`` (cursor lido aos poucos:
+        consumir sem ceder o loop).
+        """
+        check_band_query(state, low, high)
+        if low is not None:
+            return self._iter_bands(low, high, batch_size)
+        return self._iter_grants(int(state == 'terminated'), batch_size)
+
+    @staticmethod
+    def _grant_item(row):
+        grant = {field: row[field] for field in GRANT_FIELDS}
+        return row['cbsd_id'], dict(grant, terminated=bool(row['terminated']), fcc_id=row['cbsd_fcc_id'],
+                                    serial_number=row['cbsd_serial_number'])
+
+    def _iter_grants(self, terminated: int, batch_size: int):
+        last = 0
+        while True:
+            rows = self.conn.execute(
+                "SELECT g.rowid, g.*, c.fcc_id AS cbsd_fcc_id, c.serial_number AS cbsd_serial_number "
+                "FROM grants g JOIN cbsds c ON c.cbsd_id = g.cbsd_id "
+                "WHERE g.terminated = ? AND g.rowid > ? ORDER BY g.rowid LIMIT ?", (terminated, last, batch_size)
+            ).fetchall()
+            for row in rows:
+                yield self._grant_item(row)
+            if len(rows) < batch_size:
+                return
+            last = rows[-1]['rowid']
+
+    def _iter_bands(self, low: int, high: int, batch_size: int):
+        cursor = self.conn.execute(
+            "SELECT g.*, c.fcc_id AS cbsd_fcc_id, c.serial_number AS cbsd_serial_number "
+            "FROM grant_bands b JOIN grants g ON g.rowid = b.id JOIN cbsds c ON c.cbsd_id = g.cbsd_id "
+            "WHERE b.low < ? AND b.high > ? AND g.low_frequency < ? AND g.high_frequency > ? AND g.terminated = 0",
+            (high, low, high, low)
+        )
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    return
+                for row in rows:
+                    yield self._grant_item(row)
+        finally:
+            cursor.close()
+
+    def _located(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float):
+        """
+        rowids de ``cbsds`` candidatos ao retângulo (R*Tree, uma consulta por
+        faixa de longitude) e suas coordenadas exatas em graus
+        """
+        rows = []
+        for low, high in longitude_ranges(min_lon, max_lon):
+            rows += self.conn.execute(
+                "SELECT c.rowid, c.latitude, c.longitude FROM cbsd_locations l JOIN cbsds c ON c.rowid = l.id "
+                "WHERE l.max_lat >= ? AND l.min_lat <= ? AND l.max_lon >= ? AND l.min_lon <= ?",
+                (min_lat, max_lat, low, high)
+            ).fetchall()
+        located = np.array([tuple(row) for row in rows], dtype=np.int64).reshape(-1, 3)
+        return located[:, 0], located[:, 1] / COORDINATE_SCALE, located[:, 2] / COORDINATE_SCALE
+
+    def _iter_located(self, rowids, distances=None):
+        """CBSDs pelos rowids, lidos só ao consumir (a paginação lê só a página)"""
+        for i, rowid in enumerate(rowids):
+            row = self.conn.execute("SELECT * FROM cbsds WHERE rowid = ?", (rowid,)).fetchone()
+            if row is None:
+                continue
+            cbsd = dict({field: row[field] for field in CBSD_FIELDS}, grants=self.get_grants(row['cbsd_id']) or [])
+            if distances is not None:
+                cbsd['distance_km'] = distances[i]
+            yield row['cbsd_id'], cbsd
+
+    def find_near(self, latitude: float, longitude: float, radius_km: float) -> Iterator[Tuple[str, dict]]:
+        """
+        ``(cbsd_id, cbsd)`` dos CBSDs a até ``radius_km`` do ponto (graus), do mais próximo ao mais distante
+
+        Candidatos pela R*Tree ``cbsd_locations`` (retângulo do círculo), distâncias
+        calculadas de uma vez com NumPy; cada CBSD traz ``distance_km``.
+        """
+        check_radius(latitude, longitude, radius_km)
+        rowids, latitudes, longitudes = self._located(*radius_box(latitude, longitude, radius_km))
+        distances = haversine_km(latitude, longitude, latitudes, longitudes)
+        inside = np.flatnonzero(distances <= radius_km)
+        order = inside[np.argsort(distances[inside], kind='stable')]
+        return self._iter_located(rowids[order].tolist(), distances[order].tolist())
+
+    def find_in_box(self, min_lat: float, min_lon: float, max_lat: float,
+                    max_lon: float) -> Iterator[Tuple[str, dict]]:
+        """``(cbsd_id, cbsd)`` dos CBSDs no retângulo (graus; ``min_lon > max_lon`` cruza o antimeridiano)"""
+        check_box(min_lat, min_lon, max_lat, max_lon)
+        rowids, latitudes, longitudes = self._located(min_lat, min_lon, max_lat, max_lon)
+        return self._iter_located(np.sort(rowids[in_box(latitudes, longitudes, min_lat, min_lon, max_lat,
+                                                        max_lon)]).tolist())
+
+    def find_conflicts(self, cbsd_id, grant_id, radius_km: Optional[float] = None) -> List[Conflict]:
+        """Grants ativos de outros SAS com faixa sobreposta à do grant a até ``radius_km`` (ver ``CBSDRepository``)"""
+        return self.active_grants.conflicts_of((cbsd_id, grant_id),
+                                               settings.CONFLICT_RADIUS_KM if radius_km is None else radius_km)
+
+    def set_sas(self, sas_address, authorized: bool):
+        self._replace('sas', 'address', sas_address, ('address', 'authorized'), (sas_address, int(authorized)))
+
+    def is_authorized_sas(self, sas_address) -> bool:
+        row = self.conn.execute("SELECT authorized FROM sas WHERE address = ?", (sas_address,)).fetchone()
+        return bool(row['authorized']) if row else False
+
+    def snapshot(self):
+        """
+        Estado no checkpoint atual para leituras longas (ex.: fullActivityDump)
+
+        Retorna ``(bloco, iterador de (cbsd_id, cbsd), {sas: autorizado})``. O
+        iterador abre uma conexão própria na primeira leitura (fechada no fim,
+        ou quando é descartado sem ser consumido) numa transação de leitura:
+        em modo WAL ela vê o banco como estava naquele momento, enquanto o
+        indexador continua gravando. CBSDs, grants e encerramentos de blocos
+        posteriores ao checkpoint são ignorados.
+        """
+        block = self.get_checkpoint()
+        sas = {row['address']: bool(row['authorized']) for row in self.conn.execute("SELECT * FROM sas")}
+        return block, cbsds_at(self._iter_snapshot(self.path), block), sas
+
+    @staticmethod
+    def _iter_snapshot(path: str, batch_size: int = 1000):
+        conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("BEGIN")
+            columns = ', '.join([f"c.{field}" for field in CBSD_FIELDS] +
+                                [f"g.{field} AS grant_{field}" for field in GRANT_FIELDS])
+            cursor = conn.execute(
+                f"SELECT c.cbsd_id, {columns} FROM cbsds c LEFT JOIN grants g ON g.cbsd_id = c.cbsd_id "
+                "ORDER BY c.cbsd_id, g.rowid"
+            )
+            current_id, current = None, None
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    if row['cbsd_id'] != current_id:
+                        if current is not None:
+                            yield current_id, current
+                        current_id = row['cbsd_id']
+                        current = dict({field: row[field] for field in CBSD_FIELDS}, grants=[])
+                    if row['grant_grant_id'] is not None:
+                        grant = {field: row[f'grant_{field}'] for field in GRANT_FIELDS}
+                        grant['terminated'] = bool(grant['terminated'])
+                        current['grants'].append(grant)
+            if current is not None:
+                yield current_id, current
+        finally:
+            conn.close()
+
+    def get_checkpoint(self) -> Optional[int]:
+        row = self.conn.execute("SELECT block_number FROM checkpoint WHERE id = 0").fetchone()
+        return row['block_number'] if row else None
+
+    def set_checkpoint(self, block_number: int):
+        self.conn.execute("INSERT OR REPLACE INTO checkpoint (id, block_number) VALUES (0, ?)", (block_number,))
+
+    @contextmanager
+    def journal(self, block_number: int):
+        """Registra como desfazer as alterações feitas no bloco ``block_number``"""
+        self._journal_block = block_number
+        try:
+            yield
+        finally:
+            self._journal_block = None
+
+    def rollback(self, block_number: int) -> int:
+        """
+        Desfaz as alterações registradas de blocos após ``block_number`` (reorg)
+
+        Descarta os hashes desses blocos, volta o checkpoint para
+        ``block_number`` e retorna quantas alterações foram desfeitas.
+        """
+        with self.transaction():
+            entries = self.conn.execute(
+                "SELECT table_name, row_id, row FROM undo_log WHERE block_number > ? ORDER BY id DESC", (block_number,)
+            ).fetchall()
+            for entry in entries:
+                table = entry['table_name']
+                if entry['row'] is None:
+                    self.conn.execute(f"DELETE FROM {table} WHERE rowid = ?", (entry['row_id'],))
+                else:
+                    row = json.loads(entry['row'])
+                    self.conn.execute(
+                        f"INSERT OR REPLACE INTO {table} (rowid, {', '.join(row)}) VALUES (?{', ?' * len(row)})",
+                        (entry['row_id'], *row.values())
+                    )
+            self.conn.execute("DELETE FROM undo_log WHERE block_number > ?", (block_number,))
+            self.conn.execute("DELETE FROM block_hashes WHERE block_number > ?", (block_number,))
+            self.set_checkpoint(block_number)
+        self._active_grants = None
+        return len(entries)
+
+    def prune(self, block_number: int):
+        """Esquece o desfazer e os hashes de blocos até ``block_number`` (confirmados)"""
+        self.conn.execute("DELETE FROM undo_log WHERE block_number <= ?", (block_number,))
+        self.conn.execute("DELETE FROM block_hashes WHERE block_number <= ?", (block_number,))
+
+    def get_block_hashes(self) -> Dict[int, str]:
+        return {row['block_number']: row['hash'] for row in self.conn.execute("SELECT * FROM block_hashes")}
+
+    def set_block_hash(self, block_number: int, block_hash: str):
+        self.conn.execute("INSERT OR REPLACE INTO block_hashes (block_number, hash) VALUES (?, ?)",
+                          (block_number, block_hash))
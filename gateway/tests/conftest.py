@@ -0,0 +1,29 @@
+import pytest
+
+from repository.repository import CBSDRepository
+from repository.sqlite_repository import SQLiteCBSDRepository
+
+@pytest.fixture(params=["memory", "columnar", "sqlite"])
+def repo_kind(request):
+    """Implementação do repositório; um teste restringe com ``@pytest.mark.parametrize("repo_kind", [...])``"""
+    return request.param
+
+@pytest.fixture
+def make_repo(repo_kind, tmp_path):
+    """
+    Cria repositórios do tipo ``repo_kind``: em memória (grants em objetos ou
+    em colunas) ou SQLite no arquivo ``name`` em ``tmp_path`` (o mesmo nome
+    reabre o banco). Os bancos SQLite são fechados no fim do teste.
+    """
+    opened = []
+
+    def make(name="index.db"):
+        if repo_kind != "sqlite":
+            return CBSDRepository(columnar_grants=repo_kind == "columnar")
+        repo = SQLiteCBSDRepository(str(tmp_path / name))
+        opened.append(repo)
+        return repo
+
+    yield make
+    for repo in opened:
+        repo.close()
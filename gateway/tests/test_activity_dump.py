@@ -0,0 +1,169 @@
+import gzip
+import json
+import sqlite3
+import pytest
+
+import api.api as api_module
+import repository.sqlite_repository as sqlite_repository
+from repository.activity_dump import dump_chunks
+from repository.repository import CBSDRepository, cbsd_key
+from test_event_indexer import client
+
+SAS = "0xf39Fd6e51aad88F6F4ce6aB8827279cffFb92266"
+
+def add(repo, serial, block, grant=False):
+    cbsd_id = cbsd_key("FCC-DUMP", serial)
+    repo.add_cbsd(cbsd_id, {"fcc_id": "FCC-DUMP", "serial_number": serial, "sas_origin": SAS,
+                            "status": "registered", "block_number": block, "transaction_hash": "0x01"})
+    if grant:
+        repo.add_grant(cbsd_id, {"grant_id": f"GRANT-{serial}", "sas_origin": SAS, "created_at": block,
+                                 "transaction_hash": "0x02", "terminated": False})
+    return cbsd_id
+
+def read_dump(snapshot, **kwargs):
+    chunks = list(dump_chunks(snapshot, **kwargs))
+    body = b"".join(chunks)
+    if kwargs.get("gzip"):
+        body = gzip.decompress(body)
+    return chunks, [json.loads(line) for line in body.decode().splitlines()]
+
+def test_dump_is_consistent_at_snapshot_block(make_repo):
+    """Alterações indexadas durante a geração não aparecem no dump"""
+    repo = make_repo()
+    with repo.transaction():
+        first = add(repo, "SN-1", 10, grant=True)
+        for i in range(2, 199):
+            add(repo, f"SN-{i}", 10)
+        last = add(repo, "SN-199", 10, grant=True)
+        repo.set_sas(SAS, True)
+        repo.set_checkpoint(10)
+
+    block, cbsds, sas = repo.snapshot()
+    lines = [next(cbsds)]
+    # Indexador avança enquanto o dump ainda está sendo lido
+    with repo.transaction():
+        add(repo, "SN-NEW", 11, grant=True)
+        repo.terminate_grant(first, "GRANT-SN-1", 11, SAS)
+        # Removido e registrado de novo antes de ser lido: continua no dump como estava no bloco 10
+        repo.remove_cbsd(last)
+        add(repo, "SN-199", 11)
+        repo.set_sas(SAS, False)
+        repo.set_checkpoint(11)
+    lines += list(cbsds)
+
+    assert block == 10
+    assert len(lines) == 199
+    assert all(cbsd["block_number"] == 10 for _, cbsd in lines)
+    grants = dict(lines)[first]["grants"]
+    assert [(g["grant_id"], g["terminated"]) for g in grants] == [("GRANT-SN-1", False)]
+    assert [g["grant_id"] for g in dict(lines)[last]["grants"]] == ["GRANT-SN-199"]
+    assert sas == {SAS: True}
+
+@pytest.mark.parametrize("repo_kind", ["memory", "columnar"])
+def test_memory_snapshot_copies_only_changed_cbsds(make_repo, monkeypatch):
+    """Cada CBSD é convertido só ao ser lido; os alterados antes disso têm o estado do snapshot copiado"""
+    repo = make_repo()
+    ids = [add(repo, f"SN-{i}", 10) for i in range(100)]
+    with repo.journal(10):
+        repo.add_grant(ids[50], {"grant_id": "GRANT-REORG", "sas_origin": SAS, "created_at": 10,
+                                 "transaction_hash": "0x02", "terminated": False})
+    repo.set_checkpoint(10)
+    converted = []
+    as_dict = repo._as_dict
+    monkeypatch.setattr(repo, "_as_dict", lambda cbsd: converted.append(cbsd) or as_dict(cbsd))
+
+    block, cbsds, _ = repo.snapshot()
+    lines = [next(cbsds) for _ in range(10)]
+    assert len(converted) == 10
+    # Ainda não lidos: o bloco 10 desfeito por um reorg, um CBSD removido e outro registrado
+    repo.rollback(9)
+    repo.remove_cbsd(ids[60])
+    add(repo, "SN-NEW", 11)
+    assert len(converted) == 12
+    lines += list(cbsds)
+
+    assert block == 10 and [cbsd_id for cbsd_id, _ in lines] == ids
+    assert [g["grant_id"] for g in dict(lines)[ids[50]]["grants"]] == ["GRANT-REORG"]
+    assert len(converted) == 100
+    assert not repo._snapshots
+
+@pytest.mark.parametrize("repo_kind", ["sqlite"])
+def test_sqlite_snapshot_opens_connection_on_first_read(make_repo, monkeypatch):
+    """A conexão de leitura só existe enquanto o iterador é consumido; grants na ordem de gravação"""
+    repo = make_repo()
+    cbsd_id = add(repo, "SN-1", 5)
+    for grant_id in ("G-C", "G-A", "G-B"):
+        repo.add_grant(cbsd_id, {"grant_id": grant_id, "sas_origin": SAS, "created_at": 5,
+                                 "transaction_hash": "0x02", "terminated": False})
+    repo.set_checkpoint(5)
+    opened = []
+    connect = sqlite3.connect
+
+    def tracked_connect(*args, **kwargs):
+        opened.append(connect(*args, **kwargs))
+        return opened[-1]
+
+    monkeypatch.setattr(sqlite_repository.sqlite3, "connect", tracked_connect)
+
+    _, cbsds, _ = repo.snapshot()
+    assert opened == []
+    cbsds.close()
+    assert opened == []
+
+    _, cbsds, _ = repo.snapshot()
+    assert [g["grant_id"] for _, cbsd in cbsds for g in cbsd["grants"]] == ["G-C", "G-A", "G-B"]
+    assert len(opened) == 1
+    with pytest.raises(sqlite3.ProgrammingError):
+        opened[0].execute("SELECT 1")
+
+def test_dump_chunks_ndjson_and_gzip():
+    """Cabeçalho com a altura do bloco, um registro por linha, rodapé com contagens; partes limitadas"""
+    repo = CBSDRepository()
+    for i in range(500):
+        add(repo, f"SN-{i}", 3, grant=i % 2 == 0)
+    repo.set_sas(SAS, True)
+    repo.set_checkpoint(3)
+
+    chunks, records = read_dump(repo.snapshot(), chunk_size=4096)
+    assert len(chunks) > 10
+    assert all(len(chunk) < 4096 + 1024 for chunk in chunks)
+    assert records[0]["recordType"] == "header" and records[0]["blockHeight"] == 3
+    assert records[-1] == {"recordType": "footer", "blockHeight": 3, "counts": {"cbsd": 500, "sas": 1, "grant": 250}}
+    assert records[1]["fccId"] == "FCC-DUMP" and records[1]["grants"][0]["grantId"] == "GRANT-SN-0"
+    assert records[-2] == {"recordType": "sas", "address": SAS, "authorized": True}
+
+    _, compressed = read_dump(repo.snapshot(), chunk_size=4096, gzip=True)
+    assert compressed[1:] == records[1:]
+
+@pytest.mark.asyncio
+async def test_full_activity_dump_endpoint(monkeypatch):
+    """GET /v1.2/fullActivityDump responde NDJSON com X-Block-Height, gzip se aceito"""
+    repo = CBSDRepository()
+    add(repo, "SN-API", 7, grant=True)
+    repo.set_checkpoint(7)
+    monkeypatch.setattr(api_module, "repo", repo)
+
+    async with client() as http:
+        response = await http.get("/v1.2/fullActivityDump", headers={"Accept-Encoding": "identity"})
+        compressed = await http.get("/v1.2/fullActivityDump", headers={"Accept-Encoding": "gzip"})
+        refused = await http.get("/v1.2/fullActivityDump", headers={"Accept-Encoding": "gzip;q=0, identity"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert response.headers["x-block-height"] == "7"
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["recordType"] for r in records] == ["header", "cbsd", "footer"]
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert "content-encoding" not in refused.headers and refused.text == response.text
+    # httpx descomprime conforme Content-Encoding
+    assert [json.loads(line) for line in compressed.text.splitlines()][1:] == records[1:]
+
+def test_accept_encoding_quality_values():
+    """gzip só com q > 0; ``*`` cobre o gzip quando ele não foi listado"""
+    assert api_module.accepts_gzip("gzip, deflate, br")
+    assert api_module.accepts_gzip("br;q=1.0, GZIP;q=0.5")
+    assert api_module.accepts_gzip("*")
+    assert not api_module.accepts_gzip("gzip;q=0")
+    assert not api_module.accepts_gzip("gzip; q=0.0, *;q=1")
+    assert not api_module.accepts_gzip("identity")
+    assert not api_module.accepts_gzip("")
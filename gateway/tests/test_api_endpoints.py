@@ -1,14 +1,13 @@
 import pytest
 from fastapi.testclient import TestClient
 from api.api import app
-from blockchain.blockchain import Blockchain
 import json
 
 # Inicializar blockchain manualmente para os testes
 try:
-    blockchain = Blockchain()
-    # Substituir o objeto global na API
     import api.api as api_module
+    # Substituir o objeto global na API (contexto assíncrono do owner)
+    blockchain = api_module.get_signer()
     api_module.blockchain = blockchain
 except Exception as e:
     print(f"Erro ao inicializar blockchain para testes: {e}")
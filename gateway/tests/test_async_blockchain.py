@@ -0,0 +1,312 @@
+import os
+import sys
+import time
+import asyncio
+import pytest
+import pytest_asyncio
+import httpx
+from web3 import AsyncWeb3
+from eth_account import Account
+from hexbytes import HexBytes
+
+# Nó JSON-RPC local usado também pelos benchmarks
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+from rpc_standin import ChainStandIn, RPCStandInServer, decode_raw_transaction
+
+import api.api as api_module
+from blockchain.async_blockchain import AsyncBlockchain
+from blockchain.signer_pool import SignerPool
+from blockchain.receipt_cache import ReceiptCache
+from blockchain.receipt_watcher import ReceiptWatcher
+from blockchain.gas_policy import GasPolicy
+
+BLOCK_TIME = 0.3
+
+REG_PAYLOAD = {
+    "fccId": "TEST-FCC-ASYNC",
+    "userId": "TEST-USER-ASYNC",
+    "cbsdSerialNumber": "TEST-SN-ASYNC",
+    "callSign": "TESTCALL",
+    "cbsdCategory": "A",
+    "airInterface": "E_UTRA",
+    "measCapability": ["EUTRA_CARRIER_RSSI"],
+    "eirpCapability": 47,
+    "latitude": 375000000,
+    "longitude": 1224000000,
+    "height": 30,
+    "heightType": "AGL",
+    "indoorDeployment": False,
+    "antennaGain": 15,
+    "antennaBeamwidth": 360,
+    "antennaAzimuth": 0,
+    "groupingParam": "",
+    "cbsdAddress": "0xf39Fd6e51aad88F6F4ce6aB8827279cffFb92266"
+}
+
+@pytest.fixture
+def standin():
+    server = RPCStandInServer(ChainStandIn(block_time=BLOCK_TIME)).start()
+    yield server
+    server.stop()
+
+@pytest_asyncio.fixture
+async def pool(standin):
+    web3 = AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(standin.url))
+    watcher = ReceiptWatcher(web3, api_module.receipt_cache, poll_interval=0.05)
+    pool = SignerPool(web3=web3, signer_class=AsyncBlockchain, receipt_watcher=watcher,
+                      gas_policy=GasPolicy(web3, watcher, fixed_limits={}))
+    previous = api_module.signer_pool, api_module.blockchain, api_module.receipt_watcher
+    api_module.signer_pool, api_module.blockchain, api_module.receipt_watcher = pool, pool.get(), watcher
+    yield pool
+    api_module.signer_pool, api_module.blockchain, api_module.receipt_watcher = previous
+    await watcher.close()
+    await pool.close()
+
+@pytest.mark.asyncio
+async def test_registration_returns_receipt(pool):
+    """Registration assíncrono retorna o recibo minerado"""
+    receipt = await pool.get().registration(REG_PAYLOAD)
+    assert receipt["status"] == 1
+    assert receipt["blockNumber"] >= 1
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_overlap_on_one_worker(pool):
+    """Requisições concorrentes num único event loop aguardam o mesmo bloco em paralelo"""
+    transport = httpx.ASGITransport(app=api_module.app)
+    requests = 10
+    async with httpx.AsyncClient(transport=transport, base_url="http://gateway") as client:
+        start = time.perf_counter()
+        responses = await asyncio.gather(*[
+            client.post("/v1.3/registration", json=dict(
+                REG_PAYLOAD, cbsdSerialNumber=f"SN-{i}", private_key=Account.create().key.hex()
+            ))
+            for i in range(requests)
+        ])
+        elapsed = time.perf_counter() - start
+
+    assert all(r.status_code == 200 for r in responses), [r.text for r in responses]
+    # Serializadas levariam ~requests blocos; sobrepostas cabem em poucos blocos
+    assert elapsed < requests * BLOCK_TIME / 2
+    blocks = {r.json()["block_number"] for r in responses}
+    assert len(blocks) <= 2
+
+@pytest.mark.asyncio
+async def test_fire_and_track_returns_202_and_tracks_status(pool):
+    """Com 'Prefer: respond-async' a escrita retorna 202 e o status é consultável"""
+    transport = httpx.ASGITransport(app=api_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://gateway") as client:
+        resp = await client.post("/v1.3/registration", json=dict(REG_PAYLOAD, cbsdSerialNumber="SN-TRACK"),
+                                 headers={"Prefer": "respond-async"})
+        assert resp.status_code == 202
+        tx_hash = resp.json()["transaction_hash"]
+        assert resp.json()["status_url"] == f"/v1.3/tx/{tx_hash}"
+
+        status = (await client.get(f"/v1.3/tx/{tx_hash}")).json()
+        assert status["status"] == "pending"
+        assert status["block_number"] is None
+
+        await asyncio.sleep(BLOCK_TIME * 2)
+        status = (await client.get(f"/v1.3/tx/0x{tx_hash}")).json()
+        assert status["status"] == "mined"
+        assert status["block_number"] >= 1
+        assert status["gas_used"] > 0
+
+        assert (await client.get("/v1.3/tx/0x" + "ab" * 32)).status_code == 404
+
+def test_receipt_cache_statuses_and_eviction():
+    """ReceiptCache distingue mined/reverted e respeita o limite"""
+    cache = ReceiptCache(max_size=2)
+    cache.track(b"\x01" * 32)
+    cache.track("0x" + "02" * 32)
+    assert cache.pending() == ["01" * 32, "02" * 32]
+    reverted = cache.resolve({"transactionHash": b"\x02" * 32, "status": 0, "blockNumber": 7, "gasUsed": 100})
+    assert reverted["status"] == ReceiptCache.REVERTED
+    assert cache.get("0X" + "02" * 32)["block_number"] == 7
+    cache.track(b"\x03" * 32)
+    assert cache.get(b"\x01" * 32) is None
+    assert len(cache) == 2
+
+@pytest.mark.asyncio
+async def test_receipt_watcher_batches_pending_receipts(standin):
+    """Um único watcher resolve N transações com um batch por bloco, não N pollings"""
+    web3 = AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(standin.url))
+    watcher = ReceiptWatcher(web3, poll_interval=0.05)
+    signers = [AsyncBlockchain(Account.create().key.hex(), web3=web3, receipt_watcher=watcher) for _ in range(20)]
+    standin.chain.call_counts.clear()
+
+    receipts = await asyncio.gather(*[
+        signer.registration(dict(REG_PAYLOAD, cbsdSerialNumber=f"SN-W{i}")) for i, signer in enumerate(signers)
+    ])
+    await watcher.close()
+    await web3.provider.disconnect()
+
+    assert all(r["status"] == 1 for r in receipts)
+    # Formatados pelo próprio web3 (inteiros, HexBytes), como em eth.get_transaction_receipt
+    assert all(isinstance(r["blockNumber"], int) and isinstance(r["transactionHash"], HexBytes) for r in receipts)
+    assert watcher.get_stats()["pending"] == 0
+    # Nenhum polling individual de recibo fora dos batches do watcher (consulta bruta + recibos minerados)
+    assert standin.chain.call_counts["eth_getTransactionReceipt"] == watcher.receipts_requested
+    assert watcher.batches <= 8
+
+@pytest.mark.asyncio
+async def test_receipt_watcher_close_cancels_pending(standin):
+    """close() encerra o polling e cancela quem aguarda um hash que não será minerado"""
+    web3 = AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(standin.url))
+    watcher = ReceiptWatcher(web3, poll_interval=0.05)
+    waiting = asyncio.ensure_future(watcher.wait(b"\x09" * 32))
+    await asyncio.sleep(0.1)
+    task = watcher._task
+
+    await watcher.close()
+    await web3.provider.disconnect()
+
+    assert task.done() and watcher._task is None
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+    assert watcher.get_stats()["pending"] == 0
+
+@pytest.mark.asyncio
+async def test_200_parallel_requests_same_key_no_nonce_collisions(pool, standin):
+    """200 requisições paralelas com a mesma chave: nonces locais, sem colisões"""
+    transport = httpx.ASGITransport(app=api_module.app)
+    key = Account.create().key.hex()
+    async with httpx.AsyncClient(transport=transport, base_url="http://gateway", timeout=60) as client:
+        responses = await asyncio.gather(*[
+            client.post("/v1.3/registration", json=dict(
+                REG_PAYLOAD, cbsdSerialNumber=f"SN-N{i}", private_key=key
+            ))
+            for i in range(200)
+        ])
+
+    assert all(r.status_code == 200 for r in responses), [r.text for r in responses if r.status_code != 200][:3]
+    assert standin.chain.rejected_nonces == 0
+    address = Account.from_key(key).address
+    assert standin.chain.nonces[address] == 200
+    assert len({r.json()["transaction_hash"] for r in responses}) == 200
+    # Um único eth_getTransactionCount (inicial) para as 200 transações
+    assert standin.chain.call_counts["eth_getTransactionCount"] == 1
+    assert pool.get(key).nonce_manager.get_stats()["gaps"] == []
+
+@pytest.mark.asyncio
+async def test_key_spellings_share_nonces(pool, standin):
+    """Grafias diferentes da mesma chave em paralelo: um único NonceManager, sem colisões"""
+    transport = httpx.ASGITransport(app=api_module.app)
+    key = Account.create().key.hex().removeprefix("0x")
+    spellings = ["0x" + key, key, "0X" + key.upper()]
+    async with httpx.AsyncClient(transport=transport, base_url="http://gateway", timeout=60) as client:
+        responses = await asyncio.gather(*[
+            client.post("/v1.3/registration", json=dict(
+                REG_PAYLOAD, cbsdSerialNumber=f"SN-K{i}", private_key=spellings[i % 3]
+            ))
+            for i in range(30)
+        ])
+
+    assert all(r.status_code == 200 for r in responses), [r.text for r in responses if r.status_code != 200][:3]
+    assert standin.chain.rejected_nonces == 0
+    assert standin.chain.nonces[Account.from_key("0x" + key).address] == 30
+    assert standin.chain.call_counts["eth_getTransactionCount"] == 1
+    assert len({id(pool.get(spelling)) for spelling in spellings}) == 1
+
+@pytest.mark.asyncio
+async def test_resync_discards_gaps_below_pending(pool, standin):
+    """Após ressincronizar, nenhum nonce alocado fica abaixo da contagem ``pending`` da rede"""
+    signer = pool.get(Account.create().key.hex())
+    manager = signer.nonce_manager
+    assert await manager.get_nonces(3) == [0, 1, 2]
+    await manager.release_nonce(1)
+    assert manager.get_stats()["gaps"] == [1]
+
+    # Outra instância da mesma conta ocupou os nonces 0 a 4 na rede
+    standin.chain.nonces[signer.account.address] = 5
+    await manager.reset_nonce()
+
+    assert manager.get_stats()["gaps"] == []
+    assert await manager.get_next_nonce() == 5
+    assert await manager.get_nonces(2) == [6, 7]
+
+@pytest.mark.asyncio
+async def test_nonce_gap_is_filled_after_failed_send(pool, standin):
+    """Um envio que falha devolve o nonce, que é reutilizado pela próxima transação"""
+    signer = pool.get(Account.create().key.hex())
+    send_raw = signer.web3.eth.send_raw_transaction
+    failed = []
+
+    async def flaky_send(raw):
+        if decode_raw_transaction(bytes(raw))["nonce"] == 1 and not failed:
+            failed.append(raw)
+            raise ConnectionError("falha simulada")
+        return await send_raw(raw)
+
+    signer.web3.eth.send_raw_transaction = flaky_send
+    try:
+        results = await asyncio.gather(*[
+            signer.registration(dict(REG_PAYLOAD, cbsdSerialNumber=f"SN-G{i}"), wait=False) for i in range(5)
+        ], return_exceptions=True)
+        assert sum(isinstance(r, ConnectionError) for r in results) == 1
+        # A lacuna trava as transações de nonce maior até ser preenchida
+        assert signer.nonce_manager.get_stats()["gaps"] == [1]
+        await asyncio.sleep(BLOCK_TIME * 2)
+        assert standin.chain.nonces[signer.account.address] == 1
+
+        receipt = await signer.registration(dict(REG_PAYLOAD, cbsdSerialNumber="SN-G-FILL"))
+    finally:
+        del signer.web3.eth.send_raw_transaction
+
+    assert receipt["status"] == 1
+    assert signer.nonce_manager.get_stats()["gaps"] == []
+    await asyncio.sleep(BLOCK_TIME * 2)
+    assert standin.chain.nonces[signer.account.address] == 5
+
+@pytest.mark.asyncio
+async def test_nonce_resyncs_from_pending_count(pool, standin):
+    """Transações enviadas por fora da instância forçam a ressincronização via 'pending'"""
+    key = Account.create().key.hex()
+    first = pool.get(key)
+    await first.registration(dict(REG_PAYLOAD, cbsdSerialNumber="SN-R0"), wait=False)
+
+    # Outra instância (ex.: outro worker) com a mesma conta
+    other = AsyncBlockchain(key, web3=first.web3, contract=first.contract)
+    await other.registration(dict(REG_PAYLOAD, cbsdSerialNumber="SN-R1"), wait=False)
+    assert standin.chain.rejected_nonces == 0
+
+    receipt = await first.registration(dict(REG_PAYLOAD, cbsdSerialNumber="SN-R2"))
+    assert receipt["status"] == 1
+    assert first.nonce_manager.get_stats()["resyncs"] == 1
+    assert standin.chain.nonces[first.account.address] == 3
+
+@pytest.mark.asyncio
+async def test_gas_policy_avoids_per_transaction_price_and_estimate(pool, standin):
+    """Gas price por bloco e uma única estimativa por seletor"""
+    signers = [pool.get(Account.create().key.hex()) for _ in range(20)]
+    standin.chain.call_counts.clear()
+    blocks_before = standin.chain.block_number
+
+    for round_ in range(2):
+        receipts = await asyncio.gather(*[
+            signer.registration(dict(REG_PAYLOAD, cbsdSerialNumber=f"SN-GAS{round_}-{i}"))
+            for i, signer in enumerate(signers)
+        ])
+        assert all(r["status"] == 1 for r in receipts)
+
+    counts = standin.chain.call_counts
+    assert counts.get("eth_estimateGas", 0) == 1
+    assert counts.get("eth_gasPrice", 0) <= standin.chain.block_number - blocks_before + 1
+    assert pool.shared["gas_policy"].get_stats()["learned_limits"] == 1
+
+@pytest.mark.asyncio
+async def test_gas_policy_reestimates_after_out_of_gas(pool, standin):
+    """Limite fixo insuficiente: revert por falta de gas, reestimativa e reenvio"""
+    policy = GasPolicy(pool.web3, pool.shared["receipt_watcher"], fixed_limits={"registration": 30000})
+    signer = AsyncBlockchain(Account.create().key.hex(), web3=pool.web3, contract=pool.contract,
+                             receipt_watcher=pool.shared["receipt_watcher"], gas_policy=policy)
+
+    receipt = await signer.registration(dict(REG_PAYLOAD, cbsdSerialNumber="SN-OOG"))
+    assert receipt["status"] == 1
+    assert policy.get_stats()["out_of_gas"] == 1
+    assert policy.get_stats()["estimates"] == 1
+
+    # O limite aprendido passa a valer no lugar do fixo, sem nova estimativa
+    receipt = await signer.registration(dict(REG_PAYLOAD, cbsdSerialNumber="SN-OOG-2"))
+    assert receipt["status"] == 1
+    assert policy.get_stats()["estimates"] == 1
+    assert standin.chain.nonces[signer.account.address] == 3
@@ -0,0 +1,107 @@
+import asyncio
+import random
+import pytest
+
+from blockchain.backfill import Backfill, is_too_large
+from blockchain.event_indexer import EventIndexer
+from handlers.handlers import EVENT_HANDLERS
+from test_async_blockchain import standin, pool
+from rpc_standin import RPCError, encode_event_log
+
+class SyntheticSource:
+    """Um log por bloco; respostas com atraso aleatório e limite de logs como um nó"""
+
+    def __init__(self, max_logs=None, fail_once=()):
+        self.max_logs = max_logs
+        self.fail_once = set(fail_once)
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def fetch(self, start, end):
+        self.calls.append((start, end))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(random.uniform(0, 0.005))
+            if start in self.fail_once:
+                self.fail_once.discard(start)
+                raise ConnectionError("conexão recusada")
+            if self.max_logs is not None and end - start + 1 > self.max_logs:
+                raise ValueError(f"query returned more than {self.max_logs} results")
+            return list(range(start, end + 1))
+        finally:
+            self.in_flight -= 1
+
+@pytest.mark.asyncio
+async def test_backfill_applies_in_block_order():
+    """Faixas concluídas fora de ordem são aplicadas em ordem, sem lacunas nem repetições"""
+    source = SyntheticSource()
+    backfill = Backfill(source.fetch, workers=8, chunk_size=10, max_chunk_size=10, target_logs=1000,
+                        progress_interval=60)
+    applied = []
+    last = await backfill.run(5, 1004, lambda records, end: applied.append((records, end)))
+
+    assert last == 1004
+    assert [r for records, _ in applied for r in records] == list(range(5, 1005))
+    assert all(records[-1] == end for records, end in applied)
+    assert source.max_in_flight == 8
+    stats = backfill.get_stats()
+    assert (stats["blocks"], stats["logs"], stats["progress"]) == (1000, 1000, 1.0)
+    assert stats["blocks_per_s"] > 0
+
+@pytest.mark.asyncio
+async def test_backfill_adapts_chunk_size():
+    """Resposta grande demais divide a faixa; respostas esparsas fazem a faixa crescer"""
+    source = SyntheticSource(max_logs=50)
+    backfill = Backfill(source.fetch, workers=2, chunk_size=400, max_chunk_size=400, target_logs=40,
+                        progress_interval=60)
+    applied = []
+    assert await backfill.run(0, 999, lambda records, end: applied.extend(records)) == 999
+    assert applied == list(range(1000))
+    assert backfill.splits > 0
+    assert all(end - start + 1 <= 50 for start, end in source.calls[-5:])
+
+    sparse = Backfill(SyntheticSource().fetch, workers=1, chunk_size=4, max_chunk_size=64, target_logs=10_000,
+                      progress_interval=60)
+    await sparse.run(0, 999, lambda records, end: None)
+    assert sparse.chunk_size == 64
+    assert sparse.requests < 30
+
+@pytest.mark.asyncio
+async def test_backfill_retries_and_gives_up():
+    """Erro transitório é repetido; bloco único grande demais esgota as tentativas e propaga o erro"""
+    source = SyntheticSource(fail_once=[20])
+    backfill = Backfill(source.fetch, workers=4, chunk_size=10, progress_interval=60)
+    applied = []
+    assert await backfill.run(0, 49, lambda records, end: applied.extend(records)) == 49
+    assert applied == list(range(50)) and backfill.retries == 1
+
+    failing = Backfill(SyntheticSource(max_logs=0).fetch, workers=2, chunk_size=2, max_retries=1,
+                       progress_interval=60)
+    applied = []
+    with pytest.raises(ValueError):
+        await failing.run(0, 9, lambda records, end: applied.extend(records))
+    assert applied == []
+    assert is_too_large(RPCError("query returned more than 10000 results"))
+    assert not is_too_large(ConnectionError("conexão recusada"))
+
+@pytest.mark.asyncio
+async def test_indexer_backfill_against_node_log_limit(pool, standin):
+    """Indexador recupera um histórico longo mesmo com o nó limitando os logs por resposta"""
+    abi = next(e for e in pool.contract.abi if e["type"] == "event" and e["name"] == "SASAuthorized")
+    first = standin.chain.block_number + 1
+    sas = [f"0x{i:040x}" for i in range(1, 401)]
+    standin.chain.add_logs([dict(encode_event_log(pool.contract.address, abi, {"sas": address}),
+                                 blockNumber=hex(first + i // 2)) for i, address in enumerate(sas)])
+    standin.chain.max_logs = 25
+    applied = []
+    handlers = dict(EVENT_HANDLERS, SASAuthorized=lambda event: applied.append(event["args"]["sas"].lower()))
+    try:
+        indexer = EventIndexer(pool.web3, pool.contract, handlers, start_block=first, chunk_size=100, workers=4)
+        assert await indexer.sync() >= first + 199
+    finally:
+        standin.chain.max_logs = None
+    # Ordem garantida só por partição (SAS); todos aplicados uma vez
+    assert sorted(applied) == sas
+    assert indexer.get_stats()["backfill"]["splits"] > 0
@@ -0,0 +1,218 @@
+import asyncio
+import pytest
+import httpx
+from eth_abi import encode
+from eth_account import Account
+from web3 import AsyncWeb3, Web3
+
+import api.api as api_module
+from config.settings import settings
+from blockchain.blockchain import load_contract_abi, batch_item_results
+from blockchain.micro_batcher import MicroBatcher
+from blockchain.batching_provider import BatchingHTTPProvider
+# Nó stand-in e pool de signers compartilhados com os testes assíncronos
+from test_async_blockchain import REG_PAYLOAD, BLOCK_TIME, standin, pool
+
+GRANT_PAYLOAD = {
+    "fccId": "TEST-FCC-BATCH",
+    "cbsdSerialNumber": "TEST-SN-BATCH",
+    "channelType": "GAA",
+    "maxEirp": 47,
+    "lowFrequency": 3550000000,
+    "highFrequency": 3700000000,
+    "requestedMaxEirp": 47,
+    "requestedLowFrequency": 3550000000,
+    "requestedHighFrequency": 3700000000,
+    "grantExpireTime": 1750000000
+}
+
+def client():
+    transport = httpx.ASGITransport(app=api_module.app)
+    return httpx.AsyncClient(transport=transport, base_url="http://gateway", timeout=60)
+
+@pytest.mark.asyncio
+async def test_registration_batch_returns_ordered_per_item_status(pool, standin):
+    """Lote de 50 registrations: uma requisição HTTP, nonces consecutivos, resposta na ordem"""
+    key = Account.create().key.hex()
+    items = [dict(REG_PAYLOAD, cbsdSerialNumber=f"SN-B{i}") for i in range(50)]
+    http_before = standin.http_requests
+
+    async with client() as c:
+        resp = await c.post("/v1.3/registration", json={"registrationRequest": items, "private_key": key})
+
+    assert resp.status_code == 200, resp.text
+    results = resp.json()["registrationResponse"]
+    assert len(results) == 50
+    assert all(r["success"] and r["status"] == "mined" for r in results)
+    assert len({r["transaction_hash"] for r in results}) == 50
+
+    chain = standin.chain
+    address = Account.from_key(key).address
+    assert chain.nonces[address] == 50
+    assert chain.rejected_nonces == 0
+    # Ordem preservada: o item i foi assinado com o nonce i
+    assert [chain.transactions["0x" + r["transaction_hash"]]["nonce"] for r in results] == list(range(50))
+    # Envio num único batch + poucos ciclos do watcher, não 50 round trips
+    assert standin.http_requests - http_before < 20
+
+@pytest.mark.asyncio
+async def test_grant_batch_fire_and_track(pool, standin):
+    """Lote com 'Prefer: respond-async' responde 202 com um status_url por item"""
+    items = [dict(GRANT_PAYLOAD, cbsdSerialNumber=f"SN-GB{i}") for i in range(5)]
+    async with client() as c:
+        resp = await c.post("/v1.3/grant", json={"grantRequest": items}, headers={"Prefer": "respond-async"})
+        assert resp.status_code == 202
+        results = resp.json()["grantResponse"]
+        assert [r["status"] for r in results] == ["pending"] * 5
+
+        await asyncio.sleep(BLOCK_TIME * 2)
+        statuses = [(await c.get(r["status_url"])).json()["status"] for r in results]
+    assert statuses == ["mined"] * 5
+
+@pytest.mark.asyncio
+async def test_batch_size_limit(pool):
+    """Lotes acima de BATCH_MAX_SIZE respondem 413 e vazios 400, com o motivo no detalhe"""
+    item = {"fccId": "F", "cbsdSerialNumber": "S"}
+    async with client() as c:
+        too_big = await c.post("/v1.3/deregistration",
+                               json={"deregistrationRequest": [item] * (settings.BATCH_MAX_SIZE + 1)})
+        empty = await c.post("/v1.3/deregistration", json={"deregistrationRequest": []})
+    assert too_big.status_code == 413
+    assert "BATCH_MAX_SIZE" in too_big.json()["detail"]
+    assert empty.status_code == 400
+    assert empty.json()["detail"] == "Lote vazio"
+
+def batch_item_failed_log(contract, index, operation, reason):
+    """Log BatchItemFailed como o contrato emitiria"""
+    topic = Web3.keccak(text="BatchItemFailed(uint256,string,string)")
+    return {
+        "address": contract.address,
+        "topics": [topic.to_0x_hex(), "0x" + index.to_bytes(32, "big").hex()],
+        "data": "0x" + encode(["string", "string"], [operation, reason]).hex(),
+    }
+
+def test_batch_item_results_reads_failures_from_events():
+    """Itens sem BatchItemFailed são sucesso; recibo revertido falha o lote inteiro"""
+    contract = Web3().eth.contract(address=settings.CONTRACT_ADDRESS, abi=load_contract_abi())
+    log = dict(batch_item_failed_log(contract, 1, "registration", "CBSD already exists"),
+               logIndex=0, transactionIndex=0, transactionHash=b"\x01" * 32, blockHash=b"\x02" * 32,
+               blockNumber=5)
+    log["topics"] = [bytes.fromhex(t[2:]) for t in log["topics"]]
+    log["data"] = bytes.fromhex(log["data"][2:])
+
+    results = batch_item_results(contract, {"status": 1, "logs": [log]}, 3)
+    assert [r["success"] for r in results] == [True, False, True]
+    assert results[1]["reason"] == "CBSD already exists"
+
+    reverted = batch_item_results(contract, {"status": 0, "logs": []}, 2)
+    assert [r["success"] for r in reverted] == [False, False]
+
+@pytest.mark.asyncio
+async def test_onchain_batch_is_one_transaction(pool, standin, monkeypatch):
+    """Com BATCH_ONCHAIN o lote vira uma única transação registrationBatch"""
+    monkeypatch.setattr(settings, "BATCH_ONCHAIN", True)
+    contract = pool.contract
+    selector = bytes.fromhex(contract.functions.registrationBatch([]).selector[2:])
+    # O stand-in não executa EVM: simula o contrato rejeitando o item 2
+    standin.chain.log_factory = lambda tx, number: (
+        [batch_item_failed_log(contract, 2, "registration", "CBSD already exists")]
+        if tx["data"][:4] == selector else []
+    )
+    key = Account.create().key.hex()
+    items = [dict(REG_PAYLOAD, cbsdSerialNumber=f"SN-OC{i}") for i in range(20)]
+
+    async with client() as c:
+        resp = await c.post("/v1.3/registration", json={"registrationRequest": items, "private_key": key})
+
+    assert resp.status_code == 200, resp.text
+    results = resp.json()["registrationResponse"]
+    assert [r["success"] for r in results] == [i != 2 for i in range(20)]
+    assert results[2]["error"] == "CBSD already exists"
+    assert len({r["transaction_hash"] for r in results}) == 1
+    assert standin.chain.nonces[Account.from_key(key).address] == 1
+
+@pytest.fixture
+def micro_batcher(pool, monkeypatch):
+    batcher = MicroBatcher(api_module.get_signer, window_ms=20, max_items=64, onchain=False)
+    monkeypatch.setattr(api_module, "micro_batcher", batcher)
+    return batcher
+
+@pytest.mark.asyncio
+async def test_micro_batcher_adds_no_delay_when_idle(micro_batcher):
+    """Com o gateway ocioso o item sai sozinho, sem esperar a janela"""
+    result = await micro_batcher.submit("registration", None, dict(REG_PAYLOAD, cbsdSerialNumber="SN-IDLE"))
+    assert result["success"] and result["batch_size"] == 1
+    stats = micro_batcher.get_stats()
+    assert stats["last_delay_ms"] == 0
+    assert stats["queue_wait_ms"]["max"] < 5
+
+@pytest.mark.asyncio
+async def test_micro_batcher_coalesces_concurrent_calls(micro_batcher, standin):
+    """200 chamadas individuais concorrentes viram poucos lotes; cada uma recebe o seu recibo"""
+    key = Account.create().key.hex()
+    http_before = standin.http_requests
+    async with client() as c:
+        responses = await asyncio.gather(*[
+            c.post("/v1.3/registration", json=dict(REG_PAYLOAD, cbsdSerialNumber=f"SN-MB{i}", private_key=key))
+            for i in range(200)
+        ])
+
+    assert all(r.status_code == 200 for r in responses), [r.text for r in responses if r.status_code != 200][:3]
+    assert len({r.json()["transaction_hash"] for r in responses}) == 200
+    stats = micro_batcher.get_stats()
+    assert stats["items"] == 200
+    assert stats["avg_batch_size"] >= 4
+    assert max(int(bucket[2:]) for bucket in stats["batch_size_histogram"]) <= 64
+    # O atraso adaptativo nunca passa da janela (a espera medida inclui o loop ocupado assinando)
+    assert 0 < stats["last_delay_ms"] <= 20
+    assert stats["queue_wait_ms"]["p50"] is not None
+    assert standin.chain.rejected_nonces == 0
+    assert standin.http_requests - http_before < 100
+
+@pytest.mark.asyncio
+async def test_micro_batcher_onchain_batch_per_caller_result(pool, standin):
+    """Com lotes on-chain cada chamador recebe o status do seu item na transação do lote"""
+    contract = pool.contract
+    selector = bytes.fromhex(contract.functions.registrationBatch([]).selector[2:])
+    standin.chain.log_factory = lambda tx, number: (
+        [batch_item_failed_log(contract, 0, "registration", "CBSD already exists")]
+        if tx["data"][:4] == selector else []
+    )
+    batcher = MicroBatcher(api_module.get_signer, window_ms=20, max_items=64, onchain=True)
+    key = Account.create().key.hex()
+
+    async def one(i):
+        await asyncio.sleep(i * 0.001)
+        return await batcher.submit("registration", key, dict(REG_PAYLOAD, cbsdSerialNumber=f"SN-MBO{i}"))
+
+    results = await asyncio.gather(*[one(i) for i in range(50)])
+    assert batcher.batches < 50
+    assert standin.chain.nonces[Account.from_key(key).address] == batcher.batches
+    # O item 0 de cada lote foi rejeitado pelo contrato simulado
+    assert sum(not r["success"] for r in results) == batcher.batches
+    assert all(r["error"] == "CBSD already exists" for r in results if not r["success"])
+
+@pytest.mark.asyncio
+async def test_batching_provider_sends_raw_transactions_in_one_post(standin):
+    """Transações assinadas enviadas em paralelo saem num único POST, cada uma com o seu hash"""
+    account = Account.create()
+    raw_txs = [
+        account.sign_transaction({
+            "to": account.address, "value": 0, "gas": 21000, "gasPrice": 1,
+            "nonce": nonce, "chainId": standin.chain.chain_id
+        }).raw_transaction
+        for nonce in range(100)
+    ]
+    web3 = AsyncWeb3(BatchingHTTPProvider(standin.url, window_ms=0))
+    http_before = standin.http_requests
+
+    hashes = await asyncio.gather(*[web3.eth.send_raw_transaction(raw) for raw in raw_txs])
+
+    assert standin.http_requests - http_before == 1
+    assert [h.to_0x_hex() for h in hashes] == [Web3.keccak(raw).to_0x_hex() for raw in raw_txs]
+    assert web3.provider.get_stats()["calls_per_post"] == 100
+    # Chamada isolada segue como requisição simples; erros chegam a cada chamador
+    assert await web3.eth.chain_id == standin.chain.chain_id
+    with pytest.raises(Exception, match="nonce too low|replacement"):
+        await web3.eth.send_raw_transaction(raw_txs[0])
+    await web3.provider.disconnect()
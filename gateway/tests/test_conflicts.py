@@ -0,0 +1,187 @@
+import asyncio
+import json
+import random
+import httpx
+import pytest
+
+import api.api as api_module
+from blockchain.event_decoder import GrantCreated
+from blockchain.event_stream import EventBroadcaster, Subscription
+from handlers.conflicts import ConflictMonitor
+from repository.conflicts import ConflictIndex
+from repository.repository import CBSDRepository, cbsd_key
+from repository.spatial import haversine_km
+
+SAS_A = "0xf39Fd6e51aad88F6F4ce6aB8827279cffFb92266"
+SAS_B = "0x70997970C51812dc3A010C7d01b50e0d17dc79C8"
+TX = b"\x01" * 32
+# San Francisco, Oakland (~13 km) e San Jose (~68 km), em graus x 1e7
+SF, OAK, SJ = (377749000, -1224194000), (378044000, -1222712000), (373382000, -1218863000)
+
+def register(repo, serial, sas, location, block=1):
+    repo.add_cbsd(cbsd_key("FCC-CC", serial), {"fcc_id": "FCC-CC", "serial_number": serial, "sas_origin": sas,
+                                               "status": "registered", "block_number": block,
+                                               "transaction_hash": "0x01", "latitude": location[0],
+                                               "longitude": location[1]})
+
+def grant(repo, serial, grant_id, sas, band, block=2, eirp=30):
+    repo.add_grant(cbsd_key("FCC-CC", serial), {"grant_id": grant_id, "sas_origin": sas, "created_at": block,
+                                                "transaction_hash": "0x02", "terminated": False,
+                                                "low_frequency": band[0], "high_frequency": band[1],
+                                                "max_eirp": eirp})
+
+def conflict_ids(repo, serial, grant_id, radius_km=None):
+    return [conflict.grant_id for conflict in repo.find_conflicts(cbsd_key("FCC-CC", serial), grant_id, radius_km)]
+
+def populate(repo):
+    with repo.transaction():
+        register(repo, "SF", SAS_A, SF)
+        register(repo, "SF-2", SAS_A, SF)
+        register(repo, "OAK", SAS_B, OAK)
+        register(repo, "SJ", SAS_B, SJ)
+        grant(repo, "SF", "G-SF", SAS_A, (3550_000_000, 3570_000_000))
+        # Mesmo SAS: não conflita
+        grant(repo, "SF-2", "G-SF-2", SAS_A, (3550_000_000, 3570_000_000))
+        grant(repo, "OAK", "G-OAK", SAS_B, (3560_000_000, 3580_000_000), eirp=47)
+        # Canal adjacente: [3570, 3580) não sobrepõe [3550, 3570)
+        grant(repo, "OAK", "G-OAK-ADJ", SAS_B, (3570_000_000, 3580_000_000))
+        # Longe demais para o raio padrão (40 km)
+        grant(repo, "SJ", "G-SJ", SAS_B, (3550_000_000, 3560_000_000))
+
+def test_conflict_index_matches_brute_force():
+    """Mesmos conflitos que a comparação par a par: faixa semiaberta, outro SAS e distância"""
+    rng = random.Random(5)
+    index, grants = ConflictIndex(cell_size=0.2, capacity=16), {}
+    for i in range(3000):
+        latitude, longitude = rng.randrange(370000000, 385000000), rng.randrange(-1230000000, -1215000000)
+        low = 3550_000_000 + rng.randrange(0, 30) * 5_000_000
+        grants[("C", i)] = (latitude, longitude, low, low + rng.choice([5, 10, 20]) * 1_000_000,
+                            rng.choice([SAS_A, SAS_B, SAS_B.lower()]))
+        index.put(("C", i), *grants[("C", i)][:4], 30, grants[("C", i)][4])
+    for key in rng.sample(sorted(grants), 500):
+        index.remove(key)
+        del grants[key]
+    assert not index.put(("C", "sem-faixa"), SF[0], SF[1], None, None, 30, SAS_A)
+    assert len(index) == len(grants)
+
+    keys = sorted(grants)
+    latitudes = [grants[k][0] / 1e7 for k in keys]
+    longitudes = [grants[k][1] / 1e7 for k in keys]
+    for latitude, longitude, low, high, sas, radius in [(37.7, -122.4, 3560_000_000, 3570_000_000, SAS_A, 40),
+                                                        (38.0, -122.0, 3550_000_000, 3700_000_000, SAS_B, 15),
+                                                        (37.2, -121.6, 3600_000_000, 3600_000_001, SAS_A, 80)]:
+        found = index.conflicting(latitude, longitude, low, high, sas, radius)
+        distances = haversine_km(latitude, longitude, latitudes, longitudes)
+        expected = {k for k, d in zip(keys, distances) if d <= radius and grants[k][2] < high and
+                    grants[k][3] > low and grants[k][4].lower() != sas.lower()}
+        assert {(c.cbsd_id, c.grant_id) for c in found} == expected
+        assert [c.distance_km for c in found] == sorted(c.distance_km for c in found)
+    with pytest.raises(ValueError):
+        index.conflicting(37.7, -122.4, 10, 10, SAS_A, 40)
+
+def test_find_conflicts(make_repo):
+    """Conflitos acompanham grants novos, encerramentos, deregistration e rollback"""
+    repo = make_repo()
+    populate(repo)
+
+    conflicts = repo.find_conflicts(cbsd_key("FCC-CC", "SF"), "G-SF")
+    assert [c.grant_id for c in conflicts] == ["G-OAK"]
+    assert (conflicts[0].sas_origin, conflicts[0].max_eirp) == (SAS_B, 47)
+    assert conflicts[0].distance_km == pytest.approx(13.4, abs=0.1)
+    assert (conflicts[0].low_frequency, conflicts[0].high_frequency) == (3560_000_000, 3580_000_000)
+    assert conflict_ids(repo, "SF", "G-SF", radius_km=100) == ["G-OAK", "G-SJ"]
+    assert sorted(conflict_ids(repo, "OAK", "G-OAK")) == ["G-SF", "G-SF-2"]
+    assert conflict_ids(repo, "OAK", "G-OAK-ADJ") == []
+    assert conflict_ids(repo, "SF", "inexistente") == []
+
+    # Bloco sem confirmação: G-OAK encerrado e SJ registrado de novo em Oakland, com grant novo
+    with repo.transaction(), repo.journal(10):
+        repo.terminate_grant(cbsd_key("FCC-CC", "OAK"), "G-OAK", 10, SAS_B)
+        register(repo, "SJ", SAS_B, OAK, block=10)
+        grant(repo, "SJ", "G-SJ-2", SAS_B, (3565_000_000, 3575_000_000), block=10)
+    assert conflict_ids(repo, "SF", "G-SF", radius_km=100) == ["G-SJ-2"]
+    assert conflict_ids(repo, "OAK", "G-OAK") == []
+
+    repo.rollback(9)
+    assert conflict_ids(repo, "SF", "G-SF", radius_km=100) == ["G-OAK", "G-SJ"]
+
+    with repo.transaction():
+        repo.remove_cbsd(cbsd_key("FCC-CC", "OAK"))
+    assert conflict_ids(repo, "SF", "G-SF") == []
+    assert sorted(conflict_ids(repo, "SJ", "G-SJ", radius_km=100)) == ["G-SF", "G-SF-2"]
+
+@pytest.mark.parametrize("repo_kind", ["sqlite"])
+def test_sqlite_conflicts_load_from_tables(make_repo):
+    """Ao reabrir o banco as colunas são carregadas das tabelas (grants ativos com localização)"""
+    repo = make_repo()
+    populate(repo)
+    with repo.transaction():
+        repo.terminate_grant(cbsd_key("FCC-CC", "SJ"), "G-SJ", 3, SAS_B)
+    repo.close()
+
+    repo = make_repo()
+    assert len(repo.active_grants) == 4
+    assert conflict_ids(repo, "SF", "G-SF", radius_km=100) == ["G-OAK"]
+    repo.close()
+
+@pytest.mark.asyncio
+async def test_monitor_streams_conflicts_of_new_grants():
+    """GrantCreated com conflito vira um GrantConflicts no stream; replay atrasado não é verificado"""
+    repo = CBSDRepository()
+    populate(repo)
+    broadcaster = EventBroadcaster(1)
+    monitor = ConflictMonitor(repo, broadcaster, head=lambda: 20, radius_km=40, max_lag=10, max_reported=1)
+    subscription = Subscription(sas_origin=SAS_B.lower())
+    stream = broadcaster.events(subscription)
+    pending = asyncio.ensure_future(stream.__anext__())
+    await asyncio.sleep(0)
+
+    key = bytes.fromhex(cbsd_key("FCC-CC", "OAK"))
+    grant(repo, "OAK", "G-OAK-2", SAS_B, (3555_000_000, 3565_000_000), block=15)
+    grant(repo, "OAK", "G-OAK-3", SAS_B, (3600_000_000, 3610_000_000), block=15)
+    # Criado e encerrado na mesma faixa: não está mais ativo quando a faixa é verificada
+    grant(repo, "OAK", "G-OAK-4", SAS_B, (3550_000_000, 3560_000_000), block=15)
+    repo.terminate_grant(key.hex(), "G-OAK-4", 15, SAS_B)
+    monitor([GrantCreated(15, 0, TX, key, "FCC-CC", "OAK", "G-OAK-2", SAS_B, 3555_000_000, 3565_000_000, 30),
+             GrantCreated(15, 1, TX, key, "FCC-CC", "OAK", "G-OAK-3", SAS_B, 3600_000_000, 3610_000_000, 30),
+             GrantCreated(15, 2, TX, key, "FCC-CC", "OAK", "G-OAK-4", SAS_B, 3550_000_000, 3560_000_000, 30),
+             # Mais de max_lag blocos atrás da cabeça: pulado
+             GrantCreated(2, 0, TX, key, "FCC-CC", "OAK", "G-OAK", SAS_B, 3560_000_000, 3580_000_000, 47)], 15)
+
+    fields = dict(line.split(": ", 1) for line in (await pending).strip().split("\n"))
+    assert (fields["id"], fields["event"]) == ("15-0", "GrantConflicts")
+    data = json.loads(fields["data"])
+    assert (data["grantId"], data["conflictCount"], data["maxEirp"]) == ("G-OAK-2", 2, 30)
+    # Só o mais próximo (max_reported=1): SF e SF-2 estão no mesmo ponto, SF entrou primeiro
+    assert [(c["grantId"], c["sasOrigin"], c["maxEirp"]) for c in data["conflicts"]] == [("G-SF", SAS_A, 30)]
+    assert data["conflicts"][0]["cbsdKey"] == "0x" + cbsd_key("FCC-CC", "SF")
+    assert monitor.get_stats()["checks"] == 2 and monitor.get_stats()["skipped"] == 1
+    assert monitor.get_stats()["inactive"] == 1
+    assert monitor.get_stats()["conflicting_grants"] == 1
+    assert broadcaster.last_block == 15
+    await stream.aclose()
+
+@pytest.mark.asyncio
+async def test_conflicts_endpoint(monkeypatch):
+    """GET .../grants/{grantId}/conflicts pagina os conflitos atuais; grant desconhecido é 404"""
+    store = CBSDRepository()
+    populate(store)
+    monkeypatch.setattr(api_module, "repo", store)
+    monkeypatch.setattr(api_module, "conflict_broadcaster", None)
+
+    transport = httpx.ASGITransport(app=api_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://gateway") as c:
+        near = await c.get("/v1.3/cbsd/FCC-CC/OAK/grants/G-OAK/conflicts", params={"limit": 1})
+        wide = await c.get("/v1.3/cbsd/FCC-CC/SF/grants/G-SF/conflicts", params={"radiusKm": 100})
+        missing = await c.get("/v1.3/cbsd/FCC-CC/SF/grants/G-X/conflicts")
+        invalid = await c.get("/v1.3/cbsd/FCC-CC/SF/grants/G-SF/conflicts", params={"radiusKm": -1})
+        stream = await c.get("/v1.3/conflicts/stream")
+
+    assert [conflict["grantId"] for conflict in near.json()["conflicts"]] == ["G-SF"]
+    assert near.json()["next_offset"] == 1
+    assert near.json()["conflicts"][0]["distanceKm"] == pytest.approx(13.4, abs=0.1)
+    assert [conflict["grantId"] for conflict in wide.json()["conflicts"]] == ["G-OAK", "G-SJ"]
+    assert wide.json()["radiusKm"] == 100
+    assert missing.status_code == 404
+    assert invalid.status_code == 422
+    assert stream.status_code == 503
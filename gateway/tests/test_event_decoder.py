@@ -0,0 +1,86 @@
+import os
+import sys
+import pytest
+from web3 import Web3
+from web3._utils.method_formatters import log_entry_formatter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+from rpc_standin import encode_event_log
+
+from config.settings import settings
+from blockchain.blockchain import load_contract_abi
+from blockchain.event_decoder import EventDecoder, GrantCreated, ValueOutOfRange, record_json
+
+SAS = "0xf39Fd6e51aad88F6F4ce6aB8827279cffFb92266"
+KEY = Web3.keccak(text="FCC-1" + "SN-1")
+
+EVENTS = {
+    "CBSDRegistered": {"cbsdKey": KEY, "fccId": "FCC-1", "serialNumber": "SN-1", "sasOrigin": SAS,
+                       "latitude": 375000000, "longitude": -1224000000},
+    "CBSDDeregistered": {"cbsdKey": KEY, "fccId": "FCC-1", "serialNumber": "SN-1", "sasOrigin": SAS},
+    "GrantCreated": {"cbsdKey": KEY, "fccId": "FCC-1", "serialNumber": "SN-1", "grantId": "GRANT-1", "sasOrigin": SAS,
+                     "lowFrequency": 3550000000, "highFrequency": 3560000000, "maxEirp": 47},
+    "GrantTerminated": {"cbsdKey": KEY, "fccId": "FCC-1", "serialNumber": "SN-1", "grantId": "GRANT-1", "sasOrigin": SAS},
+    "SASAuthorized": {"sas": SAS},
+    "SASRevoked": {"sas": SAS},
+    "BatchItemFailed": {"index": 7, "operation": "grant", "reason": "CBSD not registered"},
+}
+
+def formatted_log(contract, name, args, number=5):
+    """Log como o web3 devolve em eth_getLogs (HexBytes e inteiros)"""
+    abi = next(e for e in contract.abi if e["type"] == "event" and e["name"] == name)
+    return log_entry_formatter(dict(
+        encode_event_log(contract.address, abi, args),
+        blockNumber=hex(number), logIndex="0x1", transactionIndex="0x0", removed=False,
+        transactionHash="0x" + "ab" * 32, blockHash="0x" + "cd" * 32
+    ))
+
+def test_decoder_matches_process_log():
+    """Cada registro traz os mesmos valores que process_log, na ordem do ABI"""
+    contract = Web3().eth.contract(address=settings.CONTRACT_ADDRESS, abi=load_contract_abi())
+    decoder = EventDecoder()
+    for name, args in EVENTS.items():
+        log = formatted_log(contract, name, args)
+        record = decoder.decode(log)
+        expected = contract.events[name].process_log(log)
+        assert type(record).__name__ == name
+        assert (record.block_number, record.log_index) == (5, 1)
+        assert record.transaction_hash == expected["transactionHash"]
+        assert list(record[3:]) == [expected["args"][i["name"]] for i in contract.events[name].abi["inputs"]]
+
+def test_decoder_unknown_and_invalid_logs():
+    """Tópico não registrado retorna None; log inválido é descartado por decode_all"""
+    contract = Web3().eth.contract(address=settings.CONTRACT_ADDRESS, abi=load_contract_abi())
+    decoder = EventDecoder(records=[GrantCreated])
+    grant = formatted_log(contract, "GrantCreated", EVENTS["GrantCreated"])
+    other = formatted_log(contract, "SASAuthorized", EVENTS["SASAuthorized"])
+    broken = dict(grant, data=b"\x00" * 5)
+
+    assert decoder.decode(other) is None
+    records = decoder.decode_all([grant, other, broken])
+    assert len(records) == 1
+    event = record_json(records[0])
+    assert event["event"] == "GrantCreated"
+    assert event["grantId"] == "GRANT-1"
+    assert event["cbsdKey"] == KEY.to_0x_hex()
+    assert (event["fccId"], event["serialNumber"]) == ("FCC-1", "SN-1")
+    assert event["sasOrigin"] == SAS
+    assert (event["lowFrequency"], event["highFrequency"], event["maxEirp"]) == (3550000000, 3560000000, 47)
+
+def test_integers_beyond_64_bits_are_rejected():
+    """uint256/int256 até ±(2^63 - 1) são aceitos; além disso o log é recusado e contado"""
+    contract = Web3().eth.contract(address=settings.CONTRACT_ADDRESS, abi=load_contract_abi())
+    decoder = EventDecoder()
+    top = formatted_log(contract, "GrantCreated", dict(EVENTS["GrantCreated"], lowFrequency=2 ** 63 - 1,
+                                                       highFrequency=2 ** 63 - 1, maxEirp=2 ** 63 - 1))
+    bottom = formatted_log(contract, "CBSDRegistered", dict(EVENTS["CBSDRegistered"], latitude=-2 ** 63 + 1))
+    too_high = formatted_log(contract, "GrantCreated", dict(EVENTS["GrantCreated"], highFrequency=2 ** 63))
+    too_low = formatted_log(contract, "CBSDRegistered", dict(EVENTS["CBSDRegistered"], longitude=-2 ** 63))
+
+    assert decoder.decode(top).high_frequency == 2 ** 63 - 1
+    assert decoder.decode(bottom).latitude == -2 ** 63 + 1
+    with pytest.raises(ValueOutOfRange, match="highFrequency"):
+        decoder.decode(too_high)
+    assert [type(r).__name__ for r in decoder.decode_all([too_high, top, too_low, bottom])] == \
+        ["GrantCreated", "CBSDRegistered"]
+    assert decoder.rejected == 2
@@ -0,0 +1,241 @@
+import asyncio
+import pytest
+import httpx
+from eth_account import Account
+from web3 import Web3
+
+import api.api as api_module
+from blockchain.event_indexer import EventIndexer
+import handlers.handlers as handlers_module
+from handlers.handlers import EVENT_HANDLERS, repo
+from repository.repository import cbsd_key
+from repository.sqlite_repository import SQLiteCBSDRepository
+# Nó stand-in e pool de signers compartilhados com os testes assíncronos
+from test_async_blockchain import REG_PAYLOAD, standin, pool
+from test_batching import GRANT_PAYLOAD
+from test_handler_pipeline import history
+from config.settings import settings
+from rpc_standin import encode_event_log
+
+def contract_events(contract):
+    """log_factory que emite os eventos que o contrato emitiria para cada operação"""
+    abi = {e["name"]: e for e in contract.abi if e["type"] == "event"}
+
+    def log(name, **args):
+        if "fccId" in args:
+            args["cbsdKey"] = Web3.keccak(text=args["fccId"] + args["serialNumber"])
+        return encode_event_log(contract.address, abi[name], args)
+
+    def factory(tx, number):
+        fn, params = contract.decode_function_input(tx["data"])
+        if fn.fn_name == "registration":
+            req = params["req"]
+            return [log("CBSDRegistered", fccId=req["fccId"], serialNumber=req["cbsdSerialNumber"],
+                        sasOrigin=tx["from"], latitude=req["latitude"], longitude=req["longitude"])]
+        if fn.fn_name == "grant":
+            req = params["req"]
+            return [log("GrantCreated", fccId=req["fccId"], serialNumber=req["cbsdSerialNumber"],
+                        grantId=f"GRANT-{req['cbsdSerialNumber']}", sasOrigin=tx["from"],
+                        lowFrequency=req["lowFrequency"], highFrequency=req["highFrequency"],
+                        maxEirp=req["maxEirp"])]
+        if fn.fn_name == "relinquishment":
+            return [log("GrantTerminated", fccId=params["fccId"], serialNumber=params["cbsdSerialNumber"],
+                        grantId=params["grantId"], sasOrigin=tx["from"])]
+        if fn.fn_name == "deregistration":
+            return [log("CBSDDeregistered", fccId=params["fccId"], serialNumber=params["cbsdSerialNumber"],
+                        sasOrigin=tx["from"])]
+        if fn.fn_name == "authorizeSAS":
+            return [log("SASAuthorized", sas=params["_sas"])]
+        return []
+
+    return factory
+
+@pytest.fixture
+def indexer(pool, standin):
+    standin.chain.log_factory = contract_events(pool.contract)
+    indexer = EventIndexer(pool.web3, pool.contract, EVENT_HANDLERS, start_block=0, chunk_size=4)
+    previous = api_module.event_indexer
+    api_module.event_indexer = indexer
+    yield indexer
+    api_module.event_indexer = previous
+
+def client():
+    transport = httpx.ASGITransport(app=api_module.app)
+    return httpx.AsyncClient(transport=transport, base_url="http://gateway", timeout=60)
+
+@pytest.mark.asyncio
+async def test_indexer_applies_events_to_repository(pool, indexer):
+    """Registration, grant, relinquishment, deregistration e authorizeSAS chegam ao repositório pelos handlers"""
+    signer = pool.get()
+    serial = f"SN-IDX-{Account.create().address[2:10]}"
+    removed = serial + "-DEREG"
+    sas = Account.create().address
+    await signer.registration(dict(REG_PAYLOAD, cbsdSerialNumber=serial))
+    await signer.registration(dict(REG_PAYLOAD, cbsdSerialNumber=removed))
+    await signer.grant(dict(GRANT_PAYLOAD, fccId=REG_PAYLOAD["fccId"], cbsdSerialNumber=serial))
+    await signer.relinquishment({"fccId": REG_PAYLOAD["fccId"], "cbsdSerialNumber": serial,
+                                 "grantId": f"GRANT-{serial}"})
+    await signer.deregistration({"fccId": REG_PAYLOAD["fccId"], "cbsdSerialNumber": removed})
+    receipt = await signer.authorize_sas(sas)
+
+    assert await indexer.sync() >= receipt["blockNumber"]
+    # Faixas de até chunk_size blocos, um eth_getLogs cada
+    assert indexer.log_requests >= receipt["blockNumber"] // 4
+
+    cbsd = repo.get(cbsd_key(REG_PAYLOAD["fccId"], serial))
+    assert cbsd["status"] == "registered"
+    assert cbsd["sas_origin"] == signer.account.address
+    assert (cbsd["latitude"], cbsd["longitude"]) == (REG_PAYLOAD["latitude"], REG_PAYLOAD["longitude"])
+    assert [(g["grant_id"], g["terminated"]) for g in cbsd["grants"]] == [(f"GRANT-{serial}", True)]
+    assert repo.get(cbsd_key(REG_PAYLOAD["fccId"], removed)) is None
+    assert cbsd_key(REG_PAYLOAD["fccId"], removed) not in repo.locations
+    assert repo.is_authorized_sas(sas)
+    assert indexer.get_stats()["errors"] == 0
+
+@pytest.mark.asyncio
+async def test_cbsd_endpoints_read_from_index_without_rpc(pool, indexer, standin):
+    """GET /v1.3/cbsd/... responde do repositório, sem requisições ao nó"""
+    signer = pool.get()
+    serial = f"SN-IDX-{Account.create().address[2:10]}"
+    await signer.registration(dict(REG_PAYLOAD, cbsdSerialNumber=serial))
+    await signer.grant(dict(GRANT_PAYLOAD, fccId=REG_PAYLOAD["fccId"], cbsdSerialNumber=serial))
+    await indexer.sync()
+
+    http_before = standin.http_requests
+    async with client() as c:
+        cbsd = await c.get(f"/v1.3/cbsd/{REG_PAYLOAD['fccId']}/{serial}")
+        grants = await c.get(f"/v1.3/cbsd/{REG_PAYLOAD['fccId']}/{serial}/grants")
+        missing = await c.get(f"/v1.3/cbsd/{REG_PAYLOAD['fccId']}/NOT-REGISTERED")
+    assert standin.http_requests == http_before
+
+    assert cbsd.status_code == 200
+    assert cbsd.json()["status"] == "registered"
+    assert cbsd.json()["grants"] == 1
+    assert cbsd.json()["indexed_block"] == indexer.last_indexed_block
+    assert [g["grantId"] for g in grants.json()["grants"]] == [f"GRANT-{serial}"]
+    assert grants.json()["grants"][0]["terminated"] is False
+    assert missing.status_code == 404
+
+@pytest.mark.asyncio
+async def test_sqlite_index_resumes_from_checkpoint(pool, standin, tmp_path, monkeypatch):
+    """Estado e checkpoint persistem; após reabrir o índice a indexação continua do checkpoint"""
+    standin.chain.log_factory = contract_events(pool.contract)
+    path = str(tmp_path / "index.db")
+    store = SQLiteCBSDRepository(path)
+    monkeypatch.setattr(handlers_module, "repo", store)
+    signer = pool.get()
+    await signer.registration(dict(REG_PAYLOAD, cbsdSerialNumber="SN-DB-1"))
+    await signer.grant(dict(GRANT_PAYLOAD, fccId=REG_PAYLOAD["fccId"], cbsdSerialNumber="SN-DB-1"))
+    indexer = EventIndexer(pool.web3, pool.contract, EVENT_HANDLERS, repository=store, start_block=0)
+    indexed = await indexer.sync()
+    assert store.get_checkpoint() == indexed
+    store.close()
+
+    # Restart: novo repositório no mesmo arquivo, sem start_block explícito
+    store = SQLiteCBSDRepository(path)
+    monkeypatch.setattr(handlers_module, "repo", store)
+    cbsd = store.get(cbsd_key(REG_PAYLOAD["fccId"], "SN-DB-1"))
+    assert cbsd["status"] == "registered"
+    assert [g["grant_id"] for g in cbsd["grants"]] == ["GRANT-SN-DB-1"]
+
+    receipt = await signer.relinquishment({"fccId": REG_PAYLOAD["fccId"], "cbsdSerialNumber": "SN-DB-1",
+                                           "grantId": "GRANT-SN-DB-1"})
+    resumed = EventIndexer(pool.web3, pool.contract, EVENT_HANDLERS, repository=store)
+    assert resumed.next_block == indexed + 1
+    assert await resumed.sync() >= receipt["blockNumber"]
+    assert resumed.log_requests == 1
+    assert store.get_grants(cbsd_key(REG_PAYLOAD["fccId"], "SN-DB-1"))[0]["terminated"] is True
+    store.close()
+
+def test_sqlite_range_is_atomic(tmp_path):
+    """Erro no meio de uma faixa desfaz as escritas e mantém o checkpoint anterior"""
+    store = SQLiteCBSDRepository(str(tmp_path / "index.db"))
+    with store.transaction():
+        store.add_cbsd("a_b", {"status": "registered"})
+        store.set_checkpoint(10)
+    with pytest.raises(RuntimeError):
+        with store.transaction():
+            store.add_cbsd("c_d", {"status": "registered"})
+            store.set_checkpoint(20)
+            raise RuntimeError("falha no meio da faixa")
+    assert store.get_checkpoint() == 10
+    assert store.get("c_d") is None
+    assert store.get("a_b")["grants"] == []
+
+@pytest.mark.asyncio
+async def test_readers_never_see_half_applied_range(tmp_path, monkeypatch):
+    """Leitores concorrentes à faixa (mesma conexão SQLite) veem o estado anterior ou a faixa inteira"""
+    store = SQLiteCBSDRepository(str(tmp_path / "index.db"))
+    monkeypatch.setattr(handlers_module, "repo", store)
+    indexer = EventIndexer(None, None, EVENT_HANDLERS, repository=store, start_block=0, confirmations=0,
+                           partitions=4, batch_size=3)
+    records = history(cbsds=20, grants=2)
+    seen = []
+
+    async def reader():
+        while True:
+            seen.append((store.get_checkpoint(), store.count()))
+            if applying.done():
+                return
+            await asyncio.sleep(0)
+
+    reading = asyncio.ensure_future(reader())
+    applying = asyncio.ensure_future(indexer._apply_range(records, 10))
+    await asyncio.gather(reading, applying)
+    assert seen[0] == (None, 0) and seen[-1] == (10, 20)
+    assert set(seen) == {(None, 0), (10, 20)}
+    assert (store.get_checkpoint(), store.count(), len(list(store.find_grants("active")))) == (10, 20, 40)
+    store.close()
+
+@pytest.mark.asyncio
+async def test_recent_events_one_getlogs_cached_by_block(pool, standin, monkeypatch):
+    """/events/recent: um eth_getLogs com OR dos tópicos, sem filtros; polls no mesmo bloco não fazem RPC"""
+    standin.chain.log_factory = contract_events(pool.contract)
+    monkeypatch.setattr(api_module, "recent_events_cache", {"block": None, "checked_at": 0.0, "response": None})
+    monkeypatch.setattr(settings, "RECENT_EVENTS_BLOCK_TTL", 60)
+    signer = pool.get()
+    sas = Account.create().address
+    await signer.registration(dict(REG_PAYLOAD, cbsdSerialNumber="SN-RECENT"))
+    await signer.authorize_sas(sas)
+
+    standin.chain.call_counts.clear()
+    http_before = standin.http_requests
+    async with client() as c:
+        first = await c.get("/events/recent")
+        assert standin.http_requests - http_before == 2
+        polls = [await c.get("/events/recent") for _ in range(5)]
+    assert standin.http_requests - http_before == 2
+    assert standin.chain.call_counts.get("eth_getLogs") == 1
+    assert "eth_newFilter" not in standin.chain.call_counts
+
+    assert first.status_code == 200
+    events = first.json()["events"]
+    assert [e["event"] for e in events][:2] == ["SASAuthorized", "CBSDRegistered"]
+    assert events[0]["sas"] == sas
+    assert all(p.json() == first.json() for p in polls)
+
+@pytest.mark.asyncio
+async def test_cbsd_history_filtered_by_cbsd_key_topic(pool, standin):
+    """Histórico do CBSD: o eth_getLogs filtra pelo tópico cbsdKey e só os logs dele voltam"""
+    standin.chain.log_factory = contract_events(pool.contract)
+    signer = pool.get()
+    serial = f"SN-HIST-{Account.create().address[2:10]}"
+    await signer.registration(dict(REG_PAYLOAD, cbsdSerialNumber=serial))
+    await signer.registration(dict(REG_PAYLOAD, cbsdSerialNumber=f"{serial}-OTHER"))
+    await signer.grant(dict(GRANT_PAYLOAD, fccId=REG_PAYLOAD["fccId"], cbsdSerialNumber=serial))
+
+    requests = []
+    original = standin.chain.eth_getLogs
+    standin.chain.eth_getLogs = lambda params: requests.append(params) or original(params)
+    async with client() as c:
+        response = await c.get(f"/v1.3/cbsd/{REG_PAYLOAD['fccId']}/{serial}/history")
+    standin.chain.eth_getLogs = original
+
+    assert response.status_code == 200
+    key = Web3.keccak(text=REG_PAYLOAD["fccId"] + serial).to_0x_hex()
+    assert response.json()["cbsdKey"] == key == "0x" + cbsd_key(REG_PAYLOAD["fccId"], serial)
+    assert len(requests) == 1 and requests[0]["topics"][1] == key
+    events = response.json()["events"]
+    assert [e["event"] for e in events] == ["CBSDRegistered", "GrantCreated"]
+    assert all(e["serialNumber"] == serial and e["cbsdKey"] == key for e in events)
+    assert events[1]["grantId"] == f"GRANT-{serial}"
@@ -0,0 +1,192 @@
+import asyncio
+import json
+import httpx
+import pytest
+from eth_account import Account
+
+import api.api as api_module
+from blockchain.event_decoder import CBSDRegistered, GrantCreated, SASAuthorized
+from blockchain.event_stream import CursorExpired, EventBroadcaster, Subscription, parse_cursor
+from test_async_blockchain import REG_PAYLOAD, standin, pool
+from test_event_indexer import indexer
+
+SAS_A = "0x" + "aa" * 20
+SAS_B = "0x" + "bb" * 20
+TX = b"\x01" * 32
+KEY = b"\x02" * 32
+
+def records(first_block, count, sas=SAS_A):
+    """Um CBSDRegistered e um GrantCreated por bloco"""
+    result = []
+    for block in range(first_block, first_block + count):
+        result.append(CBSDRegistered(block, 0, TX, KEY, "FCC-1", "SN-1", sas, 375000000, -1224000000))
+        result.append(GrantCreated(block, 1, TX, KEY, "FCC-1", "SN-1", f"GRANT-{block}", sas,
+                                   3550000000, 3560000000, 47))
+    return result
+
+async def take(stream, count):
+    """Próximos ``count`` frames SSE como (id, event, data)"""
+    frames = []
+    while len(frames) < count:
+        frame = await asyncio.wait_for(stream.__anext__(), 5)
+        if frame.startswith(":"):
+            continue
+        fields = dict(line.split(": ", 1) for line in frame.strip().split("\n"))
+        frames.append((fields.get("id"), fields["event"], json.loads(fields["data"])))
+    return frames
+
+@pytest.mark.asyncio
+async def test_fanout_to_hundreds_with_filters():
+    """Um publish alcança todos os assinantes; filtros por tipo e sasOrigin"""
+    broadcaster = EventBroadcaster(1, buffer_size=100)
+    everyone = [Subscription() for _ in range(300)]
+    grants_b = Subscription(types=["GrantCreated"], sas_origin=SAS_B.upper())
+    streams = [broadcaster.events(sub) for sub in everyone + [grants_b]]
+    # Inicia os geradores (registra os assinantes)
+    pending = [asyncio.ensure_future(stream.__anext__()) for stream in streams]
+    await asyncio.sleep(0)
+    assert broadcaster.get_stats()["subscribers"] == 301
+
+    broadcaster.publish(records(1, 2) + records(3, 1, sas=SAS_B), 3)
+    first = await asyncio.gather(*pending)
+    assert all(frame.startswith("id: 1-0\nevent: CBSDRegistered") for frame in first[:-1])
+    assert first[-1].startswith("id: 3-1\nevent: GrantCreated")
+    assert all(sub.queue.qsize() == 5 for sub in everyone)
+    assert broadcaster.published == 6
+    for stream in streams:
+        await stream.aclose()
+    assert broadcaster.get_stats()["subscribers"] == 0
+
+@pytest.mark.asyncio
+async def test_slow_consumer_is_evicted():
+    """Buffer cheio remove só o assinante lento; ele recebe o cursor para reconectar"""
+    broadcaster = EventBroadcaster(1, buffer_size=4)
+    slow, fast = Subscription(), Subscription()
+    slow_stream, fast_stream = broadcaster.events(slow), broadcaster.events(fast)
+    pending = [asyncio.ensure_future(slow_stream.__anext__()), asyncio.ensure_future(fast_stream.__anext__())]
+    await asyncio.sleep(0)
+
+    broadcaster.publish(records(1, 1), 1)
+    await asyncio.gather(*pending)
+    # O rápido consome tudo; o lento fica parado no primeiro evento
+    broadcaster.publish(records(2, 1), 2)
+    assert len(await take(fast_stream, 3)) == 3
+    broadcaster.publish(records(3, 2), 4)
+    assert slow.evicted and not fast.evicted
+    assert broadcaster.evictions == 1
+    assert await take(fast_stream, 4)
+
+    frames = await take(slow_stream, 5)
+    assert frames[-1] == (None, "evicted", {"cursor": "3-0"})
+    assert broadcaster.get_stats()["subscribers"] == 1
+    await fast_stream.aclose()
+
+@pytest.mark.asyncio
+async def test_resume_from_cursor_uses_history_and_backfill():
+    """Cursor recente vem do histórico; cursor antigo é completado pelo backfill, sem duplicar"""
+    backfill_calls = []
+
+    async def backfill(from_block, to_block):
+        backfill_calls.append((from_block, to_block))
+        for block in range(from_block, to_block + 1):
+            yield records(block, 1)
+
+    broadcaster = EventBroadcaster(1, backfill=backfill, history_size=10)
+    broadcaster.publish(records(1, 10), 10)
+    # Histórico com os 10 eventos mais recentes (blocos 6 a 10)
+    assert broadcaster.history_from_block == 6
+
+    recent = broadcaster.events(Subscription(after=parse_cursor("8-0")))
+    frames = await take(recent, 3)
+    assert [f[0] for f in frames] == ["8-1", "9-0", "9-1"]
+    await recent.aclose()
+    assert backfill_calls == []
+
+    old = broadcaster.events(Subscription(types=["GrantCreated"], after=parse_cursor("2-1")))
+    frames = await take(old, 8)
+    assert [f[0] for f in frames] == [f"{block}-1" for block in range(3, 11)]
+    assert backfill_calls == [(2, 5)]
+    # Eventos novos continuam depois do histórico
+    broadcaster.publish(records(11, 1), 11)
+    assert (await take(old, 1))[0][0] == "11-1"
+    await old.aclose()
+
+@pytest.mark.asyncio
+async def test_backfill_is_streamed_per_range_without_evicting():
+    """O backfill é consumido faixa a faixa; eventos ao vivo publicados durante ele não enchem a fila"""
+    fetched = []
+    release = asyncio.Event()
+
+    async def backfill(from_block, to_block):
+        for block in range(from_block, to_block + 1):
+            if block == 3:
+                await release.wait()
+            fetched.append(block)
+            yield records(block, 1)
+
+    broadcaster = EventBroadcaster(1, backfill=backfill, buffer_size=2, history_size=4, max_backfill_blocks=6)
+    broadcaster.publish(records(1, 6), 6)
+    assert broadcaster.history_from_block == 5
+
+    subscription = Subscription(after=(1, -1))
+    stream = broadcaster.events(subscription, replay=broadcaster.subscribe(subscription))
+    assert [f[0] for f in await take(stream, 4)] == ["1-0", "1-1", "2-0", "2-1"]
+    # Primeira faixa entregue antes da segunda ser buscada
+    assert fetched == [1, 2]
+    pending = asyncio.ensure_future(take(stream, 14))
+    await asyncio.sleep(0)
+    # Muito mais eventos que o buffer enquanto o backfill está parado: o histórico avança até o bloco 9
+    broadcaster.publish(records(7, 3), 9)
+    release.set()
+    frames = await pending
+    assert [f[0] for f in frames] == [f"{block}-{i}" for block in range(3, 10) for i in (0, 1)]
+    assert not subscription.evicted and subscription.live
+    # Blocos 5 a 7 saíram do histórico durante o backfill e foram buscados numa segunda passada
+    assert fetched == [1, 2, 3, 4, 5, 6, 7]
+    await stream.aclose()
+
+    with pytest.raises(CursorExpired):
+        broadcaster.subscribe(Subscription(after=(0, -1)))
+    assert broadcaster.get_stats()["subscribers"] == 0
+
+@pytest.mark.asyncio
+async def test_stream_endpoint_rejects_before_streaming(monkeypatch):
+    """Limite de assinantes (503) e cursor antigo demais (410) respondem antes dos cabeçalhos do stream"""
+    async def backfill(from_block, to_block):
+        yield []
+
+    broadcaster = EventBroadcaster(500, backfill=backfill, max_subscribers=1, max_backfill_blocks=100)
+    monkeypatch.setattr(api_module, "event_broadcaster", broadcaster)
+    broadcaster.subscribe(Subscription())
+
+    transport = httpx.ASGITransport(app=api_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://gateway") as c:
+        full = await c.get("/events/stream")
+        broadcaster.subscribers.clear()
+        expired = await c.get("/events/stream", params={"from_block": 10})
+        invalid = await c.get("/events/stream", headers={"Last-Event-ID": "x"})
+    assert full.status_code == 503
+    assert expired.status_code == 410
+    assert invalid.status_code == 400
+    assert broadcaster.get_stats()["subscribers"] == 0
+
+@pytest.mark.asyncio
+async def test_indexer_publishes_to_stream(pool, indexer):
+    """O EventIndexer é a única fonte: cada faixa indexada é repassada ao broadcaster"""
+    broadcaster = EventBroadcaster(indexer.next_block)
+    indexer.listeners.append(broadcaster.publish)
+    sas = Account.create().address
+    stream = broadcaster.events(Subscription(types=["SASAuthorized"]))
+    pending = asyncio.ensure_future(stream.__anext__())
+    await asyncio.sleep(0)
+
+    signer = pool.get()
+    await signer.registration(dict(REG_PAYLOAD, cbsdSerialNumber=f"SN-STREAM-{sas[2:10]}"))
+    receipt = await signer.authorize_sas(sas)
+    await indexer.sync()
+
+    frame = await asyncio.wait_for(pending, 5)
+    assert f"id: {receipt['blockNumber']}-" in frame
+    assert json.loads(frame.split("data: ", 1)[1])["sas"] == sas
+    assert broadcaster.last_block == indexer.last_indexed_block
+    await stream.aclose()
@@ -0,0 +1,118 @@
+import asyncio
+import logging
+import pytest
+
+import handlers.handlers as handlers_module
+from blockchain.event_decoder import CBSDRegistered, EventDecoder, GrantCreated, SASAuthorized
+from handlers.handlers import EVENT_HANDLERS
+from handlers.pipeline import HandlerPipeline, ThrottledLog, batch_handler, partition_key
+from repository.repository import CBSDRepository, cbsd_key
+
+SAS = "0xf39Fd6e51aad88F6F4ce6aB8827279cffFb92266"
+TX = b"\x01" * 32
+
+def registered(block, serial):
+    key = bytes.fromhex(cbsd_key("FCC-PIPE", serial))
+    return CBSDRegistered(block, 0, TX, key, "FCC-PIPE", serial, SAS, 375000000, -1224000000)
+
+def granted(block, serial, grant_id):
+    key = bytes.fromhex(cbsd_key("FCC-PIPE", serial))
+    return GrantCreated(block, 1, TX, key, "FCC-PIPE", serial, grant_id, SAS, 3550000000, 3560000000, 47)
+
+def history(cbsds=20, grants=5):
+    records = [registered(1, f"SN-{i}") for i in range(cbsds)]
+    for g in range(grants):
+        records += [granted(2 + g, f"SN-{i}", f"G-{i}-{g}") for i in range(cbsds)]
+    return records
+
+@pytest.mark.asyncio
+async def test_pipeline_orders_per_cbsd_in_concurrent_batches():
+    """Ordem mantida por CBSD, lotes do mesmo tipo limitados, partições concorrentes"""
+    applied, batches = [], []
+    running = peak = 0
+
+    async def handler(records):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        batches.append(records)
+        await asyncio.sleep(0.001)
+        applied.extend(records)
+        running -= 1
+
+    handler = batch_handler(handler)
+    records = history()
+    pipeline = HandlerPipeline({"CBSDRegistered": handler, "GrantCreated": handler}, partitions=4, batch_size=3)
+    await pipeline.process(records)
+
+    assert sorted(applied, key=records.index) == records
+    for key in {partition_key(record) for record in records}:
+        assert [r for r in applied if r.cbsd_key == key] == [r for r in records if r.cbsd_key == key]
+    assert all(len(batch) <= 3 and len({type(r) for r in batch}) == 1 for batch in batches)
+    assert peak > 1
+    assert pipeline.get_stats()["applied"] == len(records)
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_reapplied_event_by_event():
+    """Lote com evento inválido é reaplicado um a um; handlers por evento recebem o formato do web3"""
+    sas = []
+
+    @batch_handler
+    def failing(records):
+        if any(record.serial_number == "SN-BAD" for record in records):
+            raise ValueError("evento inválido")
+        sas.extend(record.serial_number for record in records)
+
+    pipeline = HandlerPipeline({"CBSDRegistered": failing,
+                                "SASAuthorized": lambda event: sas.append(event["args"]["sas"])},
+                               decoder=EventDecoder(), partitions=1, batch_size=10)
+    await pipeline.process([registered(1, "SN-1"), registered(1, "SN-BAD"), registered(1, "SN-2"),
+                            SASAuthorized(2, 0, TX, SAS)])
+    assert sas == ["SN-1", "SN-2", SAS]
+    assert (pipeline.applied, pipeline.errors) == (3, 1)
+
+@pytest.mark.asyncio
+async def test_unconfirmed_blocks_applied_under_journal(monkeypatch):
+    """Eventos a partir de journal_from podem ser desfeitos; os confirmados não"""
+    repo = CBSDRepository()
+    monkeypatch.setattr(handlers_module, "repo", repo)
+    pipeline = HandlerPipeline(EVENT_HANDLERS, repository=repo, partitions=4)
+    await pipeline.process([registered(1, "SN-1"), granted(5, "SN-1", "G-1"), registered(6, "SN-2"),
+                            granted(6, "SN-2", "G-2")], journal_from=5)
+    assert len(repo.cbsds) == 2
+
+    repo.rollback(4)
+    assert repo.get(cbsd_key("FCC-PIPE", "SN-2")) is None
+    assert repo.get_grants(cbsd_key("FCC-PIPE", "SN-1")) == []
+
+@pytest.mark.asyncio
+async def test_redelivered_registration_keeps_grants(make_repo, monkeypatch):
+    """CBSDRegistered reentregue (lote reaplicado evento a evento) não descarta os grants já aplicados"""
+    repo = make_repo()
+    monkeypatch.setattr(handlers_module, "repo", repo)
+    pipeline = HandlerPipeline(EVENT_HANDLERS, repository=repo, partitions=1)
+    key = cbsd_key("FCC-PIPE", "SN-1")
+    with repo.transaction():
+        await pipeline.process([registered(1, "SN-1"), granted(2, "SN-1", "G-1"), registered(2, "SN-2")])
+        await pipeline.process([registered(1, "SN-1"), registered(2, "SN-2")])
+    assert [grant["grant_id"] for grant in repo.get_grants(key)] == ["G-1"]
+    assert len(list(repo.find_grants("active"))) == 1
+
+    # Novo registro (outro evento) começa sem grants
+    with repo.transaction():
+        await pipeline.process([registered(9, "SN-1")])
+    assert repo.get_grants(key) == []
+    assert repo.get(key)["block_number"] == 9
+
+def test_throttled_log_summarizes_counts(caplog):
+    """Uma linha por intervalo com a contagem por tipo, em vez de uma por evento"""
+    log = ThrottledLog(logging.getLogger("test_pipeline"), interval=3600)
+    with caplog.at_level(logging.INFO, logger="test_pipeline"):
+        for _ in range(1000):
+            log.count("GrantCreated")
+        log.count("CBSDRegistered", 10)
+        assert caplog.records == []
+        log.flush()
+    assert len(caplog.records) == 1
+    assert "CBSDRegistered=10, GrantCreated=1000" in caplog.records[0].getMessage()
+    assert log.total["GrantCreated"] == 1000
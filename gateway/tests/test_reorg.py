@@ -0,0 +1,183 @@
+import asyncio
+import json
+import pytest
+from web3 import AsyncWeb3, Web3
+
+import handlers.handlers as handlers_module
+from blockchain.blockchain import load_contract_abi
+from blockchain.event_indexer import EventIndexer
+from blockchain.event_stream import EventBroadcaster, Subscription
+from handlers.handlers import EVENT_HANDLERS
+from repository.repository import CBSDRepository, cbsd_key
+from config.settings import settings
+# Importa o stand-in do nó (benchmarks/) pelo caminho configurado em test_async_blockchain
+from test_async_blockchain import ChainStandIn, RPCStandInServer
+from rpc_standin import encode_event_log
+
+SAS = "0xf39Fd6e51aad88F6F4ce6aB8827279cffFb92266"
+OTHER_SAS = "0x70997970C51812dc3A010C7d01b50e0d17dc79C8"
+
+def state(repo, serials=("SN-1", "SN-2", "SN-3")):
+    return ({serial: repo.get(cbsd_key("FCC-REORG", serial)) for serial in serials},
+            {sas: repo.is_authorized_sas(sas) for sas in (SAS, OTHER_SAS)})
+
+def register(repo, serial, block):
+    repo.add_cbsd(cbsd_key("FCC-REORG", serial), {"fcc_id": "FCC-REORG", "serial_number": serial, "sas_origin": SAS,
+                                                  "status": "registered", "block_number": block,
+                                                  "transaction_hash": "0x01"})
+
+def grant(repo, serial, grant_id, block):
+    repo.add_grant(cbsd_key("FCC-REORG", serial), {"grant_id": grant_id, "sas_origin": SAS, "created_at": block,
+                                                   "transaction_hash": "0x02", "terminated": False})
+
+def test_rollback_restores_state_of_block(make_repo):
+    """Alterações de blocos sem confirmação são desfeitas em ordem inversa; confirmados não"""
+    repo = make_repo()
+    with repo.transaction():
+        register(repo, "SN-1", 10)
+        grant(repo, "SN-1", "GRANT-1", 10)
+        grant(repo, "SN-1", "GRANT-2", 10)
+        repo.set_sas(SAS, True)
+        repo.set_checkpoint(10)
+    before = state(repo)
+
+    with repo.transaction():
+        with repo.journal(11):
+            repo.terminate_grant(cbsd_key("FCC-REORG", "SN-1"), "GRANT-1", 11, SAS)
+            register(repo, "SN-2", 11)
+            repo.set_sas(OTHER_SAS, True)
+        after_11 = state(repo)
+        with repo.journal(12):
+            # Re-registro descarta os grants; evento reentregue não duplica o grant
+            register(repo, "SN-1", 12)
+            grant(repo, "SN-1", "GRANT-3", 12)
+            grant(repo, "SN-1", "GRANT-3", 12)
+            repo.set_sas(SAS, False)
+        repo.set_block_hash(11, "0x11")
+        repo.set_block_hash(12, "0x12")
+        repo.set_checkpoint(12)
+    assert [g["grant_id"] for g in repo.get_grants(cbsd_key("FCC-REORG", "SN-1"))] == ["GRANT-3"]
+
+    assert repo.rollback(11) > 0
+    assert state(repo) == after_11
+    assert repo.get_checkpoint() == 11 and repo.get_block_hashes() == {11: "0x11"}
+    repo.prune(11)
+    assert repo.rollback(10) == 0
+    assert state(repo) == after_11
+    assert state(repo) != before
+
+    with repo.journal(13):
+        register(repo, "SN-3", 13)
+    repo.rollback(11)
+    assert state(repo) == after_11
+
+def chain_logs(contract):
+    abi = {e["name"]: e for e in contract.abi if e["type"] == "event"}
+
+    def log(block, name, **args):
+        if "serialNumber" in args:
+            args = dict(args, fccId="FCC-REORG", cbsdKey=Web3.keccak(text="FCC-REORG" + args["serialNumber"]),
+                        lowFrequency=3550000000, highFrequency=3560000000, maxEirp=47, latitude=375000000,
+                        longitude=-1224000000)
+        return dict(encode_event_log(contract.address, abi[name], args), blockNumber=hex(block))
+
+    return log
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("repo_kind", ["memory", "sqlite"])
+async def test_indexer_repairs_reorg_at_head(make_repo, monkeypatch):
+    """Reorg dos últimos blocos: o índice volta ao último bloco em comum e reindexa o fork"""
+    chain = ChainStandIn()
+    with RPCStandInServer(chain) as server:
+        web3 = AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(server.url))
+        contract = web3.eth.contract(address=settings.CONTRACT_ADDRESS, abi=load_contract_abi())
+        log = chain_logs(contract)
+        chain.add_logs([
+            log(1, "CBSDRegistered", serialNumber="SN-1", sasOrigin=SAS),
+            log(1, "SASAuthorized", sas=SAS),
+            log(6, "GrantCreated", serialNumber="SN-1", grantId="GRANT-A", sasOrigin=SAS),
+            log(7, "GrantTerminated", serialNumber="SN-1", grantId="GRANT-A", sasOrigin=SAS),
+            log(7, "SASRevoked", sas=SAS),
+            log(7, "CBSDRegistered", serialNumber="SN-2", sasOrigin=SAS),
+        ])
+        chain.mine()
+        repo = make_repo()
+        monkeypatch.setattr(handlers_module, "repo", repo)
+        indexer = EventIndexer(web3, contract, EVENT_HANDLERS, repository=repo, start_block=0, chunk_size=3,
+                               confirmations=4)
+        assert await indexer.sync() == 8
+        cbsds, sas = state(repo)
+        assert [g["terminated"] for g in cbsds["SN-1"]["grants"]] == [True]
+        assert cbsds["SN-2"] is not None and sas[SAS] is False
+        assert sorted(repo.get_block_hashes()) == [5, 6, 7, 8]
+
+        # Blocos 6-8 trocados por um fork com outro grant, mais um bloco novo
+        assert chain.reorg(3) == 6
+        chain.add_logs([log(7, "GrantCreated", serialNumber="SN-1", grantId="GRANT-B", sasOrigin=SAS)])
+        chain.mine()
+        assert await indexer.sync() == 9
+        stats = indexer.get_stats()
+        assert (stats["reorgs"], stats["reverted_blocks"]) == (1, 3)
+        assert repo.get_checkpoint() == 9
+        assert sorted(repo.get_block_hashes()) == [6, 7, 8, 9]
+
+        # Mesmo estado de uma indexação do zero da chain atual
+        replayed = make_repo("replay.db")
+        monkeypatch.setattr(handlers_module, "repo", replayed)
+        await EventIndexer(web3, contract, EVENT_HANDLERS, repository=replayed, start_block=0, confirmations=4).sync()
+        assert state(repo) == state(replayed)
+        cbsds, sas = state(repo)
+        assert [(g["grant_id"], g["terminated"]) for g in cbsds["SN-1"]["grants"]] == [("GRANT-B", False)]
+        assert cbsds["SN-2"] is None and sas[SAS] is True
+        await web3.provider.disconnect()
+
+@pytest.mark.asyncio
+async def test_reorg_retracts_streamed_events(monkeypatch):
+    """Eventos dos blocos desfeitos saem do histórico e das filas do stream; quem já os recebeu ganha um aviso"""
+    chain = ChainStandIn()
+    with RPCStandInServer(chain) as server:
+        web3 = AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(server.url))
+        contract = web3.eth.contract(address=settings.CONTRACT_ADDRESS, abi=load_contract_abi())
+        log = chain_logs(contract)
+        chain.add_logs([
+            log(1, "CBSDRegistered", serialNumber="SN-1", sasOrigin=SAS),
+            log(6, "GrantCreated", serialNumber="SN-1", grantId="GRANT-A", sasOrigin=SAS),
+            log(7, "CBSDRegistered", serialNumber="SN-2", sasOrigin=SAS),
+        ])
+        chain.mine()
+        repo = CBSDRepository()
+        monkeypatch.setattr(handlers_module, "repo", repo)
+        indexer = EventIndexer(web3, contract, EVENT_HANDLERS, repository=repo, start_block=0, confirmations=4)
+        broadcaster = EventBroadcaster(indexer.next_block)
+        indexer.listeners.append(broadcaster.publish)
+        indexer.rollback_listeners.append(broadcaster.rollback)
+        # Um assinante em dia e um que ainda não leu a fila
+        reader, idle = Subscription(), Subscription()
+        stream = broadcaster.events(reader)
+        broadcaster.subscribe(idle)
+        pending = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0)
+
+        await indexer.sync()
+        frames = [await pending] + [await stream.__anext__() for _ in range(2)]
+        assert [frame.split("\n")[0].split("-")[0] for frame in frames] == ["id: 1", "id: 6", "id: 7"]
+        assert idle.queue.qsize() == 3
+
+        assert chain.reorg(3) == 6
+        chain.add_logs([log(7, "GrantCreated", serialNumber="SN-1", grantId="GRANT-B", sasOrigin=SAS)])
+        chain.mine()
+        await indexer.sync()
+
+        reorg = await asyncio.wait_for(stream.__anext__(), 5)
+        assert reorg.startswith("id: 6\nevent: reorg\n")
+        assert json.loads(reorg.split("data: ", 1)[1]) == {"block_number": 5, "cursor": "6"}
+        replayed = await asyncio.wait_for(stream.__anext__(), 5)
+        assert replayed.startswith("id: 7-") and "event: GrantCreated" in replayed
+        assert json.loads(replayed.split("data: ", 1)[1])["grantId"] == "GRANT-B"
+        # O assinante atrasado perde só os eventos desfeitos, sem aviso
+        queued = [idle.queue.get_nowait()[0] for _ in range(idle.queue.qsize())]
+        assert [(r.block_number, type(r).__name__) for r in queued] == [(1, "CBSDRegistered"), (7, "GrantCreated")]
+        assert [record for record, _ in broadcaster.history] == queued
+        assert broadcaster.get_stats()["rollbacks"] == 1
+        await stream.aclose()
+        await web3.provider.disconnect()
@@ -0,0 +1,269 @@
+import random
+import httpx
+import pytest
+
+import api.api as api_module
+from repository.intervals import IntervalIndex
+from repository.spatial import GridIndex, haversine_km
+from repository.repository import CBSDRepository, cbsd_key
+
+SAS = "0xf39Fd6e51aad88F6F4ce6aB8827279cffFb92266"
+OTHER_SAS = "0x70997970C51812dc3A010C7d01b50e0d17dc79C8"
+
+def register(repo, fcc_id, serial, sas, block=1, location=(375000000, -1224000000)):
+    repo.add_cbsd(cbsd_key(fcc_id, serial), {"fcc_id": fcc_id, "serial_number": serial, "sas_origin": sas,
+                                             "status": "registered", "block_number": block,
+                                             "transaction_hash": "0x01", "latitude": location[0],
+                                             "longitude": location[1]})
+
+def grant(repo, fcc_id, serial, grant_id, block=2, band=(3550_000_000, 3560_000_000)):
+    repo.add_grant(cbsd_key(fcc_id, serial), {"grant_id": grant_id, "sas_origin": SAS, "created_at": block,
+                                              "transaction_hash": "0x02", "terminated": False,
+                                              "low_frequency": band[0], "high_frequency": band[1]})
+
+def serials(results):
+    return [cbsd["serial_number"] for _, cbsd in results]
+
+def grant_ids(repo, state):
+    return sorted(grant["grant_id"] for _, grant in repo.find_grants(state))
+
+def test_indexes_follow_updates_and_rollback(make_repo):
+    """Consultas por SAS, FCC ID, status e estado do grant acompanham gravações, encerramentos e reorgs"""
+    repo = make_repo()
+    with repo.transaction():
+        for i in range(6):
+            register(repo, f"FCC-{i % 2}", f"SN-{i}", SAS if i < 4 else OTHER_SAS)
+            grant(repo, f"FCC-{i % 2}", f"SN-{i}", f"G-{i}")
+        repo.terminate_grant(cbsd_key("FCC-1", "SN-1"), "G-1", 3, SAS)
+
+    assert serials(repo.find_cbsds(sas_origin=SAS)) == ["SN-0", "SN-1", "SN-2", "SN-3"]
+    assert serials(repo.find_cbsds(sas_origin=SAS, fcc_id="FCC-1")) == ["SN-1", "SN-3"]
+    assert serials(repo.find_cbsds(fcc_id="FCC-0", status="registered")) == ["SN-0", "SN-2", "SN-4"]
+    assert list(repo.find_cbsds(sas_origin="0xdesconhecido")) == []
+    assert len(list(repo.find_cbsds())) == 6
+    assert grant_ids(repo, "active") == ["G-0", "G-2", "G-3", "G-4", "G-5"]
+    assert grant_ids(repo, "terminated") == ["G-1"]
+    _, terminated = next(repo.find_grants("terminated"))
+    assert (terminated["fcc_id"], terminated["serial_number"], terminated["terminated_by"]) == ("FCC-1", "SN-1", SAS)
+    with pytest.raises(ValueError):
+        repo.find_grants("suspended")
+
+    # Bloco sem confirmação: CBSD muda de SAS (novo registro descarta os grants) e um grant é encerrado
+    with repo.transaction(), repo.journal(10):
+        register(repo, "FCC-0", "SN-0", OTHER_SAS, block=10)
+        repo.terminate_grant(cbsd_key("FCC-0", "SN-2"), "G-2", 10, SAS)
+        grant(repo, "FCC-1", "SN-5", "G-6", block=10)
+    assert serials(repo.find_cbsds(sas_origin=SAS)) == ["SN-1", "SN-2", "SN-3"]
+    assert sorted(serials(repo.find_cbsds(sas_origin=OTHER_SAS))) == ["SN-0", "SN-4", "SN-5"]
+    assert grant_ids(repo, "active") == ["G-3", "G-4", "G-5", "G-6"]
+    assert grant_ids(repo, "terminated") == ["G-1", "G-2"]
+
+    assert repo.rollback(9) > 0
+    assert sorted(serials(repo.find_cbsds(sas_origin=SAS))) == ["SN-0", "SN-1", "SN-2", "SN-3"]
+    assert serials(repo.find_cbsds(sas_origin=OTHER_SAS)) == ["SN-4", "SN-5"]
+    assert grant_ids(repo, "active") == ["G-0", "G-2", "G-3", "G-4", "G-5"]
+    assert grant_ids(repo, "terminated") == ["G-1"]
+
+def test_interval_index_matches_brute_force():
+    """Sobreposição de faixas semiabertas igual à comparação direta, com inclusões e remoções"""
+    rng = random.Random(7)
+    index, bands = IntervalIndex(), {}
+    for i in range(3000):
+        low = rng.randrange(3_550_000_000, 3_700_000_000, rng.choice([1, 5_000_000]))
+        bands[i] = (low, low + rng.choice([1, 5_000_000, 10_000_000, 40_000_000, rng.randrange(1, 10**8)]))
+        index.add(i, *bands[i])
+    for i in rng.sample(range(3000), 1000):
+        index.remove(i, *bands.pop(i))
+    index.remove("ausente", 1, 2)
+    assert len(index) == len(bands) == 2000
+
+    queries = [(3_560_000_000, 3_570_000_000), (3_560_000_000, 3_560_000_001), (0, 3_550_000_000),
+               (3_700_000_000, 2**64 - 1), (0, 2**64 - 1)]
+    queries += [(low, low + rng.randrange(1, 10**8)) for low in rng.sample(range(3_540_000_000, 3_710_000_000), 200)]
+    for low, high in queries:
+        found = list(index.overlapping(low, high))
+        assert len(found) == len(set(found))
+        assert set(found) == {i for i, (a, b) in bands.items() if a < high and b > low}
+    assert list(index.overlapping(3_600_000_000, 3_600_000_000)) == []
+    with pytest.raises(ValueError):
+        index.add("invalida", 10, 10)
+
+def test_active_grants_by_frequency(make_repo):
+    """Só grants ativos com faixa sobreposta; encerramento e rollback atualizam o índice de faixas"""
+    repo = make_repo()
+    bands = {"G-A": (3550_000_000, 3560_000_000), "G-B": (3560_000_000, 3580_000_000),
+             "G-C": (3600_000_000, 3650_000_000), "G-D": (3555_000_000, 3556_000_000)}
+    with repo.transaction():
+        for i, (grant_id, band) in enumerate(bands.items()):
+            register(repo, "FCC-BAND", f"SN-{i}", SAS)
+            grant(repo, "FCC-BAND", f"SN-{i}", grant_id, band=band)
+        register(repo, "FCC-BAND", "SN-X", SAS)
+        repo.add_grant(cbsd_key("FCC-BAND", "SN-X"), {"grant_id": "G-SEM-FAIXA", "sas_origin": SAS, "created_at": 2,
+                                                      "transaction_hash": "0x02", "terminated": False})
+
+    def overlapping(low, high):
+        return sorted(grant["grant_id"] for _, grant in repo.find_grants("active", low=low, high=high))
+
+    assert overlapping(3550_000_000, 3700_000_000) == ["G-A", "G-B", "G-C", "G-D"]
+    # Faixas semiabertas: canais adjacentes não se sobrepõem
+    assert overlapping(3560_000_000, 3570_000_000) == ["G-B"]
+    assert overlapping(3555_500_000, 3555_500_001) == ["G-A", "G-D"]
+    assert overlapping(3580_000_000, 3600_000_000) == []
+    _, found = next(repo.find_grants("active", low=3600_000_000, high=3610_000_000))
+    assert (found["low_frequency"], found["high_frequency"], found["serial_number"]) == (3600_000_000, 3650_000_000,
+                                                                                        "SN-2")
+    for low, high, state in ((1, None, "active"), (10, 5, "active"), (1, 2, "terminated")):
+        with pytest.raises(ValueError):
+            repo.find_grants(state, low=low, high=high)
+
+    with repo.transaction(), repo.journal(10):
+        repo.terminate_grant(cbsd_key("FCC-BAND", "SN-0"), "G-A", 10, SAS)
+        register(repo, "FCC-BAND", "SN-1", SAS, block=10)
+    assert overlapping(3550_000_000, 3700_000_000) == ["G-C", "G-D"]
+    repo.rollback(9)
+    assert overlapping(3550_000_000, 3700_000_000) == ["G-A", "G-B", "G-C", "G-D"]
+
+def test_grid_index_matches_brute_force():
+    """Raio e retângulo iguais à comparação direta, inclusive no antimeridiano e perto dos polos"""
+    rng = random.Random(11)
+    index, points = GridIndex(cell_size=0.5), {}
+    for i in range(4000):
+        points[i] = (rng.uniform(-90, 90), rng.uniform(-180, 180)) if i % 4 else \
+            (rng.uniform(35, 40), rng.choice([rng.uniform(-180, -175), rng.uniform(175, 180)]))
+        index.add(i, *points[i])
+    for i in rng.sample(range(4000), 1000):
+        index.remove(i)
+        del points[i]
+    index.add(0, 10.0, 10.0)
+    points[0] = (10.0, 10.0)
+    assert len(index) == len(points)
+
+    keys = list(points)
+    latitudes = [points[k][0] for k in keys]
+    longitudes = [points[k][1] for k in keys]
+    for latitude, longitude, radius in [(37.5, 179.9, 300), (37.5, -179.9, 50), (89.5, 0, 200), (-89.9, 45, 30),
+                                        (10.0, 10.0, 0), (0, 0, 5000), (37.5, -122.4, 1)]:
+        found, distances = index.within_radius(latitude, longitude, radius)
+        brute = haversine_km(latitude, longitude, latitudes, longitudes)
+        assert set(found) == {k for k, d in zip(keys, brute) if d <= radius}
+        assert list(distances) == sorted(distances)
+    for box in [(30, 170, 45, -170), (-10, -10, 10, 10), (80, -180, 90, 180), (37, -123, 37, -122)]:
+        min_lat, min_lon, max_lat, max_lon = box
+        expected = {k for k, (lat, lon) in points.items() if min_lat <= lat <= max_lat and
+                    (min_lon <= lon <= max_lon if min_lon <= max_lon else (lon >= min_lon or lon <= max_lon))}
+        assert set(index.within_box(*box)) == expected
+    with pytest.raises(ValueError):
+        index.within_box(10, 0, 5, 1)
+    with pytest.raises(ValueError):
+        index.add("fora", 91, 0)
+
+def test_cbsds_by_location(make_repo):
+    """Consultas por raio e retângulo acompanham registro, novo registro, deregistration e rollback"""
+    repo = make_repo()
+    # San Francisco, Oakland (~13 km), San Jose (~68 km), Fiji (antimeridiano) e um CBSD sem localização
+    places = {"SN-SF": (377749000, -1224194000), "SN-OAK": (378044000, -1222712000),
+              "SN-SJ": (373382000, -1218863000), "SN-FJ": (-178000000, 1799000000)}
+    with repo.transaction():
+        for serial, location in places.items():
+            register(repo, "FCC-GEO", serial, SAS, location=location)
+        register(repo, "FCC-GEO", "SN-NOWHERE", SAS, location=(None, None))
+
+    def near(radius, latitude=37.7749, longitude=-122.4194):
+        return [(cbsd["serial_number"], round(cbsd["distance_km"])) for _, cbsd in
+                repo.find_near(latitude, longitude, radius)]
+
+    def within(*box):
+        return sorted(cbsd["serial_number"] for _, cbsd in repo.find_in_box(*box))
+
+    assert near(20) == [("SN-SF", 0), ("SN-OAK", 13)]
+    assert [serial for serial, _ in near(100)] == ["SN-SF", "SN-OAK", "SN-SJ"]
+    assert near(50, -17.8, -179.99) == [("SN-FJ", 12)]
+    assert within(37, -123, 38, -121.5) == ["SN-OAK", "SN-SF", "SN-SJ"]
+    assert within(37, -123, 38, -122) == ["SN-OAK", "SN-SF"]
+    assert within(-20, 179, -15, -179) == ["SN-FJ"]
+    _, cbsd = next(repo.find_in_box(37.7, -122.5, 37.8, -122.4))
+    assert (cbsd["latitude"], cbsd["longitude"], cbsd["fcc_id"]) == (377749000, -1224194000, "FCC-GEO")
+    with pytest.raises(ValueError):
+        repo.find_near(37.7, -122.4, -1)
+
+    # Bloco sem confirmação: Oakland descadastrado e San Jose registrado de novo em San Francisco
+    with repo.transaction(), repo.journal(10):
+        assert repo.remove_cbsd(cbsd_key("FCC-GEO", "SN-OAK"))
+        assert not repo.remove_cbsd(cbsd_key("FCC-GEO", "SN-INEXISTENTE"))
+        register(repo, "FCC-GEO", "SN-SJ", SAS, block=10, location=(377750000, -1224195000))
+    assert [serial for serial, _ in near(100)] == ["SN-SF", "SN-SJ"]
+    assert repo.get(cbsd_key("FCC-GEO", "SN-OAK")) is None
+
+    repo.rollback(9)
+    assert [serial for serial, _ in near(100)] == ["SN-SF", "SN-OAK", "SN-SJ"]
+    assert repo.get_grants(cbsd_key("FCC-GEO", "SN-OAK")) == []
+
+@pytest.mark.asyncio
+async def test_query_endpoints_paginate(tmp_path, monkeypatch):
+    """GET /v1.3/cbsds e /v1.3/grants paginam os resultados dos índices com offset/limit"""
+    store = CBSDRepository()
+    for i in range(25):
+        register(store, "FCC-PAGE", f"SN-{i:02d}", SAS if i % 5 else OTHER_SAS)
+        grant(store, "FCC-PAGE", f"SN-{i:02d}", f"G-{i:02d}")
+    store.terminate_grant(cbsd_key("FCC-PAGE", "SN-07"), "G-07", 3, SAS)
+    monkeypatch.setattr(api_module, "repo", store)
+
+    transport = httpx.ASGITransport(app=api_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://gateway") as c:
+        pages, offset = [], 0
+        while offset is not None:
+            resp = await c.get("/v1.3/cbsds", params={"sasOrigin": SAS, "limit": 8, "offset": offset})
+            assert resp.status_code == 200
+            pages.append(resp.json()["cbsds"])
+            offset = resp.json()["next_offset"]
+        active = await c.get("/v1.3/grants", params={"state": "active", "limit": 1000})
+        terminated = await c.get("/v1.3/grants", params={"state": "terminated"})
+        invalid = await c.get("/v1.3/grants", params={"state": "suspended"})
+        too_large = await c.get("/v1.3/cbsds", params={"limit": 100_000})
+        band = await c.get("/v1.3/grants", params={"low": 3555_000_000, "high": 3556_000_000, "limit": 10})
+        half_band = await c.get("/v1.3/grants", params={"low": 3555_000_000})
+
+    assert [len(p) for p in pages] == [8, 8, 4]
+    assert [cbsd["cbsdSerialNumber"] for p in pages for cbsd in p] == [f"SN-{i:02d}" for i in range(25) if i % 5]
+    assert pages[0][0]["cbsdKey"] == "0x" + cbsd_key("FCC-PAGE", "SN-01")
+    assert pages[0][0]["grants"] == 1
+    assert len(active.json()["grants"]) == 24 and active.json()["next_offset"] is None
+    assert [(g["grantId"], g["cbsdSerialNumber"]) for g in terminated.json()["grants"]] == [("G-07", "SN-07")]
+    assert invalid.status_code == 400
+    assert too_large.status_code == 422
+    assert len(band.json()["grants"]) == 10 and band.json()["next_offset"] == 10
+    assert band.json()["grants"][0]["lowFrequency"] == 3550_000_000
+    assert half_band.status_code == 400
+
+@pytest.mark.asyncio
+async def test_location_endpoints(monkeypatch):
+    """GET /v1.3/cbsds/near ordena por distância e pagina; /within aceita retângulo no antimeridiano"""
+    store = CBSDRepository()
+    for i in range(12):
+        # Um CBSD a cada ~1,1 km para o norte de (37.5, -122.4)
+        register(store, "FCC-NEAR", f"SN-{i:02d}", SAS, location=(375000000 + i * 100000, -1224000000))
+    register(store, "FCC-NEAR", "SN-FJ", SAS, location=(-178000000, 1799000000))
+    monkeypatch.setattr(api_module, "repo", store)
+
+    transport = httpx.ASGITransport(app=api_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://gateway") as c:
+        first = await c.get("/v1.3/cbsds/near", params={"lat": 37.5, "lon": -122.4, "radiusKm": 10, "limit": 5})
+        second = await c.get("/v1.3/cbsds/near", params={"lat": 37.5, "lon": -122.4, "radiusKm": 10, "limit": 5,
+                                                         "offset": 5})
+        box = await c.get("/v1.3/cbsds/within", params={"minLat": -20, "minLon": 179, "maxLat": -15,
+                                                        "maxLon": -179})
+        inverted = await c.get("/v1.3/cbsds/within", params={"minLat": 38, "minLon": -123, "maxLat": 37,
+                                                             "maxLon": -122})
+        missing_radius = await c.get("/v1.3/cbsds/near", params={"lat": 37.5, "lon": -122.4})
+        out_of_range = await c.get("/v1.3/cbsds/near", params={"lat": 91, "lon": 0, "radiusKm": 1})
+
+    assert [cbsd["cbsdSerialNumber"] for cbsd in first.json()["cbsds"]] == [f"SN-{i:02d}" for i in range(5)]
+    assert first.json()["cbsds"][1]["distanceKm"] == pytest.approx(1.112, abs=0.001)
+    assert first.json()["cbsds"][0]["latitude"] == 375000000
+    assert first.json()["next_offset"] == 5
+    # 10 km ~ 9 passos de 1,1 km: SN-00 a SN-08
+    assert [cbsd["cbsdSerialNumber"] for cbsd in second.json()["cbsds"]] == [f"SN-{i:02d}" for i in range(5, 9)]
+    assert second.json()["next_offset"] is None
+    assert [cbsd["cbsdSerialNumber"] for cbsd in box.json()["cbsds"]] == ["SN-FJ"]
+    assert inverted.status_code == 400
+    assert missing_radius.status_code == 422 and out_of_range.status_code == 422
@@ -0,0 +1,55 @@
+import pytest
+
+from repository.records import CBSDRecord, GrantRecord
+from repository.repository import CBSDRepository, cbsd_key
+
+TX_HASH = "0x" + "ab" * 32
+
+def registration(serial, sas):
+    return {"fcc_id": "".join(["FCC-", "REC"]), "serial_number": serial, "sas_origin": sas,
+            "status": "registered", "block_number": 7, "transaction_hash": TX_HASH, "latitude": 375000000,
+            "longitude": -1224000000}
+
+def grant(grant_id, sas):
+    return {"grant_id": grant_id, "sas_origin": sas, "created_at": 8, "transaction_hash": TX_HASH,
+            "terminated": False, "low_frequency": 3550000000, "high_frequency": 3560000000, "max_eirp": 47}
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_records_read_back_as_dicts(columnar):
+    """Registros compactos (strings internadas, hash em bytes) são lidos nos mesmos dicionários de antes"""
+    repo = CBSDRepository(columnar_grants=columnar)
+    # Strings iguais vindas de eventos diferentes são objetos distintos antes de internar
+    sas = ["".join(["0xf39Fd6e51aad88F6F4ce6aB8827279cffFb9226", "6"]) for _ in range(2)]
+    for i in range(2):
+        key = cbsd_key("FCC-REC", f"SN-{i}")
+        repo.add_cbsd(key, registration(f"SN-{i}", sas[i]))
+        repo.add_grant(key, grant(f"G-{i}", sas[i]))
+    repo.terminate_grant(key, "G-1", 9, sas[0])
+
+    first, second = (repo.cbsds[cbsd_key("FCC-REC", f"SN-{i}")] for i in range(2))
+    assert isinstance(first, CBSDRecord) and not hasattr(first, "__dict__")
+    assert first.sas_origin is second.sas_origin and first.fcc_id is second.fcc_id
+    assert first.transaction_hash == bytes.fromhex("ab" * 32)
+    if not columnar:
+        assert isinstance(first.grants[0], GrantRecord)
+
+    assert repo.get(key) == dict(registration("SN-1", sas[1]), grants=[
+        dict(grant("G-1", sas[1]), terminated=True, terminated_at=9, terminated_by=sas[0])
+    ])
+    assert repo.get_grants(cbsd_key("FCC-REC", "SN-0")) == [
+        dict(grant("G-0", sas[0]), terminated_at=None, terminated_by=None)
+    ]
+
+def test_64_bit_boundary_values_round_trip(make_repo):
+    """Os limites aceitos pelo decodificador (±(2^63 - 1)) são gravados e lidos de volta em todos os repositórios"""
+    repo = make_repo()
+    key = cbsd_key("FCC-REC", "SN-MAX")
+    top = dict(grant("G-MAX", "0x" + "aa" * 20), low_frequency=2 ** 63 - 2, high_frequency=2 ** 63 - 1,
+               max_eirp=2 ** 63 - 1, created_at=2 ** 63 - 1)
+    with repo.transaction():
+        repo.add_cbsd(key, dict(registration("SN-MAX", "0x" + "aa" * 20), latitude=-2 ** 63 + 1, longitude=2 ** 63 - 1))
+        repo.add_grant(key, top)
+    cbsd = repo.get(key)
+    assert (cbsd["latitude"], cbsd["longitude"]) == (-2 ** 63 + 1, 2 ** 63 - 1)
+    assert repo.get_grants(key) == [dict(top, terminated_at=None, terminated_by=None)]
+    assert repo.find_grants("active", 2 ** 63 - 2, 2 ** 63 - 1)
@@ -0,0 +1,72 @@
+import pytest
+from web3 import Web3
+from eth_account import Account
+from blockchain.signer_pool import SignerPool
+from blockchain.async_blockchain import AsyncBlockchain
+from config.settings import settings
+
+# Provider apontando para lugar nenhum: o pool não deve fazer RPC ao criar contextos
+OFFLINE_WEB3 = Web3(Web3.HTTPProvider("http://127.0.0.1:1"))
+
+def new_key():
+    return Account.create().key.hex()
+
+def test_reuses_context_for_same_key():
+    """Mesma chave deve devolver o mesmo contexto"""
+    pool = SignerPool(web3=OFFLINE_WEB3, max_size=4)
+    key = new_key()
+    first = pool.get(key)
+    second = pool.get(key)
+    assert first is second
+    assert pool.get_stats()["hits"] == 1
+    assert pool.get_stats()["misses"] == 1
+
+def test_shares_provider_and_contract():
+    """Todos os contextos compartilham provider e contrato"""
+    pool = SignerPool(web3=OFFLINE_WEB3, max_size=4)
+    a = pool.get(new_key())
+    b = pool.get(new_key())
+    assert a.web3 is b.web3 is pool.web3
+    assert a.contract is b.contract is pool.contract
+    assert a.account.address != b.account.address
+
+def test_evicts_least_recently_used():
+    """Ao exceder o limite, remove o contexto menos usado recentemente"""
+    pool = SignerPool(web3=OFFLINE_WEB3, max_size=2)
+    k1, k2, k3 = new_key(), new_key(), new_key()
+    c1 = pool.get(k1)
+    pool.get(k2)
+    pool.get(k1)  # k1 passa a ser o mais recente
+    pool.get(k3)  # remove k2
+    assert len(pool) == 2
+    assert pool.get_stats()["evictions"] == 1
+    assert pool.get(k1) is c1
+    misses = pool.get_stats()["misses"]
+    pool.get(k2)
+    assert pool.get_stats()["misses"] == misses + 1
+
+def test_default_key_is_owner():
+    """Sem chave privada o contexto é o do owner"""
+    pool = SignerPool(web3=OFFLINE_WEB3, max_size=2)
+    owner = Account.from_key(settings.OWNER_PRIVATE_KEY).address
+    assert pool.get().account.address == owner
+    assert pool.get(None) is pool.get(settings.OWNER_PRIVATE_KEY)
+
+def test_async_pool_keeps_one_nonce_manager_per_key():
+    """Com AsyncBlockchain o pool compartilha um AsyncWeb3 e um NonceManager por conta"""
+    pool = SignerPool(max_size=2, signer_class=AsyncBlockchain)
+    key = new_key()
+    signer = pool.get(key)
+    assert isinstance(signer, AsyncBlockchain)
+    assert signer.web3 is pool.web3
+    assert pool.get(key).nonce_manager is signer.nonce_manager
+
+def test_key_spellings_share_context():
+    """Com ou sem 0x e em maiúsculas, a mesma chave usa o mesmo contexto"""
+    pool = SignerPool(web3=OFFLINE_WEB3, max_size=4)
+    key = Account.create().key.hex().removeprefix("0x")
+    first = pool.get("0x" + key)
+    assert pool.get(key) is first
+    assert pool.get("0X" + key.upper()) is first
+    assert len(pool) == 1
+    assert pool.get(settings.OWNER_PRIVATE_KEY.removeprefix("0x")) is pool.get()
@@ -20,7 +20,9 @@ module.exports = {
       initialBaseFeePerGas: 0
     },
     hardhat: {
-      chainId: 1337
+      chainId: 1337,
+      // Lotes de 200 registrations não cabem no limite padrão de 30M por bloco
+      blockGasLimit: 1000000000
     }
   }
 };
@@ -2,6 +2,9 @@ const { expect } = require("chai");
 const { ethers } = require("hardhat");
 const { anyValue } = require("@nomicfoundation/hardhat-chai-matchers/withArgs");
 
+// Mesma chave de _generateCBSDKey (keccak256(abi.encodePacked(fccId, serialNumber)))
+const cbsdKey = (fccId, serialNumber) => ethers.solidityPackedKeccak256(["string", "string"], [fccId, serialNumber]);
+
 describe("SASSharedRegistry (Simplificado)", function () {
   let SASSharedRegistry, sasSharedRegistry, owner, sas1, sas2, user1;
 
@@ -74,9 +77,12 @@ describe("SASSharedRegistry (Simplificado)", function () {
       await expect(sasSharedRegistry.connect(sas1).registration(registrationRequest))
         .to.emit(sasSharedRegistry, "CBSDRegistered")
         .withArgs(
+          cbsdKey(registrationRequest.fccId, registrationRequest.cbsdSerialNumber),
           registrationRequest.fccId,
           registrationRequest.cbsdSerialNumber,
-          sas1.address
+          sas1.address,
+          registrationRequest.latitude,
+          registrationRequest.longitude
         );
     });
 
@@ -85,10 +91,14 @@ describe("SASSharedRegistry (Simplificado)", function () {
       await expect(sasSharedRegistry.connect(sas1).grant(grantRequest))
         .to.emit(sasSharedRegistry, "GrantCreated")
         .withArgs(
+          cbsdKey(grantRequest.fccId, grantRequest.cbsdSerialNumber),
           grantRequest.fccId,
           grantRequest.cbsdSerialNumber,
           anyValue,
-          sas1.address
+          sas1.address,
+          grantRequest.lowFrequency,
+          grantRequest.highFrequency,
+          grantRequest.maxEirp
         );
     });
 
@@ -112,14 +122,28 @@ describe("SASSharedRegistry (Simplificado)", function () {
       expect(grantId).to.not.be.undefined;
       await expect(
         sasSharedRegistry.connect(sas1).relinquishment(grantRequest.fccId, grantRequest.cbsdSerialNumber, grantId)
-      ).to.emit(sasSharedRegistry, "GrantTerminated");
+      ).to.emit(sasSharedRegistry, "GrantTerminated")
+        .withArgs(
+          cbsdKey(grantRequest.fccId, grantRequest.cbsdSerialNumber),
+          grantRequest.fccId,
+          grantRequest.cbsdSerialNumber,
+          grantId,
+          sas1.address
+        );
     });
 
-    it("deve permitir deregistration de CBSD", async function () {
+    it("deve permitir deregistration de CBSD e emitir evento CBSDDeregistered", async function () {
       await sasSharedRegistry.connect(sas1).registration(registrationRequest);
       await expect(
         sasSharedRegistry.connect(sas1).deregistration(registrationRequest.fccId, registrationRequest.cbsdSerialNumber)
-      ).not.to.be.reverted;
+      )
+        .to.emit(sasSharedRegistry, "CBSDDeregistered")
+        .withArgs(
+          cbsdKey(registrationRequest.fccId, registrationRequest.cbsdSerialNumber),
+          registrationRequest.fccId,
+          registrationRequest.cbsdSerialNumber,
+          sas1.address
+        );
     });
 
     it("não deve permitir chamada por SAS não autorizado", async function () {
@@ -136,5 +160,121 @@ describe("SASSharedRegistry (Simplificado)", function () {
         sasSharedRegistry.connect(user1).deregistration(registrationRequest.fccId, registrationRequest.cbsdSerialNumber)
       ).to.be.revertedWith("Not an authorized SAS");
     });
+
+    it("deve registrar em lote e reportar falhas por item sem reverter", async function () {
+      const reqs = [
+        { ...registrationRequest, cbsdSerialNumber: "SN-B0" },
+        registrationRequest,
+        { ...registrationRequest, cbsdSerialNumber: "SN-B2" }
+      ];
+      await sasSharedRegistry.connect(sas1).registration(registrationRequest);
+      const tx = await sasSharedRegistry.connect(sas1).registrationBatch(reqs);
+      await expect(tx)
+        .to.emit(sasSharedRegistry, "BatchItemFailed")
+        .withArgs(1, "registration", "CBSD already exists");
+      await expect(tx).to.emit(sasSharedRegistry, "CBSDRegistered");
+      expect(await sasSharedRegistry.totalCbsds()).to.equal(3);
+    });
+
+    it("deve processar grant, relinquishment e deregistration em lote", async function () {
+      await sasSharedRegistry.connect(sas1).registration(registrationRequest);
+      const missing = { ...grantRequest, cbsdSerialNumber: "SN-NAO-EXISTE" };
+      const grantTx = await sasSharedRegistry.connect(sas1).grantBatch([grantRequest, missing]);
+      await expect(grantTx)
+        .to.emit(sasSharedRegistry, "BatchItemFailed")
+        .withArgs(1, "grant", "CBSD not registered");
+      expect(await sasSharedRegistry.totalGrants()).to.equal(1);
+
+      const receipt = await grantTx.wait();
+      const grantId = receipt.logs
+        .map((log) => { try { return sasSharedRegistry.interface.parseLog(log); } catch (e) { return null; } })
+        .find((parsed) => parsed && parsed.name === "GrantCreated").args.grantId;
+      const relinquishments = [
+        { fccId: grantRequest.fccId, cbsdSerialNumber: grantRequest.cbsdSerialNumber, grantId },
+        { fccId: grantRequest.fccId, cbsdSerialNumber: grantRequest.cbsdSerialNumber, grantId: "inexistente" }
+      ];
+      const relinquishTx = await sasSharedRegistry.connect(sas1).relinquishmentBatch(relinquishments);
+      await expect(relinquishTx).to.emit(sasSharedRegistry, "GrantTerminated");
+      await expect(relinquishTx)
+        .to.emit(sasSharedRegistry, "BatchItemFailed")
+        .withArgs(1, "relinquishment", "Grant not found");
+
+      const deregistrations = [
+        { fccId: registrationRequest.fccId, cbsdSerialNumber: registrationRequest.cbsdSerialNumber },
+        { fccId: registrationRequest.fccId, cbsdSerialNumber: registrationRequest.cbsdSerialNumber }
+      ];
+      await expect(sasSharedRegistry.connect(sas1).deregistrationBatch(deregistrations))
+        .to.emit(sasSharedRegistry, "BatchItemFailed")
+        .withArgs(1, "deregistration", "CBSD not registered");
+      expect(await sasSharedRegistry.totalCbsds()).to.equal(0);
+    });
+  });
+
+  describe("Gas por item em lote", function () {
+    const base = {
+      fccId: "FCC-GAS",
+      userId: "USR1",
+      callSign: "CALL1",
+      cbsdCategory: "A",
+      airInterface: "E-UTRA",
+      measCapability: ["RECEIVED_POWER_WITHOUT_GRANT"],
+      eirpCapability: 30,
+      latitude: 12345,
+      longitude: 67890,
+      height: 10,
+      heightType: "AGL",
+      indoorDeployment: true,
+      antennaGain: 5,
+      antennaBeamwidth: 60,
+      antennaAzimuth: 90,
+      groupingParam: "group1",
+      cbsdAddress: "192.168.0.1"
+    };
+    const grantBase = {
+      fccId: "FCC-GAS",
+      channelType: "GAA",
+      maxEirp: 30,
+      lowFrequency: 3550000000,
+      highFrequency: 3570000000,
+      requestedMaxEirp: 30,
+      requestedLowFrequency: 3550000000,
+      requestedHighFrequency: 3570000000,
+      grantExpireTime: 2000000000
+    };
+
+    async function gasUsed(txPromise) {
+      const receipt = await (await txPromise).wait();
+      return receipt.gasUsed;
+    }
+
+    it("deve reduzir o gas por item em lotes de 1, 10, 50 e 200", async function () {
+      this.timeout(300000);
+      const single = await gasUsed(
+        sasSharedRegistry.connect(sas1).registration({ ...base, cbsdSerialNumber: "SN-SINGLE" })
+      );
+      const rows = [];
+      let offset = 0;
+      for (const size of [1, 10, 50, 200]) {
+        const serials = Array.from({ length: size }, (_, i) => `SN-GAS-${offset + i}`);
+        offset += size;
+        const regGas = await gasUsed(sasSharedRegistry.connect(sas1).registrationBatch(
+          serials.map((cbsdSerialNumber) => ({ ...base, cbsdSerialNumber }))
+        ));
+        const grantGas = await gasUsed(sasSharedRegistry.connect(sas1).grantBatch(
+          serials.map((cbsdSerialNumber) => ({ ...grantBase, cbsdSerialNumber }))
+        ));
+        rows.push({
+          lote: size,
+          "registration/item": Number(regGas) / size,
+          "grant/item": Number(grantGas) / size
+        });
+      }
+      console.log(`      registration individual: ${single} gas`);
+      console.table(rows);
+
+      // O custo base da transação (21k + calldata/assinatura) é dividido pelo lote
+      expect(rows[3]["registration/item"]).to.be.lessThan(Number(single));
+      expect(rows[3]["registration/item"]).to.be.lessThan(rows[0]["registration/item"]);
+    });
   });
-}); 
\ No newline at end of file
+});